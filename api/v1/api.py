@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from api.v1.endpoints import usuario, conta, categoria, cartao_de_credito, fatura, parente, movimentacao
+from api.v1.endpoints import usuario, conta, categoria, cartao_de_credito, fatura, parente, movimentacao, sincronizacao
 
 api_router = APIRouter()
 api_router.include_router(usuario.router, prefix='/usuarios', tags=["usuarios"])
@@ -9,4 +9,4 @@ api_router.include_router(cartao_de_credito.router, prefix='/cartaoCredito', tag
 api_router.include_router(fatura.router, prefix='/fatura', tags=["fatura"])
 api_router.include_router(parente.router, prefix='/parente', tags=["parente"])
 api_router.include_router(movimentacao.router, prefix='/movimentacao', tags=["movimentacao"])
-
+api_router.include_router(sincronizacao.router, prefix='/sync', tags=["sincronizacao"])
@@ -1,4 +1,5 @@
 import calendar
+import logging
 import core.utils
 from sqlalchemy import extract
 import api.v1.endpoints
@@ -10,17 +11,20 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 from typing import List
 from core.deps import get_session, get_current_user
+from core.faturas import calendarios_dos_cartoes, invalidar_calendario
 from models.cartao_credito_model import CartaoCreditoModel
 from models.movimentacao_model import MovimentacaoModel
 from schemas.cartao_de_credito_schema import CartaoCreditoSchema, CartaoCreditoSchemaId, CartaoCreditoSchemaUpdate, CartaoCreditoSchemaFatura
 from models.usuario_model import UsuarioModel
 from models.fatura_model import FaturaModel
-from api.v1.endpoints.fatura import create_fatura_ano
+from core.horizonte import faturas_dos_meses, inserir_faturas
+from core.saldos import primeiro_dia, somar_meses
 from datetime import date, datetime
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post('/cadastro', status_code=status.HTTP_201_CREATED)
 async def post_cartao_credito(
@@ -38,7 +42,9 @@ async def post_cartao_credito(
         id_usuario=usuario_logado.id_usuario,
         nome_icone=cartao_credito.nome_icone,
         ativo=cartao_credito.ativo if cartao_credito.ativo is not None else True,
-        limite_disponivel=cartao_credito.limite
+        limite_disponivel=cartao_credito.limite,
+        dia_fechamento=cartao_credito.dia_fechamento,
+        dia_vencimento=cartao_credito.dia_vencimento
     )
 
     async with db as session:
@@ -48,24 +54,15 @@ async def post_cartao_credito(
             await session.refresh(novo_cartao)
 
            
-            await create_fatura_ano(
-                db, 
-                usuario_logado, 
-                novo_cartao.id_cartao_credito, 
-                date.today().year, 
-                cartao_credito.dia_vencimento, 
-                cartao_credito.dia_fechamento
-            )
-            
-            if date.today().month == 12:
-                await create_fatura_ano(
-                    db, 
-                    usuario_logado, 
-                    novo_cartao.id_cartao_credito, 
-                    date.today().year +1, 
-                    cartao_credito.dia_vencimento, 
-                    cartao_credito.dia_fechamento
-                )
+            # o mês atual e o seguinte, para o gasto de hoje cair na fatura certa; o resto vem do horizonte_job
+            hoje = date.today()
+            await inserir_faturas(db, faturas_dos_meses(
+                novo_cartao.id_cartao_credito,
+                cartao_credito.dia_vencimento,
+                cartao_credito.dia_fechamento,
+                hoje,
+                somar_meses(primeiro_dia(hoje), 1)
+            ), donos={novo_cartao.id_cartao_credito: usuario_logado.id_usuario})
 
             return novo_cartao
         except IntegrityError:
@@ -106,8 +103,14 @@ async def update_cartao_credito(
 
         if cartao_credito_update.dia_fechamento or cartao_credito_update.dia_vencimento:
             hoje = datetime.now()
-            dia_fechamento = cartao_credito_update.dia_fechamento 
-            dia_vencimento = cartao_credito_update.dia_vencimento 
+            # o dia que não veio continua o do cartão (as próximas faturas do horizonte usam os dois)
+            dia_fechamento = cartao_credito_update.dia_fechamento or cartao_credito.dia_fechamento
+            dia_vencimento = cartao_credito_update.dia_vencimento or cartao_credito.dia_vencimento
+            if dia_fechamento is None or dia_vencimento is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail="Informe o dia de fechamento e o de vencimento do cartão")
+            cartao_credito.dia_fechamento = dia_fechamento
+            cartao_credito.dia_vencimento = dia_vencimento
 
 
             fatura_query = select(FaturaModel).where(
@@ -118,13 +121,12 @@ async def update_cartao_credito(
             faturas = fatura_result.scalars().all()
 
             for fatura in faturas:
-                print("faturas print", fatura.id_fatura, fatura.data_fechamento, fatura.data_vencimento)
+                logger.debug("Ajustando fatura %s: fechamento %s, vencimento %s", fatura.id_fatura, fatura.data_fechamento, fatura.data_vencimento)
                 novo_mes_fechamento = fatura.data_fechamento.month
                 novo_ano_fechamento = fatura.data_fechamento.year
                 
                 ultimo_dia_mes_fechamento = calendar.monthrange(novo_ano_fechamento, novo_mes_fechamento)[1]
 
-                print("novo mes ano fechamento", novo_mes_fechamento, novo_ano_fechamento,  "dia  ", dia_fechamento, "", fatura.data_fechamento.day)
                 
                 dia_fechamento_ajustado = min(dia_fechamento, ultimo_dia_mes_fechamento)            
 
@@ -169,6 +171,8 @@ async def update_cartao_credito(
                         nova_fatura.fatura_gastos += movimentacao.valor
                         movimentacao.id_fatura = nova_fatura.id_fatura
 
+            invalidar_calendario(session, id_cartao_credito)
+
         await session.commit()
         await session.refresh(cartao_credito)
         return cartao_credito
@@ -179,7 +183,6 @@ async def listar_cartoes_credito(somente_ativo: bool, db: AsyncSession = Depends
         async with db as session:
             query = (
                 select(CartaoCreditoModel)
-                .options(joinedload(CartaoCreditoModel.faturas))
                 .where(CartaoCreditoModel.id_usuario == usuario_logado.id_usuario,
                        CartaoCreditoModel.ativo if somente_ativo else True)
             ).order_by(CartaoCreditoModel.nome)
@@ -187,15 +190,24 @@ async def listar_cartoes_credito(somente_ativo: bool, db: AsyncSession = Depends
             result = await session.execute(query)
             cartoes_credito: List[CartaoCreditoModel] = result.scalars().unique().all()
 
+            # a próxima fatura de cada cartão sai do calendário em cache; do banco só vêm os gastos dela
+            hoje = datetime.now().date()
+            calendarios = await calendarios_dos_cartoes(session, [cartao.id_cartao_credito for cartao in cartoes_credito])
+            proximas = {
+                id_cartao: calendario.proxima(hoje) for id_cartao, calendario in calendarios.items()
+            }
+            ids_proximas = [proxima.id_fatura for proxima in proximas.values() if proxima]
+            gastos = {}
+            if ids_proximas:
+                result_gastos = await session.execute(
+                    select(FaturaModel.id_fatura, FaturaModel.fatura_gastos).where(FaturaModel.id_fatura.in_(ids_proximas))
+                )
+                gastos = dict(result_gastos.all())
+
             cartoes_credito_response = []
             for cartao in cartoes_credito:
 
-                proximas_faturas = sorted(
-                    [f for f in cartao.faturas if f.data_fechamento >= datetime.now().date()],
-                    key=lambda f: f.data_fechamento
-                )
-
-                proxima_fatura = proximas_faturas[0] if proximas_faturas else None
+                proxima_fatura = proximas.get(cartao.id_cartao_credito)
                 
 
                 cartao_data = {
@@ -209,7 +221,7 @@ async def listar_cartoes_credito(somente_ativo: bool, db: AsyncSession = Depends
                     "ativo": cartao.ativo,
                     "id_usuario": cartao.id_usuario,
                     "limite": cartao.limite,
-                    "fatura_gastos": proxima_fatura.fatura_gastos if proxima_fatura else None,
+                    "fatura_gastos": gastos.get(proxima_fatura.id_fatura) if proxima_fatura else None,
                 }
                 cartoes_credito_response.append(cartao_data)
 
@@ -290,6 +302,7 @@ async def deletar_cartao_credito(
         if faturas:
             raise HTTPException(detail='Não é possível excluir o cartão de crédito. Existem faturas associadas.', status_code=status.HTTP_400_BAD_REQUEST)
         
+        invalidar_calendario(session, id_cartao_credito)
         await session.delete(cartao_credito)
         await session.commit()
 
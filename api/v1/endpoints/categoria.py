@@ -2,11 +2,15 @@ from fastapi import APIRouter, status, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from typing import List
+from datetime import datetime, timezone
 from core.deps import get_current_user, get_session
+from models.alerta_orcamento_model import AlertaOrcamentoModel
 from models.categoria_model import CategoriaModel
 from models.usuario_model import UsuarioModel
 from models.movimentacao_model import MovimentacaoModel
-from schemas.categoria_schema import CategoriaSchema, CategoriaSchemaUpdate, CategoriaSchemaId
+from schemas.categoria_schema import (AlertaOrcamentoLidosSchema, AlertaOrcamentoSchema, CategoriaSchema, CategoriaSchemaUpdate,
+                                      CategoriaSchemaId)
+from sqlalchemy import update
 from sqlalchemy.future import select
 from models.enums import TipoMovimentacao
 
@@ -181,4 +185,37 @@ async def delete_categoria (
             
         return Response(status_code=status.HTTP_204_NO_CONTENT)
         
-        
\ No newline at end of file
+        
+
+
+@router.get('/alertas-orcamento', response_model=List[AlertaOrcamentoSchema], status_code=status.HTTP_200_OK)
+async def get_alertas_orcamento(
+    db: AsyncSession = Depends(get_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user)
+):
+    # avisos enfileirados por core/orcamento.py quando o consumo cruza um limiar
+    async with db as session:
+        query = select(AlertaOrcamentoModel).where(
+            AlertaOrcamentoModel.id_usuario == usuario_logado.id_usuario,
+            AlertaOrcamentoModel.lido_em.is_(None)
+        ).order_by(AlertaOrcamentoModel.criado_em, AlertaOrcamentoModel.id_alerta)
+        result = await session.execute(query)
+        return result.scalars().all()
+
+
+@router.post('/alertas-orcamento/lidos', status_code=status.HTTP_204_NO_CONTENT)
+async def marcar_alertas_orcamento_lidos(
+    alertas: AlertaOrcamentoLidosSchema,
+    db: AsyncSession = Depends(get_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user)
+):
+    async with db as session:
+        await session.execute(
+            update(AlertaOrcamentoModel).where(
+                AlertaOrcamentoModel.id_usuario == usuario_logado.id_usuario,
+                AlertaOrcamentoModel.id_alerta.in_(alertas.ids),
+                AlertaOrcamentoModel.lido_em.is_(None)
+            ).values(lido_em=datetime.now(timezone.utc))
+        )
+        await session.commit()
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
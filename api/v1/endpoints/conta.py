@@ -1,13 +1,16 @@
 from typing import List
-from fastapi import APIRouter, status, Depends, HTTPException, Response
+from fastapi import APIRouter, status, Depends, HTTPException, Response, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from core.deps import get_current_user, get_session
+from core.deps import get_current_user, get_current_user_leitura, get_read_session, get_session
 from models.conta_model import ContaModel
 from models.movimentacao_model import MovimentacaoModel
+from models.saldo_mensal_model import SaldoMensalModel
 from models.usuario_model import UsuarioModel
-from schemas.conta_schema import ContaSchema, ContaSchemaId, ContaSchemaUpdate
+from schemas.conta_schema import ContaSchema, ContaSchemaId, ContaSchemaUpdate, SaldoMensalSchema
+from core.saldos import serie_saldos
 
+from sqlalchemy import delete
 from sqlalchemy.future import select
 
 router = APIRouter()
@@ -149,6 +152,7 @@ async def delete_conta (
         
         
            
+        await session.execute(delete(SaldoMensalModel).where(SaldoMensalModel.id_conta == conta_id))
         await session.delete(conta_del)
         
         await session.commit()
@@ -157,6 +161,24 @@ async def delete_conta (
         
         
 
+@router.get('/saldo-historico/{conta_id}', response_model=List[SaldoMensalSchema], status_code=status.HTTP_200_OK)
+async def get_saldo_historico(
+    conta_id: int,
+    meses: int = Query(12, ge=1, le=600),
+    db: AsyncSession = Depends(get_read_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user_leitura)
+):
+    async with db as session:
+        query = select(ContaModel).where(ContaModel.id_conta == conta_id, ContaModel.id_usuario == usuario_logado.id_usuario)
+        result = await session.execute(query)
+        conta: ContaModel = result.scalars().unique().one_or_none()
+
+        if not conta:
+            raise HTTPException(detail='Conta não encontrada.', status_code=status.HTTP_404_NOT_FOUND)
+
+        return await serie_saldos(session, conta.id_conta, meses)
+
+
 #GET / all Teste pra todas as contas de todos os usuários
 @router.get('/teste/', response_model=List[ContaSchemaId])
 async def get_contas_teste ( db: AsyncSession = Depends(get_session),
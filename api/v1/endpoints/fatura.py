@@ -1,7 +1,6 @@
 from datetime import datetime, date
 from decimal import Decimal
 
-from sqlalchemy import extract
 from datetime import datetime, date
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -16,6 +15,7 @@ from models.movimentacao_model import MovimentacaoModel
 from models.conta_model import ContaModel
 from schemas.fatura_schema import FaturaSchema, FaturaSchemaUpdate, FaturaSchemaId
 from core.deps import get_session, get_current_user
+from core.faturas import invalidar_calendario
 from sqlalchemy.future import select
 from typing import List, Optional
 from sqlalchemy.orm import joinedload
@@ -23,131 +23,6 @@ from sqlalchemy.orm import joinedload
 
 router = APIRouter()
 
-from datetime import timedelta
-
-
-async def verificar_fatura_existente(db: AsyncSession, id_cartao_credito: int, mes: int, ano: int) -> Optional[FaturaModel]:
-    # Verificar se já existe uma fatura para o mesmo mês e ano
-
-    result = await db.execute(
-        select(FaturaModel).where(
-            FaturaModel.id_cartao_credito == id_cartao_credito,
-            extract('month', FaturaModel.data_vencimento) == mes,
-            extract('year', FaturaModel.data_vencimento) == ano,
-            extract('month', FaturaModel.data_fechamento) == mes,
-            extract('year', FaturaModel.data_fechamento) == ano
-        )
-    )
-    return result.scalars().first()
-    
-    
-async def create_fatura_ano(
-    db: AsyncSession,
-    usuario_logado: UsuarioModel,
-    id_cartao_credito: int,
-    ano: int,
-    dia_vencimento_usuario: Optional[int],
-    dia_fechamento_usuario: Optional[int]
-):
-    # Consulta para verificar se o cartão de crédito pertence ao usuário
-    query_cartao_credito = select(CartaoCreditoModel).where(
-        CartaoCreditoModel.id_cartao_credito == id_cartao_credito,
-        CartaoCreditoModel.id_usuario == usuario_logado.id_usuario
-    )
-    result_cartao_credito = await db.execute(query_cartao_credito)
-    cartao_credito = result_cartao_credito.scalars().one_or_none()
-
-    if not cartao_credito:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, 
-            detail="Você não tem permissão para criar essa fatura"
-        )
-    
-    if dia_vencimento_usuario is None or dia_fechamento_usuario is None:
-        # Buscar a última fatura do cartão de crédito
-        fatura_anterior = await db.execute(
-            select(FaturaModel)
-            .where(FaturaModel.id_cartao_credito == id_cartao_credito)
-            .order_by(FaturaModel.data_vencimento.desc())  
-        )
-        fatura_anterior = fatura_anterior.scalars().first()  
-        
-        if fatura_anterior:
-            dia_vencimento = fatura_anterior.data_vencimento.day
-            dia_fechamento = fatura_anterior.data_fechamento.day
-
-            for mes in range(1, 13):  
-                try:
-                    data_vencimento = date(ano, mes, dia_vencimento)
-                    data_fechamento = date(ano, mes, dia_fechamento)
-                except ValueError:
-                    data_vencimento = adjust_to_valid_date(ano, mes, dia_vencimento)
-                    data_fechamento = adjust_to_valid_date(ano, mes, dia_fechamento)
-
-                existing_fatura = await verificar_fatura_existente(
-                    db, id_cartao_credito, mes, ano
-                )
-
-                if not existing_fatura:  # Se não houver fatura para esse mês e ano
-                    nova_fatura = FaturaModel(
-                        data_vencimento=data_vencimento,
-                        data_fechamento=data_fechamento,
-                        id_conta=fatura_anterior.id_conta,
-                        id_cartao_credito=id_cartao_credito,
-                        fatura_gastos=0
-                    )
-                    db.add(nova_fatura)
-
-    else:
-        dia_fechamento = dia_fechamento_usuario
-        dia_vencimento = dia_vencimento_usuario
-
-        mes_atual = date.today().month
-
-        for mes in range(mes_atual, 13):  
-            try:
-                data_vencimento = date(ano, mes, dia_vencimento)
-                data_fechamento = date(ano, mes, dia_fechamento)
-            except ValueError:
-                data_vencimento = adjust_to_valid_date(ano, mes, dia_vencimento)
-                data_fechamento = adjust_to_valid_date(ano, mes, dia_fechamento)
-
-            existing_fatura = await verificar_fatura_existente(
-                db, id_cartao_credito, mes, ano
-            )
-
-            if not existing_fatura:  # Se não houver fatura para esse mês e ano
-                nova_fatura = FaturaModel(
-                    data_vencimento=data_vencimento,
-                    data_fechamento=data_fechamento,
-                    id_conta=None,
-                    id_cartao_credito=id_cartao_credito,
-                    fatura_gastos=0
-                )
-                db.add(nova_fatura)
-
-    try:
-        await db.commit()
-        return cartao_credito
-    except IntegrityError:
-        await db.rollback()
-        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail='Erro ao criar as faturas. Verifique os dados fornecidos.')
-
-
-import calendar
-
-def adjust_to_valid_date(ano: int, mes: int, dia: int) -> date:
-    """
-    Ajusta para o próximo dia válido no mês, caso o dia especificado não exista.
-    Se o dia estiver fora do limite para o mês, ajusta para o último dia do mês.
-    """
-    ultimo_dia_mes = calendar.monthrange(ano, mes)[1]
-    
-    if dia > ultimo_dia_mes:
-        dia = ultimo_dia_mes
-
-    return date(ano, mes, dia)
-
 @router.post("/fechar")
 async def fechar_fatura(
     faturas: FaturaSchemaId,
@@ -256,9 +131,6 @@ async def fechar_fatura(
 
         except Exception as e:
             await handle_db_exceptions(session, e)
-        
-        finally:
-            await session.close()
 
 @router.put('/editar/{id_fatura}', response_model=FaturaSchemaId,status_code=status.HTTP_200_OK)
 async def put_fatura(
@@ -299,6 +171,8 @@ async def put_fatura(
         if fatura_update.id_cartao_credito:
             fatura.id_cartao_credito = fatura_update.id_cartao_credito
 
+        invalidar_calendario(session, cartao_credito.id_cartao_credito, fatura.id_cartao_credito)
+
         try:
             await session.commit()
             return fatura
@@ -320,6 +194,7 @@ async def delete_fatura(id_fatura: int, db: AsyncSession = Depends(get_session),
         if not fatura:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="fatura não encontrada ou não pertence ao usuário logado")
         
+        invalidar_calendario(session, fatura.id_cartao_credito)
         await session.delete(fatura)
         await session.commit()
 
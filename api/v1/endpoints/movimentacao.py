@@ -1,116 +1,250 @@
 
 from decimal import ROUND_HALF_UP, Decimal
+import logging
 from fastapi import APIRouter, Depends , status, HTTPException
-from sqlalchemy import and_, extract, func, or_
+from sqlalchemy import Integer, String, and_, cast, extract, func, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from api.v1.endpoints.fatura import create_fatura_ano
 from core.utils import handle_db_exceptions
 from models.cartao_credito_model import CartaoCreditoModel
 from models.divide_model import DivideModel
 from models.movimentacao_model import MovimentacaoModel
 from models.parente_model import ParenteModel
 from schemas.fatura_schema import FaturaSchemaInfo
-from schemas.movimentacao_schema import (MovimentacaoFaturaSchemaList, MovimentacaoRequestFilterSchema,
-    MovimentacaoSchemaConsolida, MovimentacaoSchemaId, MovimentacaoSchemaList, MovimentacaoSchemaReceitaDespesa,
-    MovimentacaoSchemaTransferencia, MovimentacaoSchemaUpdate, ParenteResponse)
-from core.deps import get_session, get_current_user
+from schemas.movimentacao_schema import (MovimentacaoBuscaSchema, MovimentacaoFaturaSchemaList,
+    MovimentacaoRequestFilterSchema, MovimentacaoSchemaConsolida, MovimentacaoSchemaId, MovimentacaoSchemaList, MovimentacaoSchemaReceitaDespesa,
+    MovimentacaoSchemaTransferencia, MovimentacaoSchemaUpdate, ParenteResponse, MovimentacaoListDict, ParenteResponseDict)
+from core.deps import get_current_user, get_current_user_leitura, get_read_session, get_session
 from models.usuario_model import UsuarioModel
 from models.conta_model import ContaModel
 from models.categoria_model import CategoriaModel
 from models.fatura_model import FaturaModel
-from typing import List
+from typing import List, Optional, Sequence
+from sqlalchemy.engine import RowMapping
+from core.responses import ORJSONDecimalResponse
+from core.sql import agregar_json, json_objeto
+from core.busca import CursorInvalido, buscar_movimentacoes
+from core.faturas import calendario_do_cartao, calendarios_dos_cartoes, invalidar_calendario, resolver_fatura
+from core.horizonte import fim_das_recorrencias, garantir_faturas
+from core.orcamento import consumos_do_mes
+from core.recorrencias import (PARCELA_MODELO, data_da_ocorrencia, divisoes_da_ocorrencia, mantem_o_dia,
+    nova_ocorrencia, ocorrencias_virtuais, parcelas_materializadas, parcelas_no_periodo)
+from core.saldos import primeiro_dia, somar_meses
+from core.sincronizacao import reservar_versoes
 from models.repeticao_model import RepeticaoModel
 from models.enums import CondicaoPagamento, FormaPagamento, TipoMovimentacao, TipoRecorrencia
 from datetime import date, datetime, timedelta
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm import aliased, joinedload, selectinload
 from calendar import monthrange
 from dateutil.relativedelta import relativedelta
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 
 async def find_fatura(id_cartao_credito: int, data_pagamento: date, db: AsyncSession):
-    
+    # uma consulta por faixa de data_fechamento, reaproveitada pelas parcelas seguintes da mesma transação
+    fatura = await resolver_fatura(db, id_cartao_credito, data_pagamento)
+    if fatura:
+        logger.debug("fatura %s fecha em %s, pagamento em %s", fatura.id_fatura, fatura.data_fechamento, data_pagamento)
+    return fatura
 
-    # Consulta para pegar a fatura no mês atual
-    query_mes_atual = select(FaturaModel).filter(
-        FaturaModel.id_cartao_credito == id_cartao_credito,
-        extract('month', FaturaModel.data_fechamento) == data_pagamento.month,
-        extract('year', FaturaModel.data_fechamento) == data_pagamento.year
-    )
 
-    # Consulta para pegar a fatura do mês seguinte
-    query_mes_seguinte = select(FaturaModel).filter(
-        FaturaModel.id_cartao_credito == id_cartao_credito,
-        extract('month', FaturaModel.data_fechamento) == (data_pagamento.month % 12) + 1,  # Incrementa o mês
-        extract('year', FaturaModel.data_fechamento) == (data_pagamento.year if data_pagamento.month < 12 else data_pagamento.year + 1)  # Ajusta o ano se for Dezembro
-    )
-    
-    # Executa as consultas
-    result_mes_atual = await db.execute(query_mes_atual)
-    fatura_mes_atual =  result_mes_atual.scalars().first()
+async def get_or_create_fatura(session: AsyncSession, usuario_logado: UsuarioModel, id_financeiro:int, data_pagamento: date):
+    # session.get usa o identity map: nas parcelas seguintes o cartão já está na sessão
+    cartao_credito = await session.get(CartaoCreditoModel, id_financeiro)
 
-    result_mes_seguinte = await db.execute(query_mes_seguinte)
-    fatura_mes_seguinte =  result_mes_seguinte.scalars().first()
-    
+    if not cartao_credito or cartao_credito.id_usuario != usuario_logado.id_usuario:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Você não tem permissão para acessar esse cartão"
+        )
 
-    # Verifica qual fatura escolher
-    if fatura_mes_atual:
-        # Se tiver uma fatura no mês atual, verifica se ela já é a fatura seguinte
-        print("mes atual fatura", fatura_mes_atual.data_fechamento, data_pagamento)
-        if fatura_mes_atual.data_fechamento > data_pagamento:
-            return fatura_mes_atual
-    
-    if fatura_mes_seguinte:
-        print("mes seguinte fatura", fatura_mes_seguinte.data_fechamento, data_pagamento)
+    fatura = await find_fatura(id_financeiro, data_pagamento, session)
 
-        if fatura_mes_seguinte.data_fechamento > data_pagamento and fatura_mes_atual:
-            return fatura_mes_seguinte
+    if not fatura:
+        # o horizonte_job mantém as faturas à frente; aqui só o mês da data e o seguinte (onde o gasto
+        # cai se a do mês já fechou), estejam antes da primeira fatura, depois da última ou num buraco
+        await garantir_faturas(session, [id_financeiro], somar_meses(primeiro_dia(data_pagamento), 1),
+                               de=primeiro_dia(data_pagamento))
+        # mesmo sem INSERT: o calendário em cache pode ser de outro worker, anterior às faturas que já existem
+        invalidar_calendario(session, id_financeiro)
+        fatura = await find_fatura(id_financeiro, data_pagamento, session)
 
-    return None
+        if not fatura:
+            if cartao_credito.dia_fechamento is None or cartao_credito.dia_vencimento is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail="Informe os dias de fechamento e vencimento do cartão antes de lançar nele")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao adicionar fatura")
 
+    return fatura, cartao_credito
 
-async def get_or_create_fatura(session: AsyncSession, usuario_logado: UsuarioModel, id_financeiro:int, data_pagamento: date):
-    fatura = await find_fatura(id_financeiro, data_pagamento, session)
-    cartao_credito = None 
+async def materializar_ocorrencia(
+    session: AsyncSession,
+    usuario_logado: UsuarioModel,
+    id_repeticao: int,
+    parcela: int
+) -> MovimentacaoModel:
+    """
+    Grava a ``parcela`` de uma recorrência a partir da primeira ocorrência (o modelo), para
+    ser consolidada ou editada. Se ela já é uma linha, devolve a linha.
+    """
+    existente_query = select(MovimentacaoModel).where(
+        MovimentacaoModel.id_repeticao == id_repeticao,
+        MovimentacaoModel.parcela_atual == str(parcela),
+        MovimentacaoModel.id_usuario == usuario_logado.id_usuario
+    )
+    existente = (await session.execute(existente_query)).scalars().first()
+    if existente:
+        return existente
 
-    if not fatura:
+    repeticao = await session.get(RepeticaoModel, id_repeticao)
+    modelo = (await session.execute(
+        select(MovimentacaoModel)
+        .options(selectinload(MovimentacaoModel.divisoes), joinedload(MovimentacaoModel.fatura))
+        .where(
+            MovimentacaoModel.id_repeticao == id_repeticao,
+            MovimentacaoModel.parcela_atual == PARCELA_MODELO,
+            MovimentacaoModel.condicao_pagamento == CondicaoPagamento.RECORRENTE,
+            MovimentacaoModel.id_usuario == usuario_logado.id_usuario
+        )
+    )).scalars().first()
+    if not repeticao or not modelo:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recorrência não encontrada.")
+    if parcela < 2 or (repeticao.quantidade_parcelas is not None and parcela > repeticao.quantidade_parcelas):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ocorrência não existe nesta recorrência.")
+
+    data_pagamento = data_da_ocorrencia(repeticao.tipo_recorrencia, repeticao.data_inicio, parcela)
+    nova_movimentacao = nova_ocorrencia(modelo, parcela, data_pagamento)
+
+    participa = False
+    if modelo.forma_pagamento == FormaPagamento.CREDITO and modelo.fatura is not None:
+        fatura, cartao_credito = await get_or_create_fatura(
+            session, usuario_logado, modelo.fatura.id_cartao_credito, data_pagamento)
+        nova_movimentacao.id_fatura = fatura.id_fatura
+        # como na criação: só entra no limite e nos gastos da fatura a partir do mês do pagamento
+        participa = primeiro_dia(data_pagamento) <= primeiro_dia(date.today())
+        nova_movimentacao.participa_limite_fatura_gastos = False
 
-        if data_pagamento.month == 12:  
-            cartao_credito = await create_fatura_ano(session, usuario_logado, id_financeiro, data_pagamento.year +1, None, None)
-        else:
-            cartao_credito = await create_fatura_ano(session, usuario_logado, id_financeiro, data_pagamento.year, None, None)
-        
-        fatura = await find_fatura(id_financeiro, data_pagamento, session)
-        
-        if not fatura:
+    try:
+        # o horizonte_job ou outra requisição pode gravar a mesma parcela ao mesmo tempo
+        # (ux_movimentacao_repeticao_parcela): quem chega depois fica com a linha de quem gravou
+        async with session.begin_nested():
+            session.add(nova_movimentacao)
+            await session.flush()
+    except IntegrityError:
+        logger.debug("Parcela %s da repetição %s gravada por outra transação", parcela, id_repeticao)
+        return (await session.execute(existente_query)).scalars().one()
 
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao adicionar fatura")
+    if participa:
+        ajustar_limite_fatura_gastos(cartao_credito, fatura, nova_movimentacao, True)
+    session.add_all(divisoes_da_ocorrencia(modelo, nova_movimentacao.id_movimentacao))
+    await session.flush()
+    logger.debug("Parcela %s da repetição %s materializada", parcela, id_repeticao)
+    return nova_movimentacao
+
+
+async def materializar_parcelas(
+    session: AsyncSession,
+    usuario_logado: UsuarioModel,
+    id_repeticao: int,
+    ate: date
+) -> int:
+    """
+    Grava as ocorrências ainda virtuais da recorrência com data antes de ``ate``, a partir
+    do modelo como ele está agora.
+    """
+    repeticao = await session.get(RepeticaoModel, id_repeticao)
+    gravadas = (await parcelas_materializadas(session, [id_repeticao]))[id_repeticao]
+    faltam = [parcela for parcela, _ in parcelas_no_periodo(
+        repeticao.tipo_recorrencia, repeticao.data_inicio, repeticao.quantidade_parcelas, date.min, ate)
+        if parcela not in gravadas]
+    for parcela in faltam:
+        await materializar_ocorrencia(session, usuario_logado, id_repeticao, parcela)
+    return len(faltam)
+
+
+async def separar_recorrencia(
+    session: AsyncSession,
+    usuario_logado: UsuarioModel,
+    id_repeticao: int
+) -> Optional[int]:
+    """
+    Antes de editar a primeira ocorrência (o modelo), a regra termina antes da primeira
+    ocorrência ainda virtual e uma regra nova segue dali, com essa ocorrência gravada como o
+    modelo está agora. As já gravadas depois dela passam para a regra nova, renumeradas, em
+    um UPDATE: a edição grava um número fixo de linhas, qualquer que seja o tamanho da série.
+
+    A regra nova conta as datas do seu próprio início; para um dia 31 (ou 29/02) não virar
+    o dia do mês curto em que ela começaria, as ocorrências que caem nesse dia ajustado
+    ficam gravadas na regra antiga (uma, ou até três anos seguidos no 29/02).
+    Devolve o id da regra nova, ou None se não sobrou ocorrência virtual.
+    """
+    repeticao = await session.get(RepeticaoModel, id_repeticao)
+    gravadas = (await parcelas_materializadas(session, [id_repeticao]))[id_repeticao]
+    corte = 2
+    while repeticao.quantidade_parcelas is None or corte <= repeticao.quantidade_parcelas:
+        if corte not in gravadas:
+            data_corte = data_da_ocorrencia(repeticao.tipo_recorrencia, repeticao.data_inicio, corte)
+            if mantem_o_dia(repeticao.tipo_recorrencia, repeticao.data_inicio, data_corte):
+                break
+            await materializar_ocorrencia(session, usuario_logado, id_repeticao, corte)
+        corte += 1
     else:
-        query_cartao_credito = select(CartaoCreditoModel).where(
-            CartaoCreditoModel.id_cartao_credito == id_financeiro,
-            CartaoCreditoModel.id_usuario == usuario_logado.id_usuario
+        return None
+
+    await materializar_ocorrencia(session, usuario_logado, id_repeticao, corte)
+    nova_repeticao = RepeticaoModel(
+        quantidade_parcelas=(None if repeticao.quantidade_parcelas is None
+                             else repeticao.quantidade_parcelas - corte + 1),
+        tipo_recorrencia=repeticao.tipo_recorrencia,
+        valor_total=repeticao.valor_total,
+        data_inicio=data_corte,
+        id_usuario=repeticao.id_usuario
+    )
+    session.add(nova_repeticao)
+    repeticao.quantidade_parcelas = corte - 1
+    await session.flush()
+
+    versao = (await reservar_versoes(session, [repeticao.id_usuario]))[repeticao.id_usuario]
+    numero = cast(MovimentacaoModel.parcela_atual, Integer)
+    await session.execute(
+        update(MovimentacaoModel)
+        .where(
+            MovimentacaoModel.id_repeticao == id_repeticao,
+            MovimentacaoModel.condicao_pagamento == CondicaoPagamento.RECORRENTE,
+            MovimentacaoModel.parcela_atual != PARCELA_MODELO,
+            numero >= corte
         )
-        result_cartao_credito = await session.execute(query_cartao_credito)
-        cartao_credito = result_cartao_credito.scalars().one_or_none()
+        .values(id_repeticao=nova_repeticao.id_repeticao, parcela_atual=cast(numero - corte + 1, String), versao=versao)
+        .execution_options(synchronize_session="fetch")
+    )
+    logger.debug("Repetição %s separada na parcela %s: segue na repetição %s",
+                 id_repeticao, corte, nova_repeticao.id_repeticao)
+    return nova_repeticao.id_repeticao
+
+
+@router.post('/recorrencia/{id_repeticao}/{parcela}', status_code=status.HTTP_201_CREATED)
+async def materializar_ocorrencia_recorrente(
+    id_repeticao: int,
+    parcela: int,
+    db: AsyncSession = Depends(get_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user)
+):
+    """Grava uma ocorrência virtual da listagem para poder editá-la ou apagá-la pelo id_movimentacao."""
+    movimentacao = await materializar_ocorrencia(db, usuario_logado, id_repeticao, parcela)
+    return {"id_movimentacao": movimentacao.id_movimentacao}
 
-        if not cartao_credito:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Você não tem permissão para acessar esse cartão"
-            )
-    
-    return fatura, cartao_credito
 
 async def validar_categoria(session: AsyncSession, usuario_logado: UsuarioModel, id_categoria:int):
     query_categoria = select(CategoriaModel).where(CategoriaModel.id_categoria == id_categoria, CategoriaModel.id_usuario == usuario_logado.id_usuario)
     result_categoria = await session.execute(query_categoria)
     categoria = result_categoria.scalars().first()
     if not categoria:
-        print(f"Categoria {id_categoria} não encontrada ou não pertence ao usuário {usuario_logado.id_usuario}")
+        logger.info("Categoria %s não encontrada ou não pertence ao usuário %s", id_categoria, usuario_logado.id_usuario)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Categoria não encontrada ou não pertence ao usuário.")
     return categoria
 
@@ -119,39 +253,39 @@ async def validar_conta(session, usuario_logado, id_conta):
     result_conta = await session.execute(query_conta)
     conta =  result_conta.scalars().first()
     if not conta:
-        print(f"Conta {id_conta} não encontrada ou não pertence ao usuário {usuario_logado.id_usuario}")
+        logger.info("Conta %s não encontrada ou não pertence ao usuário %s", id_conta, usuario_logado.id_usuario)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conta não encontrada ou não pertence ao usuário.")
     return conta
 
 async def criar_repeticao(movimentacao: MovimentacaoSchemaReceitaDespesa, usuario_logado: UsuarioModel, db: AsyncSession):
     if movimentacao.condicao_pagamento in [CondicaoPagamento.PARCELADO, CondicaoPagamento.RECORRENTE]:
-        if movimentacao.condicao_pagamento == CondicaoPagamento.RECORRENTE: 
-            if movimentacao.tipo_recorrencia == TipoRecorrencia.ANUAL:
-                movimentacao.quantidade_parcelas = 4
-            else: 
-                movimentacao.quantidade_parcelas = 24
-
+        # recorrente não tem fim: a regra termina quando uma ocorrência é apagada (deletar_movimentacao)
         nova_repeticao = RepeticaoModel(
-            quantidade_parcelas=movimentacao.quantidade_parcelas,
+            quantidade_parcelas=(None if movimentacao.condicao_pagamento == CondicaoPagamento.RECORRENTE
+                                 else movimentacao.quantidade_parcelas),
             tipo_recorrencia=movimentacao.tipo_recorrencia,
             valor_total=movimentacao.valor,
             data_inicio=movimentacao.data_pagamento,
             id_usuario=usuario_logado.id_usuario
         )
         
-        print(f"Nova repetição criada: {nova_repeticao}")
-
         
         db.add(nova_repeticao)
         await db.flush()
         await db.refresh(nova_repeticao)
         
-        print(f"ID da repetição: {nova_repeticao.id_repeticao}")
+        logger.debug("Repetição %s criada", nova_repeticao.id_repeticao)
 
         
         return nova_repeticao.id_repeticao
     return None
 
+def parcelas_gravadas_na_criacao(movimentacao: MovimentacaoSchemaReceitaDespesa) -> int:
+    # recorrente: só a primeira ocorrência vira linha, as seguintes saem da regra (core/recorrencias.py)
+    if movimentacao.condicao_pagamento == CondicaoPagamento.RECORRENTE:
+        return 1
+    return movimentacao.quantidade_parcelas
+
 def ajustar_data_pagamento(movimentacao: MovimentacaoSchemaReceitaDespesa, data_pagamento: date):
     if movimentacao.condicao_pagamento == CondicaoPagamento.RECORRENTE:
         if movimentacao.tipo_recorrencia == TipoRecorrencia.ANUAL:
@@ -203,7 +337,7 @@ async def create_movimentacao_despesa(
                 movimentacao.consolidado = False
                 fatura, cartao_credito = await get_or_create_fatura(session, usuario_logado, movimentacao.id_financeiro, movimentacao.data_pagamento)
                 if cartao_credito:
-                    print(f"Cartão de Crédito {cartao_credito}")
+                    logger.debug("Cartão de crédito %s", cartao_credito.id_cartao_credito)
 
             if movimentacao.id_conta is not None:
                 conta = await validar_conta(session, usuario_logado, movimentacao.id_conta)
@@ -220,7 +354,7 @@ async def create_movimentacao_despesa(
             id_repeticao = await criar_repeticao(movimentacao, usuario_logado, db)
 
             # Criação das movimentações parceladas
-            for parcela_atual in range(1, movimentacao.quantidade_parcelas + 1):
+            for parcela_atual in range(1, parcelas_gravadas_na_criacao(movimentacao) + 1):
                 nova_movimentacao = MovimentacaoModel(
                     valor=valor_primeira_parcela if parcela_atual == 1 else valor_parcela,
                     descricao=movimentacao.descricao,
@@ -294,13 +428,16 @@ async def create_movimentacao_despesa(
 
                 if movimentacao.forma_pagamento == FormaPagamento.CREDITO:       
                     fatura, cartao = await get_or_create_fatura(session, usuario_logado, movimentacao.id_financeiro, data_pagamento)
+            if movimentacao.condicao_pagamento == CondicaoPagamento.RECORRENTE:
+                # as ocorrências até o fim da janela do horizonte_job viram linha já: orçamento, saldos,
+                # extratos e a rotina de atraso leem só o MOVIMENTACAO e não esperam a próxima rodada
+                await db.flush()
+                await materializar_parcelas(db, usuario_logado, id_repeticao, fim_das_recorrencias())
             await db.commit()
             return {"message": "Despesa cadastrada com sucesso."}
         
         except Exception as e:
             await handle_db_exceptions(session, e)
-        finally:
-            await session.close()
             
 @router.post('/cadastro/receita', status_code=status.HTTP_201_CREATED)
 async def create_movimentacao_receita(
@@ -342,7 +479,7 @@ async def create_movimentacao_receita(
             id_repeticao = await criar_repeticao(movimentacao, usuario_logado, db)
 
             # Criação das movimentações parceladas
-            for parcela_atual in range(1, movimentacao.quantidade_parcelas + 1):
+            for parcela_atual in range(1, parcelas_gravadas_na_criacao(movimentacao) + 1):
                 nova_movimentacao = MovimentacaoModel(
                     valor= movimentacao.valor,
                     descricao=movimentacao.descricao,
@@ -386,6 +523,10 @@ async def create_movimentacao_receita(
                 
                 data_pagamento = ajustar_data_pagamento(movimentacao, data_pagamento)
 
+            if movimentacao.condicao_pagamento == CondicaoPagamento.RECORRENTE:
+                # como na despesa: as ocorrências da janela do horizonte_job já como linha
+                await db.flush()
+                await materializar_parcelas(db, usuario_logado, id_repeticao, fim_das_recorrencias())
             await db.commit()
             return {"message": "Receita cadastrada com sucesso."}
         
@@ -393,9 +534,6 @@ async def create_movimentacao_receita(
         except Exception as e:
             await handle_db_exceptions(session, e)
 
-        finally:
-            await session.close()
-
 @router.post('/cadastro/transferencia', status_code=status.HTTP_201_CREATED)
 async def create_movimentacao(
     movimentacao: MovimentacaoSchemaTransferencia,
@@ -404,7 +542,6 @@ async def create_movimentacao(
 ):
     async with db as session:
         try:
-            print(f"Usuário autenticado: {usuario_logado}")
 
             if movimentacao.id_conta_transferencia == movimentacao.id_conta_atual:
                 raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="As contas devem ter IDs diferentes")
@@ -448,9 +585,6 @@ async def create_movimentacao(
         
         except Exception as e:
             await handle_db_exceptions(session, e)
-        
-        finally:
-            await session.close()
 
 @router.post('/editar/{id_movimentacao}', status_code=status.HTTP_202_ACCEPTED)
 async def update_movimentacao(
@@ -512,6 +646,12 @@ async def update_movimentacao(
             
         if(movimentacao.consolidado and movimentacao.id_fatura):
             raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="Não pode editar fatura consolidada")
+
+        if (movimentacao.condicao_pagamento == CondicaoPagamento.RECORRENTE and movimentacao.id_repeticao
+                and movimentacao.parcela_atual == PARCELA_MODELO):
+            # a parcela 1 é o modelo das ocorrências virtuais: as seguintes passam para uma regra nova
+            # com o modelo de antes, senão a edição desta ocorrência reescreveria todas elas
+            await separar_recorrencia(session, usuario_logado, movimentacao.id_repeticao)
         
 
         movimentacao.descricao = movimentacao_update.descricao
@@ -577,7 +717,7 @@ async def update_movimentacao(
                     fatura, cartao = await get_or_create_fatura(session, usuario_logado, movimentacao_update.id_financeiro, movimentacao_update.data_pagamento)
                     
                     movimentacao.id_fatura = fatura.id_fatura
-                    print(cartao, cartao.limite_disponivel, fatura)
+                    logger.debug("Cartão %s, limite disponível %s, fatura %s", cartao.id_cartao_credito, cartao.limite_disponivel, fatura.id_fatura)
                     
                     if(movimentacao.data_pagamento.month <= today.month and movimentacao.data_pagamento.year <= today.year
                        or movimentacao.condicao_pagamento == CondicaoPagamento.PARCELADO):
@@ -717,9 +857,6 @@ async def update_movimentacao(
             await handle_db_exceptions(session, e)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Erro ao atualizar movimentação")
 
-        finally:
-            await session.close()
-
         
         
 async def buscar_contas_usuario(
@@ -737,8 +874,8 @@ async def buscar_contas_usuario(
     
 @router.get('/listar', response_model=List[MovimentacaoSchemaId])
 async def listar_movimentacoes(
-    db: AsyncSession = Depends(get_session),
-    usuario_logado: UsuarioModel = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user_leitura)
 ):
     async with db:  
         query = (
@@ -783,8 +920,8 @@ async def listar_movimentacoes(
 @router.post('/listar/filtro', response_model=List[MovimentacaoSchemaList])
 async def listar_movimentacoes(
     requestFilter: MovimentacaoRequestFilterSchema,
-    db: AsyncSession = Depends(get_session),
-    usuario_logado: UsuarioModel = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user_leitura)
 ):
     async with db: 
         
@@ -816,29 +953,31 @@ async def listar_movimentacoes(
                 )
             ]
   
+        # filtros que valem também para os modelos das recorrências (core/recorrencias.py)
+        filtros = []
+
         if requestFilter.forma_pagamento is not None: 
-            condicoes.append(MovimentacaoModel.forma_pagamento == requestFilter.forma_pagamento)
+            filtros.append(MovimentacaoModel.forma_pagamento == requestFilter.forma_pagamento)
                 
         if requestFilter.tipo_movimentacao is not None: 
-            condicoes.append(MovimentacaoModel.tipoMovimentacao == requestFilter.tipo_movimentacao)        
+            filtros.append(MovimentacaoModel.tipoMovimentacao == requestFilter.tipo_movimentacao)        
 
         if requestFilter.consolidado is not None: 
             condicoes.append(MovimentacaoModel.consolidado == requestFilter.consolidado)
             
         if requestFilter.id_categoria is not None: 
-            condicoes.append(MovimentacaoModel.id_categoria == requestFilter.id_categoria)
+            filtros.append(MovimentacaoModel.id_categoria == requestFilter.id_categoria)
             
         if requestFilter.id_conta is not None: 
-            condicoes.append(
+            filtros.append(
                     (MovimentacaoModel.id_conta == requestFilter.id_conta) | 
                     (MovimentacaoModel.id_conta_destino == requestFilter.id_conta)
                 )        
             
-        query = construir_query_movimentacao(condicoes)
-
         if requestFilter.id_parente is not None:
-            query = query.join(DivideModel, MovimentacaoModel.divisoes).where(DivideModel.id_parente == requestFilter.id_parente)
+            filtros.append(MovimentacaoModel.divisoes.any(DivideModel.id_parente == requestFilter.id_parente))
             
+        faixa_fechamento = None
         if requestFilter.id_cartao_credito is not None:
             
             data, data_anterior = await get_data(
@@ -847,32 +986,107 @@ async def listar_movimentacoes(
                 mes_anterior = mes_anterior,
                 ano_anterior = ano_anterior
             )            
+            faixa_fechamento = (data_anterior, data)
             
-            query = query.join(
-                FaturaModel, MovimentacaoModel.fatura
-            ).join(
-                CartaoCreditoModel, FaturaModel.cartao_credito
-            ).where(
-                CartaoCreditoModel.id_cartao_credito == requestFilter.id_cartao_credito,
-                and_(
-                    FaturaModel.data_fechamento > data_anterior,
-                    FaturaModel.data_fechamento <= data
-                )
-            )
-            
-    
-        
+            filtros.append(FaturaModel.id_cartao_credito == requestFilter.id_cartao_credito)
+            condicoes.extend([
+                FaturaModel.data_fechamento > data_anterior,
+                FaturaModel.data_fechamento <= data
+            ])
+
+        query = construir_query_movimentacao_colunas(condicoes + filtros)
         result = await db.execute(query)
-        movimentacoes = result.scalars().all()
-        
+        linhas = result.mappings().all()
 
- 
-        if not movimentacoes:
-            response = []
-        else:
-            response = construir_response(movimentacoes, requestFilter)
+        # Resposta já serializável: evita montar MovimentacaoSchemaList por linha e a revalidação do response_model
+        response = construir_response_rapida(linhas, requestFilter)
 
-        return response
+        if requestFilter.consolidado is not True:  # ocorrência virtual nunca está consolidada
+            inicio = date(ano_anterior, mes_anterior, 1) if faixa_fechamento else date(requestFilter.ano, requestFilter.mes, 1)
+            fim = somar_meses(date(requestFilter.ano, requestFilter.mes, 1), 1)
+            virtuais = await listar_ocorrencias_virtuais(
+                db, usuario_logado, requestFilter, filtros, inicio, fim, faixa_fechamento)
+            if virtuais:
+                # sort estável: no mesmo dia as linhas gravadas continuam na ordem da consulta
+                response = sorted(response + virtuais, key=lambda mov: mov["data_pagamento"])
+
+        return ORJSONDecimalResponse(content=response)
+
+
+async def listar_ocorrencias_virtuais(
+    db: AsyncSession,
+    usuario_logado: UsuarioModel,
+    requestFilter: Optional[MovimentacaoRequestFilterSchema],
+    filtros: list,
+    inicio: date,
+    fim: date,
+    faixa_fechamento: Optional[tuple] = None
+) -> List[MovimentacaoListDict]:
+    """
+    Ocorrências de recorrências ainda não gravadas com data em [inicio, fim), no formato
+    de construir_response_rapida e sem id_movimentacao. Com ``faixa_fechamento``
+    (listagem por cartão) ficam só as que caem nas faturas fechadas nessa faixa.
+    """
+    query = construir_query_movimentacao_colunas([
+        MovimentacaoModel.id_usuario == usuario_logado.id_usuario,
+        MovimentacaoModel.condicao_pagamento == CondicaoPagamento.RECORRENTE,
+        MovimentacaoModel.parcela_atual == PARCELA_MODELO,
+        RepeticaoModel.data_inicio < fim,
+        *filtros,
+    ]).add_columns(RepeticaoModel.data_inicio)
+    modelos = (await db.execute(query)).mappings().all()
+    if not modelos:
+        return []
+
+    materializadas = await parcelas_materializadas(db, [modelo["id_repeticao"] for modelo in modelos])
+    ocorrencias = ocorrencias_virtuais(modelos, materializadas, inicio, fim)
+
+    calendarios = await calendarios_dos_cartoes(
+        db, {modelo["id_cartao_credito"] for modelo, _, _ in ocorrencias if modelo["id_cartao_credito"] is not None})
+    faturas_ocorrencias = {}
+    for posicao, (modelo, _, data) in enumerate(ocorrencias):
+        if modelo["id_cartao_credito"] is not None:
+            faturas_ocorrencias[posicao] = calendarios[modelo["id_cartao_credito"]].resolver(data)
+
+    faturas = {}
+    ids_fatura = {datas.id_fatura for datas in faturas_ocorrencias.values() if datas is not None}
+    if ids_fatura:
+        result = await db.execute(
+            select(FaturaModel, ContaModel.nome)
+            .outerjoin(ContaModel, FaturaModel.id_conta == ContaModel.id_conta)
+            .where(FaturaModel.id_fatura.in_(ids_fatura))
+        )
+        faturas = {fatura.id_fatura: (fatura, nome_conta) for fatura, nome_conta in result.all()}
+
+    virtuais: List[MovimentacaoListDict] = []
+    for posicao, (modelo, parcela, data) in enumerate(ocorrencias):
+        datas = faturas_ocorrencias.get(posicao)
+        if faixa_fechamento is not None and (
+                datas is None or not faixa_fechamento[0] < datas.data_fechamento <= faixa_fechamento[1]):
+            continue
+        [ocorrencia] = construir_response_rapida([modelo], None)
+        ocorrencia.update(
+            id_movimentacao=None,
+            parcela_atual=str(parcela),
+            data_pagamento=data,
+            consolidado=False,
+            participa_limite_fatura_gastos=False if modelo["id_cartao_credito"] is not None else None,
+            id_fatura=datas.id_fatura if datas else None,
+        )
+        fatura, nome_conta = faturas.get(datas.id_fatura, (None, None)) if datas else (None, None)
+        if fatura is not None and requestFilter is not None and requestFilter.id_cartao_credito is not None:
+            ocorrencia["fatura_info"] = {
+                "id_conta": fatura.id_conta,
+                "data_vencimento": fatura.data_vencimento,
+                "data_fechamento": fatura.data_fechamento,
+                "data_pagamento": fatura.data_pagamento,
+                "id_cartao_credito": fatura.id_cartao_credito,
+                "fatura_gastos": fatura.fatura_gastos,
+                "nome_conta": nome_conta,
+                "nome_cartao": None
+            }
+        virtuais.append(ocorrencia)
+    return virtuais
 
 async def get_data(
     db: AsyncSession,
@@ -880,67 +1094,10 @@ async def get_data(
     mes_anterior: int,
     ano_anterior: int
 ):
-    # query_mes_anterior = select(FaturaModel).filter(
-    #     FaturaModel.id_cartao_credito == requestFilter.id_cartao_credito,
-    #     extract('month', FaturaModel.data_fechamento) == mes_anterior,
-    #     extract('year', FaturaModel.data_fechamento) == ano_anterior
-    # )
-    
-            
-    # query_mes_atual = select(FaturaModel).filter(
-    #     FaturaModel.id_cartao_credito == requestFilter.id_cartao_credito,
-    #     extract('month', FaturaModel.data_fechamento) == requestFilter.mes,
-    #     extract('year', FaturaModel.data_fechamento) == requestFilter.ano
-    # )
-    
-    # result_mes_anterior = await db.execute(query_mes_anterior)
-    # fatura_mes_anterior = result_mes_anterior.scalars().first()
-    
-    # result_mes_atual = await db.execute(query_mes_atual)
-    # fatura_mes_atual = result_mes_atual.scalars().first()     
-    
-    # print(f"Data de fechamento da fatura mes atual: {fatura_mes_atual.id_fatura, fatura_mes_atual.data_fechamento}")
-    # print(f"Data de fechamento da fatura mes anterior: {fatura_mes_anterior.id_fatura, fatura_mes_anterior.data_fechamento}")
-    
-    # data = fatura_mes_atual.data_fechamento if fatura_mes_atual else date(requestFilter.ano, requestFilter.mes, requestFilter.dia_fechamento)
-
-    # data_anterior = fatura_mes_anterior.data_fechamento if fatura_mes_anterior else  data - relativedelta(months=1)
-    
-    
-    # print(f"Datas 1: {data, data_anterior}")
-
-    
-    query_combined = select(FaturaModel).filter(
-        FaturaModel.id_cartao_credito == requestFilter.id_cartao_credito,
-        or_(
-            and_(
-                extract('month', FaturaModel.data_fechamento) == mes_anterior,
-                extract('year', FaturaModel.data_fechamento) == ano_anterior
-            ),
-            and_(
-                extract('month', FaturaModel.data_fechamento) == requestFilter.mes,
-                extract('year', FaturaModel.data_fechamento) == requestFilter.ano
-            )
-        )
-    )
+    calendario = await calendario_do_cartao(db, requestFilter.id_cartao_credito)
+    fatura_mes_anterior = calendario.do_mes(ano_anterior, mes_anterior)
+    fatura_mes_atual = calendario.do_mes(requestFilter.ano, requestFilter.mes)
 
-    result_combined = await db.execute(query_combined)
-    faturas_combined = result_combined.scalars().all()
-
-    # for fatura in faturas_combined:
-    #     print(f"Data de fechamento da fatura : {fatura.id_fatura, fatura.data_fechamento}")
-
-    fatura_mes_anterior = next((
-            fatura for fatura in faturas_combined
-            if fatura.data_fechamento.month == mes_anterior and fatura.data_fechamento.year == ano_anterior),None
-    )
-
-    fatura_mes_atual = next((
-        fatura for fatura in faturas_combined
-        if fatura.data_fechamento.month == requestFilter.mes and fatura.data_fechamento.year == requestFilter.ano),None
-    )
-  
-            
     data = fatura_mes_atual.data_fechamento if fatura_mes_atual else date(requestFilter.ano, requestFilter.mes, requestFilter.dia_fechamento)
 
     data_anterior = fatura_mes_anterior.data_fechamento if fatura_mes_anterior else  data - relativedelta(months=1)
@@ -1021,8 +1178,169 @@ def construir_response(movimentacoes: List, requestFilter: MovimentacaoRequestFi
     ]
     return response
 
+
+
+def construir_query_movimentacao_colunas(condicoes):
+    """
+    Alternativa a construir_query_movimentacao: em vez de oito selectinload, projeta só as
+    colunas usadas na listagem com outer joins explícitos e agrega as divisões em JSON
+    numa subconsulta correlacionada. A listagem inteira sai em uma única consulta.
+    """
+    conta_destino = aliased(ContaModel)
+    conta_fatura = aliased(ContaModel)
+
+    divide_parente = (
+        select(
+            agregar_json(
+                json_objeto(
+                    "id_parente", DivideModel.id_parente,
+                    "valor_parente", cast(DivideModel.valor, String),
+                    "nome_parente", ParenteModel.nome
+                )
+            )
+        )
+        .join(ParenteModel, DivideModel.id_parente == ParenteModel.id_parente)
+        .where(DivideModel.id_movimentacao == MovimentacaoModel.id_movimentacao)
+        .correlate(MovimentacaoModel)
+        .scalar_subquery()
+    )
+
+    query = (
+        select(
+            MovimentacaoModel.id_movimentacao,
+            MovimentacaoModel.valor,
+            MovimentacaoModel.descricao,
+            MovimentacaoModel.tipoMovimentacao,
+            MovimentacaoModel.forma_pagamento,
+            MovimentacaoModel.condicao_pagamento,
+            MovimentacaoModel.datatime,
+            MovimentacaoModel.consolidado,
+            MovimentacaoModel.parcela_atual,
+            MovimentacaoModel.data_pagamento,
+            MovimentacaoModel.id_conta,
+            MovimentacaoModel.id_conta_destino,
+            MovimentacaoModel.id_fatura,
+            MovimentacaoModel.id_repeticao,
+            MovimentacaoModel.participa_limite_fatura_gastos,
+            RepeticaoModel.quantidade_parcelas,
+            RepeticaoModel.tipo_recorrencia,
+            CategoriaModel.id_categoria,
+            CategoriaModel.nome_icone.label("nome_icone_categoria"),
+            ContaModel.nome.label("nome_conta"),
+            conta_destino.nome.label("nome_conta_destino"),
+            FaturaModel.id_cartao_credito,
+            FaturaModel.data_vencimento.label("fatura_data_vencimento"),
+            FaturaModel.data_fechamento.label("fatura_data_fechamento"),
+            FaturaModel.data_pagamento.label("fatura_data_pagamento"),
+            FaturaModel.id_conta.label("fatura_id_conta"),
+            FaturaModel.fatura_gastos.label("fatura_gastos"),
+            CartaoCreditoModel.nome.label("nome_cartao_credito"),
+            conta_fatura.nome.label("fatura_nome_conta"),
+            divide_parente.label("divide_parente"),
+        )
+        .outerjoin(RepeticaoModel, MovimentacaoModel.id_repeticao == RepeticaoModel.id_repeticao)
+        .outerjoin(CategoriaModel, MovimentacaoModel.id_categoria == CategoriaModel.id_categoria)
+        .outerjoin(ContaModel, MovimentacaoModel.id_conta == ContaModel.id_conta)
+        .outerjoin(conta_destino, MovimentacaoModel.id_conta_destino == conta_destino.id_conta)
+        .outerjoin(FaturaModel, MovimentacaoModel.id_fatura == FaturaModel.id_fatura)
+        .outerjoin(CartaoCreditoModel, FaturaModel.id_cartao_credito == CartaoCreditoModel.id_cartao_credito)
+        .outerjoin(conta_fatura, FaturaModel.id_conta == conta_fatura.id_conta)
+        .where(*condicoes)
+        .order_by(
+            MovimentacaoModel.data_pagamento,
+            MovimentacaoModel.datatime
+        )
+    )
+    return query
+
+def construir_divide_parente(divisoes_json: Optional[list]) -> List[ParenteResponseDict]:
+    # valor_parente vem como texto do banco para não passar por float no JSON; o quantize
+    # devolve as duas casas da coluna DECIMAL(10, 2) mesmo quando o banco as omite (SQLite)
+    return [
+        {
+            "id_parente": divide["id_parente"],
+            "valor_parente": Decimal(divide["valor_parente"]).quantize(Decimal("0.01")),
+            "nome_parente": divide["nome_parente"]
+        }
+        for divide in divisoes_json or []
+    ]
+
+def construir_response_rapida(
+    linhas: Sequence[RowMapping],
+    requestFilter: Optional[MovimentacaoRequestFilterSchema]
+) -> List[MovimentacaoListDict]:
+    """
+    Mesmo conteúdo de construir_response, mas em dicts simples montados a partir das
+    linhas de construir_query_movimentacao_colunas.
+    """
+    com_fatura_info = requestFilter is not None and requestFilter.id_cartao_credito is not None
+
+    response: List[MovimentacaoListDict] = []
+    for linha in linhas:
+        id_fatura = linha["id_fatura"]
+        response.append({
+            "valor": linha["valor"],
+            "descricao": linha["descricao"],
+            "tipoMovimentacao": linha["tipoMovimentacao"],
+            "forma_pagamento": linha["forma_pagamento"],
+            "condicao_pagamento": linha["condicao_pagamento"],
+            "datatime": linha["datatime"],
+            "quantidade_parcelas": linha["quantidade_parcelas"],
+            "consolidado": linha["consolidado"],
+            "tipo_recorrencia": linha["tipo_recorrencia"],
+            "parcela_atual": linha["parcela_atual"],
+            "data_pagamento": linha["data_pagamento"],
+            "id_conta": linha["id_conta"],
+            "id_categoria": linha["id_categoria"],
+            "id_fatura": id_fatura,
+            "id_repeticao": linha["id_repeticao"],
+            "participa_limite_fatura_gastos": linha["participa_limite_fatura_gastos"],
+            "nome_icone_categoria": linha["nome_icone_categoria"],
+            "nome_conta": linha["nome_conta"],
+            "nome_cartao_credito": linha["nome_cartao_credito"],
+            "id_movimentacao": linha["id_movimentacao"],
+            "id_conta_destino": linha["id_conta_destino"],
+            "id_cartao_credito": linha["id_cartao_credito"],
+            "nome_conta_destino": linha["nome_conta_destino"],
+            "divide_parente": construir_divide_parente(linha["divide_parente"]),
+            "fatura_info": {
+                "id_conta": linha["fatura_id_conta"],
+                "data_vencimento": linha["fatura_data_vencimento"],
+                "data_fechamento": linha["fatura_data_fechamento"],
+                "data_pagamento": linha["fatura_data_pagamento"],
+                "id_cartao_credito": linha["id_cartao_credito"],
+                "fatura_gastos": linha["fatura_gastos"],
+                "nome_conta": linha["fatura_nome_conta"],
+                "nome_cartao": None
+            } if com_fatura_info and id_fatura is not None else None
+        })
+    return response
     
     
+@router.post("/busca", status_code=status.HTTP_200_OK)
+async def buscar_movimentacoes_por_descricao(
+    busca: MovimentacaoBuscaSchema,
+    db: AsyncSession = Depends(get_read_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user_leitura)
+):
+    """
+    Movimentações cuja descrição contém o termo (sem acento e sem caixa), da mais recente
+    para a mais antiga. Para a próxima página, repita a busca com ``cursor`` igual ao
+    ``proximo`` recebido; as facetas vêm só na primeira página.
+    """
+    try:
+        resultado = await buscar_movimentacoes(
+            db, usuario_logado.id_usuario, busca.termo, busca.data_inicio, busca.data_fim,
+            busca.id_categorias, busca.limite, busca.cursor)
+    except CursorInvalido:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginação inválido.")
+    return ORJSONDecimalResponse(content={
+        "itens": resultado.itens,
+        "proximo": resultado.proximo,
+        "facetas": resultado.facetas,
+    })
+
+
 @router.get("/movimentacoes_vencidas/{tipo_receita}", response_model=MovimentacaoFaturaSchemaList)
 async def get_movimentacoes_vencidas(
     tipo_receita: bool,
@@ -1099,11 +1417,19 @@ async def consolidar_movimentacao(
     db: AsyncSession = Depends(get_session),
     usuario_logado: UsuarioModel = Depends(get_current_user)):
 
+    id_movimentacao = movimentacoesConsolida.id_movimentacao
+    if id_movimentacao is None:  # ocorrência virtual de uma recorrência
+        if movimentacoesConsolida.id_repeticao is None or movimentacoesConsolida.parcela is None:
+            raise HTTPException(status_code=422, detail="Informe id_movimentacao ou id_repeticao e parcela")
+        materializada = await materializar_ocorrencia(
+            db, usuario_logado, movimentacoesConsolida.id_repeticao, movimentacoesConsolida.parcela)
+        id_movimentacao = materializada.id_movimentacao
+
     movimentacao_query = (
         select(MovimentacaoModel)
         .options(joinedload(MovimentacaoModel.conta))
         .where(
-            MovimentacaoModel.id_movimentacao == movimentacoesConsolida.id_movimentacao,
+            MovimentacaoModel.id_movimentacao == id_movimentacao,
             MovimentacaoModel.id_usuario == usuario_logado.id_usuario
         )
     )
@@ -1252,7 +1578,11 @@ async def deletar_movimentacao(
                     await processar_delecao_movimentacao(mov_subsequente, session, usuario_logado)
                     repeticao.valor_total -= movimentacao.valor
 
-                repeticao.quantidade_parcelas -= len(subsequentes)
+                if movimentacao.condicao_pagamento == CondicaoPagamento.RECORRENTE and movimentacao.parcela_atual.isdigit():
+                    # as ocorrências seguintes podem nem ter sido gravadas: a regra termina antes desta
+                    repeticao.quantidade_parcelas = int(movimentacao.parcela_atual) - 1
+                else:
+                    repeticao.quantidade_parcelas -= len(subsequentes)
 
         else:
             await processar_delecao_movimentacao(movimentacao, session, usuario_logado)
@@ -1314,18 +1644,9 @@ async def calcular_orcamento_mensal(
     db: AsyncSession = Depends(get_session),
     usuario_logado: UsuarioModel = Depends(get_current_user)
 ):
-    hoje = date.today()
-    primeiro_dia = hoje.replace(day=1)
-    ultimo_dia = hoje.replace(day=monthrange(hoje.year, hoje.month)[1])
+    primeiro_dia = date.today().replace(day=1)
     
     async with db as session:
-        query_orcamento = select(func.sum(CategoriaModel.valor_categoria).label("orcamento_total")).filter(
-            CategoriaModel.modelo_categoria == TipoMovimentacao.DESPESA,
-            CategoriaModel.id_usuario == usuario_logado.id_usuario
-        )
-        orcamento_total_result = await session.execute(query_orcamento)
-        orcamento_total = orcamento_total_result.scalar() or Decimal(0)
-        
         query_categorias = select(
             CategoriaModel.id_categoria,
             CategoriaModel.valor_categoria,
@@ -1338,29 +1659,12 @@ async def calcular_orcamento_mensal(
         categorias_result = await session.execute(query_categorias)
         categorias = categorias_result.fetchall()
         
-        query_despesas_total = select(
-            CategoriaModel.id_categoria,
-            func.coalesce(func.sum(DivideModel.valor), Decimal(0)).label("valor_despesa")
-        ).join(
-            MovimentacaoModel, MovimentacaoModel.id_categoria == CategoriaModel.id_categoria, isouter=True
-        ).join(
-            DivideModel, MovimentacaoModel.id_movimentacao == DivideModel.id_movimentacao, isouter=True
-        ).join(
-            ParenteModel, DivideModel.id_parente == ParenteModel.id_parente, isouter=True
-        ).filter(
-            MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.DESPESA,
-            MovimentacaoModel.data_pagamento >= primeiro_dia,
-            MovimentacaoModel.data_pagamento <= ultimo_dia,
-            ParenteModel.nome == usuario_logado.nome_completo,
-            ParenteModel.id_usuario == usuario_logado.id_usuario
-            
-
-        ).group_by(CategoriaModel.id_categoria)
-        
-        despesas_result = await session.execute(query_despesas_total)
-        despesas = {row.id_categoria: row.valor_despesa for row in despesas_result.fetchall()}
+        # consumo mantido a cada despesa gravada (core/orcamento.py), sem agregar as divisões aqui
+        despesas = await consumos_do_mes(
+            session, usuario_logado.id_usuario, [categoria.id_categoria for categoria in categorias], primeiro_dia)
         
         resultado = []
+        orcamento_total = sum((categoria.valor_categoria for categoria in categorias if categoria.valor_categoria is not None), Decimal(0))
         soma_despesas_totais = Decimal(0)
         
         for categoria in categorias:
@@ -1384,14 +1688,13 @@ async def calcular_orcamento_mensal(
 async def calcular_gastos_receitas_por_categoria(
     tipo_receita: bool,  
     somente_usuario: bool,  
-    db: AsyncSession = Depends(get_session),
-    usuario_logado: UsuarioModel = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user_leitura)
 ):
     hoje = date.today()
     primeiro_dia = hoje.replace(day=1)
     ultimo_dia = hoje.replace(day=monthrange(hoje.year, hoje.month)[1])
     
-    print("primeiro dia", primeiro_dia)
 
     async with db as session:
         categorias_query = select(
@@ -1470,17 +1773,110 @@ async def calcular_gastos_receitas_por_categoria(
         "valor_categoria": categorias_resposta
     }
 
+MESES_MATRIZ_MAXIMO = 120
+
+
+def construir_matriz(linhas: Sequence[RowMapping], meses: List[date]) -> dict:
+    """Linhas (categoria, ano, mês, valor) -> uma série por categoria, alinhada com ``meses``."""
+    posicao = {(mes.year, mes.month): indice for indice, mes in enumerate(meses)}
+    categorias = {}
+    for linha in linhas:
+        categoria = categorias.get(linha["id_categoria"])
+        if categoria is None:
+            categoria = categorias[linha["id_categoria"]] = {
+                "id_categoria": linha["id_categoria"],
+                "nome_categoria": linha["nome_categoria"],
+                "nome_icone_categoria": linha["nome_icone_categoria"],
+                "valores": [Decimal(0)] * len(meses),
+            }
+        if linha["ano"] is not None:
+            categoria["valores"][posicao[int(linha["ano"]), int(linha["mes"])]] = Decimal(linha["valor"])
+
+    totais_mes = [Decimal(0)] * len(meses)
+    for categoria in categorias.values():
+        categoria["total"] = sum(categoria["valores"], Decimal(0))
+        totais_mes = [total + valor for total, valor in zip(totais_mes, categoria["valores"])]
+
+    # colunar: nomes uma vez por categoria e números em listas, que comprimem bem
+    return {
+        "meses": [mes.strftime("%Y-%m") for mes in meses],
+        "categorias": list(categorias.values()),
+        "totais_mes": totais_mes,
+        "valor_total": sum(totais_mes, Decimal(0)),
+    }
+
+
+@router.get("/gastos-receitas-por-categoria/matriz", status_code=status.HTTP_200_OK)
+async def calcular_matriz_gastos_receitas_por_categoria(
+    tipo_receita: bool,
+    somente_usuario: bool,
+    data_inicio: date,
+    data_fim: date,
+    db: AsyncSession = Depends(get_read_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user_leitura)
+):
+    """Categorias x meses do período em uma consulta, no lugar de uma chamada por mês."""
+    inicio, fim = primeiro_dia(data_inicio), primeiro_dia(data_fim)
+    meses = []
+    while inicio <= fim and len(meses) <= MESES_MATRIZ_MAXIMO:
+        meses.append(inicio)
+        inicio = somar_meses(inicio, 1)
+    if not meses or len(meses) > MESES_MATRIZ_MAXIMO:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Período inválido: informe de 1 a {MESES_MATRIZ_MAXIMO} meses.")
+
+    tipo = TipoMovimentacao.RECEITA if tipo_receita else TipoMovimentacao.DESPESA
+    ano = extract('year', MovimentacaoModel.data_pagamento).label("ano")
+    mes = extract('month', MovimentacaoModel.data_pagamento).label("mes")
+
+    soma = select(
+        MovimentacaoModel.id_categoria, ano, mes, func.sum(DivideModel.valor).label("valor")
+    ).join(
+        DivideModel, MovimentacaoModel.id_movimentacao == DivideModel.id_movimentacao
+    ).join(
+        ParenteModel, DivideModel.id_parente == ParenteModel.id_parente
+    ).filter(
+        MovimentacaoModel.tipoMovimentacao == tipo,
+        MovimentacaoModel.data_pagamento >= meses[0],
+        MovimentacaoModel.data_pagamento < somar_meses(meses[-1], 1),
+        ParenteModel.id_usuario == usuario_logado.id_usuario
+    )
+    if somente_usuario:
+        soma = soma.filter(ParenteModel.nome == usuario_logado.nome_completo)
+    soma = soma.group_by(MovimentacaoModel.id_categoria, ano, mes).subquery()
+
+    query = select(
+        CategoriaModel.id_categoria,
+        CategoriaModel.nome.label("nome_categoria"),
+        CategoriaModel.nome_icone.label("nome_icone_categoria"),
+        soma.c.ano,
+        soma.c.mes,
+        soma.c.valor
+    ).outerjoin(
+        soma, soma.c.id_categoria == CategoriaModel.id_categoria
+    ).filter(
+        CategoriaModel.modelo_categoria == tipo,
+        CategoriaModel.id_usuario == usuario_logado.id_usuario
+    ).order_by(CategoriaModel.id_categoria)
+
+    async with db as session:
+        result = await session.execute(query)
+        matriz = construir_matriz(result.mappings().all(), meses)
+
+    return ORJSONDecimalResponse(content=matriz)
+
+
 @router.get("/economia-meses-anteriores", status_code=status.HTTP_200_OK)
 async def economia_meses_anteriores(
     somente_usuario: bool,  
-    db: AsyncSession = Depends(get_session),
-    usuario_logado: UsuarioModel = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user_leitura)
 ):
     hoje = date.today()
     ano_atual = hoje.year
     mes_atual = hoje.month
 
-    print(f"[DEBUG] Ano atual: {ano_atual}, Mês atual: {mes_atual}")
+    logger.debug("Ano atual: %s, mês atual: %s", ano_atual, mes_atual)
 
     async with db as session:
         despesas_por_mes = []
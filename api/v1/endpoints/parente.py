@@ -1,32 +1,21 @@
-from datetime import datetime
-from email import encoders
-from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formatdate
-import io
-import smtplib
-from decouple import config
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Response
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Response
 from fastapi.responses import JSONResponse
-import pdfkit
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from sqlalchemy import and_
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
-from core.auth import send_email
+from core.cobranca import Extrato, cobrar_mes, criar_email_data, extratos_do_mes
+from core.email_saida import enfileirar_email
 from core.utils import handle_db_exceptions
-from models.enums import TipoMovimentacao
 from models.parente_model import ParenteModel
-from models.divide_model import  DivideModel
-from models.movimentacao_model import MovimentacaoModel
-from schemas.parente_schema import ParenteSchema, ParenteSchemaCobranca, ParenteSchemaUpdate, ParenteSchemaId
+from schemas.parente_schema import ParenteSchema, ParenteSchemaCobranca, ParenteSchemaCobrancaMes, ParenteSchemaUpdate, ParenteSchemaId
 from core.deps import get_session, get_current_user
 from models.usuario_model import UsuarioModel
-from sqlalchemy import case, extract, func, select
+from sqlalchemy import case, select
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post('/cadastro', status_code=status.HTTP_201_CREATED)
 async def post_parente(
@@ -55,8 +44,6 @@ async def post_parente(
             return novo_parente
         except Exception as e:
             await handle_db_exceptions(session, e)
-        finally:
-            await session.close()
 
 @router.put('/editar/{id_parente}', response_model=ParenteSchemaId, status_code=status.HTTP_202_ACCEPTED)
 async def update_parente(id_parente: int, parente_update: ParenteSchemaUpdate, db: AsyncSession = Depends(get_session), usuario_logado: UsuarioModel = Depends(get_current_user)):
@@ -115,7 +102,7 @@ async def get_parentes(somente_ativo: bool, db: AsyncSession = Depends(get_sessi
             
             parentes: List[ParenteSchemaId] = result.scalars().all()
             if not parentes:
-                print("Nenhum parente encontrado.")
+                logger.info("Nenhum parente encontrado para o usuário %s", usuario_logado.id_usuario)
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nenhum parente encontrado.")
             return parentes
 
@@ -157,7 +144,6 @@ async def delete_parente(id_parente: int, db: AsyncSession = Depends(get_session
 async def send_invoice(
     cobranca: ParenteSchemaCobranca,
     request: Request,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_session),
     usuario_logado: UsuarioModel = Depends(get_current_user)
 ):
@@ -175,169 +161,33 @@ async def send_invoice(
             response = await send_invoice_pdf(cobranca, db, usuario_logado)
             movimentacoes_data = response['data']
 
-            def formatar_data_brasileira(data_str):
-                """Converte data do formato YYYY-MM-DD para DD/MM/YYYY"""
-                return datetime.strptime(data_str, '%Y-%m-%d').strftime('%d/%m/%Y')
-
-            def formatar_valor_brasileiro(valor):
-                """Formata o valor monetário no padrão brasileiro"""
-                try:
-                    valor_float = float(valor)
-                    return f'R$ {valor_float:,.2f}'.replace('.', 'X').replace(',', '.').replace('X', ',')
-                except ValueError:
-                    return valor
-
              # Chama a função auxiliar para criar o email_data
             email_data = criar_email_data(parente, usuario_logado, cobranca, movimentacoes_data)
 
-            # Envia o email em segundo plano
-            background_tasks.add_task(send_email, email_data, parente.email)
+            # Vai para a caixa de saída na mesma transação; o PDF é gerado na entrega
+            enfileirar_email(session, parente.email, email_data["email_subject"], email_data["email_body"],
+                             origem="parente", anexar_pdf=True)
 
             return {"message": "Cobrança enviada por email com sucesso."}
 
         except Exception as e:
             await handle_db_exceptions(session, e)
             return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={'message': 'Erro ao enviar cobrança'})
-        
-        
-def formatar_valor_brasileiro(valor):
-    """Formata o valor monetário no padrão brasileiro"""
-    try:
-        valor_float = float(valor)
-        return f'R$ {valor_float:,.2f}'.replace(',', 'TEMP').replace('.', ',').replace('TEMP', '.')
-    except ValueError:
-        return valor
-
-def criar_email_data(parente, usuario_logado, cobranca, movimentacoes_data):
-    """Cria os dados do email com base nas condições de parente e usuário logado."""
-    
-    def formatar_data_brasileira(data_str):
-        """Converte data do formato YYYY-MM-DD para DD/MM/YYYY"""
-        return datetime.strptime(data_str, '%Y-%m-%d').strftime('%d/%m/%Y')
-
- 
-
-    if parente.nome == usuario_logado.nome_completo:
-        return {
-            "email_subject": "Lembrete de Movimentações não Consolidadas",
-            "email_body": (
-                f"Olá, {usuario_logado.nome_completo}!<br><br>"
-                f"Seguem as informações referentes ao mês {cobranca.mes}/{cobranca.ano}:<br><br>"                        
-                f"<table style='border-collapse: collapse; width: 100%;'>"
-                f"<thead>"
-                f"<tr style='background-color: #f2f2f2;'>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Descrição</th>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Data</th>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Valor</th>"
-                f"</tr>"
-                f"</thead>"
-                f"<tbody>"
-            ) + "".join(
-                f"<tr>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{mov['descricao']}</td>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_data_brasileira(mov['data_pagamento'])}</td>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_valor_brasileiro(mov['valor'])}</td>"
-                f"</tr>"
-                for mov in movimentacoes_data['movimentacoes_nao_consolidadas']
-            ) + (
-                f"</tbody>"
-                f"</table><br>"
-                f"<h4>Resumo da Cobrança:</h4>"
-                f"<table style='border-collapse: collapse; width: 100%;'>"
-                f"<tr style='background-color: #f2f2f2;'>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Total das Movimentações</th>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Total a Pagar</th>"
-                f"</tr>"
-                f"<tr>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_valor_brasileiro(movimentacoes_data['fatura_geral']['total_geral_movimentacoes'])}</td>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_valor_brasileiro(movimentacoes_data['fatura_geral']['total_movimentacoes'])}</td>"
-                f"</tr>"
-                f"</table><br>"
-                f"Por favor, acesse o sistema para mais informações."
-            )
-        }
-    else:
-        return {
-            "email_subject": "Cobrança de Movimentações não Consolidadas",
-            "email_body": (
-                f"Olá, {parente.nome},<br><br>"
-                f"Seguem as informações referentes às suas movimentações não consolidadas com {usuario_logado.nome_completo} no mês {cobranca.mes}/{cobranca.ano}:<br><br>"
-                f"<table style='border-collapse: collapse; width: 100%;'>"
-                f"<thead>"
-                f"<tr style='background-color: #f2f2f2;'>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Descrição</th>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Data</th>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Valor</th>"
-                f"</tr>"
-                f"</thead>"
-                f"<tbody>"
-            ) + "".join(
-                f"<tr>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{mov['descricao']}</td>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_data_brasileira(mov['data_pagamento'])}</td>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_valor_brasileiro(mov['valor'])}</td>"
-                f"</tr>"
-                for mov in movimentacoes_data['movimentacoes_nao_consolidadas']
-            ) + (
-                f"</tbody>"
-                f"</table><br>"
-                f"<h4>Resumo da Cobrança:</h4>"
-                f"<table style='border-collapse: collapse; width: 100%;'>"
-                f"<tr style='background-color: #f2f2f2;'>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Total das Movimentações</th>"
-                f"<th style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>Total a Pagar</th>"
-                f"</tr>"
-                f"<tr>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_valor_brasileiro(movimentacoes_data['fatura_geral']['total_geral_movimentacoes'])}</td>"
-                f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_valor_brasileiro(movimentacoes_data['fatura_geral']['total_movimentacoes'])}</td>"
-                f"</tr>"
-                f"</table><br>"
-                f"Por favor, acesse o sistema para mais informações."
-            )
-        }
-
-
-
-def send_email(email_data: dict, user_email: str) -> None:
-    try:
-        # Verifique se os dados de e-mail foram lidos corretamente
-        sender_email = config("EMAIL_ADDRESS")
-        sender_password = config("EMAIL_PASSWORD")
-
-        # Configura a mensagem
-        msg = MIMEMultipart()
-        msg["Subject"] = email_data["email_subject"]
-        msg["From"] = sender_email
-        msg["To"] = user_email
-        msg["Date"] = formatdate(localtime=True)
-
-        # Adicionar o corpo do e-mail
-        body = MIMEText(email_data["email_body"], "html", "utf-8")
-        msg.attach(body)
-
-        pdf_buffer = io.BytesIO()
-        pdf_data = pdfkit.from_string(email_data["email_body"], False, options={"encoding": "UTF-8"})
-        pdf_buffer.write(pdf_data)
-        pdf_buffer.seek(0)
-
-        # Anexar o PDF
-        attachment = MIMEBase("application", "pdf")
-        attachment.set_payload(pdf_buffer.read())
-        encoders.encode_base64(attachment)
-        attachment.add_header(
-            "Content-Disposition",
-            "attachment; filename=financas.pdf"
-        )
-        msg.attach(attachment)
 
-        # Conectar ao servidor SMTP do Gmail
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)  # Usa as credenciais
-            server.send_message(msg)
 
-    except Exception as e:
-        raise Exception(f"Error occurred while sending email: {e}")
+@router.post("/enviar-cobranca/lote", status_code=status.HTTP_202_ACCEPTED)
+async def send_invoice_lote(
+    cobranca: ParenteSchemaCobrancaMes,
+    db: AsyncSession = Depends(get_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user)
+):
+    """Enfileira a cobrança do mês para todos os parentes ativos, com e-mail e com divisões em aberto."""
+    async with db as session:
+        try:
+            resumo = await cobrar_mes(session, cobranca.ano, cobranca.mes, id_usuario=usuario_logado.id_usuario)
+            return {"message": "Cobranças enfileiradas para envio por email.", "parentes": resumo["parentes"]}
+        except Exception as e:
+            await handle_db_exceptions(session, e)
 
 
 @router.post("/cobranca", status_code=status.HTTP_202_ACCEPTED)
@@ -359,62 +209,10 @@ async def send_invoice_pdf(
             if not parente:
                 return {"message": "Parente não encontrado."}
             
-            query = select(
-                DivideModel,
-                MovimentacaoModel.descricao,
-                MovimentacaoModel.data_pagamento,
-                MovimentacaoModel.valor, 
-            ).join(MovimentacaoModel).filter(
-                DivideModel.id_parente == cobranca.id_parente,
-                MovimentacaoModel.consolidado == False,
-                MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.DESPESA,
-                ((extract("year", MovimentacaoModel.data_pagamento) == cobranca.ano) & 
-                 (extract("month", MovimentacaoModel.data_pagamento) == cobranca.mes))
-            )
-            
-            result = await session.execute(query)
-            movimentacoes_nao_consolidadas = result.all()
-
-            total_movimentacoes = sum(divide.valor for divide, _, _, _ in movimentacoes_nao_consolidadas)
-
-
-            query_total = select(
-                func.sum(DivideModel.valor)
-            ).join(
-                MovimentacaoModel
-            ).filter(
-                DivideModel.id_parente == cobranca.id_parente,
-                MovimentacaoModel.consolidado == False,
-                MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.DESPESA,
-                and_(
-                    extract("year", MovimentacaoModel.data_pagamento) == cobranca.ano,
-                    extract("month", MovimentacaoModel.data_pagamento) == cobranca.mes
-                ),
-
-            )
-            total_geral_result = await session.execute(query_total)
-            total_geral_movimentacoes = total_geral_result.scalar() or 0  
-
-            response = {
-                "movimentacoes_nao_consolidadas": [],
-                "fatura_geral": {}
-            }
-
-            for divide, descricao, data_pagamento, valor in movimentacoes_nao_consolidadas:
-                    descricao = f"{descricao or 'Outros'}"
-                    response["movimentacoes_nao_consolidadas"].append({
-                    "id_parente": divide.id_parente,
-                    "descricao": descricao,
-                    "data_pagamento": str(data_pagamento), 
-                    "valor": float(divide.valor)  
-                })
-
-    
-
-            response["fatura_geral"] = {
-                "total_movimentacoes": float(total_movimentacoes),
-                "total_geral_movimentacoes": float(total_geral_movimentacoes)
-            }
+            extratos = await extratos_do_mes(session, cobranca.ano, cobranca.mes, id_parente=parente.id_parente)
+            extrato = extratos[0] if extratos else Extrato(parente.id_parente, parente.nome, parente.email,
+                                                           parente.id_usuario, usuario_logado.nome_completo)
+            response = extrato.dados()
 
             return {"data": response}
 
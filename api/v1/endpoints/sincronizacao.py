@@ -0,0 +1,26 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.deps import get_current_user_leitura, get_read_session
+from core.responses import ORJSONDecimalResponse
+from core.sincronizacao import alteracoes_desde
+from models.usuario_model import UsuarioModel
+
+router = APIRouter()
+
+
+@router.get('', status_code=status.HTTP_200_OK)
+async def sincronizar(
+    since: Optional[int] = Query(default=None, ge=0),
+    db: AsyncSession = Depends(get_read_session),
+    usuario_logado: UsuarioModel = Depends(get_current_user_leitura),
+):
+    """
+    Contas, categorias, cartões, faturas, parentes, repetições e movimentações alterados
+    depois do token ``since`` e os ids apagados desde então, em uma resposta só. Sem
+    ``since`` (ou com um token que o servidor não conhece) devolve tudo, com ``completo``
+    verdadeiro: o cliente troca o que tem pelo que veio. O ``token`` vai no próximo pedido.
+    """
+    return ORJSONDecimalResponse(content=await alteracoes_desde(db, usuario_logado.id_usuario, since))
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Request, status, Depends, HTTPException, Response
+import logging
+from fastapi import APIRouter, status, Depends, HTTPException, Response
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
+from decouple import config
+from typing import List
+from core.cadastro import provisionar_usuarios
 from core.security import generate_hash
-from core.deps import get_session, get_current_user
+from core.deps import exigir_token_provisionamento, get_session, get_current_user
 from core.utils import handle_db_exceptions
 from models.usuario_model import UsuarioModel
-from models.categoria_model import CategoriaModel
-from models.conta_model import ContaModel
 from models.parente_model import ParenteModel
 from schemas.usuario_schema import UsuarioSchema, UpdateUsuarioSchema
 from schemas.resetPasswordRequest import ResetPasswordRequest
@@ -16,126 +18,51 @@ from fastapi.security import OAuth2PasswordRequestForm
 from core.auth import auth, generate_token_access, decoded_token, send_email_to_reset_password
 import jwt
 from sqlalchemy.future import select
-from fastapi import BackgroundTasks 
 from sqlalchemy import text  
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+LOTE_MAXIMO_CADASTRO = config("CADASTRO_LOTE_MAXIMO", default=1000, cast=int)
+
 
 @router.post('/cadastro', status_code=status.HTTP_201_CREATED)
 async def post_usuario(usuario: UsuarioSchema, db: AsyncSession = Depends(get_session)):
-    novo_usuario: UsuarioModel = UsuarioModel(
-        nome_completo=usuario.nome_completo,
-        data_nascimento=usuario.data_nascimento,
-        email=usuario.email,
-        senha=generate_hash(usuario.senha)
-    )
-
     async with db as session:
         try:
-            session.add(novo_usuario)
-            await session.commit()
-            await session.refresh(novo_usuario)
-
-            # Criação das categorias pré-definidas
-            categorias = [
-                CategoriaModel(
-                    nome="Saúde",
-                    tipo_categoria="Fixa",
-                    modelo_categoria="Despesa",
-                    id_usuario=novo_usuario.id_usuario,
-                    valor_categoria=None,
-                    nome_icone="health2.svg",
-                    ativo=True
-                ),
-                CategoriaModel(
-                    nome="Alimentação",
-                    tipo_categoria="Fixa",
-                    modelo_categoria="Despesa",
-                    id_usuario=novo_usuario.id_usuario,
-                    valor_categoria=None,
-                    nome_icone="food.svg",
-                    ativo=True
-                ),
-                CategoriaModel(
-                    nome="Transporte",
-                    tipo_categoria="Fixa",
-                    modelo_categoria="Despesa",
-                    id_usuario=novo_usuario.id_usuario,
-                    valor_categoria=None,
-                    nome_icone="transport.svg",
-                    ativo=True
-                ),
-                CategoriaModel(
-                    nome="Educação",
-                    tipo_categoria="Fixa",
-                    modelo_categoria="Despesa",
-                    id_usuario=novo_usuario.id_usuario,
-                    valor_categoria=None,
-                    nome_icone="schooll.svg",
-                    ativo=True
-                ),
-                CategoriaModel(
-                    nome="Lazer",
-                    tipo_categoria="Variável",
-                    modelo_categoria="Despesa",
-                    id_usuario=novo_usuario.id_usuario,
-                    valor_categoria=None,
-                    nome_icone="happy.svg",
-                    ativo=True
-                ),
-                CategoriaModel(
-                    nome="Salário",
-                    tipo_categoria="Fixa",
-                    modelo_categoria="Receita",
-                    id_usuario=novo_usuario.id_usuario,
-                    valor_categoria=None,
-                    nome_icone="salary.svg",
-                    ativo=True
-                ),
-                CategoriaModel(
-                    nome="Extra",
-                    tipo_categoria="Extra",
-                    modelo_categoria="Receita",
-                    id_usuario=novo_usuario.id_usuario,
-                    valor_categoria=None,
-                    nome_icone="extra.svg",
-                    ativo=True
-                )
-            ]
-            session.add_all(categorias)
-
-            # Criação da conta "Carteira"
-            conta_carteira = ContaModel(
-                descricao="Conta padrão para despesas em dinheiro físico",
-                nome="Carteira",
-                nome_icone="6_carteira.svg",
-                tipo_conta="Carteira",
-                id_usuario=novo_usuario.id_usuario,
-                ativo=True,
-                saldo=0
-            )
-            session.add(conta_carteira)
-
-            parente_usuario = ParenteModel(
-                nome=novo_usuario.nome_completo,
-                email=novo_usuario.email,
-                grau_parentesco= "Eu",
-                ativo=True,
-                id_usuario=novo_usuario.id_usuario
-            )
-            session.add(parente_usuario)
-
+            # usuário, categorias pré-definidas, conta "Carteira" e o parente "Eu" na mesma transação
+            [novo_usuario] = await provisionar_usuarios(session, [usuario.model_dump()])
             await session.commit()
-            return novo_usuario
+            return dict(novo_usuario._mapping)
         except Exception as e:
             await handle_db_exceptions(session, e)
             raise HTTPException(
                 status_code=status.HTTP_406_NOT_ACCEPTABLE, 
                 detail='Já existe um usuário com este email cadastrado'
             )
-        
 
 
+@router.post('/cadastro/lote', status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(exigir_token_provisionamento)])
+async def post_usuarios_lote(usuarios: List[UsuarioSchema], db: AsyncSession = Depends(get_session)):
+    """Onboarding em lote: todos os usuários entram (com os padrões) ou nenhum entra."""
+    if not usuarios:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nenhum usuário informado.")
+    if len(usuarios) > LOTE_MAXIMO_CADASTRO:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"No máximo {LOTE_MAXIMO_CADASTRO} usuários por lote.")
+    emails = [usuario.email.lower() for usuario in usuarios]
+    if len(set(emails)) != len(emails):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Há emails repetidos no lote.")
+
+    async with db as session:
+        try:
+            novos_usuarios = await provisionar_usuarios(session, [usuario.model_dump() for usuario in usuarios])
+            await session.commit()
+            return [dict(novo_usuario._mapping) for novo_usuario in novos_usuarios]
+        except Exception as e:
+            await handle_db_exceptions(session, e)
+
 
 @router.post('/login')
 async def login(login_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_session)):
@@ -162,10 +89,10 @@ async def reset_password(token: str,
     try:
         decoded_data = decoded_token(token)
     except jwt.ExpiredSignatureError:
-        print("Erro: Token expirado")
+        logger.info("Token de redefinição de senha expirado")
         return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={'message': "Expired Token!"})
     except jwt.InvalidTokenError:
-        print("Erro: Token inválido")
+        logger.info("Token de redefinição de senha inválido")
         return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={'message': 'Invalid token'})
 
     async with db as session:
@@ -175,7 +102,7 @@ async def reset_password(token: str,
             result = await session.execute(select(UsuarioModel).where(UsuarioModel.id_usuario == user_id))
             user_data = result.scalars().first()
         except Exception as e:
-            print(f"Erro ao consultar o banco de dados: {e}")
+            logger.exception("Erro ao consultar o banco de dados")
             raise HTTPException(status_code=500, detail="Database query failed")
 
         if user_data:
@@ -183,14 +110,12 @@ async def reset_password(token: str,
             await session.commit()
             return JSONResponse(status_code=status.HTTP_200_OK, content={"message": f"Password for user ID {user_data.id_usuario} updated successfully"})
         else:
-            print("Erro: Usuário não encontrado.")
+            logger.info("Usuário do token de redefinição de senha não encontrado")
     
     return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={'message': 'Error while validating token'})
 
 @router.post("/recover-password", status_code=status.HTTP_202_ACCEPTED)
 async def recover_password(schema: RecoverPasswordRequest, 
-                           request: Request, 
-                           background_tasks: BackgroundTasks,
                            db: AsyncSession = Depends(get_session), 
 ):
     
@@ -201,7 +126,8 @@ async def recover_password(schema: RecoverPasswordRequest,
 
             if user_data:
                 token = generate_token_access(user_data.id_usuario)
-                background_tasks.add_task(send_email_to_reset_password, request, user_data, token)           
+                # só enfileira: o envio sai pelo job da caixa de saída, fora da latência da requisição
+                await send_email_to_reset_password(session, user_data, token)
             else:
                 return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={'message': 'e-mail not found in database'})
 
@@ -255,9 +181,6 @@ async def delete_usuario(
         
         except Exception as e:
             await handle_db_exceptions(session, e)
-
-        finally:
-            await session.close()
         
 
 @router.get('/listar_usuario', status_code=status.HTTP_200_OK)
@@ -0,0 +1,64 @@
+"""
+Banco descartável para os benchmarks.
+
+Por padrão usa SQLite em memória (aiosqlite); passe uma URL async do PostgreSQL
+para medir contra o banco real. As tabelas são criadas a partir dos models.
+"""
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import BigInteger, event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+
+from core.configs import settings
+import models.__all_models  # noqa: F401  (registra todas as tabelas no metadata)
+
+URL_SQLITE = "sqlite+aiosqlite:///:memory:"
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_sqlite(type_, compiler, **kw):
+    # No SQLite só INTEGER PRIMARY KEY vira autoincremento
+    return "INTEGER"
+
+
+def criar_engine(url: str = URL_SQLITE) -> AsyncEngine:
+    if url.startswith("sqlite") and ":memory:" in url:
+        # uma única conexão, senão cada sessão enxerga um banco em memória diferente
+        return create_async_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    if url.startswith("sqlite"):
+        # em arquivo cada sessão tem sua conexão; escritas concorrentes esperam o lock em vez de falhar
+        return create_async_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+    return create_async_engine(url)
+
+
+async def criar_tabelas(engine: AsyncEngine):
+    async with engine.begin() as conn:
+        await conn.run_sync(settings.DBBaseModel.metadata.drop_all)
+        await conn.run_sync(settings.DBBaseModel.metadata.create_all)
+
+
+class ContadorConsultas:
+    """Conta os statements enviados ao banco enquanto estiver ativo."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine.sync_engine
+        self.statements: List[str] = []
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def total(self) -> int:
+        return len(self.statements)
+
+    @contextmanager
+    def medir(self):
+        self.statements.clear()
+        event.listen(self.engine, "before_cursor_execute", self._registrar)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self._registrar)
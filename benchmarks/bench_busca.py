@@ -0,0 +1,158 @@
+"""
+Benchmark da busca por descrição (/movimentacao/busca).
+
+Popula o MOVIMENTACAO com descrições variadas (estabelecimentos com e sem acento,
+complementos e números) espalhadas entre usuários e mede, por termo, a primeira
+página com as facetas e uma página adiante pelo cursor. No PostgreSQL mede duas
+vezes: sem o índice e depois de aplicar os comandos da migração do índice trigram
+(pg_trgm + unaccent); no SQLite mede só o caminho sem índice e sem busca aproximada.
+
+Uso:
+    python -m benchmarks.bench_busca [quantidade] [repeticoes] [url_do_banco]
+
+O tamanho de referência é 5.000.000 de linhas em um PostgreSQL local:
+    python -m benchmarks.bench_busca 5000000 10 postgresql+asyncpg://...
+"""
+import asyncio
+import importlib
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.banco import URL_SQLITE, ContadorConsultas, criar_engine, criar_tabelas
+from core.busca import buscar_movimentacoes
+from models.__all_models import CategoriaModel, MovimentacaoModel, UsuarioModel
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+
+MIGRACAO = "migrations.versions.3f9c1a7d2b10_busca_trigram_descricao"
+USUARIOS = 50
+TAMANHO_LOTE = 10000
+
+ESTABELECIMENTOS = (
+    "Padaria Pão Quente", "Açougue Boi Gordo", "Farmácia São João", "Drogaria Araújo", "Supermercado Pão de Açúcar",
+    "Posto Ipiranga", "Uber viagem", "iFood pedido", "Netflix assinatura", "Spotify família", "Academia Corpo & Mente",
+    "Livraria Cultura", "Cinema Cinemark", "Restaurante Sabor Caseiro", "Pet Shop Amigo Fiel", "Conta de luz Cemig",
+    "Conta de água Copasa", "Internet Vivo Fibra", "Aluguel apartamento", "Condomínio", "Mensalidade escola",
+    "Consulta médica", "Dentista", "Manutenção do carro", "Estacionamento shopping", "Presente aniversário",
+    "Feira orgânica", "Hortifruti", "Loja de roupas", "Mercado Livre compra",
+)
+COMPLEMENTOS = ("", "centro", "bairro", "parcelado", "online", "cartão virtual", "via pix", "delivery")
+
+# termo -> o que exercita
+TERMOS = (
+    ("padaria", "substring comum"),
+    ("acougue", "sem acento contra 'Açougue'"),
+    ("farmacai", "erro de digitação (só aproximada)"),
+    ("assinatura", "palavra do meio"),
+    ("xyzabc", "sem resultado"),
+)
+
+
+def linhas_movimentacao(quantidade: int, semente: int = 42):
+    aleatorio = random.Random(semente)
+    inicio = date(2020, 1, 1)
+    for i in range(quantidade):
+        complemento = aleatorio.choice(COMPLEMENTOS)
+        descricao = f"{aleatorio.choice(ESTABELECIMENTOS)} {complemento} {aleatorio.randint(1, 9999)}".replace("  ", " ")
+        yield {
+            "valor": Decimal(aleatorio.randint(100, 50000)) / 100,
+            "descricao": descricao,
+            "tipoMovimentacao": TipoMovimentacao.DESPESA,
+            "forma_pagamento": FormaPagamento.DEBITO,
+            "condicao_pagamento": CondicaoPagamento.A_VISTA,
+            "consolidado": True,
+            "parcela_atual": "1",
+            "data_pagamento": inicio + timedelta(days=aleatorio.randint(0, 5 * 365)),
+            "id_categoria": i % (USUARIOS * 6) + 1,
+            "id_usuario": i % USUARIOS + 1,
+        }
+
+
+async def popular(session: AsyncSession, quantidade: int):
+    await session.execute(insert(UsuarioModel), [
+        {"id_usuario": i, "nome_completo": f"Usuário {i}", "data_nascimento": date(1990, 1, 1),
+         "email": f"u{i}@exemplo.com", "senha": "x"} for i in range(1, USUARIOS + 1)
+    ])
+    # id_categoria = i % (USUARIOS * 6) + 1 cai sempre em uma categoria do próprio usuário
+    await session.execute(insert(CategoriaModel), [
+        {"id_categoria": id_categoria, "nome": f"Categoria {id_categoria}", "tipo_categoria": TipoCategoria.VARIAVEL,
+         "modelo_categoria": TipoMovimentacao.DESPESA, "id_usuario": (id_categoria - 1) % USUARIOS + 1,
+         "nome_icone": "c.svg", "ativo": True}
+        for id_categoria in range(1, USUARIOS * 6 + 1)
+    ])
+    lote = []
+    for linha in linhas_movimentacao(quantidade):
+        lote.append(linha)
+        if len(lote) == TAMANHO_LOTE:
+            await session.execute(insert(MovimentacaoModel), lote)
+            lote = []
+    if lote:
+        await session.execute(insert(MovimentacaoModel), lote)
+    await session.commit()
+
+
+async def criar_indice(engine):
+    migracao = importlib.import_module(MIGRACAO)
+    async with engine.connect() as conexao:
+        conexao = await conexao.execution_options(isolation_level="AUTOCOMMIT")
+        for comando in (*migracao.EXTENSOES, migracao.FUNCAO, migracao.INDICE, 'ANALYZE "MOVIMENTACAO"'):
+            await conexao.execute(text(comando))
+
+
+async def medir(Session, contador: ContadorConsultas, termo: str, repeticoes: int):
+    primeira, adiante, consultas, total = [], [], 0, None
+    for _ in range(repeticoes):
+        async with Session() as session:
+            with contador.medir():
+                inicio = time.perf_counter()
+                resultado = await buscar_movimentacoes(session, 1, termo, limite=50)
+                primeira.append(time.perf_counter() - inicio)
+            consultas = contador.total
+            total = resultado.facetas["total"]
+            if resultado.proximo:
+                inicio = time.perf_counter()
+                await buscar_movimentacoes(session, 1, termo, limite=50, cursor=resultado.proximo)
+                adiante.append(time.perf_counter() - inicio)
+    return primeira, adiante, consultas, total
+
+
+async def rodada(nome: str, Session, contador, repeticoes: int):
+    print(f"--- {nome}")
+    for termo, descricao in TERMOS:
+        primeira, adiante, consultas, total = await medir(Session, contador, termo, repeticoes)
+        pagina = f"{statistics.median(adiante) * 1000:8.1f} ms" if adiante else "       -"
+        print(f"{termo:>12} ({descricao}): {total} resultado(s), {consultas} consulta(s); "
+              f"1ª página + facetas {statistics.median(primeira) * 1000:8.1f} ms, página seguinte {pagina}")
+
+
+async def main(quantidade: int = 5_000_000, repeticoes: int = 10, url: str = URL_SQLITE):
+    engine = criar_engine(url)
+    await criar_tabelas(engine)
+    Session = sessionmaker(class_=AsyncSession, bind=engine, expire_on_commit=False, autoflush=False)
+    contador = ContadorConsultas(engine)
+
+    inicio = time.perf_counter()
+    async with Session() as session:
+        await popular(session, quantidade)
+    print(f"banco: {engine.url.get_backend_name()}, movimentações: {quantidade} "
+          f"({quantidade // USUARIOS} por usuário), carga em {time.perf_counter() - inicio:.0f} s")
+
+    await rodada("sem índice", Session, contador, repeticoes)
+    if engine.dialect.name == "postgresql":
+        inicio = time.perf_counter()
+        await criar_indice(engine)
+        print(f"índice trigram criado em {time.perf_counter() - inicio:.0f} s")
+        await rodada("com índice pg_trgm", Session, contador, repeticoes)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:4]
+    asyncio.run(main(*[int(a) for a in argumentos[:2]], *argumentos[2:]))
@@ -0,0 +1,231 @@
+"""
+Benchmarks de cenário sobre um banco populado pelo gerador sintético.
+
+Sobe o app inteiro (main.app) via ASGITransport, com a Session de core.database
+religada ao banco do benchmark, e mede cada cenário de ponta a ponta: latência
+(p50/p95/média) e consultas SQL por execução. O resultado é um JSON com chaves
+ordenadas, pensado para ser versionado e comparado entre commits:
+
+    python -m benchmarks.bench_cenarios --saida antes.json
+    ... (mudança) ...
+    python -m benchmarks.bench_cenarios --saida depois.json --comparar antes.json
+
+Sem --url usa SQLite em memória; para números representativos passe a URL async
+de um PostgreSQL local (o banco é recriado do zero).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import subprocess
+import time
+from datetime import date
+from typing import Awaitable, Callable, Dict, List
+from unittest import mock
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from benchmarks.banco import URL_SQLITE, criar_engine, criar_tabelas
+from benchmarks.gerador import GeradorDados, inserir
+from core.auth import generate_token_access
+from core.database import Session
+from core.instrumentation import coletar_consultas, instrumentar_engine
+from models.fatura_model import FaturaModel
+
+
+class Contexto:
+    def __init__(self, client: AsyncClient, dados):
+        self.client = client
+        self.dados = dados
+        self.hoje = date.today()
+        self._execucao = 0
+
+        # faturas em aberto com gastos, da mais antiga para a mais nova, para o cenário de fechamento
+        dono_do_cartao = {
+            id_cartao: id_usuario
+            for id_usuario, cartoes in dados.cartoes_por_usuario.items() for id_cartao in cartoes
+        }
+        self.faturas_em_aberto = [
+            (dono_do_cartao[fatura["id_cartao_credito"]], fatura["id_fatura"])
+            for fatura in sorted(dados.linhas[FaturaModel], key=lambda f: f["data_vencimento"])
+            if fatura["data_pagamento"] is None and fatura["fatura_gastos"] > 0
+        ]
+
+    def proximo_usuario(self) -> int:
+        self._execucao += 1
+        return self.dados.usuarios[self._execucao % len(self.dados.usuarios)]
+
+    @staticmethod
+    def headers(id_usuario: int) -> dict:
+        return {"Authorization": f"Bearer {generate_token_access(str(id_usuario))}"}
+
+    async def requisitar(self, metodo: str, url: str, id_usuario: int, **kwargs):
+        response = await self.client.request(metodo, url, headers=self.headers(id_usuario), **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{metodo} {url} -> {response.status_code}: {response.text[:300]}")
+        return response
+
+
+async def listar_filtro(ctx: Contexto):
+    await ctx.requisitar("POST", "/api/v1/movimentacao/listar/filtro", ctx.proximo_usuario(),
+                         json={"mes": ctx.hoje.month, "ano": ctx.hoje.year})
+
+
+async def listar_filtro_cartao(ctx: Contexto):
+    id_usuario = ctx.proximo_usuario()
+    await ctx.requisitar("POST", "/api/v1/movimentacao/listar/filtro", id_usuario,
+                         json={"mes": ctx.hoje.month, "ano": ctx.hoje.year,
+                               "id_cartao_credito": ctx.dados.cartoes_por_usuario[id_usuario][0]})
+
+
+async def dashboard(ctx: Contexto):
+    id_usuario = ctx.proximo_usuario()
+    await ctx.requisitar("GET", "/api/v1/movimentacao/orcamento-mensal", id_usuario)
+    await ctx.requisitar("GET", "/api/v1/movimentacao/gastos-receitas-por-categoria", id_usuario,
+                         params={"tipo_receita": False, "somente_usuario": True})
+    await ctx.requisitar("GET", "/api/v1/movimentacao/economia-meses-anteriores", id_usuario,
+                         params={"somente_usuario": False})
+
+
+async def listar_cartoes(ctx: Contexto):
+    await ctx.requisitar("GET", "/api/v1/cartaoCredito/listar/true", ctx.proximo_usuario())
+
+
+async def fechar_fatura(ctx: Contexto):
+    # cada execução fecha a próxima fatura em aberto (o cenário altera os dados; roda por último)
+    id_usuario, id_fatura = ctx.faturas_em_aberto.pop(0)
+    id_conta = ctx.dados.contas_por_usuario[id_usuario][0]
+    await ctx.requisitar("POST", "/api/v1/fatura/fechar", id_usuario, json={"id_fatura": id_fatura, "id_conta": id_conta})
+
+
+async def varredura_vencidos(ctx: Contexto):
+    from api.v1.endpoints import rotina
+
+    # mede a varredura e a montagem dos e-mails, não o SMTP/wkhtmltopdf
+    with mock.patch.object(rotina, "send_email"):
+        await rotina.check_and_send_email()
+
+
+CENARIOS: Dict[str, Callable[[Contexto], Awaitable[None]]] = {
+    "listar_filtro": listar_filtro,
+    "listar_filtro_cartao": listar_filtro_cartao,
+    "dashboard": dashboard,
+    "listar_cartoes": listar_cartoes,
+    "varredura_vencidos": varredura_vencidos,
+    "fechar_fatura": fechar_fatura,
+}
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+async def preparar_banco(url: str, dados) -> AsyncEngine:
+    """Recria as tabelas, insere os dados e religa a Session do app ao banco do benchmark."""
+    engine = criar_engine(url)
+    instrumentar_engine(engine)
+    await criar_tabelas(engine)
+    Session.configure(bind=engine)
+
+    inicio = time.perf_counter()
+    async with AsyncSession(engine) as session:
+        await inserir(session, dados)
+    print(f"dados gerados em {time.perf_counter() - inicio:.1f}s: {dados.total()}")
+    return engine
+
+
+async def medir_cenario(ctx: Contexto, cenario, repeticoes: int) -> dict:
+    tempos, consultas = [], []
+    await cenario(ctx)  # aquecimento (caches do SQLAlchemy, compilação das queries)
+    for _ in range(repeticoes):
+        with coletar_consultas() as coleta:
+            inicio = time.perf_counter()
+            await cenario(ctx)
+            tempos.append(time.perf_counter() - inicio)
+        consultas.append(coleta.total)
+    return {
+        "repeticoes": repeticoes,
+        "p50_ms": round(percentil(tempos, 50) * 1000, 2),
+        "p95_ms": round(percentil(tempos, 95) * 1000, 2),
+        "media_ms": round(statistics.mean(tempos) * 1000, 2),
+        "consultas_por_execucao": round(statistics.mean(consultas), 1),
+    }
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def comparar(atual: dict, anterior: dict):
+    print(f"\n{'cenário':<22}{'p50 antes':>12}{'p50 agora':>12}{'variação':>10}{'consultas':>16}")
+    for nome, resultado in atual["cenarios"].items():
+        base = anterior.get("cenarios", {}).get(nome)
+        if not base:
+            print(f"{nome:<22}{'-':>12}{resultado['p50_ms']:>12.2f}{'novo':>10}")
+            continue
+        variacao = (resultado["p50_ms"] / base["p50_ms"] - 1) * 100 if base["p50_ms"] else 0
+        consultas = f"{base['consultas_por_execucao']:g} -> {resultado['consultas_por_execucao']:g}"
+        print(f"{nome:<22}{base['p50_ms']:>12.2f}{resultado['p50_ms']:>12.2f}{variacao:>+9.1f}%{consultas:>16}")
+
+
+async def main(args):
+    from main import app
+
+    # logs por requisição (e os avisos de N+1) poluiriam a saída; as consultas já entram no resultado
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("core.instrumentation").setLevel(logging.ERROR)
+    gerador = GeradorDados(usuarios=args.usuarios, anos=args.anos, movimentacoes_por_mes=args.movimentacoes_por_mes,
+                           semente=args.semente)
+    dados = gerador.gerar()
+    engine = await preparar_banco(args.url, dados)
+
+    selecionados = args.cenarios or list(CENARIOS)
+    resultados = {}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        ctx = Contexto(client, dados)
+        for nome in selecionados:
+            resultados[nome] = await medir_cenario(ctx, CENARIOS[nome], args.repeticoes)
+            print(f"{nome:<22} p50 {resultados[nome]['p50_ms']:>9.2f} ms  p95 {resultados[nome]['p95_ms']:>9.2f} ms  "
+                  f"{resultados[nome]['consultas_por_execucao']:>6g} consultas")
+    await engine.dispose()
+
+    saida = {
+        "commit": _commit_atual(),
+        "banco": engine.url.get_backend_name(),
+        "parametros": {"usuarios": args.usuarios, "anos": args.anos, "semente": args.semente,
+                       "movimentacoes_por_mes": args.movimentacoes_por_mes, "repeticoes": args.repeticoes},
+        "linhas": dados.total(),
+        "cenarios": resultados,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(saida, arquivo, indent=2, sort_keys=True, ensure_ascii=False)
+            arquivo.write("\n")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            comparar(saida, json.load(arquivo))
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=URL_SQLITE, help="URL async do banco (padrão: SQLite em memória)")
+    parser.add_argument("--usuarios", type=int, default=5)
+    parser.add_argument("--anos", type=int, default=2)
+    parser.add_argument("--movimentacoes-por-mes", type=int, default=40)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--cenarios", nargs="*", choices=list(CENARIOS))
+    parser.add_argument("--saida", help="arquivo JSON com os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(argumentos()))
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark da compressão das respostas: bytes economizados x CPU gasta.
+
+Usa o extrato de /movimentacao/listar/filtro já serializado pelo caminho rápido
+(bench_serializacao.gerar_movimentacoes) e mede, para cada codificação e nível, o
+tamanho final, o tempo de compressão e o tempo de descompressão no cliente. Também
+compara o corpo único com o mesmo corpo enviado em pedaços pelo CompressorIncremental.
+
+Uso:
+    python -m benchmarks.bench_compressao [quantidade] [repeticoes]
+"""
+import gzip
+import sys
+
+import brotli
+
+from api.v1.endpoints.movimentacao import construir_response_rapida
+from benchmarks.bench_serializacao import gerar_movimentacoes, medir
+from core.compressao import CompressorIncremental, comprimir
+from core.responses import ORJSONDecimalResponse
+from schemas.movimentacao_schema import MovimentacaoRequestFilterSchema
+
+NIVEIS = {"gzip": (1, 6, 9), "br": (1, 4, 5, 6, 9, 11)}
+DESCOMPRIMIR = {"gzip": gzip.decompress, "br": brotli.decompress}
+TAMANHO_PEDACO = 16 * 1024
+
+
+def em_pedacos(corpo: bytes, codificacao: str, nivel: int) -> bytes:
+    compressor = CompressorIncremental(codificacao, nivel)
+    saida = [compressor.pedaco(corpo[i:i + TAMANHO_PEDACO]) for i in range(0, len(corpo), TAMANHO_PEDACO)]
+    saida.append(compressor.finalizar())
+    return b"".join(saida)
+
+
+def main(quantidade: int = 2000, repeticoes: int = 5):
+    _, linhas = gerar_movimentacoes(quantidade)
+    filtro = MovimentacaoRequestFilterSchema(mes=11, ano=2024)
+    corpo = ORJSONDecimalResponse(content=construir_response_rapida(linhas, filtro)).body
+
+    print(f"movimentações: {quantidade}, repetições: {repeticoes}, corpo: {len(corpo) / 1024:.0f} KiB")
+    print(f"{'codificação':<12}{'nível':>6}{'KiB':>9}{'razão':>8}{'comprimir ms':>15}{'descomprimir ms':>17}{'pedaços KiB':>13}")
+    for codificacao, niveis in NIVEIS.items():
+        for nivel in niveis:
+            comprimido = comprimir(corpo, codificacao, nivel)
+            assert DESCOMPRIMIR[codificacao](comprimido) == corpo
+            fluxo = em_pedacos(corpo, codificacao, nivel)
+            assert DESCOMPRIMIR[codificacao](fluxo) == corpo
+
+            tempo_comprimir = min(medir(lambda: comprimir(corpo, codificacao, nivel), repeticoes))
+            tempo_descomprimir = min(medir(lambda: DESCOMPRIMIR[codificacao](comprimido), repeticoes))
+            print(f"{codificacao:<12}{nivel:>6}{len(comprimido) / 1024:>9.1f}{len(corpo) / len(comprimido):>8.1f}"
+                  f"{tempo_comprimir * 1000:>15.2f}{tempo_descomprimir * 1000:>17.2f}{len(fluxo) / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    argumentos = [int(a) for a in sys.argv[1:3]]
+    main(*argumentos)
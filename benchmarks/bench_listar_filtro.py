@@ -0,0 +1,146 @@
+"""
+Benchmark da consulta de /listar/filtro.
+
+Compara construir_query_movimentacao (select do model + oito selectinload) com
+construir_query_movimentacao_colunas (colunas projetadas + divisões agregadas em JSON),
+reportando consultas enviadas ao banco e latência por requisição.
+
+Uso:
+    python -m benchmarks.bench_listar_filtro [quantidade] [repeticoes] [url_do_banco]
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from api.v1.endpoints.movimentacao import (construir_query_movimentacao, construir_query_movimentacao_colunas,
+                                           construir_response, construir_response_rapida)
+from benchmarks.banco import URL_SQLITE, ContadorConsultas, criar_engine, criar_tabelas
+from core.responses import ORJSONDecimalResponse
+from models.__all_models import (CartaoCreditoModel, CategoriaModel, ContaModel, DivideModel, FaturaModel,
+                                 MovimentacaoModel, ParenteModel, RepeticaoModel, UsuarioModel)
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+from schemas.movimentacao_schema import MovimentacaoRequestFilterSchema
+
+
+async def popular(session: AsyncSession, quantidade: int) -> int:
+    usuario = UsuarioModel(nome_completo="Benchmark", data_nascimento=date(1990, 1, 1),
+                           email="bench@exemplo.com", senha="x")
+    session.add(usuario)
+    await session.flush()
+
+    conta = ContaModel(nome="Corrente", tipo_conta="Corrente", id_usuario=usuario.id_usuario, saldo=Decimal("0"))
+    poupanca = ContaModel(nome="Poupança", tipo_conta="Poupança", id_usuario=usuario.id_usuario, saldo=Decimal("0"))
+    categoria = CategoriaModel(nome="Mercado", tipo_categoria=TipoCategoria.VARIAVEL,
+                               modelo_categoria=TipoMovimentacao.DESPESA, id_usuario=usuario.id_usuario,
+                               nome_icone="food.svg")
+    cartao = CartaoCreditoModel(nome="Nubank", limite=Decimal("5000"), id_usuario=usuario.id_usuario)
+    eu = ParenteModel(nome="Eu", grau_parentesco="Eu", id_usuario=usuario.id_usuario)
+    parente = ParenteModel(nome="Maria", grau_parentesco="Irmã", id_usuario=usuario.id_usuario)
+    session.add_all([conta, poupanca, categoria, cartao, eu, parente])
+    await session.flush()
+
+    fatura = FaturaModel(data_vencimento=date(2024, 11, 10), data_fechamento=date(2024, 11, 3),
+                         fatura_gastos=Decimal("0"), id_conta=conta.id_conta,
+                         id_cartao_credito=cartao.id_cartao_credito)
+    repeticao = RepeticaoModel(quantidade_parcelas=10, tipo_recorrencia="Mensal", valor_total=Decimal("1000"),
+                               data_inicio=date(2024, 11, 1), id_usuario=usuario.id_usuario)
+    session.add_all([fatura, repeticao])
+    await session.flush()
+
+    inicio = datetime(2024, 11, 1, 12, 0, tzinfo=timezone.utc)
+    for i in range(quantidade):
+        credito = i % 3 == 0
+        valor = Decimal(i % 500) + Decimal("0.90")
+        metade = (valor / 2).quantize(Decimal("0.01"))
+        mov = MovimentacaoModel(
+            valor=valor, descricao=f"Movimentação {i}", tipoMovimentacao=TipoMovimentacao.DESPESA,
+            forma_pagamento=FormaPagamento.CREDITO if credito else FormaPagamento.DEBITO,
+            condicao_pagamento=CondicaoPagamento.PARCELADO if credito else CondicaoPagamento.A_VISTA,
+            datatime=inicio + timedelta(minutes=i), consolidado=not credito, parcela_atual="1",
+            data_pagamento=date(2024, 11, 1 + i % 28), participa_limite_fatura_gastos=True if credito else None,
+            id_conta=None if credito else conta.id_conta, id_conta_destino=poupanca.id_conta if i % 7 == 0 else None,
+            id_categoria=categoria.id_categoria, id_fatura=fatura.id_fatura if credito else None,
+            id_repeticao=repeticao.id_repeticao if credito else None, id_usuario=usuario.id_usuario,
+            divisoes=[
+                DivideModel(id_parente=eu.id_parente, valor=metade),
+                DivideModel(id_parente=parente.id_parente, valor=valor - metade),
+            ],
+        )
+        session.add(mov)
+    await session.commit()
+    return usuario.id_usuario
+
+
+def condicoes_do_mes(id_usuario: int, filtro: MovimentacaoRequestFilterSchema):
+    return [
+        MovimentacaoModel.id_usuario == id_usuario,
+        extract('month', MovimentacaoModel.data_pagamento) == filtro.mes,
+        extract('year', MovimentacaoModel.data_pagamento) == filtro.ano,
+    ]
+
+
+async def caminho_selectinload(session: AsyncSession, condicoes, filtro) -> bytes:
+    result = await session.execute(construir_query_movimentacao(condicoes))
+    movimentacoes = result.scalars().all()
+    modelos = construir_response(movimentacoes, filtro)
+    return ORJSONDecimalResponse(content=[m.model_dump() for m in modelos]).body
+
+
+async def caminho_colunas(session: AsyncSession, condicoes, filtro) -> bytes:
+    result = await session.execute(construir_query_movimentacao_colunas(condicoes))
+    return ORJSONDecimalResponse(content=construir_response_rapida(result.mappings().all(), filtro)).body
+
+
+async def medir(Session, contador: ContadorConsultas, caminho, condicoes, filtro, repeticoes: int):
+    tempos, consultas, corpo = [], 0, b""
+    for _ in range(repeticoes):
+        # sessão nova a cada repetição, como em uma requisição real (sem identity map aquecido)
+        async with Session() as session:
+            with contador.medir():
+                inicio = time.perf_counter()
+                corpo = await caminho(session, condicoes, filtro)
+                tempos.append(time.perf_counter() - inicio)
+            consultas = contador.total
+    return tempos, consultas, corpo
+
+
+async def main(quantidade: int = 2000, repeticoes: int = 10, url: str = URL_SQLITE):
+    engine = criar_engine(url)
+    await criar_tabelas(engine)
+    Session = sessionmaker(class_=AsyncSession, bind=engine, expire_on_commit=False, autoflush=False)
+    contador = ContadorConsultas(engine)
+
+    async with Session() as session:
+        id_usuario = await popular(session, quantidade)
+
+    filtro = MovimentacaoRequestFilterSchema(mes=11, ano=2024)
+    condicoes = condicoes_do_mes(id_usuario, filtro)
+
+    resultados = {}
+    for nome, caminho in (("selectinload", caminho_selectinload), ("colunas", caminho_colunas)):
+        tempos, consultas, corpo = await medir(Session, contador, caminho, condicoes, filtro, repeticoes)
+        resultados[nome] = (tempos, consultas, corpo)
+
+    assert json.loads(resultados["selectinload"][2]) == json.loads(resultados["colunas"][2]), \
+        "as duas consultas devem gerar a mesma listagem"
+    await engine.dispose()
+
+    print(f"banco: {engine.url.get_backend_name()}, movimentações: {quantidade}, repetições: {repeticoes}")
+    for nome, (tempos, consultas, _) in resultados.items():
+        print(f"{nome:>12}: {consultas} consulta(s)/requisição, "
+              f"mediana {statistics.median(tempos) * 1000:8.1f} ms, melhor {min(tempos) * 1000:8.1f} ms")
+    ganho = statistics.median(resultados["selectinload"][0]) / statistics.median(resultados["colunas"][0])
+    print(f"ganho (mediana): {ganho:.1f}x")
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:4]
+    asyncio.run(main(*[int(a) for a in argumentos[:2]], *argumentos[2:]))
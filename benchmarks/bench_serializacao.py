@@ -0,0 +1,135 @@
+"""
+Micro-benchmark da serialização da listagem de movimentações.
+
+Compara o caminho antigo (construir_response -> MovimentacaoSchemaList por linha ->
+revalidação do response_model -> JSONResponse) com o caminho rápido
+(construir_response_rapida -> dicts -> ORJSONDecimalResponse).
+
+Uso:
+    python -m benchmarks.bench_serializacao [quantidade] [repeticoes]
+"""
+import asyncio
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from api.v1.endpoints.movimentacao import construir_response, construir_response_rapida
+from core.responses import ORJSONDecimalResponse
+from models.enums import CondicaoPagamento, FormaPagamento, TipoMovimentacao
+from schemas.movimentacao_schema import MovimentacaoRequestFilterSchema, MovimentacaoSchemaList
+
+
+def gerar_movimentacoes(quantidade: int):
+    """Gera objetos no formato ORM (para construir_response) e as linhas equivalentes (para o caminho rápido)."""
+    categoria = SimpleNamespace(id_categoria=1, nome_icone="food.svg")
+    conta = SimpleNamespace(nome="Carteira")
+    cartao = SimpleNamespace(nome="Nubank")
+    fatura = SimpleNamespace(
+        id_fatura=10, data_vencimento=date(2024, 12, 10), data_fechamento=date(2024, 12, 3),
+        data_pagamento=None, id_cartao_credito=3, id_conta=None, conta=None,
+        fatura_gastos=Decimal("1500.00"), cartao_credito=cartao
+    )
+    parentes = [SimpleNamespace(nome="Eu"), SimpleNamespace(nome="Maria")]
+    repeticao = SimpleNamespace(quantidade_parcelas=10, tipo_recorrencia="Mensal")
+
+    objetos, linhas = [], []
+    inicio = datetime(2024, 11, 1, 12, 0, tzinfo=timezone.utc)
+    for i in range(1, quantidade + 1):
+        credito = i % 3 == 0
+        valor = Decimal(i % 500) + Decimal("0.90")
+        metade = (valor / 2).quantize(Decimal("0.01"))
+        divide = [
+            SimpleNamespace(id_parente=1, valor=metade, parentes=parentes[0]),
+            SimpleNamespace(id_parente=2, valor=valor - metade, parentes=parentes[1]),
+        ]
+        mov = SimpleNamespace(
+            id_movimentacao=i, valor=valor, descricao=f"Movimentação {i}",
+            tipoMovimentacao=TipoMovimentacao.DESPESA,
+            forma_pagamento=FormaPagamento.CREDITO if credito else FormaPagamento.DEBITO,
+            condicao_pagamento=CondicaoPagamento.PARCELADO if credito else CondicaoPagamento.A_VISTA,
+            datatime=inicio + timedelta(minutes=i), consolidado=not credito, parcela_atual="1",
+            data_pagamento=date(2024, 11, 1 + i % 28), id_conta=None if credito else 1,
+            id_conta_destino=None, conta_destino=None, id_categoria=1, categoria=categoria,
+            conta=None if credito else conta, fatura=fatura if credito else None,
+            id_fatura=fatura.id_fatura if credito else None,
+            id_repeticao=7 if credito else None, repeticao=repeticao if credito else None,
+            participa_limite_fatura_gastos=True if credito else None, divisoes=divide,
+        )
+        objetos.append(mov)
+        linhas.append({
+            "id_movimentacao": mov.id_movimentacao, "valor": mov.valor, "descricao": mov.descricao,
+            "tipoMovimentacao": mov.tipoMovimentacao, "forma_pagamento": mov.forma_pagamento,
+            "condicao_pagamento": mov.condicao_pagamento, "datatime": mov.datatime,
+            "consolidado": mov.consolidado, "parcela_atual": mov.parcela_atual,
+            "data_pagamento": mov.data_pagamento, "id_conta": mov.id_conta,
+            "id_conta_destino": None, "id_fatura": mov.id_fatura, "id_repeticao": mov.id_repeticao,
+            "participa_limite_fatura_gastos": mov.participa_limite_fatura_gastos,
+            "quantidade_parcelas": repeticao.quantidade_parcelas if credito else None,
+            "tipo_recorrencia": repeticao.tipo_recorrencia if credito else None,
+            "id_categoria": 1, "nome_icone_categoria": "food.svg",
+            "nome_conta": None if credito else conta.nome, "nome_conta_destino": None,
+            "id_cartao_credito": fatura.id_cartao_credito if credito else None,
+            "fatura_data_vencimento": fatura.data_vencimento if credito else None,
+            "fatura_data_fechamento": fatura.data_fechamento if credito else None,
+            "fatura_data_pagamento": None, "fatura_id_conta": None,
+            "fatura_gastos": fatura.fatura_gastos if credito else None,
+            "nome_cartao_credito": cartao.nome if credito else None, "fatura_nome_conta": None,
+            "divide_parente": [
+                {"id_parente": d.id_parente, "valor_parente": str(d.valor), "nome_parente": d.parentes.nome}
+                for d in divide
+            ],
+        })
+    return objetos, linhas
+
+
+async def caminho_pydantic(objetos, filtro, campo) -> bytes:
+    modelos = construir_response(objetos, filtro)
+    conteudo = await serialize_response(field=campo, response_content=modelos)
+    return JSONResponse(content=conteudo).body
+
+
+def caminho_rapido(linhas, filtro) -> bytes:
+    return ORJSONDecimalResponse(content=construir_response_rapida(linhas, filtro)).body
+
+
+def medir(funcao, repeticoes: int) -> List[float]:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def main(quantidade: int = 5000, repeticoes: int = 10):
+    objetos, linhas = gerar_movimentacoes(quantidade)
+    filtro = MovimentacaoRequestFilterSchema(mes=11, ano=2024)
+    campo = create_response_field(name="Response_listar_filtro", type_=List[MovimentacaoSchemaList], mode="serialization")
+
+    loop = asyncio.new_event_loop()
+    corpo_pydantic = loop.run_until_complete(caminho_pydantic(objetos, filtro, campo))
+    corpo_rapido = caminho_rapido(linhas, filtro)
+    assert json.loads(corpo_pydantic) == json.loads(corpo_rapido), "os dois caminhos devem gerar o mesmo JSON"
+
+    tempos_pydantic = medir(lambda: loop.run_until_complete(caminho_pydantic(objetos, filtro, campo)), repeticoes)
+    tempos_rapido = medir(lambda: caminho_rapido(linhas, filtro), repeticoes)
+    loop.close()
+
+    melhor_pydantic, melhor_rapido = min(tempos_pydantic), min(tempos_rapido)
+    print(f"movimentações: {quantidade}, repetições: {repeticoes}, bytes: {len(corpo_rapido)}")
+    print(f"pydantic + response_model: {melhor_pydantic * 1000:8.1f} ms")
+    print(f"caminho rápido (orjson):   {melhor_rapido * 1000:8.1f} ms")
+    print(f"ganho: {melhor_pydantic / melhor_rapido:.1f}x")
+
+
+if __name__ == "__main__":
+    argumentos = [int(a) for a in sys.argv[1:3]]
+    main(*argumentos)
@@ -0,0 +1,58 @@
+"""
+Custo de import da aplicação medido com ``python -X importtime``.
+
+Roda ``import main`` em um processo novo (sem cache de módulos) e lê o tempo acumulado
+de cada módulo. Lista os maiores e confere que renderizadores de PDF e o stack de
+e-mail (MÓDULOS_SOB_DEMANDA) não entram no startup.
+
+Uso:
+    python -m benchmarks.bench_startup [repeticoes]
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# carregados só no primeiro envio de e-mail / geração de PDF (o Mako, no lifespan)
+MODULOS_SOB_DEMANDA = ("pdfkit", "smtplib", "email.mime", "weasyprint", "PIL", "fontTools", "mako")
+
+
+def medir_importacao(modulo: str = "main") -> Dict[str, int]:
+    """Tempo acumulado (µs) de cada módulo importado por ``import <modulo>``."""
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True, text=True, check=True,
+    )
+    tempos = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, acumulado, nome = linha[len("import time:"):].split("|")
+        tempos[nome.strip()] = int(acumulado)
+    return tempos
+
+
+def carregados_sob_demanda(tempos: Dict[str, int]) -> list:
+    return sorted(nome for nome in tempos
+                  if any(nome == prefixo or nome.startswith(prefixo + ".") for prefixo in MODULOS_SOB_DEMANDA))
+
+
+def main(repeticoes: int = 5):
+    medicoes = [medir_importacao() for _ in range(repeticoes)]
+    melhor = min(medicoes, key=lambda tempos: tempos["main"])
+    print(f"import main: melhor {melhor['main'] / 1000:.0f} ms, "
+          f"mediana {sorted(t['main'] for t in medicoes)[repeticoes // 2] / 1000:.0f} ms ({repeticoes} processos)")
+    print("maiores módulos de primeiro nível da aplicação:")
+    for nome in sorted((n for n in melhor if n.split(".")[0] in ("api", "core", "models", "schemas")),
+                       key=melhor.get, reverse=True)[:10]:
+        print(f"  {nome:<40}{melhor[nome] / 1000:>8.1f} ms")
+    print(f"carregados sem necessidade: {carregados_sob_demanda(melhor) or 'nenhum'}")
+
+
+if __name__ == "__main__":
+    argumentos = [int(a) for a in sys.argv[1:2]]
+    main(*argumentos)
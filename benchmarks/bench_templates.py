@@ -0,0 +1,96 @@
+"""
+Micro-benchmark da montagem dos e-mails com muitas linhas.
+
+Compara a montagem antiga (``email_body += f"..."`` por linha, com os estilos inline
+repetidos) com os templates Mako compilados de core.templates, para o alerta de contas
+em atraso (processar_usuarios_em_atraso) e para o extrato de cobrança do parente
+(criar_email_data). Os dois caminhos produzem o mesmo total no resumo.
+
+Uso:
+    python -m benchmarks.bench_templates [linhas] [repeticoes]
+"""
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List
+
+from api.v1.endpoints.rotina import processar_usuarios_em_atraso
+from core.cobranca import criar_email_data
+from core.formatacao import formatar_valor_brasileiro
+from core.templates import precompilar
+
+CELULA = "border: 1px solid #dddddd; text-align: left; padding: 8px;"
+
+
+def gerar_contas(quantidade: int) -> List[SimpleNamespace]:
+    inicio = date(2024, 1, 1)
+    return [
+        SimpleNamespace(descricao=f"Conta {i}" if i % 7 else None, data_pagamento=inicio + timedelta(days=i % 365),
+                        valor=Decimal(i % 5000) + Decimal("0.99"))
+        for i in range(quantidade)
+    ]
+
+
+def alerta_legado(contas) -> str:
+    """A montagem de processar_usuarios_em_atraso antes dos templates (só a parte das contas)."""
+    email_body = (
+        f"<h4>Contas em atraso:</h4>"
+        f"<table style='border-collapse: collapse; width: 100%;'>"
+        f"<thead><tr style='background-color: #f2f2f2;'>"
+        f"<th style='{CELULA}'>Descrição</th><th style='{CELULA}'>Data de Vencimento</th><th style='{CELULA}'>Valor</th>"
+        f"</tr></thead><tbody>"
+    )
+    total_atraso = 0
+    for conta in contas:
+        email_body += (
+            f"<tr>"
+            f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{conta.descricao or 'Outros'}</td>"
+            f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{conta.data_pagamento.strftime('%d/%m/%Y')}</td>"
+            f"<td style='border: 1px solid #dddddd; text-align: left; padding: 8px;'>{formatar_valor_brasileiro(conta.valor)}</td>"
+            f"</tr>"
+        )
+        total_atraso += conta.valor
+    email_body += "</tbody></table>"
+    email_body += f"<br><h4>Resumo das Pendências:</h4><table><tr><td>{formatar_valor_brasileiro(total_atraso)}</td></tr></table>"
+    return email_body
+
+
+def medir(funcao, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main(linhas: int = 10000, repeticoes: int = 5):
+    inicio = time.perf_counter()
+    precompilar()
+    print(f"precompilar: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    contas = gerar_contas(linhas)
+    total = formatar_valor_brasileiro(sum(conta.valor for conta in contas))
+    [(alerta, _)] = processar_usuarios_em_atraso({"a@b.com": contas}, {})
+    assert total in alerta["email_body"] and total in alerta_legado(contas)
+
+    movimentacoes = [{"descricao": conta.descricao or "Outros", "data_pagamento": str(conta.data_pagamento),
+                      "valor": float(conta.valor)} for conta in contas]
+    dados = {"movimentacoes_nao_consolidadas": movimentacoes,
+             "fatura_geral": {"total_movimentacoes": 1.0, "total_geral_movimentacoes": 1.0}}
+    parente, usuario = SimpleNamespace(nome="Bia"), SimpleNamespace(nome_completo="Ana")
+    periodo = SimpleNamespace(mes=3, ano=2024)
+
+    print(f"linhas: {linhas}, repetições: {repeticoes} (melhor tempo)")
+    print(f"  alerta legado (+=)        {medir(lambda: alerta_legado(contas), repeticoes) * 1000:>9.1f} ms")
+    print(f"  alerta template           "
+          f"{medir(lambda: processar_usuarios_em_atraso({'a@b.com': contas}, {}), repeticoes) * 1000:>9.1f} ms")
+    print(f"  extrato parente template  "
+          f"{medir(lambda: criar_email_data(parente, usuario, periodo, dados), repeticoes) * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    argumentos = [int(a) for a in sys.argv[1:3]]
+    main(*argumentos)
@@ -0,0 +1,283 @@
+"""
+Teste de carga em processo, sem rede e sem servidor.
+
+Dispara sessões de usuário simuladas contra main.app via ASGITransport, com N
+sessões simultâneas, sobre um banco populado pelo gerador sintético. Cada sessão
+reproduz o uso típico do app:
+
+    login -> contas -> categorias -> filtro do mês -> nova despesa -> filtro -> consolidar
+
+Ao final imprime, por rota, vazão (req/s), percentis de latência e taxa de erro:
+
+    python -m benchmarks.carga --concorrencia 20 --sessoes 200
+    python -m benchmarks.carga --concorrencia 20 --sem-auth --saida carga.json
+
+Com --sem-auth o get_current_user é trocado por um stub que monta o usuário a
+partir do header X-Carga-Usuario (sem login, JWT nem consulta ao banco), isolando
+o custo dos handlers. Sem --url usa um SQLite em arquivo temporário (escritas
+concorrentes são serializadas pelo lock do SQLite); para números representativos
+passe a URL async de um PostgreSQL local (o banco é recriado do zero).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Header
+from httpx import ASGITransport, AsyncClient, Response
+
+from benchmarks.bench_cenarios import percentil, preparar_banco
+from benchmarks.gerador import DadosGerados, GeradorDados
+from core.deps import get_current_user
+from core.security import generate_hash
+from models.__all_models import ParenteModel, UsuarioModel
+from models.enums import CondicaoPagamento, FormaPagamento, TipoRecorrencia
+
+SENHA = "carga-123"
+
+
+class Estatisticas:
+    """Latências e status por rota (o template da rota, não a URL com os ids)."""
+
+    def __init__(self):
+        self.tempos: Dict[str, List[float]] = defaultdict(list)
+        self.status: Dict[str, Counter] = defaultdict(Counter)
+        self.sessoes = Counter()
+
+    def registrar(self, rota: str, segundos: float, status):
+        self.tempos[rota].append(segundos)
+        self.status[rota][status] += 1
+
+    @staticmethod
+    def _erro(status) -> bool:
+        return not isinstance(status, int) or status >= 400
+
+    def relatorio(self, duracao: float) -> dict:
+        rotas = {}
+        for rota, tempos in self.tempos.items():
+            erros = sum(quantidade for status, quantidade in self.status[rota].items() if self._erro(status))
+            rotas[rota] = {
+                "requisicoes": len(tempos),
+                "erros": erros,
+                "taxa_erro": round(erros / len(tempos), 4),
+                "rps": round(len(tempos) / duracao, 2) if duracao else 0,
+                "p50_ms": round(percentil(tempos, 50) * 1000, 2),
+                "p95_ms": round(percentil(tempos, 95) * 1000, 2),
+                "p99_ms": round(percentil(tempos, 99) * 1000, 2),
+                "max_ms": round(max(tempos) * 1000, 2),
+                "media_ms": round(statistics.mean(tempos) * 1000, 2),
+                "status": {str(status): quantidade for status, quantidade in sorted(self.status[rota].items(), key=str)},
+            }
+        total = sum(len(tempos) for tempos in self.tempos.values())
+        erros = sum(rota["erros"] for rota in rotas.values())
+        return {
+            "duracao_s": round(duracao, 2),
+            "sessoes": dict(self.sessoes),
+            "requisicoes": total,
+            "rps": round(total / duracao, 2) if duracao else 0,
+            "taxa_erro": round(erros / total, 4) if total else 0,
+            "rotas": rotas,
+        }
+
+
+class ClienteCarga:
+    def __init__(self, client: AsyncClient, estatisticas: Estatisticas):
+        self.client = client
+        self.estatisticas = estatisticas
+
+    async def requisitar(self, metodo: str, rota: str, url: Optional[str] = None, **kwargs) -> Optional[Response]:
+        """Faz a requisição e registra o tempo sob ``rota``; devolve None se ela falhou."""
+        inicio = time.perf_counter()
+        try:
+            response = await self.client.request(metodo, url or rota, **kwargs)
+            status = response.status_code
+        except Exception as exc:  # a sessão segue contabilizada; o erro vai para o relatório
+            response, status = None, type(exc).__name__
+        self.estatisticas.registrar(f"{metodo} {rota}", time.perf_counter() - inicio, status)
+        if response is None or response.status_code >= 400:
+            return None
+        return response
+
+
+class SessaoUsuario:
+    """Uma sessão do app; para no primeiro passo que falhar e do qual os seguintes dependam."""
+
+    def __init__(self, cliente: ClienteCarga, usuario: dict, id_parente: int, numero: int, sem_auth: bool):
+        self.cliente = cliente
+        self.usuario = usuario
+        self.id_parente = id_parente
+        self.numero = numero
+        self.sem_auth = sem_auth
+        self.hoje = date.today()
+
+    async def _autenticar(self) -> Optional[dict]:
+        if self.sem_auth:
+            return {"X-Carga-Usuario": str(self.usuario["id_usuario"])}
+        response = await self.cliente.requisitar("POST", "/api/v1/usuarios/login",
+                                                 data={"username": self.usuario["email"], "password": SENHA})
+        if response is None:
+            return None
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def _filtrar_mes(self, headers: dict) -> Optional[Response]:
+        return await self.cliente.requisitar("POST", "/api/v1/movimentacao/listar/filtro", headers=headers,
+                                             json={"mes": self.hoje.month, "ano": self.hoje.year})
+
+    async def executar(self) -> bool:
+        requisitar = self.cliente.requisitar
+        headers = await self._autenticar()
+        if headers is None:
+            return False
+
+        contas = await requisitar("GET", "/api/v1/contas/listar/{somente_ativo}", "/api/v1/contas/listar/true",
+                                  headers=headers)
+        categorias = await requisitar("GET", "/api/v1/categorias/listar/despesa/{somente_ativo}",
+                                      "/api/v1/categorias/listar/despesa/true", headers=headers)
+        if contas is None or categorias is None or not contas.json() or not categorias.json():
+            return False
+        await self._filtrar_mes(headers)
+
+        descricao = f"Carga {self.numero}"
+        valor = Decimal(10 + self.numero % 90)
+        despesa = {
+            "valor": str(valor),
+            "descricao": descricao,
+            "id_categoria": categorias.json()[0]["id_categoria"],
+            "condicao_pagamento": CondicaoPagamento.A_VISTA.value,
+            "tipo_recorrencia": TipoRecorrencia.MENSAL.value,
+            "datatime": datetime.now().isoformat(),
+            "data_pagamento": self.hoje.isoformat(),
+            "consolidado": False,
+            "forma_pagamento": FormaPagamento.DEBITO.value,
+            "id_financeiro": contas.json()[0]["id_conta"],
+            "quantidade_parcelas": 1,
+            "divide_parente": [{"id_parente": self.id_parente, "valor_parente": str(valor)}],
+        }
+        if await requisitar("POST", "/api/v1/movimentacao/cadastro/despesa", headers=headers, json=despesa) is None:
+            return False
+
+        lista = await self._filtrar_mes(headers)
+        criada = next((m for m in lista.json() if m["descricao"] == descricao), None) if lista is not None else None
+        if criada is None:
+            return False
+        consolidada = await requisitar("POST", "/api/v1/movimentacao/consolidar", headers=headers,
+                                       json={"id_movimentacao": criada["id_movimentacao"], "consolidado": True})
+        return consolidada is not None
+
+
+def usuario_sem_token(usuarios: Dict[int, dict]):
+    """Dependência que substitui get_current_user: o usuário vem do header, sem JWT nem banco."""
+
+    async def get_usuario_carga(x_carga_usuario: int = Header()) -> UsuarioModel:
+        return UsuarioModel(**usuarios[x_carga_usuario])
+
+    return get_usuario_carga
+
+
+async def executar_carga(app: FastAPI, dados: DadosGerados, concorrencia: int, sessoes: int,
+                         duracao: Optional[float] = None, sem_auth: bool = False) -> dict:
+    """Roda ``sessoes`` sessões (ou até ``duracao`` segundos) com ``concorrencia`` sessões simultâneas."""
+    usuarios = {linha["id_usuario"]: linha for linha in dados.linhas[UsuarioModel]}
+    parente_eu = {linha["id_usuario"]: linha["id_parente"] for linha in dados.linhas[ParenteModel]
+                  if linha["grau_parentesco"] == "Eu"}
+    estatisticas = Estatisticas()
+    numeros = itertools.count()
+
+    if sem_auth:
+        app.dependency_overrides[get_current_user] = usuario_sem_token(usuarios)
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with AsyncClient(transport=transport, base_url="http://carga") as client:
+            cliente = ClienteCarga(client, estatisticas)
+            inicio = time.perf_counter()
+            limite = inicio + duracao if duracao else None
+
+            async def trabalhador():
+                for numero in numeros:
+                    if numero >= sessoes or (limite and time.perf_counter() >= limite):
+                        return
+                    id_usuario = dados.usuarios[numero % len(dados.usuarios)]
+                    sessao = SessaoUsuario(cliente, usuarios[id_usuario], parente_eu[id_usuario], numero, sem_auth)
+                    concluida = await sessao.executar()
+                    estatisticas.sessoes["concluidas" if concluida else "interrompidas"] += 1
+
+            await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+            decorrido = time.perf_counter() - inicio
+    finally:
+        if sem_auth:
+            app.dependency_overrides.pop(get_current_user, None)
+    return estatisticas.relatorio(decorrido)
+
+
+def imprimir(relatorio: dict):
+    print(f"\n{'rota':<58}{'req':>7}{'req/s':>9}{'erro':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for rota, dados in sorted(relatorio["rotas"].items()):
+        print(f"{rota:<58}{dados['requisicoes']:>7}{dados['rps']:>9.1f}{dados['taxa_erro']:>8.1%}"
+              f"{dados['p50_ms']:>10.2f}{dados['p95_ms']:>10.2f}{dados['p99_ms']:>10.2f}")
+    print(f"\n{relatorio['requisicoes']} requisições em {relatorio['duracao_s']}s ({relatorio['rps']} req/s), "
+          f"erro {relatorio['taxa_erro']:.1%}, sessões {relatorio['sessoes']}")
+
+
+async def main(args):
+    from main import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("core.instrumentation").setLevel(logging.ERROR)
+
+    dados = GeradorDados(usuarios=args.usuarios, anos=args.anos, movimentacoes_por_mes=args.movimentacoes_por_mes,
+                         semente=args.semente).gerar()
+    # o gerador não se preocupa com a senha; aqui todos os usuários logam com SENHA (um único hash bcrypt)
+    hash_senha = generate_hash(SENHA)
+    for usuario in dados.linhas[UsuarioModel]:
+        usuario["senha"] = hash_senha
+
+    arquivo = None
+    url = args.url
+    if url is None:
+        descritor, arquivo = tempfile.mkstemp(suffix=".sqlite3", prefix="carga-")
+        os.close(descritor)
+        url = f"sqlite+aiosqlite:///{arquivo}"
+    engine = await preparar_banco(url, dados)
+    try:
+        relatorio = await executar_carga(app, dados, args.concorrencia, args.sessoes, args.duracao, args.sem_auth)
+    finally:
+        await engine.dispose()
+        if arquivo:
+            os.remove(arquivo)
+
+    relatorio["parametros"] = {"banco": engine.url.get_backend_name(), "concorrencia": args.concorrencia,
+                               "sessoes": args.sessoes, "duracao": args.duracao, "sem_auth": args.sem_auth,
+                               "usuarios": args.usuarios, "semente": args.semente}
+    imprimir(relatorio)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as saida:
+            json.dump(relatorio, saida, indent=2, sort_keys=True, ensure_ascii=False)
+            saida.write("\n")
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL async do banco (padrão: SQLite em arquivo temporário)")
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--anos", type=int, default=1)
+    parser.add_argument("--movimentacoes-por-mes", type=int, default=40)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--concorrencia", type=int, default=10, help="sessões simultâneas")
+    parser.add_argument("--sessoes", type=int, default=100, help="total de sessões a executar")
+    parser.add_argument("--duracao", type=float, help="para depois de N segundos, mesmo sem completar as sessões")
+    parser.add_argument("--sem-auth", action="store_true", help="troca get_current_user por um stub sem token")
+    parser.add_argument("--saida", help="arquivo JSON com o relatório")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(argumentos()))
@@ -0,0 +1,272 @@
+"""
+Gerador determinístico de dados financeiros sintéticos.
+
+Para N usuários × M anos (terminando no mês atual) gera contas, categorias,
+parentes, cartões com faturas mensais, receitas, despesas à vista, transferências,
+compras parceladas no crédito e divisões com parentes. A mesma semente gera
+sempre os mesmos dados, então resultados de benchmark são comparáveis entre commits.
+
+As linhas são montadas como dicts com ids explícitos e inseridas em lote
+(executemany), sem passar pela unidade de trabalho do ORM.
+"""
+import random
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.__all_models import (CartaoCreditoModel, CategoriaModel, ContaModel, DivideModel, FaturaModel,
+                                 MovimentacaoModel, ParenteModel, RepeticaoModel, UsuarioModel)
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+
+# ordem de inserção respeitando as chaves estrangeiras
+ORDEM_TABELAS = (UsuarioModel, ContaModel, CategoriaModel, ParenteModel, CartaoCreditoModel, FaturaModel,
+                 RepeticaoModel, MovimentacaoModel, DivideModel)
+
+CATEGORIAS_DESPESA = (
+    ("Mercado", TipoCategoria.VARIAVEL, Decimal("1200")), ("Moradia", TipoCategoria.FIXA, Decimal("2000")),
+    ("Transporte", TipoCategoria.VARIAVEL, Decimal("500")), ("Lazer", TipoCategoria.EXTRA, Decimal("400")),
+    ("Saúde", TipoCategoria.FIXA, Decimal("300")), ("Educação", TipoCategoria.FIXA, Decimal("600")),
+)
+CATEGORIAS_RECEITA = (("Salário", TipoCategoria.FIXA), ("Freelance", TipoCategoria.EXTRA))
+
+DIA_FECHAMENTO = 3
+DIA_VENCIMENTO = 10
+TAMANHO_LOTE = 5000
+
+
+@dataclass
+class DadosGerados:
+    linhas: Dict[type, List[dict]] = field(default_factory=lambda: defaultdict(list))
+    usuarios: List[int] = field(default_factory=list)
+    cartoes_por_usuario: Dict[int, List[int]] = field(default_factory=dict)
+    contas_por_usuario: Dict[int, List[int]] = field(default_factory=dict)
+
+    def total(self) -> Dict[str, int]:
+        return {modelo.__tablename__: len(self.linhas[modelo]) for modelo in ORDEM_TABELAS}
+
+
+class GeradorDados:
+    def __init__(self, usuarios: int = 5, anos: int = 2, movimentacoes_por_mes: int = 40, semente: int = 42,
+                 hoje: Optional[date] = None):
+        self.quantidade_usuarios = usuarios
+        self.anos = anos
+        self.movimentacoes_por_mes = movimentacoes_por_mes
+        self.random = random.Random(semente)
+        self.hoje = hoje or date.today()
+        self._ids: Dict[type, int] = defaultdict(int)
+        self.dados = DadosGerados()
+
+    def _novo_id(self, modelo: type) -> int:
+        self._ids[modelo] += 1
+        return self._ids[modelo]
+
+    def _adicionar(self, modelo: type, **colunas) -> int:
+        chave = modelo.__mapper__.primary_key[0].name
+        if chave not in colunas:
+            colunas[chave] = self._novo_id(modelo)
+        self.dados.linhas[modelo].append(colunas)
+        return colunas[chave]
+
+    def _valor(self, minimo: int, maximo: int) -> Decimal:
+        return Decimal(self.random.randint(minimo * 100, maximo * 100)) / 100
+
+    def gerar(self) -> DadosGerados:
+        inicio = (self.hoje.replace(day=1) - relativedelta(months=self.anos * 12 - 1))
+        meses = [inicio + relativedelta(months=i) for i in range(self.anos * 12)]
+        for indice in range(1, self.quantidade_usuarios + 1):
+            self._gerar_usuario(indice, meses)
+        return self.dados
+
+    def _gerar_usuario(self, indice: int, meses: List[date]):
+        nome = f"Usuário Benchmark {indice}"
+        id_usuario = self._adicionar(UsuarioModel, nome_completo=nome, data_nascimento=date(1990, 1, 1),
+                                     email=f"bench{indice}@exemplo.com", senha="não usada")
+        self.dados.usuarios.append(id_usuario)
+
+        saldos: Dict[int, Decimal] = {}
+        contas = []
+        for nome_conta, tipo in (("Corrente", "Corrente"), ("Poupança", "Poupança"), ("Carteira", "Carteira")):
+            id_conta = self._adicionar(ContaModel, nome=nome_conta, tipo_conta=tipo, id_usuario=id_usuario,
+                                       nome_icone="conta.svg", ativo=True, saldo=Decimal("0"), descricao=None)
+            contas.append(id_conta)
+            saldos[id_conta] = Decimal("0")
+        self.dados.contas_por_usuario[id_usuario] = contas
+
+        despesas = [
+            self._adicionar(CategoriaModel, nome=nome_cat, tipo_categoria=tipo, modelo_categoria=TipoMovimentacao.DESPESA,
+                            id_usuario=id_usuario, valor_categoria=limite, nome_icone="categoria.svg", ativo=True)
+            for nome_cat, tipo, limite in CATEGORIAS_DESPESA
+        ]
+        receitas = [
+            self._adicionar(CategoriaModel, nome=nome_cat, tipo_categoria=tipo, modelo_categoria=TipoMovimentacao.RECEITA,
+                            id_usuario=id_usuario, valor_categoria=None, nome_icone="categoria.svg", ativo=True)
+            for nome_cat, tipo in CATEGORIAS_RECEITA
+        ]
+
+        eu = self._adicionar(ParenteModel, nome=nome, grau_parentesco="Eu", email=None, id_usuario=id_usuario, ativo=True)
+        parentes = [
+            self._adicionar(ParenteModel, nome=f"Parente {i} do usuário {indice}", grau_parentesco="Irmão(ã)",
+                            email=f"parente{i}.{indice}@exemplo.com", id_usuario=id_usuario, ativo=True)
+            for i in (1, 2)
+        ]
+
+        # faturas de todo o período e mais 12 meses à frente, para as parcelas futuras
+        faturas: Dict[int, Dict[date, dict]] = {}
+        cartoes = []
+        for nome_cartao in ("Cartão A", "Cartão B"):
+            id_cartao = self._adicionar(CartaoCreditoModel, nome=nome_cartao, limite=Decimal("8000"),
+                                        id_usuario=id_usuario, nome_icone="cartao.svg", ativo=True,
+                                        limite_disponivel=Decimal("8000"))
+            cartoes.append(id_cartao)
+            faturas[id_cartao] = {}
+            for mes in [meses[0] + relativedelta(months=i) for i in range(len(meses) + 13)]:
+                self._adicionar(FaturaModel, data_vencimento=mes.replace(day=DIA_VENCIMENTO),
+                                data_fechamento=mes.replace(day=DIA_FECHAMENTO), data_pagamento=None,
+                                fatura_gastos=Decimal("0"), id_conta=None, id_cartao_credito=id_cartao)
+                faturas[id_cartao][mes] = self.dados.linhas[FaturaModel][-1]
+        self.dados.cartoes_por_usuario[id_usuario] = cartoes
+
+        movimentacoes_da_fatura: Dict[int, List[dict]] = defaultdict(list)
+
+        def fatura_da_compra(id_cartao: int, dia: date) -> dict:
+            # a compra entra na primeira fatura que fecha depois dela
+            mes = dia.replace(day=1) if dia.day < DIA_FECHAMENTO else dia.replace(day=1) + relativedelta(months=1)
+            return faturas[id_cartao][mes]
+
+        def dividir(id_movimentacao: int, valor: Decimal):
+            if self.random.random() < 0.25:
+                metade = (valor / 2).quantize(Decimal("0.01"))
+                self._adicionar(DivideModel, id_parente=eu, id_movimentacao=id_movimentacao, valor=metade)
+                self._adicionar(DivideModel, id_parente=self.random.choice(parentes), id_movimentacao=id_movimentacao,
+                                valor=valor - metade)
+            else:
+                self._adicionar(DivideModel, id_parente=eu, id_movimentacao=id_movimentacao, valor=valor)
+
+        def movimentacao(dia: date, **colunas) -> int:
+            hora = datetime.combine(dia, time(self.random.randint(7, 22), self.random.randint(0, 59)), timezone.utc)
+            padrao = dict(parcela_atual="1", id_repeticao=None, id_fatura=None, id_conta_destino=None,
+                          participa_limite_fatura_gastos=None)
+            return self._adicionar(MovimentacaoModel, data_pagamento=dia, datatime=hora, id_usuario=id_usuario,
+                                   **{**padrao, **colunas})
+
+        corrente, poupanca, carteira = contas
+        for mes in meses:
+            ultimo_dia = (mes + relativedelta(months=1) - timedelta(days=1)).day
+            dias = [mes.replace(day=d) for d in range(1, ultimo_dia + 1)]
+
+            # receitas: salário no dia 5 e freelas eventuais
+            salario = self._valor(5000, 9000)
+            for dia, valor, categoria in [(mes.replace(day=5), salario, receitas[0])] + [
+                (self.random.choice(dias), self._valor(200, 1500), receitas[1])
+                for _ in range(self.random.randint(0, 2))
+            ]:
+                consolidado = dia <= self.hoje
+                id_mov = movimentacao(dia, valor=valor, descricao="Receita", tipoMovimentacao=TipoMovimentacao.RECEITA,
+                                      forma_pagamento=FormaPagamento.DEBITO, condicao_pagamento=CondicaoPagamento.A_VISTA,
+                                      consolidado=consolidado, id_conta=corrente, id_categoria=categoria)
+                self._adicionar(DivideModel, id_parente=eu, id_movimentacao=id_mov, valor=valor)
+                if consolidado:
+                    saldos[corrente] += valor
+
+            # transferência mensal para a poupança
+            dia_transferencia = mes.replace(day=6)
+            if dia_transferencia <= self.hoje:
+                valor = (salario * Decimal("0.1")).quantize(Decimal("0.01"))
+                movimentacao(dia_transferencia, valor=valor, descricao="Reserva",
+                             tipoMovimentacao=TipoMovimentacao.TRANSFERENCIA, forma_pagamento=FormaPagamento.DEBITO,
+                             condicao_pagamento=CondicaoPagamento.A_VISTA, consolidado=True, id_conta=corrente,
+                             id_conta_destino=poupanca, id_categoria=None)
+                saldos[corrente] -= valor
+                saldos[poupanca] += valor
+
+            for _ in range(self.movimentacoes_por_mes):
+                dia = self.random.choice(dias)
+                categoria = self.random.choice(despesas)
+                sorteio = self.random.random()
+
+                if sorteio < 0.55:
+                    # despesa à vista no débito/dinheiro; algumas recentes ficam em aberto (vencidas)
+                    conta = self.random.choice((corrente, carteira))
+                    valor = self._valor(10, 400)
+                    consolidado = dia <= self.hoje and (dia < self.hoje - timedelta(days=30) or self.random.random() < 0.8)
+                    id_mov = movimentacao(dia, valor=valor, descricao="Despesa", tipoMovimentacao=TipoMovimentacao.DESPESA,
+                                          forma_pagamento=FormaPagamento.DEBITO if conta == corrente else FormaPagamento.DINHEIRO,
+                                          condicao_pagamento=CondicaoPagamento.A_VISTA, consolidado=consolidado,
+                                          id_conta=conta, id_categoria=categoria)
+                    dividir(id_mov, valor)
+                    if consolidado:
+                        saldos[conta] -= valor
+                    continue
+
+                # crédito: à vista ou parcelado em 2 a 6 vezes
+                id_cartao = self.random.choice(cartoes)
+                parcelas = 1 if sorteio < 0.85 else self.random.randint(2, 6)
+                valor_total = self._valor(20, 1500)
+                valor_parcela = (valor_total / parcelas).quantize(Decimal("0.01"))
+                id_repeticao = None
+                if parcelas > 1:
+                    id_repeticao = self._adicionar(RepeticaoModel, quantidade_parcelas=parcelas, tipo_recorrencia="Mensal",
+                                                   valor_total=valor_total, data_inicio=dia, id_usuario=id_usuario)
+                for parcela in range(1, parcelas + 1):
+                    valor = valor_total - valor_parcela * (parcelas - 1) if parcela == 1 else valor_parcela
+                    dia_parcela = dia + relativedelta(months=parcela - 1)
+                    fatura = fatura_da_compra(id_cartao, dia_parcela)
+                    id_mov = movimentacao(
+                        dia_parcela, valor=valor, descricao="Compra no cartão",
+                        tipoMovimentacao=TipoMovimentacao.DESPESA, forma_pagamento=FormaPagamento.CREDITO,
+                        condicao_pagamento=CondicaoPagamento.PARCELADO if parcelas > 1 else CondicaoPagamento.A_VISTA,
+                        consolidado=False, id_conta=None, id_categoria=categoria, parcela_atual=str(parcela),
+                        id_repeticao=id_repeticao, id_fatura=fatura["id_fatura"], participa_limite_fatura_gastos=True,
+                    )
+                    fatura["fatura_gastos"] += valor
+                    movimentacoes_da_fatura[fatura["id_fatura"]].append(self.dados.linhas[MovimentacaoModel][-1])
+                    dividir(id_mov, valor)
+
+        # faturas vencidas há mais de 40 dias são pagas pela conta corrente; as mais recentes ficam em aberto
+        limite_pagamento = self.hoje - timedelta(days=40)
+        for id_cartao in cartoes:
+            cartao = next(c for c in self.dados.linhas[CartaoCreditoModel] if c["id_cartao_credito"] == id_cartao)
+            for fatura in faturas[id_cartao].values():
+                if fatura["data_vencimento"] < limite_pagamento and fatura["fatura_gastos"] > 0:
+                    fatura["data_pagamento"] = fatura["data_vencimento"]
+                    fatura["id_conta"] = corrente
+                    saldos[corrente] -= fatura["fatura_gastos"]
+                    for mov in movimentacoes_da_fatura[fatura["id_fatura"]]:
+                        mov["consolidado"] = True
+                else:
+                    cartao["limite_disponivel"] -= fatura["fatura_gastos"]
+
+        for conta in self.dados.linhas[ContaModel]:
+            if conta["id_conta"] in saldos:
+                conta["saldo"] = saldos[conta["id_conta"]]
+
+
+async def inserir(session: AsyncSession, dados: DadosGerados):
+    for modelo in ORDEM_TABELAS:
+        linhas = dados.linhas[modelo]
+        for inicio in range(0, len(linhas), TAMANHO_LOTE):
+            await session.execute(insert(modelo), linhas[inicio:inicio + TAMANHO_LOTE])
+
+    if session.bind.dialect.name == "postgresql":
+        # ids explícitos não avançam as sequences; sem isso o próximo INSERT da API colide
+        for modelo in ORDEM_TABELAS:
+            if modelo is DivideModel:
+                continue
+            tabela, chave = modelo.__tablename__, modelo.__mapper__.primary_key[0].name
+            await session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{tabela}\"', '{chave}'), "
+                f"COALESCE((SELECT MAX({chave}) FROM \"{tabela}\"), 1))"
+            ))
+    await session.commit()
+
+
+async def popular(session: AsyncSession, **parametros) -> DadosGerados:
+    dados = GeradorDados(**parametros).gerar()
+    await inserir(session, dados)
+    return dados
@@ -0,0 +1 @@
+pytest_plugins = ["tests.plugin_orcamento_consultas"]
@@ -1,9 +1,6 @@
-import email
+import logging
 import secrets
 import string
-from email.utils import formatdate
-from fastapi import Request
-import smtplib
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from models.usuario_model import UsuarioModel
@@ -14,9 +11,9 @@ from core.security  import check_password
 from pytz import timezone
 from datetime import datetime, timedelta
 from core.configs import settings
+from core.templates import renderizar
 from jose import jwt, JWTError
 from decouple import config
-import asyncio
 
 
 
@@ -26,13 +23,15 @@ oauth2_schema = OAuth2PasswordBearer(
 
 RECOVER_PASSWORD_SECRET = config('JWT_SECRET')
 
+logger = logging.getLogger(__name__)
+
 async def auth(email: EmailStr, senha: str, db: AsyncSession) -> Optional[UsuarioModel]:
     async with db as session:
         query = select(UsuarioModel).filter(UsuarioModel.email == email)
         result = await session.execute(query)
         usuario: UsuarioModel = result.scalars().unique().one_or_none()
         if not usuario:
-            print("check=>>> user")
+            logger.debug("Login com e-mail não cadastrado")
 
             return None
         if not check_password(senha, usuario.senha):
@@ -67,35 +66,10 @@ def generate_password(length: int = 8) -> str:
     password = "".join(secrets.choice(characters) for _ in range(length))
     return password
 
-def send_email(email_data: dict, user_email: str) -> None:
-    try:
-        # Verifique se os dados de e-mail foram lidos corretamente
-        sender_email = config("EMAIL_ADDRESS")
-        sender_password = config("EMAIL_PASSWORD")
-
-        print("Endereço de e-mail do remetente:", sender_email)
-        print("Senha de aplicativo lida:", sender_password)
-
-        # Configura a mensagem
-        msg = email.message.EmailMessage()
-        msg["Subject"] = email_data["email_subject"]
-        msg["From"] = sender_email
-        msg["To"] = user_email
-        msg["Date"] = formatdate(localtime=True)
-        msg.set_content(email_data["email_body"], subtype="html", charset="utf-8")
-
-        # Conectar ao servidor SMTP do Gmail
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)  # Usa as credenciais
-            server.send_message(msg)
-    
-    except Exception as e:
-        raise Exception(f"Error occurred while sending email: {e}")
-
+async def send_email_to_reset_password(session: AsyncSession, user_data, token: str, from_scfp_web: bool=True) -> None:
+    """Enfileira o e-mail de redefinição na transação da requisição; quem envia é o core.email_saida."""
+    from core.email_saida import enfileirar_email
 
-async def send_email_to_reset_password(request: Request, user_data, token: str, from_scfp_web: bool=True) -> None:
-    
     if from_scfp_web:
         base_url = config('URL_WEB')
     else:
@@ -104,18 +78,9 @@ async def send_email_to_reset_password(request: Request, user_data, token: str,
     url = base_url + f'/login/redefinir-senha/{token}'
     email_data = {
         "email_subject": "Redefinição de senha - Finanças Pessoais",
-        "email_body": f"""
-                        <p style="font-size: medium;">Redefinição de senha - Finanças Pessoais</p>
-                        <p style="font-size: medium;">Olá, <b>{user_data.nome_completo}</b>!</p>
-                        <p style="font-size: medium;">Clique <a href="{url}">aqui</a> para redefinir sua senha. Lembre-se de que este link é válido por apenas 5 minutos. Se você não solicitou a redefinição de senha, ignore este e-mail.</p>
-                        <p style="font-size: medium;">Atenciosamente,<br>Equipe Finanças Pessoais</p>
-                    """,
+        "email_body": renderizar("redefinir_senha.mako", nome=user_data.nome_completo, url=url),
     }
-    try:
-        await asyncio.to_thread(send_email, email_data, user_data.email)
-
-    except Exception as e:
-        raise Exception(f"Error occurred while sending email: {e}")
+    enfileirar_email(session, user_data.email, email_data["email_subject"], email_data["email_body"], origem="auth")
 
 def decoded_token(token: str) -> dict:
     sp = timezone('America/Sao_Paulo')  # Define o fuso horário de São Paulo
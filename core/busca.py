@@ -0,0 +1,173 @@
+"""
+Busca de movimentações pela descrição.
+
+A descrição é comparada sem acento e sem caixa: f_unaccent(lower(descricao)), a mesma
+expressão do índice GIN com gin_trgm_ops criado pela migração
+3f9c1a7d2b10_busca_trigram_descricao (f_unaccent é um wrapper IMMUTABLE do unaccent, que o
+PostgreSQL não aceita direto em índice). O termo é normalizado do mesmo jeito em Python.
+Casa quem contém o termo (LIKE '%termo%') ou, no PostgreSQL, quem tem uma palavra
+parecida com ele (termo <% descricao, word_similarity do pg_trgm); os dois usam o índice.
+No SQLite (testes e benchmarks) f_unaccent é registrada na conexão e não há busca
+aproximada.
+
+Os resultados vêm do mais recente para o mais antigo, paginados por chave
+(data_pagamento, id_movimentacao): o cursor é a última linha da página, então
+páginas adiante custam o mesmo que a primeira. As contagens por categoria e por mês
+saem de uma consulta agrupada por (categoria, mês) sobre tudo o que casa com o termo;
+cada faceta ignora o próprio filtro e respeita o da outra.
+"""
+import base64
+import unicodedata
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, event, extract, func, literal, or_, select, true, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.categoria_model import CategoriaModel
+from models.movimentacao_model import MovimentacaoModel
+
+DESCRICAO_NORMALIZADA = func.f_unaccent(func.lower(MovimentacaoModel.descricao))
+
+COLUNAS_RESULTADO = (
+    MovimentacaoModel.id_movimentacao, MovimentacaoModel.descricao, MovimentacaoModel.valor,
+    MovimentacaoModel.data_pagamento, MovimentacaoModel.tipoMovimentacao, MovimentacaoModel.forma_pagamento,
+    MovimentacaoModel.condicao_pagamento, MovimentacaoModel.consolidado, MovimentacaoModel.parcela_atual,
+    MovimentacaoModel.id_categoria, CategoriaModel.nome.label("nome_categoria"),
+)
+
+
+def normalizar(texto: Optional[str]) -> Optional[str]:
+    """Minúsculas e sem acento, como f_unaccent(lower(...))."""
+    if texto is None:
+        return None
+    decomposto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+
+
+@event.listens_for(Engine, "connect")
+def _registrar_f_unaccent(dbapi_connection, connection_record):
+    # só o sqlite3/aiosqlite têm create_function; no PostgreSQL a função vem da migração
+    if hasattr(dbapi_connection, "create_function"):
+        dbapi_connection.create_function("f_unaccent", 1, normalizar)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(data_pagamento: date, id_movimentacao: int) -> str:
+    return base64.urlsafe_b64encode(f"{data_pagamento.isoformat()}|{id_movimentacao}".encode()).decode()
+
+
+def decodificar_cursor(cursor: str) -> Tuple[date, int]:
+    try:
+        data, id_movimentacao = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(data), int(id_movimentacao)
+    except (ValueError, UnicodeDecodeError) as erro:
+        raise CursorInvalido(cursor) from erro
+
+
+@dataclass
+class ResultadoBusca:
+    itens: List[dict]
+    proximo: Optional[str]
+    facetas: Optional[dict]
+
+
+def _escapar_like(termo: str) -> str:
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def condicao_termo(termo: str, aproximada: bool):
+    termo = normalizar(termo.strip())
+    contem = DESCRICAO_NORMALIZADA.like(f"%{_escapar_like(termo)}%", escape="\\")
+    if not aproximada:
+        return contem
+    return or_(contem, literal(termo).op("<%", is_comparison=True)(DESCRICAO_NORMALIZADA))
+
+
+def _periodo(data_inicio: Optional[date], data_fim: Optional[date]) -> list:
+    condicoes = []
+    if data_inicio is not None:
+        condicoes.append(MovimentacaoModel.data_pagamento >= data_inicio)
+    if data_fim is not None:
+        condicoes.append(MovimentacaoModel.data_pagamento <= data_fim)
+    return condicoes
+
+
+async def _facetas(session: AsyncSession, base: list, periodo: list, categorias: Sequence[int]) -> dict:
+    ano = extract('year', MovimentacaoModel.data_pagamento).label("ano")
+    mes = extract('month', MovimentacaoModel.data_pagamento).label("mes")
+    no_periodo = func.sum(case((and_(*periodo) if periodo else true(), 1), else_=0)).label("no_periodo")
+    linhas = (await session.execute(
+        select(MovimentacaoModel.id_categoria, CategoriaModel.nome, ano, mes, func.count().label("total"), no_periodo)
+        .outerjoin(CategoriaModel, CategoriaModel.id_categoria == MovimentacaoModel.id_categoria)
+        .where(*base)
+        .group_by(MovimentacaoModel.id_categoria, CategoriaModel.nome, ano, mes)
+    )).all()
+
+    por_categoria: Dict[Optional[int], dict] = {}
+    por_mes: Dict[Tuple[int, int], int] = {}
+    total = 0
+    for id_categoria, nome, ano_linha, mes_linha, quantidade, quantidade_no_periodo in linhas:
+        selecionada = not categorias or id_categoria in categorias
+        if quantidade_no_periodo:
+            faceta = por_categoria.setdefault(id_categoria, {"id_categoria": id_categoria, "nome": nome,
+                                                             "quantidade": 0})
+            faceta["quantidade"] += quantidade_no_periodo
+            if selecionada:
+                total += quantidade_no_periodo
+        if selecionada:
+            chave = (int(ano_linha), int(mes_linha))
+            por_mes[chave] = por_mes.get(chave, 0) + quantidade
+    return {
+        "total": total,
+        "categorias": sorted(por_categoria.values(), key=lambda faceta: (-faceta["quantidade"], faceta["nome"] or "")),
+        "meses": [{"ano": ano_faceta, "mes": mes_faceta, "quantidade": quantidade}
+                  for (ano_faceta, mes_faceta), quantidade in sorted(por_mes.items(), reverse=True)],
+    }
+
+
+async def buscar_movimentacoes(
+    session: AsyncSession,
+    id_usuario: int,
+    termo: str,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    categorias: Sequence[int] = (),
+    limite: int = 50,
+    cursor: Optional[str] = None,
+) -> ResultadoBusca:
+    """
+    Uma página da busca e, só na primeira página (sem ``cursor``), as facetas.
+    Levanta CursorInvalido se o cursor não for um devolvido por esta função.
+    """
+    conexao = await session.connection()
+    base = [MovimentacaoModel.id_usuario == id_usuario,
+            condicao_termo(termo, aproximada=conexao.dialect.name == "postgresql")]
+    periodo = _periodo(data_inicio, data_fim)
+
+    query = (
+        select(*COLUNAS_RESULTADO)
+        .outerjoin(CategoriaModel, CategoriaModel.id_categoria == MovimentacaoModel.id_categoria)
+        .where(*base, *periodo)
+        .order_by(MovimentacaoModel.data_pagamento.desc(), MovimentacaoModel.id_movimentacao.desc())
+        .limit(limite + 1)
+    )
+    if categorias:
+        query = query.where(MovimentacaoModel.id_categoria.in_(categorias))
+    if cursor is not None:
+        query = query.where(tuple_(MovimentacaoModel.data_pagamento, MovimentacaoModel.id_movimentacao)
+                            < tuple_(*decodificar_cursor(cursor)))
+
+    itens = [dict(linha) for linha in (await session.execute(query)).mappings().all()]
+    proximo = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        proximo = codificar_cursor(itens[-1]["data_pagamento"], itens[-1]["id_movimentacao"])
+
+    facetas = await _facetas(session, base, periodo, categorias) if cursor is None else None
+    return ResultadoBusca(itens, proximo, facetas)
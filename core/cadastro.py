@@ -0,0 +1,117 @@
+"""
+Provisionamento de usuários com os dados padrão (categorias, conta Carteira e o parente "Eu").
+
+Os padrões são dados (CATEGORIAS_PADRAO, CONTAS_PADRAO), não código: viram uma tabela
+derivada de literais e cada tabela é semeada com um único INSERT ... SELECT cruzando essa
+tabela com os usuários recém-criados. O custo em statements não depende de quantos
+usuários entram nem de quantos padrões existem.
+
+No PostgreSQL tudo vai em um statement (CTEs com INSERT ... RETURNING); nos outros
+bancos são quatro statements na mesma transação: o INSERT dos usuários com RETURNING e
+um INSERT ... SELECT por tabela semeada.
+"""
+import asyncio
+from typing import List, Sequence
+
+from sqlalchemy import BigInteger, Boolean, Numeric, String, insert, literal, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.security import generate_hash
+from models.categoria_model import CategoriaModel
+from models.conta_model import ContaModel
+from models.enums import TipoCategoria, TipoConta, TipoMovimentacao
+from models.parente_model import ParenteModel
+from models.usuario_model import UsuarioModel
+
+# nome, tipo_categoria, modelo_categoria, nome_icone
+CATEGORIAS_PADRAO = (
+    ("Saúde", TipoCategoria.FIXA, TipoMovimentacao.DESPESA, "health2.svg"),
+    ("Alimentação", TipoCategoria.FIXA, TipoMovimentacao.DESPESA, "food.svg"),
+    ("Transporte", TipoCategoria.FIXA, TipoMovimentacao.DESPESA, "transport.svg"),
+    ("Educação", TipoCategoria.FIXA, TipoMovimentacao.DESPESA, "schooll.svg"),
+    ("Lazer", TipoCategoria.VARIAVEL, TipoMovimentacao.DESPESA, "happy.svg"),
+    ("Salário", TipoCategoria.FIXA, TipoMovimentacao.RECEITA, "salary.svg"),
+    ("Extra", TipoCategoria.EXTRA, TipoMovimentacao.RECEITA, "extra.svg"),
+)
+
+# nome, descricao, tipo_conta, nome_icone
+CONTAS_PADRAO = (
+    ("Carteira", "Conta padrão para despesas em dinheiro físico", TipoConta.CARTEIRA.value, "6_carteira.svg"),
+)
+
+GRAU_PARENTESCO_PROPRIO = "Eu"
+
+_COLUNAS_USUARIO = (UsuarioModel.id_usuario, UsuarioModel.nome_completo, UsuarioModel.data_nascimento,
+                    UsuarioModel.email)
+
+
+def _tabela_de_padroes(nome: str, modelo, colunas: Sequence[str], linhas: Sequence[tuple]):
+    """SELECT 'a' AS x, ... UNION ALL SELECT ...: os padrões como tabela, com os tipos das colunas do modelo."""
+    tipos = [modelo.__table__.c[coluna].type for coluna in colunas]
+    return union_all(*(
+        select(*(literal(valor, tipo).label(coluna) for valor, tipo, coluna in zip(linha, tipos, colunas)))
+        for linha in linhas
+    )).subquery(nome)
+
+
+def _semeaduras(usuarios) -> list:
+    """Um INSERT ... SELECT por tabela, a partir de ``usuarios`` (id_usuario, nome_completo, email)."""
+    categorias = _tabela_de_padroes("categoria_padrao", CategoriaModel,
+                                    ("nome", "tipo_categoria", "modelo_categoria", "nome_icone"), CATEGORIAS_PADRAO)
+    contas = _tabela_de_padroes("conta_padrao", ContaModel,
+                                ("nome", "descricao", "tipo_conta", "nome_icone"), CONTAS_PADRAO)
+    return [
+        insert(CategoriaModel).from_select(
+            ["nome", "tipo_categoria", "modelo_categoria", "nome_icone", "valor_categoria", "ativo", "id_usuario",
+             "versao"],
+            select(categorias, literal(None, Numeric(10, 2)), literal(True, Boolean()), usuarios.c.id_usuario,
+                   literal(0, BigInteger()))
+            .select_from(usuarios).join(categorias, true()),
+        ),
+        insert(ContaModel).from_select(
+            ["nome", "descricao", "tipo_conta", "nome_icone", "saldo", "ativo", "id_usuario", "versao"],
+            select(contas, literal(0, Numeric(10, 2)), literal(True, Boolean()), usuarios.c.id_usuario,
+                   literal(0, BigInteger()))
+            .select_from(usuarios).join(contas, true()),
+        ),
+        insert(ParenteModel).from_select(
+            ["nome", "email", "grau_parentesco", "ativo", "id_usuario", "versao"],
+            select(usuarios.c.nome_completo, usuarios.c.email, literal(GRAU_PARENTESCO_PROPRIO, String()),
+                   literal(True, Boolean()), usuarios.c.id_usuario, literal(0, BigInteger())),
+        ),
+    ]
+
+
+async def _hashes(senhas: Sequence[str]) -> List[str]:
+    # bcrypt solta o GIL: em threads os hashes de um lote saem em paralelo e o event loop fica livre
+    return list(await asyncio.gather(*(asyncio.to_thread(generate_hash, senha) for senha in senhas)))
+
+
+async def provisionar_usuarios(session: AsyncSession, usuarios: Sequence[dict]) -> list:
+    """
+    Cria os usuários (dicts com nome_completo, data_nascimento, email e senha em texto) e os
+    padrões de cada um, sem commit. Devolve as linhas (id_usuario, nome_completo,
+    data_nascimento, email) na ordem de ``usuarios``.
+    """
+    senhas = await _hashes([usuario["senha"] for usuario in usuarios])
+    linhas = [{**usuario, "senha": senha} for usuario, senha in zip(usuarios, senhas)]
+    conexao = await session.connection()
+
+    if conexao.dialect.name == "postgresql":
+        novos = insert(UsuarioModel).values(linhas).returning(*_COLUNAS_USUARIO).cte("novos_usuarios")
+        statement = select(novos).add_cte(*(
+            semeadura.cte(f"semeadura_{posicao}") for posicao, semeadura in enumerate(_semeaduras(novos))
+        ))
+        criados = (await session.execute(statement)).all()
+    else:
+        # sem sort_by_parameter_order: com ele o SQLite volta a um INSERT por linha
+        criados = (await session.execute(insert(UsuarioModel).returning(*_COLUNAS_USUARIO), linhas)).all()
+        novos = (select(UsuarioModel.id_usuario, UsuarioModel.nome_completo, UsuarioModel.email)
+                 .where(UsuarioModel.id_usuario.in_([linha.id_usuario for linha in criados]))
+                 .subquery("novos_usuarios"))
+        for semeadura in _semeaduras(novos):
+            await session.execute(semeadura)
+
+    # RETURNING não garante a ordem dos VALUES; o email é único
+    por_email = {linha.email: linha for linha in criados}
+    return [por_email[usuario["email"]] for usuario in usuarios]
@@ -0,0 +1,200 @@
+"""
+Extratos de cobrança dos parentes e a cobrança do mês em lote.
+
+Um extrato é o que um parente deve ao usuário num mês: as divisões (``divide``) das
+despesas não consolidadas com data de pagamento no mês. extratos_do_mes busca os
+extratos de todos os parentes pedidos com uma consulta só, ordenada por parente, e
+o total de cada um sai das próprias linhas (não há um SUM à parte).
+
+cobrar_mes monta o HTML dos extratos em um pool de threads, em pedaços, para não
+segurar o event loop, e grava os e-mails na caixa de saída (EMAIL_SAIDA) em lotes, com
+a chave (parente, ano, mês) que impede a mesma cobrança de ser enfileirada de novo. O
+PDF anexo é gerado na entrega, pelo drenar_emails.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence
+
+from decouple import config
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import Session
+from core.email_saida import enfileirar_emails_unicos
+from core.metrics import medir_job
+from core.templates import renderizar
+from core.trava import exclusivo
+from models.email_saida_model import EmailSaidaModel
+from models.divide_model import DivideModel
+from models.enums import TipoMovimentacao
+from models.movimentacao_model import MovimentacaoModel
+from models.parente_model import ParenteModel
+from models.usuario_model import UsuarioModel
+
+logger = logging.getLogger(__name__)
+
+LOTE = config("COBRANCA_LOTE", default=200, cast=int)
+PEDACO_RENDERIZACAO = config("COBRANCA_PEDACO_RENDERIZACAO", default=50, cast=int)
+_renderizadores = ThreadPoolExecutor(max_workers=config("COBRANCA_WORKERS", default=4, cast=int),
+                                     thread_name_prefix="cobranca")
+
+
+@dataclass
+class Extrato:
+    id_parente: int
+    nome: str
+    email: Optional[str]
+    id_usuario: int
+    nome_usuario: str
+    movimentacoes: List[dict] = field(default_factory=list)
+    total: Decimal = Decimal(0)
+
+    def dados(self) -> dict:
+        """No formato de send_invoice_pdf, que é o que criar_email_data recebe."""
+        return {
+            "movimentacoes_nao_consolidadas": self.movimentacoes,
+            "fatura_geral": {
+                "total_movimentacoes": float(self.total),
+                "total_geral_movimentacoes": float(self.total),
+            },
+        }
+
+
+def _periodo(ano: int, mes: int):
+    # intervalo em vez de extract() para o filtro usar o índice de data_pagamento
+    return date(ano, mes, 1), date(ano + mes // 12, mes % 12 + 1, 1)
+
+
+async def extratos_do_mes(session: AsyncSession, ano: int, mes: int, id_usuario: Optional[int] = None,
+                          id_parente: Optional[int] = None, para_envio: bool = False) -> List[Extrato]:
+    """
+    Extratos do mês dos parentes com alguma divisão em aberto, em uma consulta.
+    Com ``para_envio`` ficam só os parentes ativos e com e-mail.
+    """
+    inicio, fim = _periodo(ano, mes)
+    query = (
+        select(ParenteModel.id_parente, ParenteModel.nome, ParenteModel.email, ParenteModel.id_usuario,
+               UsuarioModel.nome_completo, DivideModel.valor, MovimentacaoModel.descricao,
+               MovimentacaoModel.data_pagamento)
+        .select_from(DivideModel)
+        .join(MovimentacaoModel, MovimentacaoModel.id_movimentacao == DivideModel.id_movimentacao)
+        .join(ParenteModel, ParenteModel.id_parente == DivideModel.id_parente)
+        .join(UsuarioModel, UsuarioModel.id_usuario == ParenteModel.id_usuario)
+        .where(
+            MovimentacaoModel.consolidado == False,  # noqa: E712
+            MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.DESPESA,
+            MovimentacaoModel.data_pagamento >= inicio,
+            MovimentacaoModel.data_pagamento < fim,
+        )
+        .order_by(ParenteModel.id_parente, MovimentacaoModel.data_pagamento, MovimentacaoModel.id_movimentacao)
+    )
+    if id_usuario is not None:
+        query = query.where(ParenteModel.id_usuario == id_usuario)
+    if id_parente is not None:
+        query = query.where(ParenteModel.id_parente == id_parente)
+    if para_envio:
+        query = query.where(ParenteModel.ativo == True, ParenteModel.email.isnot(None))  # noqa: E712
+
+    extratos: Dict[int, Extrato] = {}
+    for id_parente_linha, nome, email, id_usuario_linha, nome_usuario, valor, descricao, data_pagamento in (
+            await session.execute(query)).all():
+        extrato = extratos.get(id_parente_linha)
+        if extrato is None:
+            extrato = extratos[id_parente_linha] = Extrato(id_parente_linha, nome, email, id_usuario_linha,
+                                                           nome_usuario)
+        extrato.movimentacoes.append({
+            "id_parente": id_parente_linha,
+            "descricao": descricao or "Outros",
+            "data_pagamento": str(data_pagamento),
+            "valor": float(valor),
+        })
+        extrato.total += valor
+    return list(extratos.values())
+
+
+def criar_email_data(parente, usuario_logado, cobranca, movimentacoes_data):
+    """Cria os dados do email com base nas condições de parente e usuário logado."""
+    lembrete = parente.nome == usuario_logado.nome_completo
+    return {
+        "email_subject": ("Lembrete de Movimentações não Consolidadas" if lembrete
+                          else "Cobrança de Movimentações não Consolidadas"),
+        "email_body": renderizar(
+            "extrato_parente.mako", lembrete=lembrete, parente=parente.nome, usuario=usuario_logado.nome_completo,
+            mes=cobranca.mes, ano=cobranca.ano, movimentacoes=movimentacoes_data["movimentacoes_nao_consolidadas"],
+            total_geral=movimentacoes_data["fatura_geral"]["total_geral_movimentacoes"],
+            total=movimentacoes_data["fatura_geral"]["total_movimentacoes"],
+        ),
+    }
+
+
+def _renderizar_pedaco(extratos: Sequence[Extrato], ano: int, mes: int) -> List[dict]:
+    periodo = SimpleNamespace(ano=ano, mes=mes)
+    return [
+        criar_email_data(extrato, SimpleNamespace(nome_completo=extrato.nome_usuario), periodo, extrato.dados())
+        for extrato in extratos
+    ]
+
+
+async def renderizar_extratos(extratos: Sequence[Extrato], ano: int, mes: int) -> List[dict]:
+    """email_data de cada extrato, na mesma ordem, montados em paralelo fora do event loop."""
+    loop = asyncio.get_running_loop()
+    pedacos = await asyncio.gather(*(
+        loop.run_in_executor(_renderizadores, _renderizar_pedaco, extratos[inicio:inicio + PEDACO_RENDERIZACAO],
+                             ano, mes)
+        for inicio in range(0, len(extratos), PEDACO_RENDERIZACAO)
+    ))
+    return [email_data for pedaco in pedacos for email_data in pedaco]
+
+
+def chave_cobranca(id_parente: int, ano: int, mes: int) -> str:
+    return f"cobranca:{id_parente}:{ano}-{mes:02d}"
+
+
+async def cobrar_mes(session: AsyncSession, ano: int, mes: int, id_usuario: Optional[int] = None,
+                     lote: int = LOTE) -> Dict[str, int]:
+    """
+    Enfileira a cobrança do mês de cada parente (de um usuário, ou de todos) que tem
+    divisões em aberto, fazendo commit a cada ``lote`` e-mails. Cada parente é cobrado
+    uma vez por mês: os já enfileirados (por outra rodada, outro worker ou o lote do
+    usuário) ficam de fora pela chave do EMAIL_SAIDA.
+    """
+    extratos = await extratos_do_mes(session, ano, mes, id_usuario=id_usuario, para_envio=True)
+    chaves = {extrato.id_parente: chave_cobranca(extrato.id_parente, ano, mes) for extrato in extratos}
+    cobrados = set((await session.scalars(
+        select(EmailSaidaModel.chave).where(EmailSaidaModel.chave.in_(list(chaves.values())))
+    )).all()) if chaves else set()
+    extratos = [extrato for extrato in extratos if chaves[extrato.id_parente] not in cobrados]
+
+    emails = await renderizar_extratos(extratos, ano, mes)
+    enfileirados = 0
+    for inicio in range(0, len(extratos), lote):
+        enfileirados += await enfileirar_emails_unicos(session, [
+            {"destinatario": extrato.email, "assunto": email_data["email_subject"],
+             "corpo_html": email_data["email_body"], "origem": "parente", "anexar_pdf": True,
+             "chave": chaves[extrato.id_parente]}
+            for extrato, email_data in zip(extratos[inicio:inicio + lote], emails[inicio:inicio + lote])
+        ])
+        await session.commit()
+    return {"parentes": enfileirados, "usuarios": len({extrato.id_usuario for extrato in extratos}),
+            "ja_cobrados": len(chaves) - enfileirados}
+
+
+def mes_anterior(hoje: Optional[date] = None):
+    hoje = hoje or date.today()
+    return (hoje.year, hoje.month - 1) if hoje.month > 1 else (hoje.year - 1, 12)
+
+
+@exclusivo("cobranca_mensal")
+@medir_job("cobranca_mensal")
+async def cobranca_mensal_job():
+    ano, mes = mes_anterior()
+    async with Session() as session:
+        resumo = await cobrar_mes(session, ano, mes)
+    logger.info("Cobrança de %02d/%s: %s e-mail(s) enfileirados para %s usuário(s)",
+                mes, ano, resumo["parentes"], resumo["usuarios"], extra={"cobranca": resumo})
+    return resumo
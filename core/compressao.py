@@ -0,0 +1,168 @@
+"""
+Compressão de respostas negociada pelo Accept-Encoding: br se o cliente aceita, senão gzip.
+
+Corpos pequenos saem como estão: abaixo de COMPRESSAO_TAMANHO_MINIMO bytes o cabeçalho e
+a CPU custam mais do que se economiza. Respostas em streaming são comprimidas pedaço a
+pedaço (com flush a cada pedaço), sem juntar o corpo inteiro em memória.
+"""
+import gzip
+import zlib
+from typing import Dict, Optional
+
+import brotli
+from decouple import config
+from starlette.datastructures import Headers, MutableHeaders
+
+# em ordem de preferência quando o cliente dá o mesmo peso às duas
+CODIFICACOES = ("br", "gzip")
+NIVEIS_PADRAO = {
+    "br": config("COMPRESSAO_NIVEL_BR", default=4, cast=int),
+    "gzip": config("COMPRESSAO_NIVEL_GZIP", default=6, cast=int),
+}
+TAMANHO_MINIMO = config("COMPRESSAO_TAMANHO_MINIMO", default=1024, cast=int)
+
+# eventos SSE precisam chegar na hora; imagens/pdf já vêm comprimidos
+TIPOS_COMPRESSIVEIS = ("application/json", "text/html", "text/plain", "text/csv", "application/xml")
+
+
+def _pesos(accept_encoding: str) -> Dict[str, float]:
+    pesos = {}
+    for item in accept_encoding.split(","):
+        nome, _, parametros = item.strip().partition(";")
+        if not nome:
+            continue
+        peso = 1.0
+        parametro = parametros.strip()
+        if parametro.startswith("q="):
+            try:
+                peso = float(parametro[2:])
+            except ValueError:
+                peso = 0.0
+        pesos[nome.strip().lower()] = peso
+    return pesos
+
+
+def escolher_codificacao(accept_encoding: Optional[str]) -> Optional[str]:
+    """Codificação suportada com maior q no Accept-Encoding (``*`` vale para as não citadas)."""
+    if not accept_encoding:
+        return None
+    pesos = _pesos(accept_encoding)
+    curinga = pesos.get("*", 0.0)
+    candidatas = [(pesos.get(codificacao, curinga), -ordem, codificacao) for ordem, codificacao in enumerate(CODIFICACOES)]
+    peso, _, codificacao = max(candidatas)
+    return codificacao if peso > 0 else None
+
+
+def comprimir(corpo: bytes, codificacao: str, nivel: Optional[int] = None) -> bytes:
+    nivel = NIVEIS_PADRAO[codificacao] if nivel is None else nivel
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=nivel)
+    return gzip.compress(corpo, compresslevel=nivel, mtime=0)
+
+
+class CompressorIncremental:
+    """Compressor de fluxo: ``pedaco`` devolve o que já dá para enviar, ``finalizar`` fecha o fluxo."""
+
+    def __init__(self, codificacao: str, nivel: Optional[int] = None):
+        nivel = NIVEIS_PADRAO[codificacao] if nivel is None else nivel
+        self.codificacao = codificacao
+        if codificacao == "br":
+            self._compressor = brotli.Compressor(quality=nivel)
+        else:
+            # wbits=31: cabeçalho e rodapé gzip em vez de zlib cru
+            self._compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def pedaco(self, dados: bytes) -> bytes:
+        if self.codificacao == "br":
+            return self._compressor.process(dados) + self._compressor.flush()
+        return self._compressor.compress(dados) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self) -> bytes:
+        if self.codificacao == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _compressivel(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    tipo = headers.get("content-type", "").split(";")[0].strip().lower()
+    return tipo in TIPOS_COMPRESSIVEIS or tipo.endswith("+json")
+
+
+class CompressaoMiddleware:
+    """
+    Middleware ASGI que comprime as respostas conforme o Accept-Encoding.
+
+    O nível sai de ``niveis_por_rota`` (template da rota -> {codificação: nível}) ou de
+    NIVEIS_PADRAO. A decisão fica para o primeiro pedaço do corpo: se a resposta terminou
+    abaixo de ``minimo`` ela sai intacta; senão o Content-Length é trocado (corpo único) ou
+    removido (streaming).
+    """
+
+    def __init__(self, app, minimo: int = TAMANHO_MINIMO, niveis_por_rota: Optional[Dict[str, Dict[str, int]]] = None):
+        self.app = app
+        self.minimo = minimo
+        self.niveis_por_rota = niveis_por_rota or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding"))
+        inicio = None
+        pendente = b""
+        compressor: Optional[CompressorIncremental] = None
+
+        async def send_comprimido(message):
+            nonlocal inicio, pendente, compressor
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if not _compressivel(headers) or message["status"] in (204, 304):
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if codificacao is None:
+                    await send(message)
+                    return
+                inicio = message  # segura até saber o tamanho do corpo
+                return
+
+            if message["type"] != "http.response.body" or (inicio is None and compressor is None):
+                await send(message)
+                return
+
+            corpo = message.get("body", b"")
+            mais = message.get("more_body", False)
+
+            if compressor is None:
+                pendente += corpo
+                if len(pendente) < self.minimo:
+                    if mais:
+                        return
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": pendente})
+                    return
+                # template da rota (/movimentacao/{id}): o roteamento já rodou quando a resposta começa
+                rota = getattr(scope.get("route"), "path", None)
+                nivel = self.niveis_por_rota.get(rota, {}).get(codificacao)
+                headers = MutableHeaders(raw=inicio["headers"])
+                headers["Content-Encoding"] = codificacao
+                if not mais:
+                    comprimido = comprimir(pendente, codificacao, nivel)
+                    headers["Content-Length"] = str(len(comprimido))
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": comprimido})
+                    return
+                del headers["Content-Length"]
+                await send(inicio)
+                compressor = CompressorIncremental(codificacao, nivel)
+                corpo, pendente = pendente, b""
+
+            saida = compressor.pedaco(corpo) if corpo else b""
+            if not mais:
+                saida += compressor.finalizar()
+            await send({"type": "http.response.body", "body": saida, "more_body": mais})
+
+        await self.app(scope, receive, send_comprimido)
@@ -0,0 +1,289 @@
+"""
+Razão de fatura_gastos / limite_disponivel e a conciliação incremental desses totais.
+
+Os dois campos são totais corridos, alterados em vários endpoints. Em vez de mexer em
+cada um, um hook after_flush da Session anota no LANCAMENTO_FATURA a variação de cada
+fatura e cartão gravados no flush (e marca, com variação zero, as faturas cujas
+movimentações mudaram de valor, de fatura ou de participação no limite).
+
+A conciliação lê os lançamentos posteriores ao último checkpoint (que fica um pouco
+atrás do último lançamento, por causa das transações ainda abertas), descobre quais
+cartões foram tocados e, para cada lote de cartões, recalcula com um GROUP BY o que
+fatura_gastos deveria valer nas faturas em aberto (soma das movimentações que
+participam do limite) e, a partir disso, o limite_disponivel de cada cartão. Faturas
+já pagas ficam fora: o fechamento zera o total e elas não mudam mais.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import chain
+from typing import Dict, List, Optional, Sequence
+
+from decouple import config
+from sqlalchemy import case, event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session as SessionSync, attributes
+
+from core.database import Session
+from core.logger import request_id
+from core.metrics import CONCILIACAO_DIVERGENCIAS, medir_job
+from core.sincronizacao import reservar_versoes
+from core.trava import exclusivo
+from models.cartao_credito_model import CartaoCreditoModel
+from models.checkpoint_conciliacao_model import CheckpointConciliacaoModel
+from models.fatura_model import FaturaModel
+from models.lancamento_fatura_model import LancamentoFaturaModel
+from models.movimentacao_model import MovimentacaoModel
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = "faturas"
+LOTE_CARTOES = config("CONCILIACAO_LOTE_CARTOES", default=200, cast=int)
+REPARAR = config("CONCILIACAO_REPARAR", default=False, cast=bool)
+# maior duração esperada de uma transação que grava no razão
+ATRASO = timedelta(seconds=config("CONCILIACAO_ATRASO_SEGUNDOS", default=300, cast=int))
+CENTAVO = Decimal("0.01")
+
+# mudanças em movimentação que alteram o total da fatura
+_CAMPOS_MOVIMENTACAO = ("id_fatura", "valor", "participa_limite_fatura_gastos")
+
+
+def _decimal(valor) -> Decimal:
+    return Decimal(str(valor or 0)).quantize(CENTAVO)
+
+
+def _variacao(objeto, campo: str, novo: bool, removido: bool) -> Optional[Decimal]:
+    """Quanto o campo mudou neste flush; None se não mudou."""
+    if removido:
+        return -_decimal(getattr(objeto, campo))
+    historico = attributes.get_history(objeto, campo)
+    if not historico.added:
+        return None
+    if novo:
+        return _decimal(historico.added[0])
+    # valor anterior não estava carregado: a variação é desconhecida, fica só a marca
+    # (variação zero) para a conciliação recalcular
+    if not historico.deleted:
+        return Decimal(0)
+    return _decimal(historico.added[0]) - _decimal(historico.deleted[0])
+
+
+def _faturas_da_movimentacao(movimentacao: MovimentacaoModel, novo: bool, removido: bool) -> set:
+    if novo or removido:
+        return {movimentacao.id_fatura}
+    if not any(attributes.get_history(movimentacao, campo).has_changes() for campo in _CAMPOS_MOVIMENTACAO):
+        return set()
+    historico = attributes.get_history(movimentacao, "id_fatura")
+    return set(chain(historico.added, historico.deleted, historico.unchanged))
+
+
+@event.listens_for(SessionSync, "after_flush")
+def _registrar_lancamentos(session, flush_context):
+    lancamentos: List[dict] = []
+    marcadas = set()
+    origem = request_id.get() or "sistema"
+
+    for objeto in chain(session.new, session.dirty, session.deleted):
+        novo, removido = objeto in session.new, objeto in session.deleted
+        if isinstance(objeto, FaturaModel):
+            delta = _variacao(objeto, "fatura_gastos", novo, removido)
+            if delta is not None:
+                marcadas.add(objeto.id_fatura)
+                lancamentos.append({"id_fatura": objeto.id_fatura, "id_cartao_credito": objeto.id_cartao_credito,
+                                    "delta_fatura_gastos": delta, "delta_limite_disponivel": 0})
+        elif isinstance(objeto, CartaoCreditoModel) and not removido:
+            delta = _variacao(objeto, "limite_disponivel", novo, removido)
+            if delta is None and attributes.get_history(objeto, "limite").has_changes():
+                delta = Decimal(0)
+            if delta is not None:
+                lancamentos.append({"id_fatura": None, "id_cartao_credito": objeto.id_cartao_credito,
+                                    "delta_fatura_gastos": 0, "delta_limite_disponivel": delta})
+        elif isinstance(objeto, MovimentacaoModel):
+            for id_fatura in _faturas_da_movimentacao(objeto, novo, removido) - marcadas:
+                if id_fatura is not None:
+                    marcadas.add(id_fatura)
+                    lancamentos.append({"id_fatura": id_fatura, "id_cartao_credito": None,
+                                        "delta_fatura_gastos": 0, "delta_limite_disponivel": 0})
+
+    if lancamentos:
+        for lancamento in lancamentos:
+            lancamento["origem"] = origem
+            lancamento["criado_em"] = datetime.now(timezone.utc)
+        session.connection().execute(insert(LancamentoFaturaModel), lancamentos)
+
+
+@dataclass
+class Divergencia:
+    tipo: str  # "fatura" ou "cartao"
+    id: int
+    id_cartao_credito: int
+    registrado: Decimal
+    esperado: Decimal
+
+    @property
+    def diferenca(self) -> Decimal:
+        return self.esperado - self.registrado
+
+
+@dataclass
+class ResultadoConciliacao:
+    checkpoint_anterior: int
+    checkpoint: int
+    cartoes: int = 0
+    divergencias: List[Divergencia] = field(default_factory=list)
+    reparadas: int = 0
+
+    def resumo(self) -> dict:
+        return {
+            "checkpoint": [self.checkpoint_anterior, self.checkpoint],
+            "cartoes": self.cartoes,
+            "reparadas": self.reparadas,
+            "divergencias": [
+                {"tipo": d.tipo, "id": d.id, "registrado": str(d.registrado), "esperado": str(d.esperado)}
+                for d in self.divergencias[:50]
+            ],
+        }
+
+
+async def _cartoes_alterados(session: AsyncSession, depois_de: int, ate: int) -> List[int]:
+    cartao = func.coalesce(LancamentoFaturaModel.id_cartao_credito, FaturaModel.id_cartao_credito)
+    result = await session.execute(
+        select(cartao).distinct()
+        .select_from(LancamentoFaturaModel)
+        .outerjoin(FaturaModel, FaturaModel.id_fatura == LancamentoFaturaModel.id_fatura)
+        .where(LancamentoFaturaModel.id_lancamento > depois_de, LancamentoFaturaModel.id_lancamento <= ate)
+    )
+    return sorted(id_cartao for id_cartao in result.scalars() if id_cartao is not None)
+
+
+async def _conciliar_lote(session: AsyncSession, cartoes: Sequence[int]) -> List[Divergencia]:
+    esperado = func.coalesce(func.sum(case(
+        (MovimentacaoModel.participa_limite_fatura_gastos == True, MovimentacaoModel.valor),  # noqa: E712
+        else_=0,
+    )), 0)
+    result_faturas = await session.execute(
+        select(FaturaModel.id_fatura, FaturaModel.id_cartao_credito, FaturaModel.fatura_gastos, esperado)
+        .select_from(FaturaModel)
+        .outerjoin(MovimentacaoModel, MovimentacaoModel.id_fatura == FaturaModel.id_fatura)
+        .where(FaturaModel.id_cartao_credito.in_(cartoes), FaturaModel.data_pagamento.is_(None))
+        .group_by(FaturaModel.id_fatura, FaturaModel.id_cartao_credito, FaturaModel.fatura_gastos)
+    )
+    result_cartoes = await session.execute(
+        select(CartaoCreditoModel.id_cartao_credito, CartaoCreditoModel.limite, CartaoCreditoModel.limite_disponivel)
+        .where(CartaoCreditoModel.id_cartao_credito.in_(cartoes))
+    )
+
+    divergencias = []
+    em_aberto: Dict[int, Decimal] = {}
+    for id_fatura, id_cartao, registrado, gastos in result_faturas.all():
+        registrado, gastos = _decimal(registrado), _decimal(gastos)
+        em_aberto[id_cartao] = em_aberto.get(id_cartao, Decimal(0)) + gastos
+        if registrado != gastos:
+            divergencias.append(Divergencia("fatura", id_fatura, id_cartao, registrado, gastos))
+
+    for id_cartao, limite, limite_disponivel in result_cartoes.all():
+        registrado = _decimal(limite_disponivel)
+        esperado_limite = _decimal(limite) - em_aberto.get(id_cartao, Decimal(0))
+        if registrado != esperado_limite:
+            divergencias.append(Divergencia("cartao", id_cartao, id_cartao, registrado, esperado_limite))
+    return divergencias
+
+
+async def _reparar(session: AsyncSession, divergencias: List[Divergencia]) -> int:
+    """
+    Grava o valor esperado e o lançamento de ajuste. O UPDATE só vale se o total ainda é o
+    lido na conciliação; se uma requisição o alterou no meio tempo, fica para a próxima rodada.
+    """
+    reparadas = 0
+    donos = dict((await session.execute(
+        select(CartaoCreditoModel.id_cartao_credito, CartaoCreditoModel.id_usuario)
+        .where(CartaoCreditoModel.id_cartao_credito.in_({d.id_cartao_credito for d in divergencias}))
+    )).all()) if divergencias else {}
+    versoes = await reservar_versoes(session, donos.values())
+    for divergencia in divergencias:
+        versao = versoes[donos[divergencia.id_cartao_credito]]
+        if divergencia.tipo == "fatura":
+            comando = (update(FaturaModel)
+                       .where(FaturaModel.id_fatura == divergencia.id,
+                              FaturaModel.fatura_gastos == divergencia.registrado)
+                       .values(fatura_gastos=divergencia.esperado, versao=versao))
+            lancamento = {"id_fatura": divergencia.id, "delta_fatura_gastos": divergencia.diferenca,
+                          "delta_limite_disponivel": 0}
+        else:
+            comando = (update(CartaoCreditoModel)
+                       .where(CartaoCreditoModel.id_cartao_credito == divergencia.id,
+                              CartaoCreditoModel.limite_disponivel == divergencia.registrado)
+                       .values(limite_disponivel=divergencia.esperado, versao=versao))
+            lancamento = {"id_fatura": None, "delta_fatura_gastos": 0,
+                          "delta_limite_disponivel": divergencia.diferenca}
+        result = await session.execute(comando)
+        if result.rowcount:
+            reparadas += 1
+            await session.execute(insert(LancamentoFaturaModel).values(
+                id_cartao_credito=divergencia.id_cartao_credito, origem="conciliacao",
+                criado_em=datetime.now(timezone.utc), **lancamento))
+    return reparadas
+
+
+async def conciliar_faturas(session: AsyncSession, reparar: bool = False, lote: int = LOTE_CARTOES,
+                           completa: bool = False, agora: Optional[datetime] = None,
+                           atraso: Optional[timedelta] = None) -> ResultadoConciliacao:
+    """
+    Concilia os cartões tocados desde o último checkpoint e avança o checkpoint até o último
+    lançamento gravado há mais de ``atraso`` (CONCILIACAO_ATRASO_SEGUNDOS).
+    Com ``completa`` confere todos os cartões (útil na primeira execução, antes de haver razão).
+    """
+    agora = agora or datetime.now(timezone.utc)
+    atraso = ATRASO if atraso is None else atraso
+    checkpoint = await session.get(CheckpointConciliacaoModel, CHECKPOINT)
+    if checkpoint is None:
+        checkpoint = CheckpointConciliacaoModel(nome=CHECKPOINT, id_lancamento=0)
+        session.add(checkpoint)
+    anterior = checkpoint.id_lancamento
+
+    ultimo = (await session.execute(select(func.max(LancamentoFaturaModel.id_lancamento)))).scalar() or 0
+    # o id vem da sequência no INSERT e não no commit: uma transação ainda aberta pode aparecer
+    # depois com id menor que o último lido. O checkpoint só passa dos lançamentos gravados há mais
+    # de ``atraso``; os mais novos são conferidos agora e de novo na próxima rodada
+    seguro = (await session.execute(
+        select(func.max(LancamentoFaturaModel.id_lancamento))
+        .where(LancamentoFaturaModel.id_lancamento > anterior, LancamentoFaturaModel.criado_em <= agora - atraso)
+    )).scalar() or anterior
+    resultado = ResultadoConciliacao(checkpoint_anterior=anterior, checkpoint=seguro)
+    if ultimo <= anterior and not completa:
+        return resultado
+
+    if completa:
+        cartoes = sorted((await session.execute(select(CartaoCreditoModel.id_cartao_credito))).scalars())
+    else:
+        cartoes = await _cartoes_alterados(session, anterior, ultimo)
+    resultado.cartoes = len(cartoes)
+    for inicio in range(0, len(cartoes), lote):
+        resultado.divergencias.extend(await _conciliar_lote(session, cartoes[inicio:inicio + lote]))
+
+    if reparar and resultado.divergencias:
+        # os lançamentos de ajuste são novos: os cartões reparados são conferidos de novo na próxima rodada
+        resultado.reparadas = await _reparar(session, resultado.divergencias)
+
+    for divergencia in resultado.divergencias:
+        CONCILIACAO_DIVERGENCIAS.inc((divergencia.tipo, "sim" if reparar else "nao"))
+
+    checkpoint.id_lancamento = resultado.checkpoint
+    checkpoint.atualizado_em = datetime.now(timezone.utc)
+    await session.commit()
+    return resultado
+
+
+@exclusivo("conciliar_faturas")
+@medir_job("conciliar_faturas")
+async def conciliar_faturas_job():
+    async with Session() as session:
+        resultado = await conciliar_faturas(session, reparar=REPARAR)
+    if resultado.divergencias:
+        logger.warning("Conciliação de faturas: %s divergência(s) em %s cartão(ões), %s reparada(s)",
+                       len(resultado.divergencias), resultado.cartoes, resultado.reparadas,
+                       extra={"conciliacao": resultado.resumo()})
+    else:
+        logger.info("Conciliação de faturas: %s cartão(ões) conferidos, sem divergências", resultado.cartoes)
+    return resultado
@@ -1,4 +1,4 @@
-from typing import ClassVar, List
+from typing import ClassVar, List, Optional
 
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
@@ -11,8 +11,12 @@ class Settings(BaseSettings):
     """
     API_V1_STR: str = '/api/v1'
     DB_URL: str = config("DATABASE_URL")
+    # réplica somente leitura (opcional); sem ela as leituras vão para o DB_URL
+    DB_URL_LEITURA: Optional[str] = config("DATABASE_URL_LEITURA", default=None)
     DBBaseModel: ClassVar = declarative_base() 
     URL_WEB: str = config("URL_WEB")
+    # token do cadastro em lote (POST /usuarios/cadastro/lote); sem ele a rota fica desligada
+    PROVISIONAMENTO_TOKEN: Optional[str] = config("PROVISIONAMENTO_TOKEN", default=None)
     
     JWT_SECRET: str = config("JWT_SECRET")  # em uma api real não se deve fornecer isso aqui pra ninguem
     """
@@ -1,7 +1,14 @@
-from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager
+
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SessionSync, sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 
 from core.configs import settings 
+from core.instrumentation import instrumentar_engine
+from core.metrics import registrar_pool
 
 
 
@@ -10,13 +17,97 @@ engine = create_async_engine(
     pool_pre_ping=True,        # Verifica se a conexão está ativa antes de usá-la
     pool_recycle=3600,        # Recicla conexões após 3600 segundos (1 hora)
 )
+instrumentar_engine(engine)
+registrar_pool(engine)
+
+engine_leitura: Optional[AsyncEngine] = None
+if settings.DB_URL_LEITURA:
+    engine_leitura = create_async_engine(settings.DB_URL_LEITURA, pool_pre_ping=True, pool_recycle=3600)
+    instrumentar_engine(engine_leitura)
+    registrar_pool(engine_leitura, "replica")
+
+
+# sessões da réplica: o que elas leem pode estar atrasado e não vai para caches compartilhados
+CHAVE_REPLICA = "replica"
+# marcada quando a transação gravou algo (flush com mudanças ou INSERT/UPDATE/DELETE direto)
+CHAVE_ESCREVEU = "escreveu"
+
+
+@event.listens_for(SessionSync, "after_flush")
+def _marcar_flush(session, flush_context):
+    session.info[CHAVE_ESCREVEU] = True
+
+
+@event.listens_for(SessionSync, "do_orm_execute")
+def _marcar_dml(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        estado.session.info[CHAVE_ESCREVEU] = True
+
+
+class SessaoUnidadeDeTrabalho(AsyncSession):
+    """
+    AsyncSession que pode rodar como unidade de trabalho de uma requisição.
+
+    Dentro de ``unidade_de_trabalho()`` a autenticação, o handler e os helpers dividem a
+    mesma conexão e a mesma transação: ``commit()`` só dá flush, ``close()`` e
+    ``async with db as session`` não fecham nada, e o commit (ou rollback) acontece uma
+    única vez na saída. Fora dela (jobs, scripts) se comporta como uma AsyncSession comum.
+    """
+
+    _em_unidade = False
+    escreveu = False
+
+    @asynccontextmanager
+    async def unidade_de_trabalho(self, somente_leitura: bool = False):
+        """Com ``somente_leitura`` a saída é sempre rollback: nada que o handler tenha sujado é gravado."""
+        self._em_unidade = True
+        try:
+            yield self
+        except BaseException:
+            self._em_unidade = False
+            await self.rollback()
+            raise
+        else:
+            self._em_unidade = False
+            if somente_leitura:
+                await self.rollback()
+            else:
+                self.escreveu = bool(self.info.pop(CHAVE_ESCREVEU, False) or self.sync_session.new
+                                     or self.sync_session.dirty or self.sync_session.deleted)
+                await self.commit()
+        finally:
+            self._em_unidade = False
+            self.info.pop(CHAVE_ESCREVEU, None)
+            await self.close()
+
+    async def commit(self) -> None:
+        if self._em_unidade:
+            # erros de constraint aparecem aqui, no mesmo ponto do handler que antes fazia o commit
+            await self.flush()
+            return
+        await super().commit()
+
+    async def close(self) -> None:
+        if not self._em_unidade:
+            await super().close()
 
 
 Session: AsyncSession = sessionmaker(
     autocommit= False,
     autoflush= False,
     expire_on_commit= False,
-    class_= AsyncSession,
+    class_= SessaoUnidadeDeTrabalho,
     bind = engine,
 )
 
+# réplica quando configurada; core.replica decide por requisição se ela pode ser usada
+SessionLeitura: Optional[sessionmaker] = None
+if engine_leitura is not None:
+    SessionLeitura = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        class_=SessaoUnidadeDeTrabalho,
+        bind=engine_leitura,
+        info={CHAVE_REPLICA: True},
+    )
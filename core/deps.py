@@ -1,6 +1,9 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Optional
 
-from fastapi import Depends, HTTPException, status, Header
+import secrets
+import time
+
+from fastapi import Depends, HTTPException, Request, status, Header
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -8,6 +11,7 @@ from sqlalchemy.future import select
 from pydantic import BaseModel
 
 from core.database import Session
+from core.replica import COOKIE_ULTIMA_ESCRITA, escrita_recente, sessao_leitura
 from core.auth import oauth2_schema
 from core.configs import settings
 
@@ -18,16 +22,24 @@ class TokenData(BaseModel):
     username: Optional[str] = None
 
 
-async def get_session()-> Generator: # type: ignore
-    session: AsyncSession = Session()
-    try:
+async def get_session(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
+    """Uma conexão e uma transação por requisição: commit se o handler termina bem, rollback se levanta."""
+    async with Session().unidade_de_trabalho() as session:
         yield session
-    finally:
-        await session.close()
-        
-        
-async def get_current_user(db: AsyncSession = Depends(get_session), token: str = Depends(oauth2_schema)) -> UsuarioModel:
-    
+    if session.escreveu and request is not None:
+        # vira o cookie ultima_escrita (core.replica.ConsistenciaLeituraMiddleware)
+        request.state.ultima_escrita = time.time()
+
+
+async def get_read_session(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
+    """Sessão somente leitura (réplica) para listagens e relatórios; ver core.replica."""
+    recente = request is not None and escrita_recente(request.cookies.get(COOKIE_ULTIMA_ESCRITA))
+    async with sessao_leitura(forcar_primario=recente) as session:
+        yield session
+
+
+async def _usuario_do_token(db: AsyncSession, token: str) -> UsuarioModel:
+
     credential_exception: HTTPException = HTTPException (
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail=f"Não foi possível autentificar a credencial " + token,
@@ -51,15 +63,31 @@ async def get_current_user(db: AsyncSession = Depends(get_session), token: str =
         raise credential_exception
     
     
-    async with db as session:
-        query = select(UsuarioModel).filter(UsuarioModel.id_usuario == int(token_data.username))
-        result = await session.execute(query)
-        usuario: Optional[UsuarioModel] = result.scalars().unique().one_or_none()
-        
-        if usuario is None:
-            raise credential_exception
-        
-        return usuario
+    # mesma sessão (e conexão) que o handler vai usar em seguida
+    query = select(UsuarioModel).filter(UsuarioModel.id_usuario == int(token_data.username))
+    result = await db.execute(query)
+    usuario: Optional[UsuarioModel] = result.scalars().unique().one_or_none()
+
+    if usuario is None:
+        raise credential_exception
+
+    return usuario
+
+
+async def get_current_user(db: AsyncSession = Depends(get_session), token: str = Depends(oauth2_schema)) -> UsuarioModel:
+    return await _usuario_do_token(db, token)
+
 
+async def get_current_user_leitura(db: AsyncSession = Depends(get_read_session),
+                                   token: str = Depends(oauth2_schema)) -> UsuarioModel:
+    """get_current_user das rotas de leitura: autentica na mesma sessão de leitura do handler."""
+    return await _usuario_do_token(db, token)
 
 
+async def exigir_token_provisionamento(x_provisionamento_token: Optional[str] = Header(default=None)) -> None:
+    """Protege o cadastro em lote: exige o header X-Provisionamento-Token igual a PROVISIONAMENTO_TOKEN."""
+    if not settings.PROVISIONAMENTO_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cadastro em lote desabilitado.")
+    if x_provisionamento_token is None or not secrets.compare_digest(
+            x_provisionamento_token.encode(), settings.PROVISIONAMENTO_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de provisionamento inválido.")
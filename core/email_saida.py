@@ -0,0 +1,200 @@
+"""
+Caixa de saída de e-mails (EMAIL_SAIDA) e o job que a esvazia.
+
+Quem precisa mandar um e-mail (redefinição de senha, cobrança, alerta de atraso) grava a
+linha na própria sessão (enfileirar_email): ela entra na mesma transação do handler e a
+requisição responde sem esperar o servidor SMTP. Se a transação cair, o e-mail não sai; se
+o worker reiniciar, a linha continua lá.
+
+drenar_emails reserva um lote de pendentes já vencidos (FOR UPDATE SKIP LOCKED, estado
+Enviando e um prazo de reserva em proxima_tentativa) e commita antes de falar com o
+servidor SMTP: a entrega roda fora da transação, numa única conexão, e o resultado é
+gravado numa segunda transação. Se o worker morrer no meio, a reserva vence e outra rodada
+pega o e-mail de novo. O limite por domínio do destinatário é contado no banco (enviados no
+último minuto e reservas em andamento), então vale para todos os workers; o que passa do
+limite é adiado para a janela seguinte. Falha reagenda com espera exponencial; depois de
+EMAIL_MAX_TENTATIVAS o e-mail fica como Descartado (dead letter) com o último erro.
+"""
+import asyncio
+import io
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from decouple import config
+from sqlalchemy import and_, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import Session
+from core.metrics import EMAILS_ENVIADOS, medir_job
+from core.trava import exclusivo
+from core.utils import importar_sob_demanda
+from models.email_saida_model import EmailSaidaModel
+from models.enums import EstadoEmail
+
+logger = logging.getLogger(__name__)
+
+smtplib = importar_sob_demanda("smtplib")
+pdfkit = importar_sob_demanda("pdfkit")
+
+LOTE = config("EMAIL_LOTE", default=50, cast=int)
+MAX_TENTATIVAS = config("EMAIL_MAX_TENTATIVAS", default=6, cast=int)
+ESPERA_BASE_SEGUNDOS = config("EMAIL_ESPERA_BASE_SEGUNDOS", default=60, cast=int)
+LIMITE_POR_DOMINIO_MINUTO = config("EMAIL_LIMITE_POR_DOMINIO_MINUTO", default=30, cast=int)
+# maior que o tempo de uma entrega de lote: vencida, a reserva volta para a fila
+RESERVA = timedelta(seconds=config("EMAIL_RESERVA_SEGUNDOS", default=600, cast=int))
+JANELA_DOMINIO = timedelta(minutes=1)
+
+
+def enfileirar_email(session: AsyncSession, destinatario: str, assunto: str, corpo_html: str, origem: str,
+                     anexar_pdf: bool = False) -> EmailSaidaModel:
+    """Grava o e-mail na transação corrente; quem entrega é o drenar_emails."""
+    email = EmailSaidaModel(destinatario=destinatario, assunto=assunto, corpo_html=corpo_html, origem=origem,
+                            anexar_pdf=anexar_pdf)
+    session.add(email)
+    return email
+
+
+async def enfileirar_emails_unicos(session: AsyncSession, emails: List[dict]) -> int:
+    """
+    Grava os e-mails (colunas do EMAIL_SAIDA, com ``chave``) na transação corrente, menos
+    os de chave já enfileirada, mesmo que por outra transação ainda aberta. Devolve quantos
+    entraram.
+    """
+    if not emails:
+        return 0
+    dialeto = postgresql if (await session.connection()).dialect.name == "postgresql" else sqlite
+    return len((await session.execute(
+        dialeto.insert(EmailSaidaModel).on_conflict_do_nothing().returning(EmailSaidaModel.id_email), emails,
+    )).all())
+
+
+def dominio(endereco: str) -> str:
+    return endereco.rpartition("@")[2].lower()
+
+
+async def envios_por_dominio(session: AsyncSession, agora: datetime) -> Counter:
+    """Envios da janela por domínio, de todos os workers: entregues no último minuto e reservas em andamento."""
+    destinatarios = (await session.execute(
+        select(EmailSaidaModel.destinatario).where(or_(
+            and_(EmailSaidaModel.estado == EstadoEmail.ENVIADO, EmailSaidaModel.enviado_em > agora - JANELA_DOMINIO),
+            and_(EmailSaidaModel.estado == EstadoEmail.ENVIANDO, EmailSaidaModel.proxima_tentativa > agora),
+        ))
+    )).scalars()
+    return Counter(dominio(destinatario) for destinatario in destinatarios)
+
+
+def montar_mensagem(email: EmailSaidaModel, remetente: str):
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email import encoders
+    from email.utils import formatdate
+
+    msg = MIMEMultipart()
+    msg["Subject"] = email.assunto
+    msg["From"] = remetente
+    msg["To"] = email.destinatario
+    msg["Date"] = formatdate(localtime=True)
+    msg.attach(MIMEText(email.corpo_html, "html", "utf-8"))
+
+    if email.anexar_pdf:
+        pdf_buffer = io.BytesIO(pdfkit.from_string(email.corpo_html, False, options={"encoding": "UTF-8"}))
+        anexo = MIMEBase("application", "pdf")
+        anexo.set_payload(pdf_buffer.read())
+        encoders.encode_base64(anexo)
+        anexo.add_header("Content-Disposition", "attachment; filename=financas.pdf")
+        msg.attach(anexo)
+    return msg
+
+
+def entregar_lote(emails: Sequence[EmailSaidaModel]) -> Dict[int, Optional[str]]:
+    """Entrega em uma conexão SMTP; devolve o erro de cada e-mail (None quando saiu)."""
+    remetente = config("EMAIL_ADDRESS")
+    erros: Dict[int, Optional[str]] = {}
+    try:
+        with smtplib.SMTP("smtp.gmail.com", 587) as server:
+            server.starttls()
+            server.login(remetente, config("EMAIL_PASSWORD"))
+            for email in emails:
+                try:
+                    server.send_message(montar_mensagem(email, remetente))
+                    erros[email.id_email] = None
+                except Exception as e:  # um destinatário recusado não derruba o lote
+                    erros[email.id_email] = str(e) or type(e).__name__
+    except Exception as e:
+        # conexão ou login: o que ainda não foi enviado volta para a fila
+        for email in emails:
+            erros.setdefault(email.id_email, str(e) or type(e).__name__)
+    return erros
+
+
+async def reservar_lote(session: AsyncSession, agora: datetime) -> Tuple[List[EmailSaidaModel], int]:
+    """Marca como Enviando o que cabe no limite dos domínios e commita; devolve o lote e quantos foram adiados."""
+    candidatos = (await session.execute(
+        select(EmailSaidaModel)
+        .where(EmailSaidaModel.estado.in_([EstadoEmail.PENDENTE, EstadoEmail.ENVIANDO]),
+               EmailSaidaModel.proxima_tentativa <= agora)
+        .order_by(EmailSaidaModel.proxima_tentativa, EmailSaidaModel.id_email)
+        .limit(LOTE)
+        .with_for_update(skip_locked=True)
+    )).scalars().all()
+
+    envios = await envios_por_dominio(session, agora)
+    reservados = []
+    for email in candidatos:
+        destino = dominio(email.destinatario)
+        if envios[destino] < LIMITE_POR_DOMINIO_MINUTO:
+            envios[destino] += 1
+            email.estado = EstadoEmail.ENVIANDO
+            email.proxima_tentativa = agora + RESERVA
+            reservados.append(email)
+        else:
+            # passou do limite do domínio: sai da frente da fila até a janela andar, sem contar tentativa
+            email.estado = EstadoEmail.PENDENTE
+            email.proxima_tentativa = agora + JANELA_DOMINIO
+    await session.commit()
+    return reservados, len(candidatos) - len(reservados)
+
+
+async def drenar_emails(session: AsyncSession, agora: Optional[datetime] = None) -> Dict[str, int]:
+    agora = agora or datetime.now(timezone.utc)
+    reservados, adiados = await reservar_lote(session, agora)
+    # fora de transação: nenhuma linha fica travada enquanto o servidor SMTP responde
+    erros = await asyncio.to_thread(entregar_lote, reservados) if reservados else {}
+
+    resumo = {"enviados": 0, "reagendados": 0, "descartados": 0, "adiados": adiados}
+    for email in reservados:
+        erro = erros.get(email.id_email)
+        if erro is None:
+            email.estado = EstadoEmail.ENVIADO
+            email.enviado_em = agora
+            resumo["enviados"] += 1
+            EMAILS_ENVIADOS.inc((email.origem, "sucesso"))
+            continue
+        EMAILS_ENVIADOS.inc((email.origem, "falha"))
+        email.tentativas += 1
+        email.ultimo_erro = erro
+        if email.tentativas >= MAX_TENTATIVAS:
+            email.estado = EstadoEmail.DESCARTADO
+            resumo["descartados"] += 1
+            logger.error("E-mail %s (%s) descartado após %s tentativas: %s",
+                         email.id_email, email.origem, email.tentativas, erro)
+        else:
+            email.estado = EstadoEmail.PENDENTE
+            email.proxima_tentativa = agora + timedelta(seconds=ESPERA_BASE_SEGUNDOS * 2 ** (email.tentativas - 1))
+            resumo["reagendados"] += 1
+    await session.commit()
+    return resumo
+
+
+@exclusivo("drenar_emails")
+@medir_job("drenar_emails")
+async def drenar_emails_job():
+    async with Session() as session:
+        resumo = await drenar_emails(session)
+    if any(resumo.values()):
+        logger.info("Caixa de saída: %s", resumo, extra={"email_saida": resumo})
+    return resumo
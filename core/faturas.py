@@ -0,0 +1,214 @@
+"""
+Calendário de faturas por cartão: em qual fatura cai um gasto feito na data D no cartão C.
+
+Dias de fechamento e vencimento quase nunca mudam, então o calendário de cada cartão
+(id, fechamento e vencimento de todas as faturas) fica em um cache em memória do
+processo, com descarte LRU e um TTL de segurança para quando há mais de um worker.
+Com o cache quente, rotear um gasto para a fatura não vai ao banco: sobra só carregar
+as faturas que serão alteradas, em lotes, porque as parcelas seguintes de uma compra
+caem nas faturas seguintes.
+
+O calendário inteiro no lugar da consulta por faixa de data_fechamento guardada só na
+transação é de propósito: são umas doze faturas por ano, as datas quase não mudam, e a
+listagem de cartões e o filtro por cartão leem meses anteriores ao do gasto, que uma faixa
+a partir dele não cobre. Na falta, a carga por cartão em ordem de data_fechamento usa o
+ix_fatura_cartao_fechamento.
+
+Quem cria, altera ou apaga faturas (ou muda os dias do cartão) chama
+invalidar_calendario(session, id_cartao); a entrada sai do cache na hora e de novo no
+commit, para que uma requisição concorrente não guarde a versão anterior ao commit.
+
+O calendário só roteia gastos. Decidir se uma fatura precisa ser criada é do
+horizonte.garantir_faturas, que lê o banco e insere com ON CONFLICT sobre o índice único
+ux_fatura_cartao_mes: o cache de um worker pode estar atrás do de outro.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from decouple import config
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session as SessionSync
+
+from core.database import CHAVE_REPLICA
+from models.fatura_model import FaturaModel
+
+CHAVE_INVALIDAR = "faturas_invalidar"
+CHAVE_CARREGADAS = "faturas_carregadas"
+LOTE_FATURAS = 12
+
+
+class DataFatura(NamedTuple):
+    id_fatura: int
+    data_fechamento: date
+    data_vencimento: date
+
+
+class CalendarioFaturas:
+    """Todas as faturas de um cartão, em ordem de fechamento."""
+
+    def __init__(self, datas: List[DataFatura]):
+        self.datas = datas
+
+    def do_mes(self, ano: int, mes: int) -> Optional[DataFatura]:
+        return next((d for d in self.datas if d.data_fechamento.year == ano and d.data_fechamento.month == mes), None)
+
+    def proxima(self, a_partir: date) -> Optional[DataFatura]:
+        return next((d for d in self.datas if d.data_fechamento >= a_partir), None)
+
+    def resolver(self, data: date) -> Optional[DataFatura]:
+        """
+        A fatura do mês de ``data`` se ela ainda não fechou; senão a do mês seguinte.
+        Como no find_fatura original, sem fatura no próprio mês não há resolução
+        (quem chama cria as faturas do ano e tenta de novo).
+        """
+        atual = self.do_mes(data.year, data.month)
+        if atual is None:
+            return None
+        if atual.data_fechamento > data:
+            return atual
+        ano, mes = (data.year + 1, 1) if data.month == 12 else (data.year, data.month + 1)
+        seguinte = self.do_mes(ano, mes)
+        if seguinte is not None and seguinte.data_fechamento > data:
+            return seguinte
+        return None
+
+
+class CacheCalendarios:
+    """LRU com TTL; o lock só protege o OrderedDict (jobs do scheduler rodam em outras threads)."""
+
+    def __init__(self, maximo: int, ttl: float):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._entradas: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, id_cartao_credito: int) -> Optional[CalendarioFaturas]:
+        with self._lock:
+            entrada = self._entradas.get(id_cartao_credito)
+            if entrada is None:
+                return None
+            calendario, expira_em = entrada
+            if expira_em < time.monotonic():
+                del self._entradas[id_cartao_credito]
+                return None
+            self._entradas.move_to_end(id_cartao_credito)
+            return calendario
+
+    def guardar(self, id_cartao_credito: int, calendario: CalendarioFaturas):
+        with self._lock:
+            self._entradas[id_cartao_credito] = (calendario, time.monotonic() + self.ttl)
+            self._entradas.move_to_end(id_cartao_credito)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def descartar(self, id_cartao_credito: int):
+        with self._lock:
+            self._entradas.pop(id_cartao_credito, None)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+cache_calendarios = CacheCalendarios(
+    maximo=config("FATURA_CALENDARIO_MAXIMO", default=2048, cast=int),
+    ttl=config("FATURA_CALENDARIO_TTL", default=300, cast=float),
+)
+
+
+async def calendarios_dos_cartoes(session: AsyncSession, ids_cartao: Iterable[int]) -> Dict[int, CalendarioFaturas]:
+    """Calendários dos cartões pedidos; os que faltam no cache vêm juntos em uma consulta."""
+    calendarios = {}
+    faltando = []
+    for id_cartao in ids_cartao:
+        calendario = cache_calendarios.obter(id_cartao)
+        if calendario is None:
+            faltando.append(id_cartao)
+        else:
+            calendarios[id_cartao] = calendario
+
+    if faltando:
+        result = await session.execute(
+            select(FaturaModel.id_cartao_credito, FaturaModel.id_fatura,
+                   FaturaModel.data_fechamento, FaturaModel.data_vencimento)
+            .where(FaturaModel.id_cartao_credito.in_(faltando))
+            .order_by(FaturaModel.id_cartao_credito, FaturaModel.data_fechamento, FaturaModel.id_fatura)
+        )
+        datas: Dict[int, List[DataFatura]] = {id_cartao: [] for id_cartao in faltando}
+        for id_cartao, *linha in result.all():
+            datas[id_cartao].append(DataFatura(*linha))
+        pendentes = session.info.get(CHAVE_INVALIDAR, ())
+        replica = session.info.get(CHAVE_REPLICA, False)
+        for id_cartao, lista in datas.items():
+            calendarios[id_cartao] = CalendarioFaturas(lista)
+            # o que esta transação alterou e ainda não commitou (ou a réplica atrasada) não vai para o cache compartilhado
+            if id_cartao not in pendentes and not replica:
+                cache_calendarios.guardar(id_cartao, calendarios[id_cartao])
+    return calendarios
+
+
+async def calendario_do_cartao(session: AsyncSession, id_cartao_credito: int) -> CalendarioFaturas:
+    return (await calendarios_dos_cartoes(session, [id_cartao_credito]))[id_cartao_credito]
+
+
+async def _carregar_fatura(session: AsyncSession, calendario: CalendarioFaturas, datas: DataFatura) -> Optional[FaturaModel]:
+    carregadas: Dict[int, FaturaModel] = session.info.setdefault(CHAVE_CARREGADAS, {})
+    if datas.id_fatura not in carregadas:
+        # as parcelas seguintes caem nas faturas seguintes: um lote por consulta em vez de uma fatura por parcela
+        ids = [d.id_fatura for d in calendario.datas if d.data_fechamento >= datas.data_fechamento][:LOTE_FATURAS]
+        result = await session.execute(select(FaturaModel).where(FaturaModel.id_fatura.in_(ids)))
+        carregadas.update((fatura.id_fatura, fatura) for fatura in result.scalars())
+    return carregadas.get(datas.id_fatura)
+
+
+async def resolver_fatura(session: AsyncSession, id_cartao_credito: int, data: date) -> Optional[FaturaModel]:
+    """Fatura aberta em que cai um gasto na ``data``, já carregada na sessão para ser alterada."""
+    calendario = await calendario_do_cartao(session, id_cartao_credito)
+    datas = calendario.resolver(data)
+    if datas is None:
+        return None
+    fatura = await _carregar_fatura(session, calendario, datas)
+    if fatura is None or fatura.id_cartao_credito != id_cartao_credito:
+        # o calendário em cache estava velho (outro worker apagou ou moveu a fatura): recarrega uma vez
+        invalidar_calendario(session, id_cartao_credito)
+        session.info[CHAVE_CARREGADAS].pop(datas.id_fatura, None)
+        calendario = await calendario_do_cartao(session, id_cartao_credito)
+        datas = calendario.resolver(data)
+        fatura = await _carregar_fatura(session, calendario, datas) if datas else None
+    return fatura
+
+
+def invalidar_calendario(session: AsyncSession, *ids_cartao: Optional[int]):
+    """Descarta agora e no commit os calendários dos cartões cujas faturas esta transação alterou."""
+    pendentes = session.info.setdefault(CHAVE_INVALIDAR, set())
+    for id_cartao in ids_cartao:
+        if id_cartao is not None:
+            pendentes.add(id_cartao)
+            cache_calendarios.descartar(id_cartao)
+
+
+@event.listens_for(SessionSync, "after_commit")
+def _invalidar_no_commit(session):
+    for id_cartao in session.info.pop(CHAVE_INVALIDAR, ()):
+        cache_calendarios.descartar(id_cartao)
+
+
+@event.listens_for(SessionSync, "after_soft_rollback")
+def _esquecer_no_rollback(session, previous_transaction):
+    # nada foi gravado; as entradas já saíram do cache e voltam na próxima leitura
+    if previous_transaction.parent is None:
+        session.info.pop(CHAVE_INVALIDAR, None)
+
+
+@event.listens_for(SessionSync, "after_transaction_end")
+def _soltar_faturas_carregadas(session, transaction):
+    # as faturas ficam presas em session.info só durante a transação (o identity map guarda referências fracas)
+    if transaction.parent is None:
+        session.info.pop(CHAVE_CARREGADAS, None)
@@ -0,0 +1,23 @@
+"""
+Formatação no padrão brasileiro usada nos e-mails e extratos (e exposta aos templates).
+"""
+from datetime import date
+from typing import Union
+
+# "1,234.56" -> "1.234,56" em uma passada
+_TROCA_SEPARADORES = str.maketrans(",.", ".,")
+
+
+def formatar_valor_brasileiro(valor):
+    """Formata o valor monetário no padrão brasileiro (R$ 1.234,56); o que não é número volta como veio."""
+    try:
+        return f"R$ {float(valor):,.2f}".translate(_TROCA_SEPARADORES)
+    except (TypeError, ValueError):
+        return valor
+
+
+def formatar_data_brasileira(data: Union[date, str]) -> str:
+    """DD/MM/AAAA a partir de date/datetime ou de uma data ISO (AAAA-MM-DD)."""
+    if isinstance(data, str):
+        data = date.fromisoformat(data[:10])
+    return f"{data.day:02d}/{data.month:02d}/{data.year}"
@@ -0,0 +1,307 @@
+"""
+Horizonte de faturas e recorrências mantido por um job, fora das requisições.
+
+Faturas: cada cartão ativo tem faturas até HORIZONTE_FATURAS_MESES meses à frente. As
+que faltam saem dos dias de fechamento e vencimento do cartão (e da conta da última
+fatura), com um INSERT por lote de cartões. Antes o ano inteiro era criado dentro da
+requisição que não achava a fatura (create_fatura_ano); agora get_or_create_fatura só
+completa os meses que faltam em volta da data pedida (antes da primeira fatura, depois
+da última ou num buraco), e o cadastro do cartão cria o mês atual e o seguinte.
+
+Recorrências: as ocorrências continuam sendo regra (core/recorrencias.py) e a listagem
+gera as que não são linha. O job grava as que caem até o fim do mês atual (ou
+HORIZONTE_RECORRENCIAS_MESES meses depois), para que orçamento, saldos, extratos e a
+rotina de atraso, que leem só o MOVIMENTACAO, as enxerguem; o cadastro da recorrência
+grava as da mesma janela, para elas não ficarem de fora até a próxima rodada. A gravação é pela Session,
+em lotes de REPETICAO (keyset por id), para os hooks de orçamento e de conciliação
+valerem; as ocorrências do mês corrente no cartão entram no limite e na fatura.
+
+O job e as requisições podem criar a mesma fatura ou a mesma ocorrência ao mesmo tempo:
+os índices únicos ux_fatura_cartao_mes e ux_movimentacao_repeticao_parcela decidem quem
+fica, as faturas entram com ON CONFLICT DO NOTHING e o lote de ocorrências que colidir
+é refeito. O job roda em um worker por vez (core/trava.py).
+"""
+import calendar
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from decouple import config
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
+
+from core.database import Session
+from core.faturas import calendarios_dos_cartoes, invalidar_calendario
+from core.metrics import medir_job
+from core.recorrencias import (PARCELA_MODELO, divisoes_da_ocorrencia, nova_ocorrencia, ocorrencias_virtuais,
+                               parcelas_materializadas)
+from core.saldos import primeiro_dia, somar_meses
+from core.sincronizacao import reservar_versoes
+from core.trava import exclusivo
+from models.cartao_credito_model import CartaoCreditoModel
+from models.enums import CondicaoPagamento, FormaPagamento
+from models.fatura_model import FaturaModel
+from models.movimentacao_model import MovimentacaoModel
+from models.repeticao_model import RepeticaoModel
+
+logger = logging.getLogger(__name__)
+
+MESES_FATURAS = config("HORIZONTE_FATURAS_MESES", default=12, cast=int)
+MESES_RECORRENCIAS = config("HORIZONTE_RECORRENCIAS_MESES", default=0, cast=int)
+LOTE = config("HORIZONTE_LOTE", default=200, cast=int)
+
+
+def dia_valido(mes: date, dia: int) -> date:
+    """O ``dia`` no mês de ``mes``, ou o último dia do mês se ele não existir (31 em abril)."""
+    return date(mes.year, mes.month, min(dia, calendar.monthrange(mes.year, mes.month)[1]))
+
+
+def faturas_dos_meses(id_cartao_credito: int, dia_vencimento: int, dia_fechamento: int, de: date, ate: date,
+                      id_conta: Optional[int] = None) -> List[dict]:
+    """Linhas de FATURA de um cartão, uma por mês do mês de ``de`` ao de ``ate``, inclusive."""
+    linhas = []
+    mes = primeiro_dia(de)
+    while mes <= ate:
+        linhas.append({
+            "id_cartao_credito": id_cartao_credito,
+            "data_vencimento": dia_valido(mes, dia_vencimento),
+            "data_fechamento": dia_valido(mes, dia_fechamento),
+            "id_conta": id_conta,
+            "fatura_gastos": Decimal(0),
+        })
+        mes = somar_meses(mes, 1)
+    return linhas
+
+
+async def inserir_faturas(session: AsyncSession, linhas: List[dict], donos: Optional[Dict[int, int]] = None) -> int:
+    """
+    INSERT das linhas de faturas_dos_meses; o mês que outra transação já criou (índice
+    ux_fatura_cartao_mes) fica de fora. ``donos`` (cartão -> id_usuario) evita a consulta
+    dos donos, de quem é reservada a versão de sincronização que o flush daria. Devolve
+    quantas faturas foram criadas.
+    """
+    # fatura_gastos nasce zerada: não há o que anotar no razão, então vai sem passar pelo flush
+    if not linhas:
+        return 0
+    if donos is None:
+        donos = dict((await session.execute(
+            select(CartaoCreditoModel.id_cartao_credito, CartaoCreditoModel.id_usuario)
+            .where(CartaoCreditoModel.id_cartao_credito.in_({linha["id_cartao_credito"] for linha in linhas}))
+        )).all())
+    versoes = await reservar_versoes(session, donos.values())
+    for linha in linhas:
+        linha["versao"] = versoes[donos[linha["id_cartao_credito"]]]
+    dialeto = postgresql if (await session.connection()).dialect.name == "postgresql" else sqlite
+    # render_nulls: id_conta nulo (cartão sem faturas) não parte o lote em outro INSERT
+    criadas = (await session.execute(
+        dialeto.insert(FaturaModel).on_conflict_do_nothing().returning(FaturaModel.id_fatura)
+        .execution_options(render_nulls=True),
+        linhas,
+    )).all()
+    # mesmo com conflito: o mês que faltava aqui foi criado por outro worker, e o calendário dele mudou
+    invalidar_calendario(session, *{linha["id_cartao_credito"] for linha in linhas})
+    return len(criadas)
+
+
+async def garantir_faturas(session: AsyncSession, ids_cartao: Iterable[int], ate: date,
+                           de: Optional[date] = None, hoje: Optional[date] = None) -> int:
+    """
+    Cria, sem commit, as faturas que faltam de cada cartão nos meses de ``de`` a ``ate``;
+    sem ``de``, dos meses depois da última fatura (ou do mês atual, se o cartão não tem
+    nenhuma). Os dias são os do cartão (os da última fatura nos cartões antigos, que não
+    os guardam) e a conta é a da última fatura. Cartão sem dias e sem faturas fica como está.
+    """
+    ids_cartao = list(ids_cartao)
+    if not ids_cartao:
+        return 0
+    # a última pelo vencimento, como o create_fatura_ano fazia
+    ordem = func.row_number().over(
+        partition_by=FaturaModel.id_cartao_credito,
+        order_by=(FaturaModel.data_vencimento.desc(), FaturaModel.id_fatura.desc()),
+    ).label("ordem")
+    faturas = (
+        select(FaturaModel.id_cartao_credito, FaturaModel.data_vencimento, FaturaModel.data_fechamento,
+               FaturaModel.id_conta, ordem)
+        .where(FaturaModel.id_cartao_credito.in_(ids_cartao), FaturaModel.data_vencimento.isnot(None),
+               FaturaModel.data_fechamento.isnot(None))
+        .subquery()
+    )
+    cartoes = (await session.execute(
+        select(CartaoCreditoModel.id_cartao_credito, CartaoCreditoModel.id_usuario,
+               CartaoCreditoModel.dia_vencimento, CartaoCreditoModel.dia_fechamento,
+               faturas.c.data_vencimento, faturas.c.data_fechamento, faturas.c.id_conta)
+        .outerjoin(faturas, and_(faturas.c.id_cartao_credito == CartaoCreditoModel.id_cartao_credito,
+                                 faturas.c.ordem == 1))
+        .where(CartaoCreditoModel.id_cartao_credito.in_(ids_cartao))
+    )).all()
+
+    existentes = set()
+    if de is not None:
+        # só com a janela pedida vale olhar antes da última fatura (compra retroativa, cartão com buracos)
+        existentes = {(id_cartao, primeiro_dia(fechamento)) for id_cartao, fechamento in (await session.execute(
+            select(FaturaModel.id_cartao_credito, FaturaModel.data_fechamento)
+            .where(FaturaModel.id_cartao_credito.in_(ids_cartao),
+                   FaturaModel.data_fechamento >= primeiro_dia(de),
+                   FaturaModel.data_fechamento < somar_meses(primeiro_dia(ate), 1))
+        )).all()}
+
+    linhas, donos = [], {}
+    for id_cartao, id_usuario, dia_vencimento, dia_fechamento, vencimento, fechamento, id_conta in cartoes:
+        if dia_vencimento is None or dia_fechamento is None:
+            if fechamento is None:
+                logger.warning("Cartão %s sem dias de fechamento e vencimento e sem faturas", id_cartao)
+                continue
+            dia_vencimento, dia_fechamento = vencimento.day, fechamento.day
+        if de is not None:
+            inicio = de
+        elif fechamento is not None:
+            inicio = somar_meses(primeiro_dia(fechamento), 1)
+        else:
+            inicio = hoje or date.today()
+        donos[id_cartao] = id_usuario
+        linhas.extend(linha for linha in faturas_dos_meses(id_cartao, dia_vencimento, dia_fechamento, inicio, ate,
+                                                           id_conta)
+                      if (id_cartao, primeiro_dia(linha["data_fechamento"])) not in existentes)
+    return await inserir_faturas(session, linhas, donos)
+
+
+async def estender_faturas(session: AsyncSession, ate: date, lote: int = LOTE, hoje: Optional[date] = None) -> int:
+    """Faturas de todos os cartões ativos até o mês de ``ate``, com commit a cada ``lote`` cartões."""
+    criadas = 0
+    ultimo = 0
+    while True:
+        ids = (await session.execute(
+            select(CartaoCreditoModel.id_cartao_credito)
+            .where(CartaoCreditoModel.ativo == True, CartaoCreditoModel.id_cartao_credito > ultimo)  # noqa: E712
+            .order_by(CartaoCreditoModel.id_cartao_credito)
+            .limit(lote)
+        )).scalars().all()
+        if not ids:
+            return criadas
+        criadas += await garantir_faturas(session, ids, ate, hoje=hoje)
+        await session.commit()
+        ultimo = ids[-1]
+
+
+async def _recorrencias_em_aberto(session: AsyncSession, depois_de: int, fim: date, lote: int):
+    """
+    Próximo lote de recorrências (modelo, REPETICAO, cartão do modelo) que começam antes de
+    ``fim`` e ainda têm ocorrência sem linha.
+    """
+    gravadas = aliased(MovimentacaoModel)
+    linhas = (
+        select(func.count()).select_from(gravadas)
+        .where(gravadas.id_repeticao == RepeticaoModel.id_repeticao)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        select(MovimentacaoModel, RepeticaoModel, FaturaModel.id_cartao_credito)
+        .join(RepeticaoModel, RepeticaoModel.id_repeticao == MovimentacaoModel.id_repeticao)
+        .outerjoin(FaturaModel, FaturaModel.id_fatura == MovimentacaoModel.id_fatura)
+        .options(selectinload(MovimentacaoModel.divisoes))
+        .where(
+            RepeticaoModel.id_repeticao > depois_de,
+            RepeticaoModel.data_inicio < fim,
+            MovimentacaoModel.parcela_atual == PARCELA_MODELO,
+            MovimentacaoModel.condicao_pagamento == CondicaoPagamento.RECORRENTE,
+            or_(RepeticaoModel.quantidade_parcelas.is_(None), linhas < RepeticaoModel.quantidade_parcelas),
+        )
+        .order_by(RepeticaoModel.id_repeticao)
+        .limit(lote)
+    )
+    return result.all()
+
+
+async def materializar_recorrencias(session: AsyncSession, fim: date, lote: int = LOTE,
+                                    hoje: Optional[date] = None) -> int:
+    """
+    Grava as ocorrências das recorrências com data antes de ``fim`` que ainda não são
+    linha, com commit a cada ``lote`` recorrências. Devolve quantas foram gravadas.
+    """
+    mes_atual = primeiro_dia(hoje or date.today())
+    gravadas = 0
+    ultimo = 0
+    while True:
+        recorrencias = await _recorrencias_em_aberto(session, ultimo, fim, lote)
+        if not recorrencias:
+            return gravadas
+
+        modelos = [{
+            "id_repeticao": repeticao.id_repeticao,
+            "tipo_recorrencia": repeticao.tipo_recorrencia,
+            "data_inicio": repeticao.data_inicio,
+            "quantidade_parcelas": repeticao.quantidade_parcelas,
+            "modelo": modelo,
+            "id_cartao_credito": id_cartao if modelo.forma_pagamento == FormaPagamento.CREDITO else None,
+        } for modelo, repeticao, id_cartao in recorrencias]
+        materializadas = await parcelas_materializadas(session, (m["id_repeticao"] for m in modelos))
+        ocorrencias = ocorrencias_virtuais(modelos, materializadas, date.min, fim)
+
+        ids_cartao = {m["id_cartao_credito"] for m, _, _ in ocorrencias if m["id_cartao_credito"] is not None}
+        calendarios = await calendarios_dos_cartoes(session, ids_cartao)
+        datas_fatura = {}
+        for modelo, parcela, data in ocorrencias:
+            if modelo["id_cartao_credito"] is not None:
+                datas_fatura[(modelo["id_repeticao"], parcela)] = calendarios[modelo["id_cartao_credito"]].resolver(data)
+        faturas: Dict[int, FaturaModel] = {}
+        cartoes: Dict[int, CartaoCreditoModel] = {}
+        ids_fatura = {datas.id_fatura for datas in datas_fatura.values() if datas is not None}
+        if ids_fatura:
+            faturas = {fatura.id_fatura: fatura for fatura in (await session.execute(
+                select(FaturaModel).where(FaturaModel.id_fatura.in_(ids_fatura)))).scalars()}
+            cartoes = {cartao.id_cartao_credito: cartao for cartao in (await session.execute(
+                select(CartaoCreditoModel).where(CartaoCreditoModel.id_cartao_credito.in_(ids_cartao)))).scalars()}
+
+        novas = []
+        for modelo, parcela, data in ocorrencias:
+            ocorrencia = nova_ocorrencia(modelo["modelo"], parcela, data)
+            if modelo["id_cartao_credito"] is not None:
+                datas = datas_fatura[(modelo["id_repeticao"], parcela)]
+                if datas is None:
+                    # sem fatura para a data (antes da primeira ou além do horizonte): continua virtual
+                    logger.debug("Parcela %s da repetição %s sem fatura em %s", parcela, modelo["id_repeticao"], data)
+                    continue
+                fatura, cartao = faturas[datas.id_fatura], cartoes[modelo["id_cartao_credito"]]
+                ocorrencia.id_fatura = fatura.id_fatura
+                # como na criação: só entra no limite e nos gastos da fatura a partir do mês do pagamento
+                ocorrencia.participa_limite_fatura_gastos = primeiro_dia(data) <= mes_atual
+                if ocorrencia.participa_limite_fatura_gastos:
+                    cartao.limite_disponivel -= ocorrencia.valor
+                    fatura.fatura_gastos += ocorrencia.valor
+            novas.append((modelo["modelo"], ocorrencia))
+
+        session.add_all(ocorrencia for _, ocorrencia in novas)
+        try:
+            await session.flush()
+        except IntegrityError:
+            # uma requisição materializou uma destas parcelas no meio (ux_movimentacao_repeticao_parcela):
+            # desfaz o lote, com limite e gastos, e o refaz relendo as parcelas gravadas
+            logger.info("Parcela materializada durante o lote depois da repetição %s; refazendo", ultimo)
+            await session.rollback()
+            continue
+        session.add_all(divisao for modelo, ocorrencia in novas
+                        for divisao in divisoes_da_ocorrencia(modelo, ocorrencia.id_movimentacao))
+        await session.commit()
+        gravadas += len(novas)
+        ultimo = recorrencias[-1][1].id_repeticao
+
+
+def fim_das_recorrencias(hoje: Optional[date] = None) -> date:
+    """Fim (exclusivo) da janela de ocorrências gravadas: o fim do mês atual mais HORIZONTE_RECORRENCIAS_MESES."""
+    return somar_meses(primeiro_dia(hoje or date.today()), MESES_RECORRENCIAS + 1)
+
+
+@exclusivo("horizonte")
+@medir_job("horizonte")
+async def horizonte_job():
+    mes_atual = primeiro_dia(date.today())
+    async with Session() as session:
+        faturas = await estender_faturas(session, somar_meses(mes_atual, MESES_FATURAS))
+        ocorrencias = await materializar_recorrencias(session, fim_das_recorrencias())
+    logger.info("Horizonte: %s fatura(s) e %s ocorrência(s) recorrente(s) criadas", faturas, ocorrencias,
+                extra={"horizonte": {"faturas": faturas, "ocorrencias": ocorrencias}})
+    return {"faturas": faturas, "ocorrencias": ocorrencias}
@@ -0,0 +1,175 @@
+"""
+Instrumentação das consultas SQL por requisição.
+
+Os eventos do engine contam os statements, o tempo gasto no banco e as repetições
+de cada "impressão digital" (o SQL com os valores trocados por ?), o que denuncia
+round trips escondidos em laços (N+1). O middleware abre uma coleta por requisição,
+devolve o resumo no header Server-Timing e registra um log estruturado.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# a partir de quantas execuções do mesmo statement numa requisição ele é tratado como N+1
+LIMIAR_REPETICAO = 5
+
+_PARAMETROS = re.compile(r"%\(\w+\)s|\$\d+|\?")
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+def impressao_digital(statement: str) -> str:
+    """Normaliza o SQL para que execuções com valores diferentes caiam na mesma chave."""
+    sql = _PARAMETROS.sub("?", statement)
+    sql = _LITERAIS.sub("?", sql)
+    sql = _LISTAS.sub("(?)", sql)
+    return _ESPACOS.sub(" ", sql).strip()
+
+
+class ColetaConsultas:
+    """Acumula as consultas executadas dentro de uma requisição (ou bloco de teste).
+
+    Coletas aninhadas repassam cada consulta para a coleta de fora, então um
+    benchmark ou teste que envolve requisições também enxerga o total delas.
+    """
+
+    def __init__(self, pai: Optional["ColetaConsultas"] = None):
+        self.pai = pai
+        self.total = 0
+        self.tempo_db = 0.0
+        self.impressoes: Counter = Counter()
+
+    def registrar(self, statement: str, duracao: float):
+        self.total += 1
+        self.tempo_db += duracao
+        self.impressoes[impressao_digital(statement)] += 1
+        if self.pai is not None:
+            self.pai.registrar(statement, duracao)
+
+    def repetidas(self, limiar: int = LIMIAR_REPETICAO) -> Dict[str, int]:
+        return {sql: vezes for sql, vezes in self.impressoes.most_common() if vezes >= limiar}
+
+    def resumo(self) -> dict:
+        return {
+            "consultas": self.total,
+            "tempo_db_ms": round(self.tempo_db * 1000, 2),
+            "repetidas": self.repetidas(),
+        }
+
+
+_coleta_atual: ContextVar[Optional[ColetaConsultas]] = ContextVar("coleta_consultas", default=None)
+_observadores: List[Callable[[str, ColetaConsultas], None]] = []
+
+
+@contextmanager
+def coletar_consultas() -> Iterator[ColetaConsultas]:
+    coleta = ColetaConsultas(pai=_coleta_atual.get())
+    token = _coleta_atual.set(coleta)
+    try:
+        yield coleta
+    finally:
+        _coleta_atual.reset(token)
+
+
+def registrar_observador(observador: Callable[[str, ColetaConsultas], None]):
+    """Recebe (rota, coleta) ao final de cada requisição; usado pelo plugin de orçamento de consultas."""
+    _observadores.append(observador)
+
+
+def remover_observador(observador: Callable[[str, ColetaConsultas], None]):
+    if observador in _observadores:
+        _observadores.remove(observador)
+
+
+def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    # no contexto da execução, não no conn.info: o after_cursor_execute não roda quando o statement falha,
+    # e o que ficasse na conexão do pool não sairia mais
+    if _coleta_atual.get() is not None:
+        context._inicio_consulta = time.perf_counter()
+
+
+def _depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    coleta = _coleta_atual.get()
+    inicio = getattr(context, "_inicio_consulta", None)
+    if coleta is None or inicio is None:
+        return
+    coleta.registrar(statement, time.perf_counter() - inicio)
+
+
+def instrumentar_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _antes_de_executar):
+        event.listen(sync_engine, "before_cursor_execute", _antes_de_executar)
+        event.listen(sync_engine, "after_cursor_execute", _depois_de_executar)
+
+
+def server_timing(coleta: ColetaConsultas, duracao_total: float) -> str:
+    repetidas = sum(coleta.repetidas().values())
+    return (
+        f'db;dur={coleta.tempo_db * 1000:.2f};desc="{coleta.total} consultas, {repetidas} repetidas", '
+        f'app;dur={duracao_total * 1000:.2f}'
+    )
+
+
+def _nome_rota(scope) -> str:
+    rota = scope.get("route")
+    return getattr(rota, "path", None) or scope.get("path", "")
+
+
+class InstrumentacaoSQLMiddleware:
+    """Middleware ASGI que coleta as consultas de cada requisição HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = 500
+
+        with coletar_consultas() as coleta:
+            async def send_com_timing(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(coleta, time.perf_counter() - inicio).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_com_timing)
+            finally:
+                self._finalizar(scope, coleta, status, time.perf_counter() - inicio)
+
+    def _finalizar(self, scope, coleta: ColetaConsultas, status: int, duracao: float):
+        rota = _nome_rota(scope)
+        resumo = {
+            "metodo": scope.get("method"),
+            "rota": rota,
+            "status": status,
+            "duracao_ms": round(duracao * 1000, 2),
+            **coleta.resumo(),
+        }
+        nivel = logging.WARNING if resumo["repetidas"] else logging.INFO
+        logger.log(
+            nivel,
+            "sql metodo=%s rota=%s status=%s consultas=%d tempo_db_ms=%.2f repetidas=%d",
+            resumo["metodo"], rota, status, coleta.total, resumo["tempo_db_ms"], len(resumo["repetidas"]),
+            extra={"sql": resumo},
+        )
+        for observador in list(_observadores):
+            observador(rota, coleta)
@@ -0,0 +1,171 @@
+"""
+Logging estruturado e não bloqueante.
+
+Os módulos usam ``logging.getLogger(__name__)`` normalmente. configurar_logging()
+troca os handlers da raiz por um QueueHandler: quem loga só enfileira o registro
+(já com request_id e segredos mascarados) e uma thread do QueueListener faz a
+escrita em JSON no stdout, fora do event loop.
+
+Use ``logger.debug("... %s", valor)`` com argumentos, nunca f-string: com o nível
+acima de DEBUG a chamada retorna antes de formatar qualquer coisa.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from decouple import config
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+MASCARA = "***"
+CHAVES_SENSIVEIS = ("senha", "password", "secret", "token", "authorization", "api_key")
+
+_SENSIVEL_CHAVE_VALOR = re.compile(
+    r"(?i)(\b\w*(?:%s)\w*\b[\"']?\s*[:=]\s*[\"']?)([^\s,;\"'}]+)" % "|".join(CHAVES_SENSIVEIS)
+)
+_BEARER = re.compile(r"(?i)(bearer\s+)[\w\-.~+/]+=*")
+_JWT = re.compile(r"\beyJ[\w-]+\.[\w-]+\.[\w-]+")
+
+# atributos que todo LogRecord tem; o resto veio via extra= e vai para o JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+
+def mascarar(texto: str) -> str:
+    texto = _SENSIVEL_CHAVE_VALOR.sub(lambda m: m.group(1) + MASCARA, texto)
+    texto = _BEARER.sub(lambda m: m.group(1) + MASCARA, texto)
+    return _JWT.sub(MASCARA, texto)
+
+
+def _mascarar_extra(valor):
+    if isinstance(valor, dict):
+        return {
+            chave: MASCARA if any(s in str(chave).lower() for s in CHAVES_SENSIVEIS) else _mascarar_extra(v)
+            for chave, v in valor.items()
+        }
+    if isinstance(valor, str):
+        return mascarar(valor)
+    return valor
+
+
+class ContextoFilter(logging.Filter):
+    """Anexa o request_id da requisição atual e mascara segredos antes de o registro sair da thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        mensagem = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args = mascarar(mensagem), None
+        if record.exc_text:
+            record.exc_text = mascarar(record.exc_text)
+        for chave, valor in list(vars(record).items()):
+            if chave not in _ATRIBUTOS_PADRAO:
+                setattr(record, chave, _mascarar_extra(valor))
+        return True
+
+
+class FormatadorJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            dados["request_id"] = record.request_id
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                dados[chave] = valor
+        if record.exc_text:
+            dados["exc"] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class _QueueHandlerEstruturado(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # a mensagem e o traceback (exc_text) já foram resolvidos no filtro; o QueueHandler padrão
+        # colaria o traceback na mensagem, e o objeto da exceção não precisa atravessar a fila
+        record = copy.copy(record)
+        record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configurar_logging(nivel: Optional[str] = None, formato: Optional[str] = None) -> QueueListener:
+    """Instala o QueueHandler na raiz; chamar de novo substitui o listener anterior."""
+    global _listener
+
+    nivel = (nivel or config("LOG_LEVEL", default="INFO")).upper()
+    formato = formato or config("LOG_FORMAT", default="json")
+
+    saida = logging.StreamHandler(sys.stdout)
+    if formato == "json":
+        saida.setFormatter(FormatadorJSON())
+    else:
+        saida.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    if _listener is not None:
+        _listener.stop()
+
+    fila: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandlerEstruturado(fila)
+    handler.addFilter(ContextoFilter())
+
+    raiz = logging.getLogger()
+    for antigo in list(raiz.handlers):
+        raiz.removeHandler(antigo)
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel)
+
+    _listener = QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def parar_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(parar_logging)
+
+
+class RequestIdMiddleware:
+    """Propaga o X-Request-ID recebido (ou gera um) para os logs e para a resposta."""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        recebido = dict(scope.get("headers", [])).get(self.header)
+        valor = recebido.decode("latin-1")[:64] if recebido else uuid.uuid4().hex
+        token = request_id.set(valor)
+
+        async def send_com_request_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (self.header, valor.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_com_request_id)
+        finally:
+            request_id.reset(token)
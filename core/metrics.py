@@ -0,0 +1,294 @@
+"""
+Métricas da aplicação no formato de exposição de texto do Prometheus.
+
+Contadores, gauges e histogramas guardam os valores em um shard por thread: no
+caminho quente cada thread só escreve no próprio dicionário, sem lock. O lock
+existe apenas para registrar o shard de uma thread nova; a leitura em /metrics
+soma os shards.
+"""
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Rotulos = Tuple[str, ...]
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+def _formatar_rotulos(nomes: Sequence[str], valores: Sequence[str]) -> str:
+    if not nomes:
+        return ""
+    pares = ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores))
+    return "{" + pares + "}"
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.valores
+        except AttributeError:
+            valores: dict = {}
+            with self._lock:
+                self._shards.append(valores)
+            self._local.valores = valores
+            return valores
+
+    def _somar_shards(self) -> Dict[Rotulos, float]:
+        total: Dict[Rotulos, float] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for rotulos, valor in list(shard.items()):
+                total[rotulos] = total.get(rotulos, 0) + valor
+        return total
+
+    def _amostras(self) -> Iterable[str]:
+        for rotulos, valor in sorted(self._somar_shards().items()):
+            yield f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {_formatar_numero(valor)}"
+
+    def expor(self) -> str:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        linhas.extend(self._amostras())
+        return "\n".join(linhas)
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, rotulos: Rotulos = (), valor: float = 1):
+        shard = self._shard()
+        shard[rotulos] = shard.get(rotulos, 0) + valor
+
+    def valor(self, rotulos: Rotulos = ()) -> float:
+        return self._somar_shards().get(rotulos, 0)
+
+
+class Gauge(Contador):
+    """Gauge que sobe e desce (ex.: requisições em andamento); cada shard guarda a própria variação."""
+    tipo = "gauge"
+
+    def dec(self, rotulos: Rotulos = (), valor: float = 1):
+        self.inc(rotulos, -valor)
+
+
+class GaugeFuncao(_Metrica):
+    """Gauge calculado na hora da leitura, para valores que já existem em outro lugar (ex.: pool do banco)."""
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str], funcao: Callable[[], Dict[Rotulos, float]]):
+        super().__init__(nome, ajuda, rotulos)
+        self.funcao = funcao
+
+    def _somar_shards(self) -> Dict[Rotulos, float]:
+        return self.funcao()
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_PADRAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor: float, rotulos: Rotulos = ()):
+        shard = self._shard()
+        dados = shard.get(rotulos)
+        if dados is None:
+            # [soma, contagem por bucket..., contagem acima do último bucket]
+            dados = shard[rotulos] = [0.0] + [0] * (len(self.buckets) + 1)
+        dados[0] += valor
+        dados[1 + bisect_left(self.buckets, valor)] += 1
+
+    def _somar_shards(self) -> Dict[Rotulos, List[float]]:
+        total: Dict[Rotulos, List[float]] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for rotulos, dados in list(shard.items()):
+                acumulado = total.setdefault(rotulos, [0.0] * len(dados))
+                for i, valor in enumerate(list(dados)):
+                    acumulado[i] += valor
+        return total
+
+    def _amostras(self) -> Iterable[str]:
+        nomes_bucket = self.rotulos + ("le",)
+        for rotulos, dados in sorted(self._somar_shards().items()):
+            acumulado = 0
+            for limite, quantidade in zip(self.buckets + (float("inf"),), dados[1:]):
+                acumulado += quantidade
+                yield (f"{self.nome}_bucket{_formatar_rotulos(nomes_bucket, rotulos + (_formatar_numero(limite),))} "
+                       f"{_formatar_numero(acumulado)}")
+            yield f"{self.nome}_sum{_formatar_rotulos(self.rotulos, rotulos)} {_formatar_numero(dados[0])}"
+            yield f"{self.nome}_count{_formatar_rotulos(self.rotulos, rotulos)} {_formatar_numero(acumulado)}"
+
+
+class Registro:
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def registrar(self, metrica: _Metrica) -> _Metrica:
+        self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def expor(self) -> str:
+        return "\n".join(metrica.expor() for metrica in self._metricas.values()) + "\n"
+
+
+registro = Registro()
+
+HTTP_REQUISICOES = registro.registrar(Contador(
+    "http_requisicoes_total", "Requisições HTTP atendidas.", ("metodo", "rota", "status")))
+HTTP_DURACAO = registro.registrar(Histograma(
+    "http_requisicao_duracao_segundos", "Latência das requisições HTTP por rota.", ("metodo", "rota")))
+HTTP_EM_ANDAMENTO = registro.registrar(Gauge(
+    "http_requisicoes_em_andamento", "Requisições HTTP sendo processadas.", ("metodo",)))
+JOB_EXECUCOES = registro.registrar(Contador(
+    "job_execucoes_total", "Execuções das rotinas agendadas.", ("job", "resultado")))
+JOB_DURACAO = registro.registrar(Histograma(
+    "job_duracao_segundos", "Duração das rotinas agendadas.", ("job",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0)))
+EMAILS_ENVIADOS = registro.registrar(Contador(
+    "emails_enviados_total", "Tentativas de envio de e-mail por origem e resultado.", ("origem", "resultado")))
+CONCILIACAO_DIVERGENCIAS = registro.registrar(Contador(
+    "conciliacao_divergencias_total", "Totais de fatura/cartão divergentes encontrados pela conciliação.",
+    ("tipo", "reparada")))
+ORCAMENTO_ALERTAS = registro.registrar(Contador(
+    "orcamento_alertas_total", "Avisos de orçamento de categoria enfileirados, por limiar.", ("limiar",)))
+LEITURAS_ROTEADAS = registro.registrar(Contador(
+    "db_leituras_roteadas_total", "Sessões de leitura por destino (replica, primario, fallback).", ("destino",)))
+
+
+_POOLS: Dict[str, object] = {}
+
+
+def _estado_pools() -> Dict[Rotulos, float]:
+    estado = {}
+    for banco, pool in _POOLS.items():
+        if not hasattr(pool, "checkedout"):
+            continue
+        estado.update({
+            (banco, "tamanho"): pool.size(),
+            (banco, "em_uso"): pool.checkedout(),
+            (banco, "ociosas"): pool.checkedin(),
+            (banco, "overflow"): max(pool.overflow(), 0),
+        })
+    return estado
+
+
+registro.registrar(GaugeFuncao(
+    "db_pool_conexoes", "Conexões do pool do banco por estado.", ("banco", "estado"), _estado_pools))
+
+
+def registrar_pool(engine: AsyncEngine, banco: str = "primario"):
+    """Expõe o estado do pool de conexões do engine (QueuePool) como gauges."""
+    _POOLS[banco] = engine.sync_engine.pool
+
+
+def medir_job(nome: str):
+    """Decorator que conta as execuções (ok/erro) e a duração de uma rotina agendada."""
+    def decorator(funcao):
+        def registrar(inicio: float, resultado: str):
+            JOB_EXECUCOES.inc((nome, resultado))
+            JOB_DURACAO.observar(time.perf_counter() - inicio, (nome,))
+
+        if inspect.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def wrapper_async(*args, **kwargs):
+                inicio = time.perf_counter()
+                try:
+                    retorno = await funcao(*args, **kwargs)
+                except Exception:
+                    registrar(inicio, "erro")
+                    raise
+                registrar(inicio, "ok")
+                return retorno
+            return wrapper_async
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                retorno = funcao(*args, **kwargs)
+            except Exception:
+                registrar(inicio, "erro")
+                raise
+            registrar(inicio, "ok")
+            return retorno
+        return wrapper
+    return decorator
+
+
+def contar_envio_email(origem: str):
+    """Decorator para as funções send_email: conta sucesso ou falha de cada envio."""
+    def decorator(funcao):
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            try:
+                retorno = funcao(*args, **kwargs)
+            except Exception:
+                EMAILS_ENVIADOS.inc((origem, "falha"))
+                raise
+            EMAILS_ENVIADOS.inc((origem, "sucesso"))
+            return retorno
+        return wrapper
+    return decorator
+
+
+class MetricasHTTPMiddleware:
+    """Middleware ASGI com latência por rota, total de requisições e requisições em andamento."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        status = 500
+        inicio = time.perf_counter()
+
+        async def send_com_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_EM_ANDAMENTO.inc((metodo,))
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            HTTP_EM_ANDAMENTO.dec((metodo,))
+            # o template da rota (/movimentacao/{id}) mantém a cardinalidade baixa; sem rota, 404 etc.
+            rota = getattr(scope.get("route"), "path", None) or "desconhecida"
+            HTTP_REQUISICOES.inc((metodo, rota, str(status)))
+            HTTP_DURACAO.observar(time.perf_counter() - inicio, (metodo, rota))
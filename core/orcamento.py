@@ -0,0 +1,284 @@
+"""
+Orçamento por categoria: consumo do mês mantido a cada escrita e avisos de limiar.
+
+calcular_orcamento_mensal somava, a cada chamada, a parte do usuário nas divisões das
+despesas do mês, e os clientes consultavam o endpoint o tempo todo para avisar quem
+estava perto do limite. Agora um hook after_flush da Session aplica ao CONSUMO_CATEGORIA
+a variação de cada despesa incluída, alterada ou apagada (uma leitura e um UPDATE em
+lote para as categorias e meses afetados) e, quando o consumo cruza um dos
+ORCAMENTO_LIMIARES (% de valor_categoria), enfileira um aviso no ALERTA_ORCAMENTO. Se o
+consumo volta para baixo do limiar, o aviso fica rearmado.
+
+Um contador que ainda não existe nasce com a soma do mês no banco, que já inclui o flush
+corrente; é o único momento em que a agregação roda.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from itertools import chain
+from typing import Dict, Iterable, Optional, Tuple
+
+from decouple import Csv, config
+from sqlalchemy import and_, bindparam, event, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session as SessionSync, attributes
+
+from core.metrics import ORCAMENTO_ALERTAS
+from core.saldos import primeiro_dia, somar_meses
+from models.alerta_orcamento_model import AlertaOrcamentoModel
+from models.categoria_model import CategoriaModel
+from models.consumo_categoria_model import ConsumoCategoriaModel
+from models.divide_model import DivideModel
+from models.enums import TipoMovimentacao
+from models.movimentacao_model import MovimentacaoModel
+from models.parente_model import ParenteModel
+from models.usuario_model import UsuarioModel
+
+LIMIARES = tuple(sorted(config("ORCAMENTO_LIMIARES", default="80,100", cast=Csv(int))))
+
+# (id_usuario, id_categoria, mês)
+Chave = Tuple[int, int, date]
+
+# na ordem dos parâmetros de _chave
+_CAMPOS_MOVIMENTACAO = ("id_usuario", "id_categoria", "tipoMovimentacao", "data_pagamento")
+_CAMPOS_DIVIDE = ("id_parente", "valor")
+
+
+def _decimal(valor) -> Decimal:
+    return Decimal(str(valor or 0))
+
+
+def _anterior(objeto, campo: str):
+    historico = attributes.get_history(objeto, campo)
+    if historico.deleted:
+        return historico.deleted[0]
+    return getattr(objeto, campo)
+
+
+def _chave(id_usuario, id_categoria, tipo, data_pagamento) -> Optional[Chave]:
+    if tipo != TipoMovimentacao.DESPESA or id_categoria is None or data_pagamento is None:
+        return None
+    return id_usuario, id_categoria, primeiro_dia(data_pagamento)
+
+
+def _parente_do_usuario():
+    """O próprio usuário entre os parentes dele: mesmo nome (o critério de calcular_orcamento_mensal)."""
+    return and_(UsuarioModel.id_usuario == ParenteModel.id_usuario, UsuarioModel.nome_completo == ParenteModel.nome)
+
+
+def consulta_consumo(ids_categoria: Iterable[int], desde: date, ate: date):
+    """Parte do usuário nas despesas com pagamento em [desde, ate), por categoria e mês."""
+    ano = func.extract("year", MovimentacaoModel.data_pagamento)
+    mes = func.extract("month", MovimentacaoModel.data_pagamento)
+    return (
+        select(MovimentacaoModel.id_categoria, ano, mes, func.coalesce(func.sum(DivideModel.valor), 0))
+        .select_from(DivideModel)
+        .join(MovimentacaoModel, MovimentacaoModel.id_movimentacao == DivideModel.id_movimentacao)
+        .join(ParenteModel, ParenteModel.id_parente == DivideModel.id_parente)
+        .join(UsuarioModel, _parente_do_usuario())
+        .where(MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.DESPESA,
+               MovimentacaoModel.id_categoria.in_(list(ids_categoria)),
+               MovimentacaoModel.data_pagamento >= desde,
+               MovimentacaoModel.data_pagamento < ate)
+        .group_by(MovimentacaoModel.id_categoria, ano, mes)
+    )
+
+
+def _inserir_consumos(dialeto: str, linhas: list):
+    """INSERT que ignora contadores criados ao mesmo tempo por outra transação."""
+    if dialeto == "postgresql":
+        return postgresql.insert(ConsumoCategoriaModel).values(linhas).on_conflict_do_nothing()
+    if dialeto == "sqlite":
+        return sqlite.insert(ConsumoCategoriaModel).values(linhas).on_conflict_do_nothing()
+    return insert(ConsumoCategoriaModel).values(linhas)
+
+
+def limiar_cruzado(consumido: Decimal, valor_categoria) -> int:
+    if not valor_categoria or valor_categoria <= 0:
+        return 0
+    return max((limiar for limiar in LIMIARES if consumido * 100 >= _decimal(valor_categoria) * limiar), default=0)
+
+
+@event.listens_for(SessionSync, "after_flush")
+def _atualizar_consumos(session, flush_context):
+    divisoes, movimentacoes, categorias = [], [], []
+    for objeto in chain(session.new, session.dirty, session.deleted):
+        if isinstance(objeto, DivideModel):
+            divisoes.append(objeto)
+        elif isinstance(objeto, MovimentacaoModel):
+            movimentacoes.append(objeto)
+        elif (isinstance(objeto, CategoriaModel) and objeto not in session.new
+              and attributes.get_history(objeto, "valor_categoria").has_changes()):
+            categorias.append(objeto)
+    if not (divisoes or movimentacoes or categorias):
+        return
+
+    novos, removidos = session.new, session.deleted
+    conexao = session.connection()
+
+    # chave antiga e nova das movimentações deste flush; as demais não mudaram de chave
+    chaves: Dict[int, Tuple[Optional[Chave], Optional[Chave]]] = {}
+    for movimentacao in movimentacoes:
+        antiga = None if movimentacao in novos else _chave(*(_anterior(movimentacao, c) for c in _CAMPOS_MOVIMENTACAO))
+        nova = None if movimentacao in removidos else _chave(*(getattr(movimentacao, c) for c in _CAMPOS_MOVIMENTACAO))
+        chaves[movimentacao.id_movimentacao] = (antiga, nova)
+
+    divisoes = [d for d in divisoes if d in novos or d in removidos
+                or any(attributes.get_history(d, campo).has_changes() for campo in _CAMPOS_DIVIDE)]
+    faltando = {d.id_movimentacao for d in divisoes} - chaves.keys()
+    if faltando:
+        result = conexao.execute(
+            select(MovimentacaoModel.id_movimentacao, *(getattr(MovimentacaoModel, c) for c in _CAMPOS_MOVIMENTACAO))
+            .where(MovimentacaoModel.id_movimentacao.in_(faltando)))
+        for id_movimentacao, *campos in result.all():
+            chave = _chave(*campos)
+            chaves[id_movimentacao] = (chave, chave)
+
+    variacoes: Dict[Chave, Decimal] = defaultdict(Decimal)
+    usuarios = {chave[0] for par in chaves.values() for chave in par if chave is not None}
+    if usuarios:
+        proprios = set(conexao.execute(
+            select(ParenteModel.id_parente).join(UsuarioModel, _parente_do_usuario())
+            .where(ParenteModel.id_usuario.in_(usuarios))).scalars())
+
+        for divisao in divisoes:
+            antiga, nova = chaves.get(divisao.id_movimentacao, (None, None))
+            if antiga and divisao not in novos and _anterior(divisao, "id_parente") in proprios:
+                variacoes[antiga] -= _decimal(_anterior(divisao, "valor"))
+            if nova and divisao not in removidos and divisao.id_parente in proprios:
+                variacoes[nova] += _decimal(divisao.valor)
+
+        # mudou categoria/data/tipo: as divisões que não mudaram também trocam de contador
+        movidas = [m.id_movimentacao for m in movimentacoes if m not in novos and m not in removidos
+                   and chaves[m.id_movimentacao][0] != chaves[m.id_movimentacao][1]]
+        if movidas and proprios:
+            tocadas = {(d.id_parente, d.id_movimentacao) for d in divisoes}
+            result = conexao.execute(
+                select(DivideModel.id_movimentacao, DivideModel.id_parente, DivideModel.valor)
+                .where(DivideModel.id_movimentacao.in_(movidas), DivideModel.id_parente.in_(proprios)))
+            for id_movimentacao, id_parente, valor in result.all():
+                if (id_parente, id_movimentacao) not in tocadas:
+                    antiga, nova = chaves[id_movimentacao]
+                    if antiga:
+                        variacoes[antiga] -= _decimal(valor)
+                    if nova:
+                        variacoes[nova] += _decimal(valor)
+
+    mes_atual = primeiro_dia(date.today())
+    for categoria in categorias:
+        # orçamento mudou: só reavalia os limiares do mês
+        variacoes.setdefault((categoria.id_usuario, categoria.id_categoria, mes_atual), Decimal(0))
+
+    _aplicar(conexao, variacoes, mes_atual)
+
+
+def _aplicar(conexao, variacoes: Dict[Chave, Decimal], mes_atual: date):
+    """Aplica as variações em lote: uma leitura, um UPDATE executemany e, se faltar contador, uma agregação."""
+    categorias = {chave[1] for chave in variacoes}
+    meses = sorted({chave[2] for chave in variacoes})
+    existentes = {
+        (id_categoria, mes): (_decimal(valor), notificado)
+        for id_categoria, mes, valor, notificado in conexao.execute(
+            select(ConsumoCategoriaModel.id_categoria, ConsumoCategoriaModel.mes,
+                   ConsumoCategoriaModel.valor_consumido, ConsumoCategoriaModel.limiar_notificado)
+            .where(ConsumoCategoriaModel.id_categoria.in_(categorias), ConsumoCategoriaModel.mes.in_(meses))).all()
+    }
+
+    consumos: Dict[Chave, Tuple[Decimal, int]] = {}
+    somar = []
+    faltando = []
+    for chave, variacao in variacoes.items():
+        atual = existentes.get(chave[1:])
+        if atual is not None:
+            consumos[chave] = (atual[0] + variacao, atual[1])
+            if variacao:
+                somar.append({"b_categoria": chave[1], "b_mes": chave[2], "b_variacao": variacao})
+        elif variacao:
+            faltando.append(chave)
+        # sem contador e sem variação (só o orçamento mudou): nada a reavaliar
+
+    if faltando:
+        # o banco já tem este flush: a soma do mês é o valor inicial do contador
+        totais = {
+            (id_categoria, date(int(ano), int(mes), 1)): _decimal(total)
+            for id_categoria, ano, mes, total in conexao.execute(consulta_consumo(
+                {chave[1] for chave in faltando}, min(chave[2] for chave in faltando),
+                somar_meses(max(chave[2] for chave in faltando), 1))).all()
+        }
+        linhas = [{"id_categoria": id_categoria, "mes": mes, "id_usuario": id_usuario,
+                   "valor_consumido": totais.get((id_categoria, mes), Decimal(0)), "limiar_notificado": 0}
+                  for id_usuario, id_categoria, mes in faltando]
+        inseridas = set(conexao.execute(_inserir_consumos(conexao.dialect.name, linhas).returning(
+            ConsumoCategoriaModel.id_categoria, ConsumoCategoriaModel.mes)).all())
+        for linha, chave in zip(linhas, faltando):
+            consumos[chave] = (linha["valor_consumido"], 0)
+            if chave[1:] not in inseridas:
+                # outra transação criou o contador antes: a variação entra nele
+                somar.append({"b_categoria": chave[1], "b_mes": chave[2], "b_variacao": variacoes[chave]})
+
+    if somar:
+        conexao.execute(
+            update(ConsumoCategoriaModel)
+            .where(ConsumoCategoriaModel.id_categoria == bindparam("b_categoria"),
+                   ConsumoCategoriaModel.mes == bindparam("b_mes"))
+            .values(valor_consumido=ConsumoCategoriaModel.valor_consumido + bindparam("b_variacao")),
+            somar)
+
+    # avisos só para o mês corrente e os seguintes (parcelas); meses passados só atualizam o consumo
+    a_avaliar = {chave: consumo for chave, consumo in consumos.items() if chave[2] >= mes_atual}
+    if not a_avaliar:
+        return
+    orcamentos = dict(conexao.execute(
+        select(CategoriaModel.id_categoria, CategoriaModel.valor_categoria)
+        .where(CategoriaModel.id_categoria.in_({chave[1] for chave in a_avaliar}))).all())
+
+    alertas, limiares = [], []
+    for (id_usuario, id_categoria, mes), (consumido, notificado) in a_avaliar.items():
+        orcamento = orcamentos.get(id_categoria)
+        cruzado = limiar_cruzado(consumido, orcamento)
+        if cruzado == notificado:
+            continue
+        for limiar in LIMIARES:
+            if notificado < limiar <= cruzado:
+                alertas.append({"id_usuario": id_usuario, "id_categoria": id_categoria, "mes": mes, "limiar": limiar,
+                                "valor_consumido": consumido, "valor_categoria": orcamento})
+                ORCAMENTO_ALERTAS.inc((str(limiar),))
+        limiares.append({"b_categoria": id_categoria, "b_mes": mes, "b_limiar": cruzado})
+    if limiares:
+        conexao.execute(
+            update(ConsumoCategoriaModel)
+            .where(ConsumoCategoriaModel.id_categoria == bindparam("b_categoria"),
+                   ConsumoCategoriaModel.mes == bindparam("b_mes"))
+            .values(limiar_notificado=bindparam("b_limiar")),
+            limiares)
+    if alertas:
+        conexao.execute(insert(AlertaOrcamentoModel), alertas)
+
+
+async def consumos_do_mes(session: AsyncSession, id_usuario: int, ids_categoria: Iterable[int],
+                          mes: date) -> Dict[int, Decimal]:
+    """
+    Consumo do mês das categorias pedidas. Os contadores que faltam (categorias sem
+    despesa desde que o contador existe) são calculados uma vez e gravados.
+    """
+    ids_categoria = list(ids_categoria)
+    if not ids_categoria:
+        return {}
+    result = await session.execute(
+        select(ConsumoCategoriaModel.id_categoria, ConsumoCategoriaModel.valor_consumido)
+        .where(ConsumoCategoriaModel.id_categoria.in_(ids_categoria), ConsumoCategoriaModel.mes == mes))
+    consumos = {id_categoria: _decimal(valor) for id_categoria, valor in result.all()}
+
+    faltando = [id_categoria for id_categoria in ids_categoria if id_categoria not in consumos]
+    if faltando:
+        result = await session.execute(consulta_consumo(faltando, mes, somar_meses(mes, 1)))
+        totais = {id_categoria: total for id_categoria, _, _, total in result.all()}
+        linhas = [{"id_categoria": id_categoria, "mes": mes, "id_usuario": id_usuario,
+                   "valor_consumido": _decimal(totais.get(id_categoria)), "limiar_notificado": 0}
+                  for id_categoria in faltando]
+        conexao = await session.connection()
+        await session.execute(_inserir_consumos(conexao.dialect.name, linhas))
+        await session.commit()
+        consumos.update((linha["id_categoria"], linha["valor_consumido"]) for linha in linhas)
+    return consumos
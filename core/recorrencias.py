@@ -0,0 +1,132 @@
+"""
+Movimentações recorrentes (condição RECORRENTE) como regra, não como linhas.
+
+Uma recorrência é o REPETICAO (tipo_recorrencia, data_inicio e, se a série tem fim,
+quantidade_parcelas ocorrências) mais a primeira ocorrência, gravada na criação: ela é o modelo das outras
+(valor, descrição, categoria, conta ou cartão e divisões). As demais ocorrências não
+existem no MOVIMENTACAO até serem consolidadas ou editadas; as leituras por período
+geram as que caem na janela pedida a partir do modelo, descontando as parcelas que já
+viraram linha (uma ocorrência editada continua com o seu parcela_atual, mesmo que a data
+tenha mudado). Editar o modelo separa a regra: a antiga termina antes da primeira
+ocorrência ainda virtual e uma nova segue dali com o modelo de antes da edição
+(separar_recorrencia em api/v1/endpoints/movimentacao.py), para a edição valer só para
+a primeira.
+
+Antes a criação gravava as 24 ocorrências mensais (ou 4 anuais) de uma vez, e cada uma
+ainda era alterada ou apagada uma a uma depois. Hoje a recorrência nasce sem fim
+(quantidade_parcelas nulo) e só ganha um quando uma ocorrência é apagada.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.divide_model import DivideModel
+from models.enums import TipoRecorrencia
+from models.movimentacao_model import MovimentacaoModel
+
+PARCELA_MODELO = "1"
+
+
+def data_da_ocorrencia(tipo_recorrencia: str, data_inicio: date, parcela: int) -> date:
+    """
+    Data da ``parcela`` (a partir de 1). Sempre contada de data_inicio, e não da ocorrência
+    anterior, para um dia 31 não virar 28 para sempre depois de fevereiro.
+    """
+    passos = parcela - 1
+    if tipo_recorrencia == TipoRecorrencia.ANUAL:
+        return data_inicio + relativedelta(years=passos)
+    if tipo_recorrencia == TipoRecorrencia.QUINZENAL:
+        return data_inicio + timedelta(days=15 * passos)
+    if tipo_recorrencia == TipoRecorrencia.SEMANAL:
+        return data_inicio + timedelta(weeks=passos)
+    return data_inicio + relativedelta(months=passos)
+
+
+def mantem_o_dia(tipo_recorrencia: str, data_inicio: date, data: date) -> bool:
+    """
+    Se uma regra que começasse em ``data`` daria as mesmas datas que a que começa em
+    data_inicio: nas mensais e anuais, só se ``data`` não é um dia 31 (ou 29/02) ajustado.
+    """
+    if tipo_recorrencia in (TipoRecorrencia.QUINZENAL, TipoRecorrencia.SEMANAL):
+        return True
+    return data.day == data_inicio.day
+
+
+def parcelas_no_periodo(tipo_recorrencia: str, data_inicio: date, quantidade: Optional[int],
+                        inicio: date, fim: date) -> List[Tuple[int, date]]:
+    """(parcela, data) das ocorrências com inicio <= data < fim; sem ``quantidade``, a série não tem fim."""
+    parcelas = []
+    for parcela in count(1) if quantidade is None else range(1, quantidade + 1):
+        data = data_da_ocorrencia(tipo_recorrencia, data_inicio, parcela)
+        if data >= fim:
+            break
+        if data >= inicio:
+            parcelas.append((parcela, data))
+    return parcelas
+
+
+async def parcelas_materializadas(session: AsyncSession, ids_repeticao: Iterable[int]) -> Dict[int, Set[int]]:
+    """Parcelas de cada recorrência que já são linhas no MOVIMENTACAO, em uma consulta."""
+    ids_repeticao = list(ids_repeticao)
+    materializadas: Dict[int, Set[int]] = defaultdict(set)
+    if not ids_repeticao:
+        return materializadas
+    result = await session.execute(
+        select(MovimentacaoModel.id_repeticao, MovimentacaoModel.parcela_atual)
+        .where(MovimentacaoModel.id_repeticao.in_(ids_repeticao))
+    )
+    for id_repeticao, parcela_atual in result.all():
+        if parcela_atual is not None and parcela_atual.isdigit():
+            materializadas[id_repeticao].add(int(parcela_atual))
+    return materializadas
+
+
+def ocorrencias_virtuais(modelos, materializadas: Dict[int, Set[int]], inicio: date,
+                         fim: date) -> List[Tuple[object, int, date]]:
+    """
+    (modelo, parcela, data) de cada ocorrência ainda não materializada com inicio <= data < fim.
+    ``modelos`` são as primeiras ocorrências com tipo_recorrencia, quantidade_parcelas (None
+    na série sem fim) e a data_pagamento original (a data_inicio do REPETICAO).
+    """
+    ocorrencias = []
+    for modelo in modelos:
+        gravadas = materializadas.get(modelo["id_repeticao"], ())
+        for parcela, data in parcelas_no_periodo(modelo["tipo_recorrencia"], modelo["data_inicio"],
+                                                 modelo["quantidade_parcelas"], inicio, fim):
+            if parcela not in gravadas:
+                ocorrencias.append((modelo, parcela, data))
+    return ocorrencias
+
+
+def nova_ocorrencia(modelo: MovimentacaoModel, parcela: int, data_pagamento: date) -> MovimentacaoModel:
+    """
+    A ``parcela`` como linha, copiada do modelo e ainda não consolidada. id_fatura e a
+    participação no limite ficam com quem grava, que conhece a fatura da data.
+    """
+    return MovimentacaoModel(
+        valor=modelo.valor,
+        descricao=modelo.descricao,
+        tipoMovimentacao=modelo.tipoMovimentacao,
+        forma_pagamento=modelo.forma_pagamento,
+        condicao_pagamento=modelo.condicao_pagamento,
+        datatime=modelo.datatime,
+        consolidado=False,
+        parcela_atual=str(parcela),
+        data_pagamento=data_pagamento,
+        id_conta=modelo.id_conta,
+        id_categoria=modelo.id_categoria,
+        id_repeticao=modelo.id_repeticao,
+        id_usuario=modelo.id_usuario,
+        participa_limite_fatura_gastos=None
+    )
+
+
+def divisoes_da_ocorrencia(modelo: MovimentacaoModel, id_movimentacao: int) -> List[DivideModel]:
+    # pela chave e não por ocorrencia.divisoes: o consolidar devolve o objeto na resposta
+    return [DivideModel(id_movimentacao=id_movimentacao, id_parente=divisao.id_parente, valor=divisao.valor)
+            for divisao in modelo.divisoes]
@@ -0,0 +1,82 @@
+"""
+Roteamento das leituras para a réplica (DATABASE_URL_LEITURA), com leitura das próprias escritas.
+
+Depois de uma requisição que gravou, ConsistenciaLeituraMiddleware devolve o cookie
+``ultima_escrita`` (timestamp, Max-Age = REPLICA_JANELA_SEGUNDOS). Enquanto ele estiver
+dentro da janela, as leituras desse cliente vão para o primário: o atraso da réplica não
+esconde o que ele acabou de gravar. Sem réplica configurada, ou se ela não responder,
+tudo vai para o primário.
+"""
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from decouple import config
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.datastructures import MutableHeaders
+
+from core import database
+from core.database import SessaoUnidadeDeTrabalho
+from core.metrics import LEITURAS_ROTEADAS
+
+logger = logging.getLogger(__name__)
+
+COOKIE_ULTIMA_ESCRITA = "ultima_escrita"
+# maior atraso de replicação tolerado; acima disso a leitura ainda pode não ver a escrita
+JANELA_SEGUNDOS = config("REPLICA_JANELA_SEGUNDOS", default=10, cast=int)
+
+
+def escrita_recente(valor_cookie: Optional[str], agora: Optional[float] = None) -> bool:
+    if not valor_cookie:
+        return False
+    try:
+        ultima_escrita = float(valor_cookie)
+    except ValueError:
+        return False
+    agora = time.time() if agora is None else agora
+    return agora - ultima_escrita < JANELA_SEGUNDOS
+
+
+@asynccontextmanager
+async def sessao_leitura(forcar_primario: bool = False) -> AsyncIterator[SessaoUnidadeDeTrabalho]:
+    """Sessão somente leitura: réplica quando possível, primário como fallback; sempre termina em rollback."""
+    session, destino = None, "primario"
+    if database.SessionLeitura is not None and not forcar_primario:
+        session = database.SessionLeitura()
+        try:
+            await session.connection()  # checkout (com pre_ping) já aqui para poder cair no primário
+            destino = "replica"
+        except (SQLAlchemyError, OSError) as erro:
+            logger.warning("réplica indisponível, lendo do primário: %s", erro)
+            await session.close()
+            session, destino = None, "fallback"
+    if session is None:
+        session = database.Session()
+
+    LEITURAS_ROTEADAS.inc((destino,))
+    async with session.unidade_de_trabalho(somente_leitura=True):
+        yield session
+
+
+class ConsistenciaLeituraMiddleware:
+    """Middleware ASGI que devolve o cookie ``ultima_escrita`` quando a unidade de trabalho gravou algo."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_com_cookie(message):
+            # get_session grava em scope["state"] (request.state) ao fechar, antes de a resposta começar
+            ultima_escrita = scope.get("state", {}).get("ultima_escrita")
+            if message["type"] == "http.response.start" and ultima_escrita is not None:
+                headers = MutableHeaders(scope=message)
+                headers.append("Set-Cookie", f"{COOKIE_ULTIMA_ESCRITA}={ultima_escrita:.3f}; Max-Age={JANELA_SEGUNDOS}; "
+                                             "Path=/; HttpOnly; SameSite=Lax")
+            await send(message)
+
+        await self.app(scope, receive, send_com_cookie)
@@ -0,0 +1,26 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def _orjson_default(valor: Any):
+    # Mesmo formato que o Pydantic usa para Decimal no modo JSON ("100.00")
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError
+
+
+class ORJSONDecimalResponse(ORJSONResponse):
+    """
+    Resposta ORJSON que serializa Decimal como string e datetime UTC com "Z",
+    gerando o mesmo JSON que o response_model geraria, sem revalidar o conteúdo.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
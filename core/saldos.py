@@ -0,0 +1,230 @@
+"""
+Saldo das contas no fim de cada mês, para o histórico sem reprocessar as movimentações.
+
+ContaModel.saldo é só o saldo corrente. O SALDO_MENSAL guarda o saldo no fim de cada
+mês já encerrado; o efeito de uma movimentação consolidada no saldo é:
+
+    receita            +valor na conta
+    despesa / fatura   -valor na conta
+    transferência      -valor na conta de origem, +valor na de destino
+
+Um hook after_flush compara o efeito anterior e o novo de cada movimentação incluída,
+alterada ou apagada e soma a diferença em todos os meses gravados a partir do mês do
+pagamento (um UPDATE por conta e mês afetados, e nenhum para o mês corrente, que ainda
+não tem fotografia).
+
+Os meses que faltam são gravados pelo fechar_saldos_job, uma vez por dia: a partir da
+última fotografia somando as variações dos meses seguintes ou, na primeira vez, voltando
+do saldo corrente da conta. A série de uma conta (GET /saldo-historico, que não grava
+nada) sai das fotografias mais uma consulta com a variação do mês corrente inteiro; se o
+job ainda não fechou algum mês da conta, o mês entra na série pela mesma conta, em memória.
+"""
+import logging
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, event, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session as SessionSync, attributes
+
+from core.database import Session
+from core.metrics import medir_job
+from core.trava import exclusivo
+from models.conta_model import ContaModel
+from models.enums import TipoMovimentacao
+from models.movimentacao_model import MovimentacaoModel
+from models.saldo_mensal_model import SaldoMensalModel
+
+logger = logging.getLogger(__name__)
+
+# campos da movimentação que entram no efeito sobre o saldo
+_CAMPOS_SALDO = ("consolidado", "valor", "tipoMovimentacao", "id_conta", "id_conta_destino", "data_pagamento")
+
+
+def primeiro_dia(data: date) -> date:
+    return date(data.year, data.month, 1)
+
+
+def somar_meses(mes: date, quantidade: int) -> date:
+    indice = mes.year * 12 + mes.month - 1 + quantidade
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _efeitos(consolidado, valor, tipo, id_conta, id_conta_destino, data_pagamento) -> List[Tuple[int, date, Decimal]]:
+    """(conta, mês, variação) que uma movimentação com esses valores causa nos saldos."""
+    if not consolidado or valor is None or data_pagamento is None:
+        return []
+    valor = Decimal(str(valor))
+    mes = primeiro_dia(data_pagamento)
+    efeitos = []
+    if id_conta is not None:
+        efeitos.append((id_conta, mes, valor if tipo == TipoMovimentacao.RECEITA else -valor))
+    if tipo == TipoMovimentacao.TRANSFERENCIA and id_conta_destino is not None:
+        efeitos.append((id_conta_destino, mes, valor))
+    return efeitos
+
+
+def _valor_anterior(objeto, campo: str):
+    historico = attributes.get_history(objeto, campo)
+    if historico.deleted:
+        return historico.deleted[0]
+    return getattr(objeto, campo)
+
+
+@event.listens_for(SessionSync, "after_flush")
+def _ajustar_saldos_mensais(session, flush_context):
+    variacoes: Dict[Tuple[int, date], Decimal] = defaultdict(Decimal)
+
+    for objeto in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(objeto, MovimentacaoModel):
+            continue
+        novo, removido = objeto in session.new, objeto in session.deleted
+        if not (novo or removido) and not any(
+                attributes.get_history(objeto, campo).has_changes() for campo in _CAMPOS_SALDO):
+            continue
+        if not novo:
+            anterior = (getattr(objeto, campo) if removido else _valor_anterior(objeto, campo) for campo in _CAMPOS_SALDO)
+            for id_conta, mes, valor in _efeitos(*anterior):
+                variacoes[id_conta, mes] -= valor
+        if not removido:
+            for id_conta, mes, valor in _efeitos(*(getattr(objeto, campo) for campo in _CAMPOS_SALDO)):
+                variacoes[id_conta, mes] += valor
+
+    mes_atual = primeiro_dia(date.today())
+    for (id_conta, mes), variacao in variacoes.items():
+        if variacao and mes < mes_atual:
+            session.connection().execute(
+                update(SaldoMensalModel)
+                .where(SaldoMensalModel.id_conta == id_conta, SaldoMensalModel.mes >= mes)
+                .values(saldo=SaldoMensalModel.saldo + variacao)
+            )
+
+
+async def _variacoes_por_mes(session: AsyncSession, id_conta: int, desde: Optional[date] = None,
+                             ate: Optional[date] = None) -> Dict[date, Decimal]:
+    """Soma dos efeitos das movimentações consolidadas por mês, com data_pagamento em [desde, ate)."""
+    destino = and_(MovimentacaoModel.id_conta_destino == id_conta,
+                   MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.TRANSFERENCIA)
+    efeito = case(
+        (destino, MovimentacaoModel.valor),
+        (MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.RECEITA, MovimentacaoModel.valor),
+        else_=-MovimentacaoModel.valor,
+    )
+    ano = func.extract("year", MovimentacaoModel.data_pagamento)
+    mes = func.extract("month", MovimentacaoModel.data_pagamento)
+    query = (
+        select(ano, mes, func.sum(efeito))
+        .where(MovimentacaoModel.consolidado == True,  # noqa: E712
+               or_(MovimentacaoModel.id_conta == id_conta, destino))
+        .group_by(ano, mes)
+    )
+    if desde is not None:
+        query = query.where(MovimentacaoModel.data_pagamento >= desde)
+    if ate is not None:
+        query = query.where(MovimentacaoModel.data_pagamento < ate)
+    result = await session.execute(query)
+    return {date(int(a), int(m), 1): Decimal(str(total or 0)) for a, m, total in result.all()}
+
+
+async def _meses_sem_fotografia(session: AsyncSession, id_conta: int, hoje: Optional[date] = None) -> List[dict]:
+    """Fotografias que faltam até o mês anterior ao de ``hoje``, calculadas sem gravar."""
+    mes_atual = primeiro_dia(hoje or date.today())
+    fechado = somar_meses(mes_atual, -1)
+    ultima = (await session.execute(
+        select(SaldoMensalModel.mes, SaldoMensalModel.saldo)
+        .where(SaldoMensalModel.id_conta == id_conta)
+        .order_by(SaldoMensalModel.mes.desc())
+        .limit(1)
+    )).one_or_none()
+    if ultima is not None and ultima.mes >= fechado:
+        return []
+
+    linhas = []
+    if ultima is not None:
+        # para frente: a última fotografia mais as variações dos meses seguintes
+        variacoes = await _variacoes_por_mes(session, id_conta, somar_meses(ultima.mes, 1), mes_atual)
+        saldo, mes = Decimal(ultima.saldo), somar_meses(ultima.mes, 1)
+        while mes <= fechado:
+            saldo += variacoes.get(mes, Decimal(0))
+            linhas.append({"id_conta": id_conta, "mes": mes, "saldo": saldo})
+            mes = somar_meses(mes, 1)
+    else:
+        # para trás: o saldo corrente menos o que entrou depois de cada mês
+        variacoes = await _variacoes_por_mes(session, id_conta)
+        saldo_atual = (await session.execute(select(ContaModel.saldo).where(ContaModel.id_conta == id_conta))).scalar()
+        saldo = Decimal(str(saldo_atual or 0)) - sum((v for m, v in variacoes.items() if m > fechado), Decimal(0))
+        inicio = min([m for m in variacoes if m <= fechado], default=fechado)
+        mes = fechado
+        while mes >= inicio:
+            linhas.append({"id_conta": id_conta, "mes": mes, "saldo": saldo})
+            saldo -= variacoes.get(mes, Decimal(0))
+            mes = somar_meses(mes, -1)
+
+    return linhas
+
+
+async def fechar_meses(session: AsyncSession, id_conta: int, hoje: Optional[date] = None) -> int:
+    """Grava, sem commit, as fotografias que faltam da conta; devolve quantas gravou."""
+    linhas = await _meses_sem_fotografia(session, id_conta, hoje)
+    if not linhas:
+        return 0
+    # outro worker pode ter gravado os mesmos meses entre a leitura e o INSERT
+    dialeto = postgresql if (await session.connection()).dialect.name == "postgresql" else sqlite
+    return len((await session.execute(
+        dialeto.insert(SaldoMensalModel).on_conflict_do_nothing().returning(SaldoMensalModel.mes), linhas,
+    )).all())
+
+
+async def fechar_saldos(session: AsyncSession, hoje: Optional[date] = None) -> int:
+    """Fecha os meses de todas as contas, com um commit por conta; devolve quantas fotografias gravou."""
+    ids_conta = (await session.execute(select(ContaModel.id_conta).order_by(ContaModel.id_conta))).scalars().all()
+    gravadas = 0
+    for id_conta in ids_conta:
+        gravadas += await fechar_meses(session, id_conta, hoje)
+        await session.commit()
+    return gravadas
+
+
+@exclusivo("fechar_saldos")
+@medir_job("fechar_saldos")
+async def fechar_saldos_job():
+    async with Session() as session:
+        gravadas = await fechar_saldos(session)
+    logger.info("Saldos mensais: %s fotografias gravadas", gravadas)
+    return gravadas
+
+
+async def serie_saldos(session: AsyncSession, id_conta: int, meses: int,
+                       hoje: Optional[date] = None) -> List[dict]:
+    """
+    Saldo no fim de cada um dos últimos ``meses`` meses, o último sendo o mês corrente com as
+    movimentações consolidadas até o fim dele. Meses anteriores à primeira movimentação da
+    conta ficam de fora. Só lê: os meses que o fechar_saldos_job ainda não gravou são
+    calculados aqui.
+    """
+    hoje = hoje or date.today()
+    mes_atual = primeiro_dia(hoje)
+    fechado = somar_meses(mes_atual, -1)
+    inicio = somar_meses(mes_atual, 1 - meses)
+    consulta = (
+        select(SaldoMensalModel.mes, SaldoMensalModel.saldo)
+        .where(SaldoMensalModel.id_conta == id_conta, SaldoMensalModel.mes >= min(inicio, fechado))
+        .order_by(SaldoMensalModel.mes)
+    )
+    fotografias = [(mes, Decimal(saldo)) for mes, saldo in (await session.execute(consulta)).all()]
+    if not fotografias or fotografias[-1][0] < fechado:
+        faltantes = await _meses_sem_fotografia(session, id_conta, hoje)
+        fotografias = sorted(fotografias + [(linha["mes"], linha["saldo"]) for linha in faltantes
+                                            if linha["mes"] >= min(inicio, fechado)])
+
+    # o mês corrente inteiro: movimentação consolidada com pagamento mais adiante no mês já mexeu no saldo
+    parcial = await _variacoes_por_mes(session, id_conta, mes_atual, somar_meses(mes_atual, 1))
+    saldo_fechado = fotografias[-1][1] if fotografias else Decimal(0)
+
+    serie = [{"mes": mes, "saldo": saldo, "parcial": False} for mes, saldo in fotografias if mes >= inicio]
+    serie.append({"mes": mes_atual, "saldo": saldo_fechado + parcial.get(mes_atual, Decimal(0)), "parcial": True})
+    return serie
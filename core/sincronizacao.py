@@ -0,0 +1,202 @@
+"""
+Sincronização incremental dos clientes (/sync).
+
+Cada usuário tem um contador em VERSAO_SYNC. Um hook before_flush da Session reserva a
+próxima versão de cada usuário tocado no flush (um UPSERT ``versao + 1`` com RETURNING,
+em ordem de id_usuario) e a grava na coluna ``versao`` de tudo o que foi incluído ou
+alterado; o que foi apagado vira uma lápide no REMOCAO_SYNC com a mesma versão. Mudança
+em divisão conta como mudança da movimentação dona dela, e fatura pertence ao usuário
+do cartão. A linha do contador fica travada até o commit, então as escritas de um mesmo
+usuário entram em ordem de versão: quem leu o contador valendo N já enxerga tudo o que
+tem versão até N.
+
+O cliente guarda o token (a versão do usuário no momento da leitura) e manda de volta
+em ``since``; a resposta traz só as linhas com versão maior, pelos índices
+(id_usuario, versao). Os INSERT/UPDATE diretos em Core (inserir_faturas, reparo da
+conciliação) reservam a versão com reservar_versoes. Usuário recém-cadastrado fica na
+versão 0: o primeiro /sync, sem ``since``, já traz tudo.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, event, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session as SessionSync
+
+from models.cartao_credito_model import CartaoCreditoModel
+from models.categoria_model import CategoriaModel
+from models.conta_model import ContaModel
+from models.divide_model import DivideModel
+from models.fatura_model import FaturaModel
+from models.movimentacao_model import MovimentacaoModel
+from models.parente_model import ParenteModel
+from models.remocao_sync_model import RemocaoSyncModel
+from models.repeticao_model import RepeticaoModel
+from models.versao_sync_model import VersaoSyncModel
+
+# modelo -> nome da entidade na resposta e nas lápides
+ENTIDADES = {
+    ContaModel: "contas",
+    CategoriaModel: "categorias",
+    CartaoCreditoModel: "cartoes_credito",
+    FaturaModel: "faturas",
+    ParenteModel: "parentes",
+    RepeticaoModel: "repeticoes",
+    MovimentacaoModel: "movimentacoes",
+}
+
+
+def _reservar(conexao, ids_usuario: Iterable[int]) -> Dict[int, int]:
+    ids = sorted(set(ids_usuario))
+    if not ids:
+        return {}
+    dialeto = postgresql if conexao.dialect.name == "postgresql" else sqlite
+    comando = dialeto.insert(VersaoSyncModel).values([{"id_usuario": id_usuario, "versao": 1} for id_usuario in ids])
+    comando = comando.on_conflict_do_update(
+        index_elements=[VersaoSyncModel.id_usuario], set_={"versao": VersaoSyncModel.versao + 1},
+    ).returning(VersaoSyncModel.id_usuario, VersaoSyncModel.versao)
+    return dict(conexao.execute(comando).all())
+
+
+async def reservar_versoes(session: AsyncSession, ids_usuario: Iterable[int]) -> Dict[int, int]:
+    """Próxima versão de cada usuário, para escritas que não passam pelo flush do ORM."""
+    conexao = await session.connection()
+    return await conexao.run_sync(_reservar, ids_usuario)
+
+
+def _carregado(session, objeto, relacao: str, modelo, id_relacionado):
+    """O objeto relacionado já na memória (atributo carregado ou identity map), sem consulta."""
+    relacionado = objeto.__dict__.get(relacao)
+    if relacionado is None and id_relacionado is not None:
+        relacionado = session.identity_map.get(session.identity_key(modelo, id_relacionado))
+    return relacionado
+
+
+@event.listens_for(SessionSync, "before_flush")
+def _versionar(session, flush_context, instances):
+    gravados, removidos, divisoes = [], [], []
+    for objeto in session.new:
+        if type(objeto) in ENTIDADES:
+            gravados.append(objeto)
+        elif isinstance(objeto, DivideModel):
+            divisoes.append(objeto)
+    for objeto in session.dirty:
+        if (type(objeto) in ENTIDADES or isinstance(objeto, DivideModel)) \
+                and session.is_modified(objeto, include_collections=False):
+            (divisoes if isinstance(objeto, DivideModel) else gravados).append(objeto)
+    for objeto in session.deleted:
+        if type(objeto) in ENTIDADES:
+            removidos.append(objeto)
+        elif isinstance(objeto, DivideModel):
+            divisoes.append(objeto)
+    if not (gravados or removidos or divisoes):
+        return
+
+    # divisão alterada: versiona a movimentação dona (carregada ou, se não, por UPDATE direto)
+    movimentacoes_fora: set = set()
+    vistos = {id(objeto) for objeto in gravados}
+    for divisao in divisoes:
+        movimentacao = _carregado(session, divisao, "movimentacoes", MovimentacaoModel, divisao.id_movimentacao)
+        if movimentacao is None:
+            movimentacoes_fora.add(divisao.id_movimentacao)
+        elif movimentacao not in session.deleted and id(movimentacao) not in vistos:
+            vistos.add(id(movimentacao))
+            gravados.append(movimentacao)
+
+    conexao = session.connection()
+    usuarios: Dict[int, int] = {}  # id(objeto) -> id_usuario
+    cartoes_fora: Dict[int, List] = defaultdict(list)
+    for objeto in gravados + removidos:
+        if isinstance(objeto, FaturaModel):
+            cartao = _carregado(session, objeto, "cartao_credito", CartaoCreditoModel, objeto.id_cartao_credito)
+            if cartao is not None:
+                usuarios[id(objeto)] = cartao.id_usuario
+            elif objeto.id_cartao_credito is not None:
+                cartoes_fora[objeto.id_cartao_credito].append(objeto)
+        elif objeto.id_usuario is not None:
+            usuarios[id(objeto)] = objeto.id_usuario
+    if cartoes_fora:
+        for id_cartao, id_usuario in conexao.execute(
+                select(CartaoCreditoModel.id_cartao_credito, CartaoCreditoModel.id_usuario)
+                .where(CartaoCreditoModel.id_cartao_credito.in_(list(cartoes_fora)))):
+            usuarios.update((id(fatura), id_usuario) for fatura in cartoes_fora[id_cartao])
+    donos_fora: Dict[int, int] = {}
+    movimentacoes_fora.discard(None)
+    if movimentacoes_fora:
+        donos_fora = dict(conexao.execute(
+            select(MovimentacaoModel.id_movimentacao, MovimentacaoModel.id_usuario)
+            .where(MovimentacaoModel.id_movimentacao.in_(list(movimentacoes_fora)))).all())
+
+    versoes = _reservar(conexao, [*usuarios.values(), *donos_fora.values()])
+    for objeto in gravados:
+        if id(objeto) in usuarios:
+            objeto.versao = versoes[usuarios[id(objeto)]]
+    lapides = [
+        {"id_usuario": usuarios[id(objeto)], "entidade": ENTIDADES[type(objeto)],
+         "id_registro": objeto.__mapper__.primary_key_from_instance(objeto)[0],
+         "versao": versoes[usuarios[id(objeto)]]}
+        for objeto in removidos if id(objeto) in usuarios
+    ]
+    if lapides:
+        conexao.execute(insert(RemocaoSyncModel), lapides)
+    if donos_fora:
+        conexao.execute(
+            update(MovimentacaoModel)
+            .where(MovimentacaoModel.id_movimentacao == bindparam("b_id"))
+            .values(versao=bindparam("b_versao")),
+            [{"b_id": id_movimentacao, "b_versao": versoes[id_usuario]}
+             for id_movimentacao, id_usuario in donos_fora.items()],
+        )
+
+
+async def _linhas(session: AsyncSession, modelo, condicoes: list) -> List[dict]:
+    tabela = modelo.__table__
+    result = await session.execute(select(tabela).where(*condicoes).order_by(*tabela.primary_key.columns))
+    return [dict(linha) for linha in result.mappings()]
+
+
+async def alteracoes_desde(session: AsyncSession, id_usuario: int, desde: Optional[int] = None) -> dict:
+    """
+    Tudo o que mudou para o usuário depois da versão ``desde`` (sem ``desde``, tudo o que
+    existe) e o token da próxima chamada. Uma consulta por entidade, mais divisões e lápides.
+    """
+    # o token é lido antes das linhas: o que entrar no meio vem de novo na próxima chamada
+    token = await session.scalar(
+        select(VersaoSyncModel.versao).where(VersaoSyncModel.id_usuario == id_usuario)) or 0
+    # token maior que o do servidor (banco restaurado, outro ambiente): recomeça do zero
+    completo = desde is None or desde > token
+    desde = desde or 0
+
+    entidades = {}
+    for modelo, nome in ENTIDADES.items():
+        if modelo is FaturaModel:
+            dono = FaturaModel.id_cartao_credito.in_(
+                select(CartaoCreditoModel.id_cartao_credito).where(CartaoCreditoModel.id_usuario == id_usuario))
+        else:
+            dono = modelo.id_usuario == id_usuario
+        condicoes = [dono] if completo else [dono, modelo.versao > desde]
+        entidades[nome] = await _linhas(session, modelo, condicoes)
+
+    movimentacoes = entidades["movimentacoes"]
+    if movimentacoes:
+        por_movimentacao = defaultdict(list)
+        condicao = DivideModel.id_movimentacao.in_(
+            select(MovimentacaoModel.id_movimentacao).where(MovimentacaoModel.id_usuario == id_usuario))
+        if not completo:
+            condicao = DivideModel.id_movimentacao.in_([m["id_movimentacao"] for m in movimentacoes])
+        for id_movimentacao, id_parente, valor in await session.execute(
+                select(DivideModel.id_movimentacao, DivideModel.id_parente, DivideModel.valor).where(condicao)):
+            por_movimentacao[id_movimentacao].append({"id_parente": id_parente, "valor_parente": valor})
+        for movimentacao in movimentacoes:
+            movimentacao["divide_parente"] = por_movimentacao.get(movimentacao["id_movimentacao"], [])
+
+    removidos = {nome: [] for nome in ENTIDADES.values()}
+    if not completo:
+        for entidade, id_registro in await session.execute(
+                select(RemocaoSyncModel.entidade, RemocaoSyncModel.id_registro)
+                .where(RemocaoSyncModel.id_usuario == id_usuario, RemocaoSyncModel.versao > desde)
+                .order_by(RemocaoSyncModel.versao)):
+            removidos[entidade].append(id_registro)
+
+    return {"token": token, "completo": completo, "entidades": entidades, "removidos": removidos}
@@ -0,0 +1,49 @@
+"""
+Funções SQL com variação por dialeto.
+
+Produção usa PostgreSQL; os benchmarks também rodam em SQLite. Cada função aqui
+compila para o equivalente de cada banco.
+"""
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import JSON
+
+
+class json_objeto(FunctionElement):
+    """json_objeto('chave', valor, ...) -> objeto JSON."""
+    type = JSON()
+    inherit_cache = True
+    name = "json_objeto"
+
+
+class agregar_json(FunctionElement):
+    """Agrega os valores do grupo em um array JSON (NULL se o grupo for vazio)."""
+    type = JSON()
+    inherit_cache = True
+    name = "agregar_json"
+
+
+def _argumentos_json_objeto(element, compiler, **kw):
+    # as chaves vão literais no SQL: como parâmetro, o asyncpg não consegue inferir o tipo delas
+    kw["literal_binds"] = True
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(json_objeto)
+def _json_objeto_default(element, compiler, **kw):
+    return "json_object(%s)" % _argumentos_json_objeto(element, compiler, **kw)
+
+
+@compiles(json_objeto, "postgresql")
+def _json_objeto_postgresql(element, compiler, **kw):
+    return "json_build_object(%s)" % _argumentos_json_objeto(element, compiler, **kw)
+
+
+@compiles(agregar_json)
+def _agregar_json_default(element, compiler, **kw):
+    return "json_group_array(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(agregar_json, "postgresql")
+def _agregar_json_postgresql(element, compiler, **kw):
+    return "json_agg(%s)" % compiler.process(element.clauses, **kw)
@@ -0,0 +1,62 @@
+"""
+Templates de e-mail e extrato (Mako, em templates/email).
+
+Cada template é compilado uma vez para um módulo Python: precompilar() faz isso no
+startup (lifespan) e renderizar() reaproveita o compilado, compilando no primeiro uso
+quando o startup não rodou (testes, scripts). O código gerado escreve cada pedaço em
+uma lista e junta no fim, então uma tabela com milhares de linhas custa linear.
+
+Dentro dos templates ``moeda`` e ``data`` são os formatadores de core.formatacao, os
+ESTILO_* são os estilos inline das tabelas (usados com ``| n``, sem escape) e toda
+outra expressão sai com escape de HTML.
+"""
+import html
+import threading
+from pathlib import Path
+from typing import List
+
+DIRETORIO = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+# inline: boa parte dos clientes de e-mail ignora <style>
+ESTILO_TABELA = "border-collapse: collapse; width: 100%;"
+ESTILO_CABECALHO = "background-color: #f2f2f2;"
+ESTILO_CELULA = "border: 1px solid #dddddd; text-align: left; padding: 8px;"
+
+_IMPORTS = [
+    "from core.formatacao import formatar_valor_brasileiro as moeda, formatar_data_brasileira as data",
+    "from core.templates import ESTILO_CABECALHO, ESTILO_CELULA, ESTILO_TABELA, escapar",
+]
+
+def escapar(valor) -> str:
+    """Filtro padrão dos templates: html.escape devolve str, sem criar um Markup por expressão."""
+    return html.escape(str(valor))
+
+_lookup = None
+_lock = threading.Lock()
+
+
+def _obter_lookup():
+    global _lookup
+    if _lookup is None:
+        with _lock:
+            if _lookup is None:
+                # o Mako só carrega na primeira renderização ou no precompilar do startup
+                from mako.lookup import TemplateLookup
+
+                _lookup = TemplateLookup(directories=[str(DIRETORIO)], imports=_IMPORTS,
+                                         default_filters=["escapar"], strict_undefined=True,
+                                         input_encoding="utf-8", filesystem_checks=False)
+    return _lookup
+
+
+def precompilar() -> List[str]:
+    """Compila todos os templates; devolve os nomes compilados."""
+    lookup = _obter_lookup()
+    nomes = sorted(caminho.name for caminho in DIRETORIO.glob("*.mako"))
+    for nome in nomes:
+        lookup.get_template(nome)
+    return nomes
+
+
+def renderizar(nome: str, /, **contexto) -> str:
+    return _obter_lookup().get_template(nome).render(**contexto)
@@ -0,0 +1,80 @@
+"""
+Trava entre processos para os jobs agendados.
+
+Cada worker tem o seu BackgroundScheduler, então todo job dispara uma vez por worker. O
+lock de arquivo que o main.py pegava era solto logo depois de agendar a corrotina no loop,
+antes de ela rodar, e o arquivo era apagado: não impedia nada. ``exclusivo`` segura a
+trava durante toda a execução do job:
+
+- PostgreSQL: pg_try_advisory_lock numa conexão própria, em autocommit (sem transação
+  parada), e pg_advisory_unlock no fim; se o processo morrer, a trava cai com a conexão.
+  Vale entre máquinas, não só entre os workers de uma.
+- Outros bancos (SQLite de desenvolvimento e testes): flock num arquivo por job no
+  diretório temporário, aberto até o fim do job e nunca apagado (apagar o arquivo deixa
+  o próximo processo travar outro inode).
+
+Quem não consegue a trava não espera: outro worker já está rodando o mesmo job.
+"""
+import fcntl
+import functools
+import logging
+import os
+import tempfile
+import zlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core import database
+
+logger = logging.getLogger(__name__)
+
+
+def chave_da_trava(nome: str) -> int:
+    """Chave do advisory lock: estável entre processos (o hash() do Python não é)."""
+    return zlib.crc32(f"financas:{nome}".encode())
+
+
+@asynccontextmanager
+async def trava(nome: str, engine: Optional[AsyncEngine] = None) -> AsyncIterator[bool]:
+    """Entra com True se a trava ``nome`` foi obtida, False se outro processo a tem."""
+    engine = engine or database.engine
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as conexao:
+            conexao = await conexao.execution_options(isolation_level="AUTOCOMMIT")
+            chave = chave_da_trava(nome)
+            obtida = await conexao.scalar(text("SELECT pg_try_advisory_lock(:chave)"), {"chave": chave})
+            try:
+                yield bool(obtida)
+            finally:
+                if obtida:
+                    await conexao.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": chave})
+        return
+
+    arquivo = open(os.path.join(tempfile.gettempdir(), f"financas-{nome}.lock"), "a")
+    try:
+        try:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+        else:
+            yield True
+    finally:
+        # fechar o arquivo solta o flock
+        arquivo.close()
+
+
+def exclusivo(nome: str):
+    """Decorator de job: roda em um processo por vez; nos outros devolve None sem rodar."""
+    def decorator(funcao):
+        @functools.wraps(funcao)
+        async def wrapper(*args, **kwargs):
+            async with trava(nome) as obtida:
+                if not obtida:
+                    logger.info("Job %s já está rodando em outro processo", nome)
+                    return None
+                return await funcao(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,18 +1,21 @@
+import importlib
+import logging
+import sys
+from types import ModuleType
+
 from fastapi import HTTPException, status
-import traceback
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+logger = logging.getLogger(__name__)
+
 
 async def handle_db_exceptions(session, exc):
     # Rollback da sessão em caso de erro
     await session.rollback()
-    
-    traceback.print_exc()
-
 
     # Tratamento específico para IntegrityError
     if isinstance(exc, IntegrityError):
-        print(f"Erro de integridade: {exc.orig}")
+        logger.warning("Erro de integridade: %s", exc.orig)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Erro de integridade no banco de dados: {exc.orig}"
@@ -20,7 +23,7 @@ async def handle_db_exceptions(session, exc):
 
     # Tratamento genérico para erros do SQLAlchemy
     elif isinstance(exc, SQLAlchemyError):
-        print(f"Erro de banco de dados: {exc}")
+        logger.error("Erro de banco de dados", exc_info=exc)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erro no banco de dados, tente novamente mais tarde."
@@ -28,8 +31,25 @@ async def handle_db_exceptions(session, exc):
 
     # Tratamento para qualquer outra exceção
     else:
-        print(f"Erro geral: {exc}")
+        logger.error("Erro geral: %s", exc, exc_info=exc)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ocorreu um erro: {exc}"
         )
+
+
+class ModuloSobDemanda(ModuleType):
+    """
+    Módulo importado só no primeiro acesso a um atributo.
+
+    Cada acesso repassa ao módulo real (o import já fica em cache no sys.modules), então
+    mock.patch("pacote.modulo.smtplib.SMTP") continua funcionando sobre o proxy.
+    """
+
+    def __getattr__(self, atributo):
+        return getattr(importlib.import_module(self.__name__), atributo)
+
+
+def importar_sob_demanda(nome: str) -> ModuleType:
+    """Para dependências pesadas usadas só em caminhos raros (PDF, SMTP): não pesam no startup."""
+    return sys.modules.get(nome) or ModuloSobDemanda(nome)
@@ -1,53 +1,37 @@
 import asyncio
-import fcntl
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from contextlib import asynccontextmanager
 from api.v1.endpoints.rotina import check_and_send_email
+from core.cobranca import cobranca_mensal_job
+from core.compressao import CompressaoMiddleware
+from core.conciliacao import conciliar_faturas_job
+from core.email_saida import drenar_emails_job
+from core.horizonte import horizonte_job
+from core.saldos import fechar_saldos_job
 from core.configs import settings
+from core.instrumentation import InstrumentacaoSQLMiddleware
+from core.logger import RequestIdMiddleware, configurar_logging
+from core.replica import ConsistenciaLeituraMiddleware
+from core.templates import precompilar
+from core.trava import exclusivo
+from core.metrics import CONTENT_TYPE, MetricasHTTPMiddleware, registro
 from api.v1.api import api_router
-import tempfile
-import os
 import logging
+from decouple import config
 
-# Configuração do logger
-logging.basicConfig(level=logging.INFO)
+# Configuração do logger (JSON, não bloqueante; nível via LOG_LEVEL)
+configurar_logging()
 logger = logging.getLogger(__name__)
 
 scheduler = BackgroundScheduler()
-LOCK_FILE_PATH = os.path.join(tempfile.gettempdir(), 'shared_lock_file.lock')
 
-# Garantir que o diretório existe com permissões restritas
-os.makedirs(tempfile.gettempdir(), mode=0o700, exist_ok=True)
-
-def acquire_file_lock():
-    try:
-        # Criar ou abrir um arquivo de lock compartilhado
-        lock_file = open(LOCK_FILE_PATH, 'w')
-        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-        logger.info(f"Lock adquirido com sucesso no arquivo: {LOCK_FILE_PATH}")
-        return lock_file
-    except IOError as e:
-        logger.info(f"Outro processo já está executando a tarefa {e}")
-        return None
-
-def release_file_lock(lock_file):
-    if lock_file:
-        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)  # Libera o lock
-        lock_file.close()  # Fecha o arquivo
-        os.unlink(lock_file.name)  # Remove o arquivo
-
-        logger.info(f"Lock liberado e arquivo: {LOCK_FILE_PATH} fechado.")
 
 def executar_funcao_assincrona(loop):
-    lock_file = acquire_file_lock()  # Caminho do arquivo de lock
-    if lock_file:
-        try:
-            asyncio.run_coroutine_threadsafe(check_and_send_email(), loop)
-        finally:
-            release_file_lock(lock_file)
+    # a trava fica com a corrotina até ela terminar (core/trava.py), não com quem a agenda
+    asyncio.run_coroutine_threadsafe(exclusivo("rotina_atraso")(check_and_send_email)(), loop)
 
 
 def agendar_execucao(hora: int, minuto: int, loop):
@@ -69,11 +53,105 @@ def agendar_execucao(hora: int, minuto: int, loop):
     current_time = datetime.now().strftime('%H:%M:%S')
     logger.info(f"Tarefa diária agendada para {hora:02d}:{minuto:02d}. Hora atual {current_time}")
 
+def executar_conciliacao(loop):
+    # conciliar_faturas_job é exclusivo entre os workers (core/trava.py)
+    asyncio.run_coroutine_threadsafe(conciliar_faturas_job(), loop)
+
+
+def agendar_conciliacao(minutos: int, loop):
+    # confere fatura_gastos/limite_disponivel dos cartões alterados desde a última rodada
+    scheduler.add_job(
+        executar_conciliacao,
+        'interval',
+        minutes=minutos,
+        args=[loop],
+        id="conciliacao_faturas",
+        replace_existing=True
+    )
+    logger.info("Conciliação de faturas agendada a cada %s minutos", minutos)
+
+def executar_drenagem_emails(loop):
+    # drenar_emails_job é exclusivo entre os workers (core/trava.py)
+    asyncio.run_coroutine_threadsafe(drenar_emails_job(), loop)
+
+
+def agendar_drenagem_emails(segundos: int, loop):
+    # entrega o que os handlers deixaram na caixa de saída (EMAIL_SAIDA)
+    scheduler.add_job(
+        executar_drenagem_emails,
+        'interval',
+        seconds=segundos,
+        args=[loop],
+        id="drenagem_emails",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    logger.info("Caixa de saída de e-mails drenada a cada %s segundos", segundos)
+
+def executar_cobranca_mensal(loop):
+    # cobranca_mensal_job é exclusivo entre os workers (core/trava.py)
+    asyncio.run_coroutine_threadsafe(cobranca_mensal_job(), loop)
+
+
+def agendar_cobranca_mensal(dia: int, hora: int, loop):
+    # cobrança do mês anterior de todos os parentes, enfileirada na caixa de saída
+    scheduler.add_job(
+        executar_cobranca_mensal,
+        'cron',
+        day=dia,
+        hour=hora,
+        args=[loop],
+        id="cobranca_mensal",
+        replace_existing=True
+    )
+    logger.info("Cobrança mensal agendada para o dia %s às %02d:00", dia, hora)
+
+def executar_horizonte(loop):
+    # horizonte_job é exclusivo entre os workers (core/trava.py)
+    asyncio.run_coroutine_threadsafe(horizonte_job(), loop)
+
+
+def agendar_horizonte(hora: int, loop):
+    # faturas dos cartões ativos e ocorrências das recorrências até o horizonte, fora das requisições
+    scheduler.add_job(
+        executar_horizonte,
+        'cron',
+        hour=hora,
+        args=[loop],
+        id="horizonte",
+        replace_existing=True
+    )
+    logger.info("Horizonte de faturas e recorrências agendado para as %02d:00", hora)
+
+def executar_fechamento_saldos(loop):
+    # fechar_saldos_job é exclusivo entre os workers (core/trava.py)
+    asyncio.run_coroutine_threadsafe(fechar_saldos_job(), loop)
+
+
+def agendar_fechamento_saldos(hora: int, loop):
+    # fotografias do SALDO_MENSAL dos meses encerrados; o GET /saldo-historico só lê
+    scheduler.add_job(
+        executar_fechamento_saldos,
+        'cron',
+        hour=hora,
+        args=[loop],
+        id="fechamento_saldos",
+        replace_existing=True
+    )
+    logger.info("Fechamento dos saldos mensais agendado para as %02d:00", hora)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     loop = asyncio.get_running_loop()  # Loop principal do FastAPI
+    logger.info("Templates de e-mail compilados: %s", ", ".join(precompilar()))
     scheduler.start()
     agendar_execucao(11, 00,loop)  
+    agendar_conciliacao(config("CONCILIACAO_INTERVALO_MINUTOS", default=15, cast=int), loop)
+    agendar_drenagem_emails(config("EMAIL_DRENAGEM_INTERVALO_SEGUNDOS", default=30, cast=int), loop)
+    agendar_cobranca_mensal(config("COBRANCA_DIA", default=1, cast=int), config("COBRANCA_HORA", default=8, cast=int), loop)
+    agendar_horizonte(config("HORIZONTE_HORA", default=3, cast=int), loop)
+    agendar_fechamento_saldos(config("SALDOS_HORA", default=2, cast=int), loop)
     try:
         yield
     finally:
@@ -88,6 +166,24 @@ app.add_middleware(
     allow_methods=["GET", "POST", "OPTIONS", "DELETE", "PUT"],
     allow_headers=["*"],
 )
+# listagens grandes e cacheáveis no cliente valem um nível de br mais alto
+app.add_middleware(
+    CompressaoMiddleware,
+    niveis_por_rota={
+        f"{settings.API_V1_STR}/movimentacao/listar/filtro": {"br": 5},
+        f"{settings.API_V1_STR}/movimentacao/gastos-receitas-por-categoria/matriz": {"br": 6, "gzip": 9},
+    },
+)
+app.add_middleware(ConsistenciaLeituraMiddleware)
+app.add_middleware(InstrumentacaoSQLMiddleware)
+app.add_middleware(MetricasHTTPMiddleware)
+# por último para ficar por fora: o request_id já vale nos logs dos outros middlewares
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=registro.expor(), media_type=CONTENT_TYPE)
 
 if __name__ == '__main__':
     import uvicorn
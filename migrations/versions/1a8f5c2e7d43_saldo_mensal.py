@@ -0,0 +1,43 @@
+"""fotografias mensais de saldo por conta
+
+Revision ID: 1a8f5c2e7d43
+Revises: 9e4d7b1c3a60
+Create Date: 2026-10-19 05:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a8f5c2e7d43'
+down_revision = '9e4d7b1c3a60'
+branch_labels = None
+depends_on = None
+
+# a série de saldos soma as movimentações de cada conta, pelos dois lados da transferência
+INDICES = {
+    "ix_movimentacao_conta_pagamento": ["id_conta", "data_pagamento"],
+    "ix_movimentacao_destino_pagamento": ["id_conta_destino", "data_pagamento"],
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "SALDO_MENSAL",
+        sa.Column("id_conta", sa.BigInteger(), sa.ForeignKey("CONTA.id_conta"), primary_key=True),
+        sa.Column("mes", sa.Date(), primary_key=True),
+        sa.Column("saldo", sa.DECIMAL(10, 2), nullable=False),
+    )
+
+    # sem CONCURRENTLY o build trava as escritas no MOVIMENTACAO
+    with op.get_context().autocommit_block():
+        for indice, colunas in INDICES.items():
+            op.create_index(indice, "MOVIMENTACAO", colunas, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for indice in INDICES:
+            op.drop_index(indice, table_name="MOVIMENTACAO", postgresql_concurrently=True, if_exists=True)
+    op.drop_table("SALDO_MENSAL")
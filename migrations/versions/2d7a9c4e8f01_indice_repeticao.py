@@ -0,0 +1,28 @@
+"""índice das ocorrências por repetição
+
+Revision ID: 2d7a9c4e8f01
+Revises: 4f7a1d8c2e69
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7a9c4e8f01'
+down_revision = '4f7a1d8c2e69'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # o horizonte busca as ocorrências já gravadas de cada regra; sem CONCURRENTLY o build trava as escritas
+    with op.get_context().autocommit_block():
+        op.create_index("ix_movimentacao_repeticao", "MOVIMENTACAO", ["id_repeticao"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_movimentacao_repeticao", table_name="MOVIMENTACAO", postgresql_concurrently=True,
+                      if_exists=True)
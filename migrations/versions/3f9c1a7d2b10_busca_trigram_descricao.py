@@ -0,0 +1,48 @@
+"""busca por trigramas na descrição das movimentações
+
+Revision ID: 3f9c1a7d2b10
+Revises: 2d7a9c4e8f01
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c1a7d2b10'
+down_revision = '2d7a9c4e8f01'
+branch_labels = None
+depends_on = None
+
+EXTENSOES = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+)
+
+# unaccent() é STABLE (depende do dicionário em uso); índice de expressão exige IMMUTABLE
+FUNCAO = """
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+"""
+
+INDICE = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_movimentacao_descricao_trgm ON "MOVIMENTACAO" '
+    "USING gin (f_unaccent(lower(descricao)) gin_trgm_ops)"
+)
+
+
+def upgrade() -> None:
+    for comando in EXTENSOES:
+        op.execute(comando)
+    op.execute(FUNCAO)
+    # CONCURRENTLY não roda dentro de transação, e sem ele o MOVIMENTACAO fica travado para escrita no build
+    with op.get_context().autocommit_block():
+        op.execute(INDICE)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_movimentacao_descricao_trgm")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
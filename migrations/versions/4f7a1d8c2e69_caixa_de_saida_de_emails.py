@@ -0,0 +1,42 @@
+"""caixa de saída de e-mails
+
+Revision ID: 4f7a1d8c2e69
+Revises: d2b6e9a4f158
+Create Date: 2026-10-19 07:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f7a1d8c2e69'
+down_revision = 'd2b6e9a4f158'
+branch_labels = None
+depends_on = None
+
+ESTADO_EMAIL = sa.Enum("PENDENTE", "ENVIADO", "DESCARTADO", name="estadoemail")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "EMAIL_SAIDA",
+        sa.Column("id_email", sa.BigInteger(), primary_key=True),
+        sa.Column("origem", sa.String(30), nullable=False),
+        sa.Column("destinatario", sa.String(256), nullable=False),
+        sa.Column("assunto", sa.String(256), nullable=False),
+        sa.Column("corpo_html", sa.Text(), nullable=False),
+        sa.Column("anexar_pdf", sa.Boolean(), nullable=False),
+        sa.Column("estado", ESTADO_EMAIL, nullable=False),
+        sa.Column("tentativas", sa.Integer(), nullable=False),
+        sa.Column("proxima_tentativa", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("ultimo_erro", sa.Text(), nullable=True),
+        sa.Column("criado_em", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("enviado_em", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index("ix_email_saida_estado_proxima", "EMAIL_SAIDA", ["estado", "proxima_tentativa"])
+
+
+def downgrade() -> None:
+    op.drop_table("EMAIL_SAIDA")
+    ESTADO_EMAIL.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,28 @@
+"""índice das faturas por cartão e data de fechamento
+
+Revision ID: 6c0f2a8e4b91
+Revises: b5e18c3a9d72
+Create Date: 2026-10-19 03:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6c0f2a8e4b91'
+down_revision = 'b5e18c3a9d72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # sem CONCURRENTLY o build trava as escritas no FATURA
+    with op.get_context().autocommit_block():
+        op.create_index("ix_fatura_cartao_fechamento", "FATURA", ["id_cartao_credito", "data_fechamento"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_fatura_cartao_fechamento", table_name="FATURA", postgresql_concurrently=True,
+                      if_exists=True)
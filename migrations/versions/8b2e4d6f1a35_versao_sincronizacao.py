@@ -0,0 +1,62 @@
+"""versão de sincronização por registro e lápides de remoção
+
+Revision ID: 8b2e4d6f1a35
+Revises: 3f9c1a7d2b10
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a35'
+down_revision = '3f9c1a7d2b10'
+branch_labels = None
+depends_on = None
+
+# tabela -> (nome do índice, coluna do dono)
+TABELAS = {
+    "CONTA": ("ix_conta_usuario_versao", "id_usuario"),
+    "CATEGORIA": ("ix_categoria_usuario_versao", "id_usuario"),
+    "CARTAO_CREDITO": ("ix_cartao_credito_usuario_versao", "id_usuario"),
+    "FATURA": ("ix_fatura_cartao_versao", "id_cartao_credito"),
+    "PARENTE": ("ix_parente_usuario_versao", "id_usuario"),
+    "REPETICAO": ("ix_repeticao_usuario_versao", "id_usuario"),
+    "MOVIMENTACAO": ("ix_movimentacao_usuario_versao", "id_usuario"),
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "VERSAO_SYNC",
+        sa.Column("id_usuario", sa.BigInteger(), primary_key=True),
+        sa.Column("versao", sa.BigInteger(), nullable=False),
+    )
+    op.create_table(
+        "REMOCAO_SYNC",
+        sa.Column("id_remocao", sa.BigInteger(), primary_key=True),
+        sa.Column("id_usuario", sa.BigInteger(), nullable=False),
+        sa.Column("entidade", sa.String(30), nullable=False),
+        sa.Column("id_registro", sa.BigInteger(), nullable=False),
+        sa.Column("versao", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("ix_remocao_sync_usuario_versao", "REMOCAO_SYNC", ["id_usuario", "versao"])
+    # com DEFAULT constante o ADD COLUMN não reescreve a tabela (PostgreSQL 11+)
+    for tabela in TABELAS:
+        op.add_column(tabela, sa.Column("versao", sa.BigInteger(), nullable=False, server_default="0"))
+    # sem CONCURRENTLY o build trava as escritas no MOVIMENTACAO
+    with op.get_context().autocommit_block():
+        for tabela, (indice, dono) in TABELAS.items():
+            op.create_index(indice, tabela, [dono, "versao"], postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for tabela, (indice, _) in TABELAS.items():
+            op.drop_index(indice, table_name=tabela, postgresql_concurrently=True, if_exists=True)
+    for tabela in TABELAS:
+        op.drop_column(tabela, "versao")
+    op.drop_index("ix_remocao_sync_usuario_versao", table_name="REMOCAO_SYNC")
+    op.drop_table("REMOCAO_SYNC")
+    op.drop_table("VERSAO_SYNC")
@@ -0,0 +1,42 @@
+"""razão de faturas e checkpoint da conciliação
+
+Revision ID: 9e4d7b1c3a60
+Revises: 6c0f2a8e4b91
+Create Date: 2026-10-19 04:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4d7b1c3a60'
+down_revision = '6c0f2a8e4b91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # o hook after_flush da conciliação escreve no LANCAMENTO_FATURA a cada movimentação no cartão
+    op.create_table(
+        "LANCAMENTO_FATURA",
+        sa.Column("id_lancamento", sa.BigInteger(), primary_key=True),
+        sa.Column("id_fatura", sa.BigInteger(), nullable=True),
+        sa.Column("id_cartao_credito", sa.BigInteger(), nullable=True),
+        sa.Column("delta_fatura_gastos", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("delta_limite_disponivel", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("origem", sa.String(64), nullable=False),
+        sa.Column("criado_em", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+    op.create_index("ix_lancamento_fatura_id_fatura", "LANCAMENTO_FATURA", ["id_fatura"])
+    op.create_table(
+        "CHECKPOINT_CONCILIACAO",
+        sa.Column("nome", sa.String(60), primary_key=True),
+        sa.Column("id_lancamento", sa.BigInteger(), nullable=False),
+        sa.Column("atualizado_em", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("CHECKPOINT_CONCILIACAO")
+    op.drop_table("LANCAMENTO_FATURA")
@@ -0,0 +1,32 @@
+"""reserva de e-mails na drenagem (estado Enviando) e índice dos envios recentes
+
+Revision ID: a7c3e9f1b524
+Revises: f1d3a5c7e920
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9f1b524'
+down_revision = 'f1d3a5c7e920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # o valor novo do enum só vale depois do commit do ALTER TYPE; sem CONCURRENTLY o build
+    # do índice trava as escritas no EMAIL_SAIDA
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE estadoemail ADD VALUE IF NOT EXISTS 'ENVIANDO' AFTER 'PENDENTE'")
+        op.create_index("ix_email_saida_enviado_em", "EMAIL_SAIDA", ["enviado_em"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    # o PostgreSQL não remove valor de enum: as reservas voltam para a fila e o valor fica sem uso
+    op.execute("""UPDATE "EMAIL_SAIDA" SET estado = 'PENDENTE' WHERE estado = 'ENVIANDO'""")
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_email_saida_enviado_em", table_name="EMAIL_SAIDA", postgresql_concurrently=True,
+                      if_exists=True)
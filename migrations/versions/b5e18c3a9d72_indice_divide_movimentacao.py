@@ -0,0 +1,28 @@
+"""índice das divisões por movimentação
+
+Revision ID: b5e18c3a9d72
+Revises:
+Create Date: 2026-10-19 01:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e18c3a9d72'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # a PK do divide começa por id_parente; sem CONCURRENTLY o build trava as escritas
+    with op.get_context().autocommit_block():
+        op.create_index("ix_divide_id_movimentacao", "divide", ["id_movimentacao"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_divide_id_movimentacao", table_name="divide", postgresql_concurrently=True,
+                      if_exists=True)
@@ -0,0 +1,39 @@
+"""recorrência sem quantidade de ocorrências (REPETICAO.quantidade_parcelas nulo)
+
+Revision ID: b8d4f2a6c0e3
+Revises: a7c3e9f1b524
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4f2a6c0e3'
+down_revision = 'a7c3e9f1b524'
+branch_labels = None
+depends_on = None
+
+# as recorrências tinham sempre 24 ocorrências (4 nas anuais) impostas pela criação; as que
+# ainda têm esse número não foram encurtadas por exclusão e passam a não ter fim
+RECORRENCIAS_SEM_FIM = """
+UPDATE "REPETICAO" AS r SET quantidade_parcelas = NULL
+WHERE r.quantidade_parcelas = CASE WHEN r.tipo_recorrencia = 'Anual' THEN 4 ELSE 24 END
+  AND EXISTS (SELECT 1 FROM "MOVIMENTACAO" AS m
+              WHERE m.id_repeticao = r.id_repeticao AND m.condicao_pagamento = 'RECORRENTE')
+"""
+RECORRENCIAS_COM_FIM = """
+UPDATE "REPETICAO" SET quantidade_parcelas = CASE WHEN tipo_recorrencia = 'Anual' THEN 4 ELSE 24 END
+WHERE quantidade_parcelas IS NULL
+"""
+
+
+def upgrade() -> None:
+    op.alter_column("REPETICAO", "quantidade_parcelas", existing_type=sa.BigInteger(), nullable=True)
+    op.execute(RECORRENCIAS_SEM_FIM)
+
+
+def downgrade() -> None:
+    op.execute(RECORRENCIAS_COM_FIM)
+    op.alter_column("REPETICAO", "quantidade_parcelas", existing_type=sa.BigInteger(), nullable=False)
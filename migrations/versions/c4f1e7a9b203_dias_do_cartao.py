@@ -0,0 +1,41 @@
+"""dias de fechamento e vencimento no cartão
+
+Revision ID: c4f1e7a9b203
+Revises: 8b2e4d6f1a35
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f1e7a9b203'
+down_revision = '8b2e4d6f1a35'
+branch_labels = None
+depends_on = None
+
+# os dias da última fatura de cada cartão, como o horizonte fazia até aqui
+PREENCHER = """
+UPDATE "CARTAO_CREDITO" AS c
+SET dia_fechamento = EXTRACT(DAY FROM f.data_fechamento),
+    dia_vencimento = EXTRACT(DAY FROM f.data_vencimento)
+FROM (
+    SELECT DISTINCT ON (id_cartao_credito) id_cartao_credito, data_fechamento, data_vencimento
+    FROM "FATURA"
+    WHERE data_fechamento IS NOT NULL AND data_vencimento IS NOT NULL
+    ORDER BY id_cartao_credito, data_vencimento DESC, id_fatura DESC
+) AS f
+WHERE f.id_cartao_credito = c.id_cartao_credito
+"""
+
+
+def upgrade() -> None:
+    op.add_column("CARTAO_CREDITO", sa.Column("dia_fechamento", sa.SmallInteger(), nullable=True))
+    op.add_column("CARTAO_CREDITO", sa.Column("dia_vencimento", sa.SmallInteger(), nullable=True))
+    op.execute(PREENCHER)
+
+
+def downgrade() -> None:
+    op.drop_column("CARTAO_CREDITO", "dia_vencimento")
+    op.drop_column("CARTAO_CREDITO", "dia_fechamento")
@@ -0,0 +1,47 @@
+"""consumo por categoria e mês e alertas de orçamento
+
+Revision ID: d2b6e9a4f158
+Revises: 1a8f5c2e7d43
+Create Date: 2026-10-19 06:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b6e9a4f158'
+down_revision = '1a8f5c2e7d43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # mantidos pelo hook after_flush do core/orcamento.py
+    op.create_table(
+        "CONSUMO_CATEGORIA",
+        sa.Column("id_categoria", sa.BigInteger(), primary_key=True),
+        sa.Column("mes", sa.Date(), primary_key=True),
+        sa.Column("id_usuario", sa.BigInteger(), nullable=False),
+        sa.Column("valor_consumido", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("limiar_notificado", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_consumo_categoria_usuario_mes", "CONSUMO_CATEGORIA", ["id_usuario", "mes"])
+    op.create_table(
+        "ALERTA_ORCAMENTO",
+        sa.Column("id_alerta", sa.BigInteger(), primary_key=True),
+        sa.Column("id_usuario", sa.BigInteger(), nullable=False),
+        sa.Column("id_categoria", sa.BigInteger(), nullable=False),
+        sa.Column("mes", sa.Date(), nullable=False),
+        sa.Column("limiar", sa.Integer(), nullable=False),
+        sa.Column("valor_consumido", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("valor_categoria", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("criado_em", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("lido_em", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index("ix_alerta_orcamento_usuario_lido", "ALERTA_ORCAMENTO", ["id_usuario", "lido_em"])
+
+
+def downgrade() -> None:
+    op.drop_table("ALERTA_ORCAMENTO")
+    op.drop_table("CONSUMO_CATEGORIA")
@@ -0,0 +1,83 @@
+"""uma fatura por cartão e mês, uma linha por parcela de repetição
+
+Revision ID: e6a2b8c5d417
+Revises: c4f1e7a9b203
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a2b8c5d417'
+down_revision = 'c4f1e7a9b203'
+branch_labels = None
+depends_on = None
+
+# duplicatas criadas pela corrida entre o horizonte_job e as requisições: fica a de menor id
+FATURAS_DUPLICADAS = """
+CREATE TEMPORARY TABLE fatura_duplicada ON COMMIT DROP AS
+SELECT id_fatura, manter FROM (
+    SELECT id_fatura, MIN(id_fatura) OVER (
+        PARTITION BY id_cartao_credito, EXTRACT(YEAR FROM data_fechamento), EXTRACT(MONTH FROM data_fechamento)
+    ) AS manter
+    FROM "FATURA"
+    WHERE data_fechamento IS NOT NULL
+) AS f
+WHERE id_fatura <> manter
+"""
+JUNTAR_FATURAS = [
+    """UPDATE "FATURA" AS f SET fatura_gastos = f.fatura_gastos + d.gastos
+       FROM (SELECT dup.manter, SUM(COALESCE(x.fatura_gastos, 0)) AS gastos
+             FROM fatura_duplicada AS dup JOIN "FATURA" AS x ON x.id_fatura = dup.id_fatura
+             GROUP BY dup.manter) AS d
+       WHERE f.id_fatura = d.manter""",
+    """UPDATE "MOVIMENTACAO" AS m SET id_fatura = d.manter
+       FROM fatura_duplicada AS d WHERE m.id_fatura = d.id_fatura""",
+    """UPDATE "LANCAMENTO_FATURA" AS l SET id_fatura = d.manter
+       FROM fatura_duplicada AS d WHERE l.id_fatura = d.id_fatura""",
+    """DELETE FROM "FATURA" WHERE id_fatura IN (SELECT id_fatura FROM fatura_duplicada)""",
+]
+OCORRENCIAS_DUPLICADAS = """
+CREATE TEMPORARY TABLE ocorrencia_duplicada ON COMMIT DROP AS
+SELECT id_movimentacao FROM (
+    SELECT id_movimentacao, MIN(id_movimentacao) OVER (PARTITION BY id_repeticao, parcela_atual) AS manter
+    FROM "MOVIMENTACAO"
+    WHERE id_repeticao IS NOT NULL AND parcela_atual IS NOT NULL
+) AS m
+WHERE id_movimentacao <> manter
+"""
+REMOVER_OCORRENCIAS = [
+    """DELETE FROM divide WHERE id_movimentacao IN (SELECT id_movimentacao FROM ocorrencia_duplicada)""",
+    """DELETE FROM "MOVIMENTACAO" WHERE id_movimentacao IN (SELECT id_movimentacao FROM ocorrencia_duplicada)""",
+]
+
+
+def upgrade() -> None:
+    op.execute(FATURAS_DUPLICADAS)
+    for comando in JUNTAR_FATURAS:
+        op.execute(comando)
+    op.execute(OCORRENCIAS_DUPLICADAS)
+    for comando in REMOVER_OCORRENCIAS:
+        op.execute(comando)
+
+    # sem CONCURRENTLY o build trava as escritas no FATURA e no MOVIMENTACAO
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_fatura_cartao_mes ON "FATURA" '
+            '(id_cartao_credito, EXTRACT(YEAR FROM data_fechamento), EXTRACT(MONTH FROM data_fechamento))'
+        )
+        op.create_index("ux_movimentacao_repeticao_parcela", "MOVIMENTACAO", ["id_repeticao", "parcela_atual"],
+                        unique=True, postgresql_concurrently=True, if_not_exists=True)
+        # coberto pelo índice único, que começa por id_repeticao
+        op.drop_index("ix_movimentacao_repeticao", table_name="MOVIMENTACAO", postgresql_concurrently=True,
+                      if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_movimentacao_repeticao", "MOVIMENTACAO", ["id_repeticao"],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index("ux_movimentacao_repeticao_parcela", table_name="MOVIMENTACAO", postgresql_concurrently=True,
+                      if_exists=True)
+        op.drop_index("ux_fatura_cartao_mes", table_name="FATURA", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,26 @@
+"""chave única no EMAIL_SAIDA para a cobrança do mês sair uma vez por parente
+
+Revision ID: f1d3a5c7e920
+Revises: e6a2b8c5d417
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d3a5c7e920'
+down_revision = 'e6a2b8c5d417'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("EMAIL_SAIDA", sa.Column("chave", sa.String(120), nullable=True))
+    op.create_index("ux_email_saida_chave", "EMAIL_SAIDA", ["chave"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_email_saida_chave", table_name="EMAIL_SAIDA")
+    op.drop_column("EMAIL_SAIDA", "chave")
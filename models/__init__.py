@@ -7,3 +7,11 @@ from models.fatura_model import FaturaModel
 from models.movimentacao_model import MovimentacaoModel
 from models.repeticao_model import RepeticaoModel
 from models.divide_model import DivideModel
+from models.lancamento_fatura_model import LancamentoFaturaModel
+from models.checkpoint_conciliacao_model import CheckpointConciliacaoModel
+from models.saldo_mensal_model import SaldoMensalModel
+from models.consumo_categoria_model import ConsumoCategoriaModel
+from models.alerta_orcamento_model import AlertaOrcamentoModel
+from models.email_saida_model import EmailSaidaModel
+from models.versao_sync_model import VersaoSyncModel
+from models.remocao_sync_model import RemocaoSyncModel
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, BigInteger, DECIMAL, Date, Integer, TIMESTAMP, Index
+from core.configs import settings
+
+
+class AlertaOrcamentoModel(settings.DBBaseModel):
+    """Fila de avisos de orçamento: um por limiar cruzado, até o usuário marcar como lido."""
+    __tablename__ = "ALERTA_ORCAMENTO"
+
+    id_alerta = Column(BigInteger, primary_key=True)
+    id_usuario = Column(BigInteger, nullable=False)
+    id_categoria = Column(BigInteger, nullable=False)
+    mes = Column(Date, nullable=False)
+    limiar = Column(Integer, nullable=False)
+    valor_consumido = Column(DECIMAL(10, 2), nullable=False)
+    valor_categoria = Column(DECIMAL(10, 2), nullable=False)
+    criado_em = Column(TIMESTAMP(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    lido_em = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('ix_alerta_orcamento_usuario_lido', 'id_usuario', 'lido_em'),
+    )
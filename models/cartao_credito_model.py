@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, BigInteger, DECIMAL, ForeignKey, UniqueConstraint, Boolean
+from sqlalchemy import Column, String, BigInteger, DECIMAL, ForeignKey, UniqueConstraint, Boolean, Index, SmallInteger
 from sqlalchemy.orm import relationship
 
 from core.configs import settings
@@ -14,10 +14,15 @@ class CartaoCreditoModel(settings.DBBaseModel):
     nome_icone = Column(String(100))
     ativo = Column(Boolean, default=True)  # Adicionando a coluna ativo
     limite_disponivel = Column(DECIMAL(10,2))
+    # dias das faturas criadas pelo core/horizonte.py; nulos nos cartões antigos, que usam os da última fatura
+    dia_fechamento = Column(SmallInteger, nullable=True)
+    dia_vencimento = Column(SmallInteger, nullable=True)
+    versao = Column(BigInteger, nullable=False, default=0, server_default="0")  # core/sincronizacao.py
 
     usuario = relationship("UsuarioModel", back_populates="cartoes_credito")
     faturas = relationship("FaturaModel", back_populates="cartao_credito", cascade= "all, delete-orphan")
     
     __table_args__ = (
+    Index('ix_cartao_credito_usuario_versao', 'id_usuario', 'versao'),
     UniqueConstraint('nome', 'id_usuario', name='unique_nome_cartao'),
     )
\ No newline at end of file
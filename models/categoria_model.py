@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, BigInteger,  Enum as SqlEnum, ForeignKey, UniqueConstraint, DECIMAL, Boolean
+from sqlalchemy import Column, String, BigInteger,  Enum as SqlEnum, ForeignKey, UniqueConstraint, DECIMAL, Boolean, Index
 from core.configs import settings
 from sqlalchemy.orm import relationship
 from models.enums import TipoMovimentacao, TipoCategoria
@@ -16,11 +16,13 @@ class CategoriaModel(settings.DBBaseModel):
     valor_categoria = Column(DECIMAL(10, 2), nullable=True)
     nome_icone = Column(String(100))
     ativo = Column(Boolean, default=True, nullable=False)
+    versao = Column(BigInteger, nullable=False, default=0, server_default="0")  # core/sincronizacao.py
 
 
     movimentacoes = relationship("MovimentacaoModel", back_populates="categoria")
     usuarios = relationship("UsuarioModel", back_populates="categorias")
     
     __table_args__ = (
+        Index('ix_categoria_usuario_versao', 'id_usuario', 'versao'),
         UniqueConstraint('nome', 'id_usuario', name='unique_nome_categoria'),
     )
\ No newline at end of file
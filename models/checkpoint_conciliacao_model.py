@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, BigInteger, TIMESTAMP
+from core.configs import settings
+
+
+class CheckpointConciliacaoModel(settings.DBBaseModel):
+    """Último lançamento já conciliado, por rotina de conciliação."""
+    __tablename__ = "CHECKPOINT_CONCILIACAO"
+
+    nome = Column(String(60), primary_key=True)
+    id_lancamento = Column(BigInteger, nullable=False, default=0)
+    atualizado_em = Column(TIMESTAMP(timezone=True), nullable=True)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, BigInteger, DECIMAL, Date, Integer, Index
+from core.configs import settings
+
+
+class ConsumoCategoriaModel(settings.DBBaseModel):
+    """
+    Quanto o usuário já gastou na categoria no mês (a parte dele nas divisões das despesas),
+    mantido a cada flush por core/orcamento.py. Sem chave estrangeira, como o razão de faturas.
+    """
+    __tablename__ = "CONSUMO_CATEGORIA"
+
+    id_categoria = Column(BigInteger, primary_key=True)
+    mes = Column(Date, primary_key=True)
+    id_usuario = Column(BigInteger, nullable=False)
+    valor_consumido = Column(DECIMAL(10, 2), nullable=False, default=0)
+    # maior limiar (em % de valor_categoria) já avisado neste mês
+    limiar_notificado = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('ix_consumo_categoria_usuario_mes', 'id_usuario', 'mes'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DECIMAL, BigInteger, ForeignKey, UniqueConstraint, Boolean
+from sqlalchemy import Column, String, DECIMAL, BigInteger, ForeignKey, UniqueConstraint, Boolean, Index
 from core.configs import settings
 from sqlalchemy.orm import relationship
 
@@ -15,6 +15,7 @@ class ContaModel(settings.DBBaseModel):
     nome_icone = Column(String(100))
     ativo = Column(Boolean, default=True)  # Adicionando a coluna ativo
     saldo = Column(DECIMAL(10, 2))
+    versao = Column(BigInteger, nullable=False, default=0, server_default="0")  # core/sincronizacao.py
 
     usuario = relationship("UsuarioModel", back_populates="contas")
     movimentacoes = relationship("MovimentacaoModel", back_populates="conta", foreign_keys="[MovimentacaoModel.id_conta]")
@@ -22,5 +23,6 @@ class ContaModel(settings.DBBaseModel):
     faturas = relationship("FaturaModel", back_populates="conta")
 
     __table_args__ = (
+        Index('ix_conta_usuario_versao', 'id_usuario', 'versao'),
         UniqueConstraint('nome', 'id_usuario', name='unique_nome_conta'),
     )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column , BigInteger, ForeignKey, DECIMAL, Enum 
+from sqlalchemy import Column , BigInteger, ForeignKey, DECIMAL, Enum, Index
 from core.configs import settings
 from sqlalchemy.orm import relationship
 
@@ -10,4 +10,9 @@ class DivideModel(settings.DBBaseModel):
     valor = Column(DECIMAL(10, 2), nullable=False)
 
     parentes = relationship("ParenteModel", back_populates="divisoes")
-    movimentacoes = relationship("MovimentacaoModel", back_populates="divisoes")
\ No newline at end of file
+    movimentacoes = relationship("MovimentacaoModel", back_populates="divisoes")
+
+    __table_args__ = (
+        # a PK começa por id_parente; a listagem busca as divisões pela movimentação
+        Index('ix_divide_id_movimentacao', 'id_movimentacao'),
+    )
\ No newline at end of file
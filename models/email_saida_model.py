@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, BigInteger, Boolean, Enum as SqlEnum, Integer, String, Text, TIMESTAMP, Index
+from core.configs import settings
+from models.enums import EstadoEmail
+
+
+class EmailSaidaModel(settings.DBBaseModel):
+    """Caixa de saída de e-mails: gravada na transação de quem pede o envio, entregue pelo job."""
+    __tablename__ = "EMAIL_SAIDA"
+
+    id_email = Column(BigInteger, primary_key=True)
+    origem = Column(String(30), nullable=False)
+    destinatario = Column(String(256), nullable=False)
+    assunto = Column(String(256), nullable=False)
+    corpo_html = Column(Text, nullable=False)
+    anexar_pdf = Column(Boolean, nullable=False, default=False)
+    estado = Column(SqlEnum(EstadoEmail), nullable=False, default=EstadoEmail.PENDENTE)
+    tentativas = Column(Integer, nullable=False, default=0)
+    proxima_tentativa = Column(TIMESTAMP(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    ultimo_erro = Column(Text, nullable=True)
+    criado_em = Column(TIMESTAMP(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    enviado_em = Column(TIMESTAMP(timezone=True), nullable=True)
+    # e-mails que só podem sair uma vez (a cobrança do mês de cada parente); nula nos demais
+    chave = Column(String(120), nullable=True)
+
+    __table_args__ = (
+        Index('ix_email_saida_estado_proxima', 'estado', 'proxima_tentativa'),
+        # limite por domínio: envios do último minuto
+        Index('ix_email_saida_enviado_em', 'enviado_em'),
+        Index('ux_email_saida_chave', 'chave', unique=True),
+    )
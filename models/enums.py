@@ -37,3 +37,9 @@ class TipoRecorrencia(str, Enum):
     SEMANAL = "Semanal"
 
     
+
+class EstadoEmail(str, Enum):
+    PENDENTE = "Pendente"
+    ENVIANDO = "Enviando"  # reservado por uma rodada do drenar_emails até proxima_tentativa
+    ENVIADO = "Enviado"
+    DESCARTADO = "Descartado"  # esgotou as tentativas (dead letter)
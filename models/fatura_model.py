@@ -1,6 +1,6 @@
 
 
-from sqlalchemy import Column, String, BigInteger, ForeignKey, DECIMAL, Enum as SqlEnum, Date, DateTime
+from sqlalchemy import Column, String, BigInteger, ForeignKey, DECIMAL, Enum as SqlEnum, Date, DateTime, Index, extract
 from core.configs import settings
 from sqlalchemy.orm import relationship
 
@@ -14,8 +14,18 @@ class FaturaModel(settings.DBBaseModel):
     fatura_gastos = Column(DECIMAL(10,2))
     id_conta = Column(BigInteger, ForeignKey("CONTA.id_conta"))
     id_cartao_credito = Column(BigInteger, ForeignKey("CARTAO_CREDITO.id_cartao_credito"))
+    versao = Column(BigInteger, nullable=False, default=0, server_default="0")  # core/sincronizacao.py
     
 
     conta = relationship("ContaModel", back_populates="faturas")
     cartao_credito = relationship("CartaoCreditoModel", back_populates="faturas")
-    movimentacoes = relationship("MovimentacaoModel", back_populates="fatura")
\ No newline at end of file
+    movimentacoes = relationship("MovimentacaoModel", back_populates="fatura")
+
+    __table_args__ = (
+        Index('ix_fatura_cartao_versao', 'id_cartao_credito', 'versao'),
+        # resolução de fatura por cartão + faixa de data de fechamento (core/faturas.py)
+        Index('ix_fatura_cartao_fechamento', 'id_cartao_credito', 'data_fechamento'),
+        # uma fatura por cartão e mês: o horizonte_job e o get_or_create_fatura criam o mesmo mês sem se ver
+        Index('ux_fatura_cartao_mes', 'id_cartao_credito', extract('year', data_fechamento),
+              extract('month', data_fechamento), unique=True),
+    )
@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, String, BigInteger, DECIMAL, TIMESTAMP, Index
+from core.configs import settings
+
+
+class LancamentoFaturaModel(settings.DBBaseModel):
+    """
+    Razão só de inserção com as variações de fatura_gastos e limite_disponivel.
+    Sem chave estrangeira: o lançamento continua valendo depois que a fatura é apagada.
+    """
+    __tablename__ = "LANCAMENTO_FATURA"
+
+    id_lancamento = Column(BigInteger, primary_key=True)
+    id_fatura = Column(BigInteger, nullable=True)
+    id_cartao_credito = Column(BigInteger, nullable=True)
+    delta_fatura_gastos = Column(DECIMAL(10, 2), nullable=False, default=0)
+    delta_limite_disponivel = Column(DECIMAL(10, 2), nullable=False, default=0)
+    origem = Column(String(64), nullable=False)
+    criado_em = Column(TIMESTAMP(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index('ix_lancamento_fatura_id_fatura', 'id_fatura'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, String, BigInteger, ForeignKey, DECIMAL, Enum as SqlEnum, Date, TIMESTAMP
+from sqlalchemy import Boolean, Column, String, BigInteger, ForeignKey, DECIMAL, Enum as SqlEnum, Date, TIMESTAMP, Index
 from core.configs import settings
 from sqlalchemy.orm import relationship
 
@@ -24,6 +24,7 @@ class MovimentacaoModel(settings.DBBaseModel):
     id_repeticao = Column(BigInteger, ForeignKey("REPETICAO.id_repeticao"))
     id_usuario = Column(BigInteger, ForeignKey("USUARIO.id_usuario"), nullable=False)
     id_conta_destino = Column(BigInteger, ForeignKey("CONTA.id_conta"), nullable=True)
+    versao = Column(BigInteger, nullable=False, default=0, server_default="0")  # core/sincronizacao.py
 
     # Especificar foreign_keys para evitar ambiguidade
     conta = relationship("ContaModel", back_populates="movimentacoes", foreign_keys=[id_conta])
@@ -33,3 +34,13 @@ class MovimentacaoModel(settings.DBBaseModel):
     divisoes = relationship("DivideModel", back_populates="movimentacoes", cascade="all, delete-orphan")
     repeticao = relationship("RepeticaoModel", back_populates="movimentacoes")
     usuario = relationship("UsuarioModel", back_populates="movimentacoes")
+
+    __table_args__ = (
+        Index('ix_movimentacao_usuario_versao', 'id_usuario', 'versao'),
+        # variação de saldo por conta e período (core/saldos.py)
+        Index('ix_movimentacao_conta_pagamento', 'id_conta', 'data_pagamento'),
+        Index('ix_movimentacao_destino_pagamento', 'id_conta_destino', 'data_pagamento'),
+        # ocorrências já gravadas de cada recorrência (core/recorrencias.py, core/horizonte.py); única
+        # porque o horizonte_job e o materializar_ocorrencia podem gravar a mesma parcela ao mesmo tempo
+        Index('ux_movimentacao_repeticao_parcela', 'id_repeticao', 'parcela_atual', unique=True),
+    )
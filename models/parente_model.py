@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, BigInteger, ForeignKey,Boolean
+from sqlalchemy import Column, String, BigInteger, ForeignKey,Boolean, Index
 from core.configs import settings
 from sqlalchemy.orm import relationship
 
@@ -13,7 +13,11 @@ class ParenteModel(settings.DBBaseModel):
     nome = Column(String(60), nullable=False)
     id_usuario = Column(BigInteger, ForeignKey("USUARIO.id_usuario"), nullable=False)
     ativo = Column(Boolean(), default=True)
+    versao = Column(BigInteger, nullable=False, default=0, server_default="0")  # core/sincronizacao.py
 
     usuario = relationship("UsuarioModel", back_populates="parentes")
     divisoes = relationship("DivideModel", back_populates="parentes")
 
+    __table_args__ = (
+        Index('ix_parente_usuario_versao', 'id_usuario', 'versao'),
+    )
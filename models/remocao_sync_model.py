@@ -0,0 +1,17 @@
+from sqlalchemy import Column, BigInteger, String, Index
+from core.configs import settings
+
+
+class RemocaoSyncModel(settings.DBBaseModel):
+    """Lápide de um registro apagado, para /sync avisar quem já o tinha baixado."""
+    __tablename__ = "REMOCAO_SYNC"
+
+    id_remocao = Column(BigInteger, primary_key=True)
+    id_usuario = Column(BigInteger, nullable=False)
+    entidade = Column(String(30), nullable=False)
+    id_registro = Column(BigInteger, nullable=False)
+    versao = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index('ix_remocao_sync_usuario_versao', 'id_usuario', 'versao'),
+    )
@@ -1,16 +1,21 @@
 from core.configs import settings
-from sqlalchemy import Column, String, BigInteger, ForeignKey, Date, DECIMAL
+from sqlalchemy import Column, String, BigInteger, ForeignKey, Date, DECIMAL, Index
 from sqlalchemy.orm import relationship
 
 class RepeticaoModel(settings.DBBaseModel):
     __tablename__ = "REPETICAO"
 
     id_repeticao = Column(BigInteger, primary_key=True)
-    quantidade_parcelas = Column(BigInteger, nullable=False)
+    quantidade_parcelas = Column(BigInteger, nullable=True)  # nulo: recorrência sem fim (core/recorrencias.py)
     tipo_recorrencia = Column(String(100), nullable=False)
     valor_total = Column(DECIMAL, nullable=False)
     data_inicio = Column(Date, nullable=False)
     id_usuario = Column(BigInteger, ForeignKey("USUARIO.id_usuario"), nullable=False)
+    versao = Column(BigInteger, nullable=False, default=0, server_default="0")  # core/sincronizacao.py
 
     movimentacoes = relationship("MovimentacaoModel", back_populates="repeticao")
     usuario = relationship("UsuarioModel", back_populates="repeticao")
+
+    __table_args__ = (
+        Index('ix_repeticao_usuario_versao', 'id_usuario', 'versao'),
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, BigInteger, ForeignKey, DECIMAL, Date
+from core.configs import settings
+
+
+class SaldoMensalModel(settings.DBBaseModel):
+    """
+    Saldo da conta no fim de cada mês já encerrado (core/saldos.py).
+    ``mes`` é sempre o primeiro dia do mês.
+    """
+    __tablename__ = "SALDO_MENSAL"
+
+    id_conta = Column(BigInteger, ForeignKey("CONTA.id_conta"), primary_key=True)
+    mes = Column(Date, primary_key=True)
+    saldo = Column(DECIMAL(10, 2), nullable=False)
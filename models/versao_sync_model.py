@@ -0,0 +1,10 @@
+from sqlalchemy import Column, BigInteger
+from core.configs import settings
+
+
+class VersaoSyncModel(settings.DBBaseModel):
+    """Última versão de sincronização de cada usuário: o token devolvido por /sync."""
+    __tablename__ = "VERSAO_SYNC"
+
+    id_usuario = Column(BigInteger, primary_key=True)
+    versao = Column(BigInteger, nullable=False, default=0)
@@ -1,7 +1,8 @@
 from pydantic import BaseModel, ConfigDict
 from models.enums import TipoMovimentacao, TipoCategoria
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal
+from datetime import date, datetime
 
 class CategoriaSchema(BaseModel):
     nome: str
@@ -27,3 +28,16 @@ class CategoriaSchemaId(CategoriaSchema):
     valor_categoria: Optional[Decimal] = None
 
 
+class AlertaOrcamentoSchema(BaseModel):
+    id_alerta: int
+    id_categoria: int
+    mes: date
+    limiar: int
+    valor_consumido: Decimal
+    valor_categoria: Decimal
+    criado_em: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AlertaOrcamentoLidosSchema(BaseModel):
+    ids: List[int]
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional
 from decimal import Decimal
+from datetime import date
 
 from models.enums import TipoConta
 
@@ -26,4 +27,10 @@ class ContaSchemaUpdate(ContaSchema):
     tipo_conta: Optional[TipoConta] = None
     nome: Optional[str] = None
     nome_icone: Optional[str] = None
-    ativo : Optional[bool] = True
\ No newline at end of file
+    ativo : Optional[bool] = True
+
+
+class SaldoMensalSchema(BaseModel):
+    mes: date
+    saldo: Decimal
+    parcial: bool
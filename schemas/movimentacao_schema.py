@@ -1,7 +1,7 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from decimal import Decimal
 import sqlalchemy
-from typing import List, Optional
+from typing import List, Optional, TypedDict
 from datetime import date, datetime
 from models.enums import CondicaoPagamento, FormaPagamento, TipoMovimentacao, TipoRecorrencia
 from schemas.fatura_schema import FaturaSchemaInfo
@@ -87,12 +87,27 @@ class MovimentacaoRequestFilterSchema(BaseModel):
     dia_fechamento: Optional[int] = None
     
 
+class MovimentacaoBuscaSchema(BaseModel):
+    termo: str = Field(min_length=3, max_length=100)  # ao menos um trigrama
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+    id_categorias: List[int] = []
+    limite: int = Field(default=50, ge=1, le=200)
+    cursor: Optional[str] = None  # o "proximo" da página anterior
+
+    @field_validator("termo", mode="before")
+    @classmethod
+    def tirar_espacos(cls, termo):
+        # "  ab " não pode passar no min_length com só dois caracteres buscáveis
+        return termo.strip() if isinstance(termo, str) else termo
+
+
 
 class MovimentacaoSchemaList(MovimentacaoSchema):
     nome_icone_categoria: Optional[str]
     nome_conta: Optional[str]
     nome_cartao_credito: Optional[str]
-    id_movimentacao: int
+    id_movimentacao: Optional[int]  # nulo nas ocorrências virtuais de recorrências
     id_conta_destino: Optional[int]
     id_cartao_credito: Optional[int]
     nome_conta_destino : Optional[str]
@@ -100,9 +115,59 @@ class MovimentacaoSchemaList(MovimentacaoSchema):
     fatura_info: Optional[FaturaSchemaInfo] 
     
 
+# Linhas "cruas" do caminho rápido de listagem: mesmos campos de MovimentacaoSchemaList,
+# montados direto das colunas da consulta e serializados sem passar pelo Pydantic.
+class ParenteResponseDict(TypedDict):
+    id_parente: int
+    valor_parente: Decimal
+    nome_parente: Optional[str]
+
+
+class FaturaInfoDict(TypedDict):
+    id_conta: Optional[int]
+    data_vencimento: date
+    data_fechamento: date
+    data_pagamento: Optional[date]
+    id_cartao_credito: int
+    fatura_gastos: Decimal
+    nome_conta: Optional[str]
+    nome_cartao: Optional[str]
+
+
+class MovimentacaoListDict(TypedDict):
+    valor: Decimal
+    descricao: Optional[str]
+    tipoMovimentacao: Optional[TipoMovimentacao]
+    forma_pagamento: Optional[FormaPagamento]
+    condicao_pagamento: Optional[CondicaoPagamento]
+    datatime: Optional[datetime]
+    quantidade_parcelas: Optional[int]
+    consolidado: bool
+    tipo_recorrencia: Optional[str]
+    parcela_atual: Optional[str]
+    data_pagamento: date
+    id_conta: Optional[int]
+    id_categoria: Optional[int]
+    id_fatura: Optional[int]
+    id_repeticao: Optional[int]
+    participa_limite_fatura_gastos: Optional[bool]
+    nome_icone_categoria: Optional[str]
+    nome_conta: Optional[str]
+    nome_cartao_credito: Optional[str]
+    id_movimentacao: Optional[int]  # nulo nas ocorrências virtuais de recorrências
+    id_conta_destino: Optional[int]
+    id_cartao_credito: Optional[int]
+    nome_conta_destino: Optional[str]
+    divide_parente: List[ParenteResponseDict]
+    fatura_info: Optional[FaturaInfoDict]
+
+
 class MovimentacaoSchemaConsolida(BaseModel):
-    id_movimentacao: int
+    id_movimentacao: Optional[int] = None
     consolidado: bool
+    # ocorrência ainda não gravada de uma recorrência (id_movimentacao nulo na listagem)
+    id_repeticao: Optional[int] = None
+    parcela: Optional[int] = None
     
     
 class MovimentacaoFaturaSchemaList(BaseModel):
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 
 class ParenteSchema(BaseModel):
@@ -20,7 +20,9 @@ class ParenteSchemaUpdate(ParenteSchema):
     email: Optional[str] = None
     ativo : Optional[bool] = True
 
-class ParenteSchemaCobranca(BaseModel):
-    mes: int
+class ParenteSchemaCobrancaMes(BaseModel):
+    mes: int = Field(ge=1, le=12)
     ano: int
+
+class ParenteSchemaCobranca(ParenteSchemaCobrancaMes):
     id_parente: int
\ No newline at end of file
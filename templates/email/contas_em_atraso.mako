@@ -0,0 +1,35 @@
+## Alerta diário de contas e faturas vencidas (rotina.processar_usuarios_em_atraso)
+% if contas:
+<h4>Contas em atraso:</h4>
+<table style="${ESTILO_TABELA | n}">
+<thead>
+<tr style="${ESTILO_CABECALHO | n}"><th style="${ESTILO_CELULA | n}">Descrição</th><th style="${ESTILO_CELULA | n}">Data de Vencimento</th><th style="${ESTILO_CELULA | n}">Valor</th></tr>
+</thead>
+<tbody>
+% for conta in contas:
+<tr><td style="${ESTILO_CELULA | n}">${conta.descricao or 'Outros'}</td><td style="${ESTILO_CELULA | n}">${data(conta.data_pagamento)}</td><td style="${ESTILO_CELULA | n}">${moeda(conta.valor)}</td></tr>
+% endfor
+</tbody></table>
+% endif
+% if faturas:
+% if contas:
+<br>
+% endif
+<h4>Faturas em atraso:</h4>
+<table style="${ESTILO_TABELA | n}">
+<thead>
+<tr style="${ESTILO_CABECALHO | n}"><th style="${ESTILO_CELULA | n}">Cartão</th><th style="${ESTILO_CELULA | n}">Data de Vencimento</th><th style="${ESTILO_CELULA | n}">Valor</th></tr>
+</thead>
+<tbody>
+% for fatura, cartao in faturas:
+<tr><td style="${ESTILO_CELULA | n}">Fatura - ${cartao.nome}</td><td style="${ESTILO_CELULA | n}">${data(fatura.data_vencimento)}</td><td style="${ESTILO_CELULA | n}">${moeda(fatura.fatura_gastos)}</td></tr>
+% endfor
+</tbody></table>
+% endif
+<br><h4>Resumo das Pendências:</h4>
+<table style="${ESTILO_TABELA | n}">
+<tr style="${ESTILO_CABECALHO | n}"><th style="${ESTILO_CELULA | n}">Total a Pagar</th></tr>
+<tr><td style="${ESTILO_CELULA | n}">${moeda(total)}</td></tr>
+</table><br>
+Por favor, tome as devidas providências.<br><br>
+Atenciosamente,<br>Equipe Finanças Pessoais!
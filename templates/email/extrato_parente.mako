@@ -0,0 +1,24 @@
+## Extrato de cobrança de um parente no mês (core.cobranca.criar_email_data)
+% if lembrete:
+Olá, ${usuario}!<br><br>
+Seguem as informações referentes ao mês ${mes}/${ano}:<br><br>
+% else:
+Olá, ${parente},<br><br>
+Seguem as informações referentes às suas movimentações não consolidadas com ${usuario} no mês ${mes}/${ano}:<br><br>
+% endif
+<table style="${ESTILO_TABELA | n}">
+<thead>
+<tr style="${ESTILO_CABECALHO | n}"><th style="${ESTILO_CELULA | n}">Descrição</th><th style="${ESTILO_CELULA | n}">Data</th><th style="${ESTILO_CELULA | n}">Valor</th></tr>
+</thead>
+<tbody>
+% for mov in movimentacoes:
+<tr><td style="${ESTILO_CELULA | n}">${mov['descricao']}</td><td style="${ESTILO_CELULA | n}">${data(mov['data_pagamento'])}</td><td style="${ESTILO_CELULA | n}">${moeda(mov['valor'])}</td></tr>
+% endfor
+</tbody>
+</table><br>
+<h4>Resumo da Cobrança:</h4>
+<table style="${ESTILO_TABELA | n}">
+<tr style="${ESTILO_CABECALHO | n}"><th style="${ESTILO_CELULA | n}">Total das Movimentações</th><th style="${ESTILO_CELULA | n}">Total a Pagar</th></tr>
+<tr><td style="${ESTILO_CELULA | n}">${moeda(total_geral)}</td><td style="${ESTILO_CELULA | n}">${moeda(total)}</td></tr>
+</table><br>
+Por favor, acesse o sistema para mais informações.
@@ -0,0 +1,5 @@
+## Link de redefinição de senha (core.auth.send_email_to_reset_password)
+<p style="font-size: medium;">Redefinição de senha - Finanças Pessoais</p>
+<p style="font-size: medium;">Olá, <b>${nome}</b>!</p>
+<p style="font-size: medium;">Clique <a href="${url}">aqui</a> para redefinir sua senha. Lembre-se de que este link é válido por apenas 5 minutos. Se você não solicitou a redefinição de senha, ignore este e-mail.</p>
+<p style="font-size: medium;">Atenciosamente,<br>Equipe Finanças Pessoais</p>
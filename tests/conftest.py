@@ -0,0 +1,59 @@
+"""
+Banco SQLite em memória, com as tabelas dos models, para os testes que tocam o banco.
+
+O conteúdo inicial vem da fixture ``semente``: uma corrotina que recebe a engine com as
+tabelas já criadas (ver tests/sementes.py). O padrão é só a usuária 1; um módulo troca a
+semente sobrescrevendo a fixture, e um teste com ``@pytest.mark.parametrize("semente", ...)``.
+"""
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.orm import sessionmaker
+
+from api.v1.endpoints import movimentacao
+from benchmarks.banco import criar_engine, criar_tabelas
+from core.database import SessaoUnidadeDeTrabalho
+from core.deps import get_current_user, get_current_user_leitura, get_read_session, get_session
+from core.instrumentation import InstrumentacaoSQLMiddleware, instrumentar_engine
+from models.__all_models import UsuarioModel
+from tests.sementes import SO_ANA
+
+
+@pytest.fixture
+def semente():
+    return SO_ANA
+
+
+@pytest_asyncio.fixture
+async def engine(semente):
+    engine = criar_engine()
+    instrumentar_engine(engine)
+    await criar_tabelas(engine)
+    await semente(engine)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine, class_=SessaoUnidadeDeTrabalho, expire_on_commit=False, autoflush=False)
+
+
+@pytest_asyncio.fixture
+async def cliente(Session):
+    """Cliente HTTP das rotas de /movimentacao, logado como a usuária 1; ``cliente.Session`` abre o banco."""
+    async def sessao():
+        async with Session().unidade_de_trabalho() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(movimentacao.router, prefix="/movimentacao")
+    # mede cada requisição: é o que o @pytest.mark.orcamento_consultas confere
+    app.add_middleware(InstrumentacaoSQLMiddleware)
+    app.dependency_overrides[get_session] = app.dependency_overrides[get_read_session] = sessao
+    app.dependency_overrides[get_current_user] = app.dependency_overrides[get_current_user_leitura] = \
+        lambda: UsuarioModel(id_usuario=1, nome_completo="Ana")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as http:
+        http.Session = Session
+        yield http
@@ -0,0 +1,66 @@
+"""
+Plugin pytest: orçamento de consultas SQL por endpoint.
+
+Marque o teste com ``@pytest.mark.orcamento_consultas(maximo)`` e ele falha se
+qualquer requisição feita durante o teste (via InstrumentacaoSQLMiddleware)
+executar mais de ``maximo`` statements. Se o teste chama o endpoint direto, sem
+HTTP, o orçamento vale para o total do corpo do teste. Com
+``repeticoes=n`` também falha se algum statement se repetir ``n`` vezes ou mais
+(o padrão típico de N+1).
+"""
+from typing import List
+
+import pytest
+
+from core.instrumentation import ColetaConsultas, coletar_consultas, registrar_observador, remover_observador
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "orcamento_consultas(maximo, repeticoes=None): falha se um endpoint executar mais consultas que o declarado",
+    )
+
+
+def violacoes_orcamento(origem: str, coleta: ColetaConsultas, maximo: int, repeticoes=None) -> List[str]:
+    violacoes = []
+    if coleta.total > maximo:
+        violacoes.append(f"{origem}: {coleta.total} consultas (orçamento: {maximo})")
+    if repeticoes is not None:
+        for sql, vezes in coleta.repetidas(repeticoes).items():
+            violacoes.append(f"{origem}: {vezes}x {sql}")
+    return violacoes
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    marcador = item.get_closest_marker("orcamento_consultas")
+    if marcador is None:
+        yield
+        return
+
+    maximo = marcador.kwargs.get("maximo", marcador.args[0] if marcador.args else None)
+    if maximo is None:
+        raise pytest.UsageError("orcamento_consultas precisa do número máximo de consultas")
+    repeticoes = marcador.kwargs.get("repeticoes")
+    violacoes: List[str] = []
+    requisicoes = 0
+
+    def observar(rota: str, coleta: ColetaConsultas):
+        nonlocal requisicoes
+        requisicoes += 1
+        violacoes.extend(violacoes_orcamento(rota, coleta, maximo, repeticoes))
+
+    registrar_observador(observar)
+    try:
+        with coletar_consultas() as coleta:
+            resultado = yield
+    finally:
+        remover_observador(observar)
+
+    if not requisicoes:
+        violacoes.extend(violacoes_orcamento(item.name, coleta, maximo, repeticoes))
+    if violacoes and resultado.excinfo is None:
+        resultado.force_exception(
+            pytest.fail.Exception("orçamento de consultas excedido:\n" + "\n".join(violacoes), pytrace=False)
+        )
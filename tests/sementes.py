@@ -0,0 +1,44 @@
+"""Dados iniciais dos bancos de teste (fixture ``semente`` do tests/conftest.py)."""
+from datetime import date
+from decimal import Decimal
+from typing import List
+
+from sqlalchemy import insert
+
+from models.__all_models import CategoriaModel, ContaModel, ParenteModel, UsuarioModel
+from models.enums import TipoCategoria, TipoMovimentacao
+
+
+def usuarios(*linhas) -> List[dict]:
+    """Linhas (id_usuario, nome[, email]) do USUARIO; sem e-mail, nome@b.com."""
+    return [
+        {"id_usuario": linha[0], "nome_completo": linha[1],
+         "email": linha[2] if len(linha) > 2 else f"{linha[1].lower()}@b.com", "senha": "x",
+         "data_nascimento": date(1990, 1, 1)}
+        for linha in linhas
+    ]
+
+
+def semear(*tabelas):
+    """Semente que insere, na ordem e numa transação, cada (Model, linhas)."""
+    async def semente(engine):
+        async with engine.begin() as conn:
+            for modelo, linhas in tabelas:
+                await conn.execute(insert(modelo), linhas)
+    return semente
+
+
+def cadastro_da_ana() -> list:
+    """A usuária 1 com o parente "Eu", a categoria Lazer e a conta Corrente, todos com id 1."""
+    return [
+        (UsuarioModel, usuarios((1, "Ana"))),
+        (ParenteModel, [{"id_parente": 1, "nome": "Ana", "grau_parentesco": "Eu", "id_usuario": 1}]),
+        (CategoriaModel, [{"id_categoria": 1, "nome": "Lazer", "id_usuario": 1, "ativo": True,
+                           "tipo_categoria": TipoCategoria.VARIAVEL, "modelo_categoria": TipoMovimentacao.DESPESA,
+                           "nome_icone": "happy.svg"}]),
+        (ContaModel, [{"id_conta": 1, "nome": "Corrente", "tipo_conta": "Corrente", "saldo": Decimal("1000"),
+                       "ativo": True, "id_usuario": 1}]),
+    ]
+
+
+SO_ANA = semear((UsuarioModel, usuarios((1, "Ana"))))
@@ -200,7 +200,6 @@ class TestCriarRepeticao:
 
         resultado = await criar_repeticao(movimentacao, usuario_logado, db_mock_repeticao)
 
-        assert movimentacao.quantidade_parcelas == 4
         db_mock_repeticao.add.assert_called_once()
         
         called_obj = db_mock_repeticao.add.call_args[0][0]
@@ -209,7 +208,7 @@ class TestCriarRepeticao:
         assert resultado == 1
 
         repeticao = db_mock_repeticao.add.call_args[0][0]
-        assert repeticao.quantidade_parcelas == 4
+        assert repeticao.quantidade_parcelas is None
         assert repeticao.tipo_recorrencia == TipoRecorrencia.ANUAL
         assert repeticao.valor_total == movimentacao.valor
         assert repeticao.id_usuario == usuario_logado.id_usuario
@@ -223,7 +222,7 @@ class TestCriarRepeticao:
 
         result = await criar_repeticao(movimentacao, usuario_logado, db_mock_repeticao)
 
-        assert movimentacao.quantidade_parcelas == 24
+        assert db_mock_repeticao.add.call_args[0][0].quantidade_parcelas is None
 
     async def test_criar_repeticao_parcelado(self, db_mock_repeticao, usuario_logado):
         movimentacao = criar_movimentacao(condicao_pagamento=CondicaoPagamento.PARCELADO, tipo_recorrencia=TipoRecorrencia.MENSAL)
@@ -2,51 +2,7 @@ import string
 from fastapi import Request
 import core.auth
 import unittest
-from unittest.mock import patch, MagicMock
-import smtplib
-
-class TestSendEmail(unittest.TestCase):
-    @patch("core.auth.smtplib.SMTP")
-    @patch("core.auth.config")
-    def test_send_email_success(self, mock_config, mock_smtp):
-        mock_config.side_effect = lambda key: "mock_value" if key in ["EMAIL_ADDRESS", "EMAIL_PASSWORD"] else None
-        
-        mock_server = MagicMock()
-        mock_smtp.return_value.__enter__.return_value = mock_server
-
-        email_data = {
-            "email_subject": "Test Subject",
-            "email_body": "<html><body><h1>Test Body</h1></body></html>"
-        }
-        user_email = "recipient@example.com"
-
-        core.auth.send_email(email_data, user_email)
-
-        mock_smtp.assert_called_once_with("smtp.gmail.com", 587)
-        mock_server.starttls.assert_called_once()
-        mock_server.login.assert_called_once_with("mock_value", "mock_value")
-        mock_server.send_message.assert_called_once()
-
-    @patch("core.auth.smtplib.SMTP")
-    @patch("core.auth.config")
-    def test_send_email_exception(self, mock_config, mock_smtp):
-        mock_server = MagicMock()
-        mock_smtp.return_value.__enter__.return_value = mock_server
-        mock_server.login.side_effect = smtplib.SMTPAuthenticationError(535, "Authentication failed")
-
-        mock_config.side_effect = lambda key: "mock_value" if key in ["EMAIL_ADDRESS", "EMAIL_PASSWORD"] else None
-
-        email_data = {
-            "email_subject": "Test Subject",
-            "email_body": "<html><body><h1>Test Body</h1></body></html>"
-        }
-        user_email = "recipient@example.com"
-
-        with self.assertRaises(Exception) as context:
-            core.auth.send_email(email_data, user_email)
-
-        self.assertTrue("Error occurred while sending email" in str(context.exception))
-
+from unittest.mock import patch
 
 from jose import jwt, JWTError
 
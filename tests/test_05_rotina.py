@@ -1,62 +1,4 @@
-import unittest
-from unittest.mock import MagicMock, patch
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-
-from api.v1.endpoints.rotina import processar_usuarios_em_atraso, send_email
-
-class TestSendEmail(unittest.TestCase):
-    @patch("api.v1.endpoints.rotina.smtplib.SMTP")
-    @patch("api.v1.endpoints.rotina.config")
-    @patch("api.v1.endpoints.rotina.pdfkit.from_string")
-    def test_send_email(self, mock_pdfkit, mock_config, mock_smtp):
-        mock_config.side_effect = lambda key: "dummy_value" if key in ["EMAIL_ADDRESS", "EMAIL_PASSWORD"] else None
-
-        mock_pdfkit.return_value = b"PDF content"
-
-        mock_server = MagicMock()
-        mock_smtp.return_value.__enter__.return_value = mock_server
-
-        email_data = {
-            "email_subject": "Test Email Subject",
-            "email_body": "<p>This is a test email body.</p>"
-        }
-        user_email = "user@example.com"
-
-        send_email(email_data, user_email)
-
-        mock_smtp.assert_called_once_with("smtp.gmail.com", 587)
-        mock_server.starttls.assert_called_once()
-        mock_server.login.assert_called_once_with("dummy_value", "dummy_value")
-        mock_server.send_message.assert_called_once()
-
-        mock_pdfkit.assert_called_once_with(email_data["email_body"], False, options={"encoding": "UTF-8"})
-
-        self.assertEqual(mock_server.send_message.call_args[0][0]["Subject"], email_data["email_subject"])
-        self.assertEqual(mock_server.send_message.call_args[0][0]["To"], user_email)
-
-    @patch("api.v1.endpoints.rotina.smtplib.SMTP")
-    @patch("api.v1.endpoints.rotina.config")
-    def test_send_email_exception(self, mock_config, mock_smtp):
-        mock_config.side_effect = lambda key: "dummy_value" if key in ["EMAIL_ADDRESS", "EMAIL_PASSWORD"] else None
-
-        mock_server = MagicMock()
-        mock_smtp.return_value.__enter__.return_value = mock_server
-        mock_server.send_message.side_effect = Exception("SMTP error")
-
-        # Dados de teste
-        email_data = {
-            "email_subject": "Test Email Subject",
-            "email_body": "<p>This is a test email body.</p>"
-        }
-        user_email = "user@example.com"
-
-        with self.assertRaises(Exception) as context:
-            send_email(email_data, user_email)
-        
-        self.assertTrue("Error occurred while sending email" in str(context.exception))
+from api.v1.endpoints.rotina import processar_usuarios_em_atraso
 
 import unittest
 from datetime import datetime
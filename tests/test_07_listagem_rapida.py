@@ -0,0 +1,96 @@
+import json
+import unittest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from api.v1.endpoints.movimentacao import construir_response, construir_response_rapida
+from core.responses import ORJSONDecimalResponse
+from models.enums import CondicaoPagamento, FormaPagamento, TipoMovimentacao
+from schemas.movimentacao_schema import MovimentacaoRequestFilterSchema
+
+
+def criar_movimentacao_credito():
+    cartao = SimpleNamespace(nome="Nubank")
+    conta_fatura = SimpleNamespace(nome="Corrente")
+    fatura = SimpleNamespace(
+        data_vencimento=date(2024, 12, 10), data_fechamento=date(2024, 12, 3), data_pagamento=None,
+        id_cartao_credito=3, id_conta=2, conta=conta_fatura, fatura_gastos=Decimal("300.00"),
+        cartao_credito=cartao
+    )
+    return SimpleNamespace(
+        id_movimentacao=1, valor=Decimal("100.10"), descricao="Mercado",
+        tipoMovimentacao=TipoMovimentacao.DESPESA, forma_pagamento=FormaPagamento.CREDITO,
+        condicao_pagamento=CondicaoPagamento.PARCELADO,
+        datatime=datetime(2024, 11, 23, 12, 0, tzinfo=timezone.utc), consolidado=False,
+        parcela_atual="1", data_pagamento=date(2024, 11, 23), id_conta=None, id_conta_destino=None,
+        conta_destino=None, id_categoria=5, categoria=SimpleNamespace(nome_icone="food.svg"),
+        conta=None, fatura=fatura, id_fatura=10, id_repeticao=7,
+        repeticao=SimpleNamespace(quantidade_parcelas=2, tipo_recorrencia="Mensal"),
+        participa_limite_fatura_gastos=True,
+        divisoes=[SimpleNamespace(id_parente=1, valor=Decimal("100.10"), parentes=SimpleNamespace(nome="Eu"))]
+    )
+
+
+def linha_da_movimentacao(mov):
+    return {
+        "id_movimentacao": mov.id_movimentacao, "valor": mov.valor, "descricao": mov.descricao,
+        "tipoMovimentacao": mov.tipoMovimentacao, "forma_pagamento": mov.forma_pagamento,
+        "condicao_pagamento": mov.condicao_pagamento, "datatime": mov.datatime,
+        "consolidado": mov.consolidado, "parcela_atual": mov.parcela_atual,
+        "data_pagamento": mov.data_pagamento, "id_conta": mov.id_conta,
+        "id_conta_destino": mov.id_conta_destino, "id_fatura": mov.id_fatura,
+        "id_repeticao": mov.id_repeticao,
+        "participa_limite_fatura_gastos": mov.participa_limite_fatura_gastos,
+        "quantidade_parcelas": mov.repeticao.quantidade_parcelas,
+        "tipo_recorrencia": mov.repeticao.tipo_recorrencia,
+        "id_categoria": mov.id_categoria, "nome_icone_categoria": mov.categoria.nome_icone,
+        "nome_conta": None, "nome_conta_destino": None,
+        "id_cartao_credito": mov.fatura.id_cartao_credito,
+        "fatura_data_vencimento": mov.fatura.data_vencimento,
+        "fatura_data_fechamento": mov.fatura.data_fechamento,
+        "fatura_data_pagamento": mov.fatura.data_pagamento,
+        "fatura_id_conta": mov.fatura.id_conta, "fatura_gastos": mov.fatura.fatura_gastos,
+        "nome_cartao_credito": mov.fatura.cartao_credito.nome,
+        "fatura_nome_conta": mov.fatura.conta.nome,
+        "divide_parente": [
+            {"id_parente": d.id_parente, "valor_parente": str(d.valor), "nome_parente": d.parentes.nome}
+            for d in mov.divisoes
+        ],
+    }
+
+
+class TestConstruirResponseRapida(unittest.TestCase):
+    def test_mesmo_json_que_construir_response(self):
+        mov = criar_movimentacao_credito()
+        filtro = MovimentacaoRequestFilterSchema(mes=11, ano=2024, id_cartao_credito=3)
+
+        esperado = [m.model_dump(mode="json") for m in construir_response([mov], filtro)]
+        rapido = ORJSONDecimalResponse(content=construir_response_rapida([linha_da_movimentacao(mov)], filtro))
+
+        self.assertEqual(json.loads(rapido.body), esperado)
+
+    def test_sem_filtro_de_cartao_nao_inclui_fatura_info(self):
+        mov = criar_movimentacao_credito()
+        filtro = MovimentacaoRequestFilterSchema(mes=11, ano=2024)
+
+        resposta = construir_response_rapida([linha_da_movimentacao(mov)], filtro)
+
+        self.assertIsNone(resposta[0]["fatura_info"])
+
+    def test_divisoes_vazias(self):
+        linha = {**linha_da_movimentacao(criar_movimentacao_credito()), "divide_parente": None}
+
+        resposta = construir_response_rapida([linha], None)
+
+        self.assertEqual(resposta[0]["divide_parente"], [])
+        self.assertIsNone(resposta[0]["fatura_info"])
+
+    def test_decimal_serializado_como_string(self):
+        corpo = ORJSONDecimalResponse(content={"valor": Decimal("10.50")}).body
+
+        self.assertEqual(corpo, b'{"valor":"10.50"}')
+
+
+if __name__ == "__main__":
+    unittest.main()
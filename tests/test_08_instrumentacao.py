@@ -0,0 +1,92 @@
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.banco import criar_engine
+from core.instrumentation import (ColetaConsultas, InstrumentacaoSQLMiddleware, coletar_consultas, impressao_digital,
+                                  instrumentar_engine, registrar_observador, remover_observador)
+from tests.plugin_orcamento_consultas import violacoes_orcamento
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = criar_engine()
+    instrumentar_engine(engine)
+    yield engine
+    await engine.dispose()
+
+
+def criar_app(engine, consultas_por_requisicao: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(InstrumentacaoSQLMiddleware)
+
+    @app.get("/itens/{id_item}")
+    async def listar_itens(id_item: int):
+        async with engine.connect() as conn:
+            for i in range(consultas_por_requisicao):
+                await conn.execute(text("SELECT :valor"), {"valor": id_item + i})
+        return {"ok": True}
+
+    return app
+
+
+def test_impressao_digital_ignora_valores():
+    primeira = impressao_digital('SELECT * FROM "FATURA" WHERE id_cartao_credito = $1 AND nome = \'Nubank\'')
+    segunda = impressao_digital('SELECT *  FROM "FATURA"\n WHERE id_cartao_credito = $2 AND nome = \'Inter\'')
+
+    assert primeira == segunda == 'SELECT * FROM "FATURA" WHERE id_cartao_credito = ? AND nome = ?'
+    assert impressao_digital("SELECT 1 WHERE id IN (?, ?, ?)") == impressao_digital("SELECT 2 WHERE id IN (?, ?)")
+
+
+@pytest.mark.asyncio
+async def test_middleware_expoe_server_timing_e_notifica_observadores(engine):
+    recebidas = []
+    observador = lambda rota, coleta: recebidas.append((rota, coleta.total))
+    registrar_observador(observador)
+    try:
+        async with AsyncClient(transport=ASGITransport(app=criar_app(engine, 6)), base_url="http://teste") as client:
+            response = await client.get("/itens/1")
+    finally:
+        remover_observador(observador)
+
+    assert response.status_code == 200
+    assert 'desc="6 consultas, 6 repetidas"' in response.headers["server-timing"]
+    assert recebidas == [("/itens/{id_item}", 6)]
+
+
+@pytest.mark.asyncio
+async def test_statement_que_falha_nao_deixa_rastro_na_conexao(engine):
+    async with engine.connect() as conn:
+        with coletar_consultas() as coleta:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("SELECT * FROM tabela_que_nao_existe"))
+            await conn.execute(text("SELECT 1"))
+        info = (await conn.get_raw_connection()).info
+
+    assert coleta.total == 1 and list(coleta.impressoes) == ["SELECT ?"]
+    assert not any(isinstance(valor, list) for valor in info.values())
+
+
+def test_violacoes_orcamento():
+    coleta = ColetaConsultas()
+    for _ in range(4):
+        coleta.registrar("SELECT * FROM divide WHERE id_movimentacao = $1", 0.001)
+
+    assert violacoes_orcamento("/listar", coleta, maximo=10) == []
+    assert violacoes_orcamento("/listar", coleta, maximo=3) == ["/listar: 4 consultas (orçamento: 3)"]
+    assert violacoes_orcamento("/listar", coleta, maximo=10, repeticoes=3) == [
+        "/listar: 4x SELECT * FROM divide WHERE id_movimentacao = ?"
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.orcamento_consultas(2, repeticoes=3)
+async def test_endpoint_dentro_do_orcamento(engine):
+    async with AsyncClient(transport=ASGITransport(app=criar_app(engine, 2)), base_url="http://teste") as client:
+        response = await client.get("/itens/1")
+
+    assert response.status_code == 200
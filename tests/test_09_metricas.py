@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from httpx import ASGITransport, AsyncClient
+
+from core.metrics import (CONTENT_TYPE, Contador, Histograma, MetricasHTTPMiddleware, Registro, contar_envio_email,
+                          medir_job, EMAILS_ENVIADOS, HTTP_DURACAO, HTTP_REQUISICOES, JOB_EXECUCOES, registro)
+
+
+def test_contador_soma_os_shards_de_todas_as_threads():
+    contador = Contador("teste_total", "Teste.", ("origem",))
+
+    def incrementar():
+        for _ in range(1000):
+            contador.inc(("thread",))
+
+    threads = [threading.Thread(target=incrementar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    contador.inc(("principal",), 2)
+
+    assert contador.valor(("thread",)) == 4000
+    assert 'teste_total{origem="principal"} 2' in contador.expor()
+
+
+def test_histograma_expoe_buckets_acumulados():
+    registro_local = Registro()
+    histograma = registro_local.registrar(Histograma("latencia_segundos", "Teste.", ("rota",), buckets=(0.1, 1.0)))
+    for valor in (0.05, 0.1, 0.5, 3.0):
+        histograma.observar(valor, ("/x",))
+
+    texto = registro_local.expor()
+
+    assert "# TYPE latencia_segundos histogram" in texto
+    assert 'latencia_segundos_bucket{rota="/x",le="0.1"} 2' in texto
+    assert 'latencia_segundos_bucket{rota="/x",le="1"} 3' in texto
+    assert 'latencia_segundos_bucket{rota="/x",le="+Inf"} 4' in texto
+    assert 'latencia_segundos_count{rota="/x"} 4' in texto
+    assert 'latencia_segundos_sum{rota="/x"} 3.65' in texto
+
+
+@pytest.mark.asyncio
+async def test_middleware_registra_rota_pelo_template():
+    app = FastAPI()
+    app.add_middleware(MetricasHTTPMiddleware)
+
+    @app.get("/teste-metricas/{id_item}")
+    async def item(id_item: int):
+        if id_item == 0:
+            raise HTTPException(status_code=404)
+        return {"id": id_item}
+
+    rota = "/teste-metricas/{id_item}"
+    antes = HTTP_REQUISICOES.valor(("GET", rota, "200"))
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as client:
+        await client.get("/teste-metricas/1")
+        await client.get("/teste-metricas/2")
+        await client.get("/teste-metricas/0")
+
+    assert HTTP_REQUISICOES.valor(("GET", rota, "200")) == antes + 2
+    assert HTTP_REQUISICOES.valor(("GET", rota, "404")) >= 1
+    assert f'http_requisicao_duracao_segundos_count{{metodo="GET",rota="{rota}"}}' in HTTP_DURACAO.expor()
+
+
+@pytest.mark.asyncio
+async def test_medir_job_e_contar_envio_email():
+    @medir_job("job_teste")
+    async def job(falhar: bool):
+        if falhar:
+            raise RuntimeError("falhou")
+
+    @contar_envio_email("teste")
+    def enviar(falhar: bool):
+        if falhar:
+            raise Exception("smtp fora do ar")
+
+    await job(False)
+    with pytest.raises(RuntimeError):
+        await job(True)
+    enviar(False)
+    with pytest.raises(Exception):
+        enviar(True)
+
+    assert JOB_EXECUCOES.valor(("job_teste", "ok")) == 1
+    assert JOB_EXECUCOES.valor(("job_teste", "erro")) == 1
+    assert EMAILS_ENVIADOS.valor(("teste", "sucesso")) == 1
+    assert EMAILS_ENVIADOS.valor(("teste", "falha")) == 1
+
+
+def test_registro_global_em_formato_texto():
+    texto = registro.expor()
+
+    assert CONTENT_TYPE.startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_requisicoes_total counter" in texto
+    assert "# TYPE job_duracao_segundos histogram" in texto
+    assert texto.endswith("\n")
@@ -0,0 +1,34 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from benchmarks.gerador import GeradorDados
+from models.__all_models import DivideModel, FaturaModel, MovimentacaoModel
+from models.enums import TipoMovimentacao
+
+
+def gerar(semente=7):
+    return GeradorDados(usuarios=2, anos=1, movimentacoes_por_mes=15, semente=semente, hoje=date(2024, 11, 20)).gerar()
+
+
+def test_mesma_semente_gera_os_mesmos_dados():
+    assert gerar().linhas == gerar().linhas
+    assert gerar().linhas != gerar(semente=8).linhas
+
+
+def test_fatura_gastos_e_divisoes_batem_com_as_movimentacoes():
+    dados = gerar()
+
+    gastos = defaultdict(Decimal)
+    for mov in dados.linhas[MovimentacaoModel]:
+        if mov["id_fatura"] is not None:
+            gastos[mov["id_fatura"]] += mov["valor"]
+    for fatura in dados.linhas[FaturaModel]:
+        assert fatura["fatura_gastos"] == gastos[fatura["id_fatura"]]
+
+    divisoes = defaultdict(Decimal)
+    for divide in dados.linhas[DivideModel]:
+        divisoes[divide["id_movimentacao"]] += divide["valor"]
+    for mov in dados.linhas[MovimentacaoModel]:
+        if mov["tipoMovimentacao"] == TipoMovimentacao.DESPESA:
+            assert divisoes[mov["id_movimentacao"]] == mov["valor"]
@@ -0,0 +1,48 @@
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.carga import ClienteCarga, Estatisticas, usuario_sem_token
+from core.deps import get_current_user
+from models.usuario_model import UsuarioModel
+
+
+def test_relatorio_por_rota():
+    estatisticas = Estatisticas()
+    for ms in (10, 20, 30, 40):
+        estatisticas.registrar("GET /a", ms / 1000, 200)
+    estatisticas.registrar("GET /a", 0.5, 500)
+    estatisticas.registrar("POST /b", 0.1, "ConnectError")
+
+    relatorio = estatisticas.relatorio(duracao=2)
+
+    assert relatorio["requisicoes"] == 6
+    assert relatorio["rps"] == 3
+    assert relatorio["rotas"]["GET /a"]["erros"] == 1
+    assert relatorio["rotas"]["GET /a"]["taxa_erro"] == 0.2
+    assert relatorio["rotas"]["GET /a"]["p50_ms"] == 30
+    assert relatorio["rotas"]["GET /a"]["max_ms"] == 500
+    assert relatorio["rotas"]["POST /b"]["status"] == {"ConnectError": 1}
+    assert relatorio["taxa_erro"] == round(2 / 6, 4)
+
+
+@pytest.mark.asyncio
+async def test_cliente_agrupa_pelo_template_e_stub_dispensa_token():
+    app = FastAPI()
+
+    @app.get("/itens/{id_item}")
+    async def item(id_item: int, usuario: UsuarioModel = Depends(get_current_user)):
+        if id_item == 0:
+            raise HTTPException(status_code=404)
+        return {"id_usuario": usuario.id_usuario}
+
+    app.dependency_overrides[get_current_user] = usuario_sem_token({7: {"id_usuario": 7, "email": "a@b.com"}})
+    estatisticas = Estatisticas()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as client:
+        cliente = ClienteCarga(client, estatisticas)
+        ok = await cliente.requisitar("GET", "/itens/{id_item}", "/itens/1", headers={"X-Carga-Usuario": "7"})
+        falha = await cliente.requisitar("GET", "/itens/{id_item}", "/itens/0", headers={"X-Carga-Usuario": "7"})
+
+    assert ok.json() == {"id_usuario": 7}
+    assert falha is None
+    assert dict(estatisticas.status["GET /itens/{id_item}"]) == {200: 1, 404: 1}
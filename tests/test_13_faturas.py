@@ -0,0 +1,97 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.faturas import (CacheCalendarios, CalendarioFaturas, DataFatura, cache_calendarios, invalidar_calendario,
+                          resolver_fatura)
+from core.instrumentation import coletar_consultas
+from models.__all_models import CartaoCreditoModel, FaturaModel, UsuarioModel
+from tests.sementes import semear, usuarios
+
+
+def datas(id_fatura, fechamento):
+    return DataFatura(id_fatura, fechamento, fechamento.replace(day=10))
+
+
+def test_calendario_mantem_a_regra_do_find_fatura():
+    calendario = CalendarioFaturas([datas(1, date(2024, 11, 3)), datas(2, date(2024, 12, 3))])
+
+    assert calendario.resolver(date(2024, 11, 2)).id_fatura == 1
+    assert calendario.resolver(date(2024, 11, 3)).id_fatura == 2  # fechou no dia: vai para a próxima
+    assert calendario.resolver(date(2024, 12, 20)) is None  # sem a fatura de janeiro
+    assert calendario.resolver(date(2024, 10, 20)) is None  # sem fatura no próprio mês
+    assert calendario.proxima(date(2024, 11, 4)).id_fatura == 2
+
+
+def test_cache_lru_e_ttl(monkeypatch):
+    relogio = [0.0]
+    monkeypatch.setattr("core.faturas.time.monotonic", lambda: relogio[0])
+    cache = CacheCalendarios(maximo=2, ttl=10)
+    for id_cartao in (1, 2):
+        cache.guardar(id_cartao, CalendarioFaturas([]))
+
+    cache.obter(1)
+    cache.guardar(3, CalendarioFaturas([]))
+    assert cache.obter(2) is None  # o menos usado recentemente saiu
+    assert cache.obter(1) is not None
+
+    relogio[0] = 11
+    assert cache.obter(1) is None
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        (UsuarioModel, usuarios((1, "Ana"))),
+        (CartaoCreditoModel, [{"id_cartao_credito": 1, "nome": "Cartão", "id_usuario": 1, "limite": Decimal("1000"),
+                               "limite_disponivel": Decimal("1000"), "nome_icone": "c.svg", "ativo": True}]),
+        (FaturaModel, [
+            {"id_fatura": mes, "id_cartao_credito": 1, "data_fechamento": date(2024, mes, 3),
+             "data_vencimento": date(2024, mes, 10), "fatura_gastos": Decimal("0")}
+            for mes in range(1, 13)
+        ]),
+    )
+
+
+@pytest.fixture(autouse=True)
+def cache_vazio():
+    cache_calendarios.limpar()
+    yield
+    cache_calendarios.limpar()
+
+
+@pytest.mark.asyncio
+async def test_roteamento_sem_consultas_com_o_cache_quente(engine):
+    async with AsyncSession(engine) as session:
+        with coletar_consultas() as coleta:
+            ids = [(await resolver_fatura(session, 1, date(2024, mes, 15))).id_fatura for mes in range(3, 10)]
+        assert ids == [4, 5, 6, 7, 8, 9, 10]
+        assert coleta.total == 2  # o calendário e um lote com as faturas que serão alteradas
+
+    async with AsyncSession(engine) as session:
+        with coletar_consultas() as coleta:
+            primeira = await resolver_fatura(session, 1, date(2024, 5, 15))
+            segunda = await resolver_fatura(session, 1, date(2024, 5, 20))
+        assert primeira is segunda
+        assert coleta.total == 1  # só o lote de faturas; o calendário veio do cache
+
+
+@pytest.mark.asyncio
+async def test_invalidacao_vale_no_commit(engine):
+    async with AsyncSession(engine) as session:
+        await resolver_fatura(session, 1, date(2024, 5, 15))
+    assert cache_calendarios.obter(1) is not None
+
+    async with AsyncSession(engine) as session:
+        session.add(FaturaModel(id_fatura=99, id_cartao_credito=1, data_fechamento=date(2025, 1, 3),
+                                data_vencimento=date(2025, 1, 10), fatura_gastos=Decimal("0")))
+        invalidar_calendario(session, 1)
+        await session.flush()
+        await resolver_fatura(session, 1, date(2024, 12, 20))
+        assert cache_calendarios.obter(1) is None  # alteração ainda não commitada não vai para o cache
+        await session.commit()
+
+    async with AsyncSession(engine) as session:
+        assert (await resolver_fatura(session, 1, date(2024, 12, 20))).id_fatura == 99
@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.conciliacao import conciliar_faturas
+from core.instrumentation import coletar_consultas
+from models.__all_models import (CartaoCreditoModel, CategoriaModel, FaturaModel, LancamentoFaturaModel,
+                                 MovimentacaoModel, UsuarioModel)
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+from tests.sementes import semear, usuarios
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        (UsuarioModel, usuarios((1, "Ana"))),
+        (CategoriaModel, [{"id_categoria": 1, "nome": "Mercado", "id_usuario": 1, "ativo": True,
+                           "tipo_categoria": TipoCategoria.VARIAVEL, "modelo_categoria": TipoMovimentacao.DESPESA,
+                           "nome_icone": "m.svg"}]),
+        (CartaoCreditoModel, [
+            {"id_cartao_credito": id_cartao, "nome": f"Cartão {id_cartao}", "id_usuario": 1, "limite": Decimal("1000"),
+             "limite_disponivel": Decimal("1000"), "nome_icone": "c.svg", "ativo": True}
+            for id_cartao in (1, 2)
+        ]),
+        (FaturaModel, [
+            {"id_fatura": id_cartao, "id_cartao_credito": id_cartao, "data_fechamento": date(2024, 11, 3),
+             "data_vencimento": date(2024, 11, 10), "fatura_gastos": Decimal("0")}
+            for id_cartao in (1, 2)
+        ]),
+    )
+
+
+async def comprar(session, id_cartao, valor):
+    """O que create_movimentacao_despesa faz no crédito: movimentação + totais corridos."""
+    fatura = await session.get(FaturaModel, id_cartao)
+    cartao = await session.get(CartaoCreditoModel, id_cartao)
+    movimentacao = MovimentacaoModel(
+        valor=valor, tipoMovimentacao=TipoMovimentacao.DESPESA, forma_pagamento=FormaPagamento.CREDITO,
+        condicao_pagamento=CondicaoPagamento.A_VISTA, datatime=datetime.now(timezone.utc), consolidado=False,
+        data_pagamento=date(2024, 10, 20), id_categoria=1, id_fatura=id_cartao, id_usuario=1,
+        participa_limite_fatura_gastos=True)
+    session.add(movimentacao)
+    fatura.fatura_gastos += valor
+    cartao.limite_disponivel -= valor
+    await session.commit()
+    return movimentacao
+
+
+@pytest.mark.asyncio
+async def test_flush_registra_as_variacoes_no_razao(engine):
+    async with AsyncSession(engine) as session:
+        await comprar(session, 1, Decimal("150.00"))
+        await comprar(session, 1, Decimal("50.00"))
+
+        lancamentos = (await session.execute(select(LancamentoFaturaModel))).scalars().all()
+
+    assert sum(l.delta_fatura_gastos for l in lancamentos if l.id_fatura == 1) == Decimal("200.00")
+    assert sum(l.delta_limite_disponivel for l in lancamentos if l.id_fatura is None) == Decimal("-200.00")
+    assert {l.origem for l in lancamentos} == {"sistema"}
+
+
+@pytest.mark.asyncio
+async def test_conciliacao_incremental_encontra_e_repara_divergencia(engine):
+    async with AsyncSession(engine) as session:
+        await comprar(session, 1, Decimal("150.00"))
+        await comprar(session, 2, Decimal("80.00"))
+        assert (await conciliar_faturas(session, atraso=timedelta(0))).divergencias == []
+
+        # um caminho que muda o valor da compra sem ajustar os totais
+        movimentacao = (await session.execute(
+            select(MovimentacaoModel).where(MovimentacaoModel.id_fatura == 1))).scalar_one()
+        movimentacao.valor = Decimal("120.00")
+        await session.commit()
+
+        with coletar_consultas() as coleta:
+            resultado = await conciliar_faturas(session, reparar=True, atraso=timedelta(0))
+
+        assert resultado.cartoes == 1  # só o cartão tocado desde o checkpoint
+        assert {(d.tipo, d.registrado, d.esperado) for d in resultado.divergencias} == {
+            ("fatura", Decimal("150.00"), Decimal("120.00")),
+            ("cartao", Decimal("850.00"), Decimal("880.00")),
+        }
+        assert resultado.reparadas == 2
+        assert coleta.total < 15
+
+    async with AsyncSession(engine) as session:
+        assert (await session.get(FaturaModel, 1)).fatura_gastos == Decimal("120.00")
+        assert (await session.get(CartaoCreditoModel, 1)).limite_disponivel == Decimal("880.00")
+        # os ajustes da reparação são conferidos de novo, e já batem
+        segunda = await conciliar_faturas(session, atraso=timedelta(0))
+        assert segunda.cartoes == 1 and segunda.divergencias == []
+        assert (await conciliar_faturas(session, atraso=timedelta(0))).cartoes == 0
+        assert (await conciliar_faturas(session, completa=True)).divergencias == []
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_fica_atras_das_transacoes_recentes(engine):
+    async with AsyncSession(engine) as session:
+        await comprar(session, 1, Decimal("150.00"))
+        antigos = (await session.execute(select(func.max(LancamentoFaturaModel.id_lancamento)))).scalar()
+        # o que entrou há mais de um minuto já passou de qualquer transação aberta
+        await session.execute(update(LancamentoFaturaModel).values(
+            criado_em=datetime.now(timezone.utc) - timedelta(minutes=2)))
+        await session.commit()
+        await comprar(session, 2, Decimal("80.00"))
+
+        primeira = await conciliar_faturas(session, atraso=timedelta(minutes=1))
+        # o cartão 2 é conferido, mas o checkpoint não passa dele: uma transação aberta
+        # pode ainda gravar um id menor que o do lançamento dele
+        assert primeira.cartoes == 2 and primeira.checkpoint == antigos
+        segunda = await conciliar_faturas(session, atraso=timedelta(minutes=1))
+        assert segunda.checkpoint_anterior == antigos and segunda.cartoes == 1
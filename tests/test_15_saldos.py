@@ -0,0 +1,122 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.instrumentation import coletar_consultas
+from core.saldos import fechar_saldos, primeiro_dia, serie_saldos, somar_meses
+from models.__all_models import ContaModel, MovimentacaoModel, SaldoMensalModel, UsuarioModel
+from models.enums import CondicaoPagamento, FormaPagamento, TipoMovimentacao
+from tests.sementes import semear, usuarios
+
+HOJE = date.today()
+MES_ATUAL = primeiro_dia(HOJE)
+
+
+def no_mes(meses_atras: int) -> date:
+    return somar_meses(MES_ATUAL, -meses_atras).replace(day=5) if meses_atras else HOJE
+
+
+def movimentacao(tipo, valor, meses_atras, consolidado=True, id_conta_destino=None):
+    return MovimentacaoModel(
+        valor=Decimal(valor), tipoMovimentacao=tipo, forma_pagamento=FormaPagamento.DEBITO,
+        condicao_pagamento=CondicaoPagamento.A_VISTA, datatime=datetime.now(timezone.utc), consolidado=consolidado,
+        data_pagamento=no_mes(meses_atras), id_conta=1, id_conta_destino=id_conta_destino, id_usuario=1)
+
+
+async def com_movimentacoes(engine):
+    await semear(
+        (UsuarioModel, usuarios((1, "Ana"))),
+        (ContaModel, [
+            {"id_conta": 1, "nome": "Banco", "tipo_conta": "Corrente", "id_usuario": 1, "saldo": Decimal("650")},
+            {"id_conta": 2, "nome": "Poupança", "tipo_conta": "Poupança", "id_usuario": 1, "saldo": Decimal("100")},
+        ]),
+    )(engine)
+    async with AsyncSession(engine) as session:
+        session.add_all([
+            movimentacao(TipoMovimentacao.RECEITA, "1000", 3),
+            movimentacao(TipoMovimentacao.DESPESA, "200", 2),
+            movimentacao(TipoMovimentacao.DESPESA, "999", 2, consolidado=False),
+            movimentacao(TipoMovimentacao.TRANSFERENCIA, "100", 1, id_conta_destino=2),
+            movimentacao(TipoMovimentacao.DESPESA, "50", 0),
+        ])
+        await session.commit()
+
+
+@pytest.fixture
+def semente():
+    return com_movimentacoes
+
+
+def saldos(serie):
+    return [(item["mes"], item["saldo"]) for item in serie]
+
+
+@pytest.mark.asyncio
+async def test_serie_so_le_e_depois_do_job_usa_as_fotografias(engine):
+    async with AsyncSession(engine) as session:
+        serie = await serie_saldos(session, 1, meses=5)
+
+        assert saldos(serie) == [
+            (somar_meses(MES_ATUAL, -3), Decimal("1000")),
+            (somar_meses(MES_ATUAL, -2), Decimal("800")),
+            (somar_meses(MES_ATUAL, -1), Decimal("700")),
+            (MES_ATUAL, Decimal("650")),
+        ]
+        assert [item["parcial"] for item in serie] == [False, False, False, True]
+        assert not session.new and not session.dirty
+        assert (await session.execute(select(SaldoMensalModel))).first() is None  # o GET não grava
+
+        assert await fechar_saldos(session) == 4  # três meses da conta 1, um da 2
+        assert await fechar_saldos(session) == 0
+        with coletar_consultas() as coleta:
+            assert await serie_saldos(session, 1, meses=5) == serie
+        assert coleta.total == 2  # fotografias + variação do mês corrente
+
+        assert saldos(await serie_saldos(session, 2, meses=2)) == [
+            (somar_meses(MES_ATUAL, -1), Decimal("100")), (MES_ATUAL, Decimal("100"))]
+
+
+@pytest.mark.asyncio
+async def test_mes_corrente_vai_ate_o_fim_do_mes(engine):
+    fim_do_mes = somar_meses(MES_ATUAL, 1) - timedelta(days=1)
+    async with AsyncSession(engine) as session:
+        # já consolidada, com pagamento no último dia: o saldo corrente da conta já a inclui
+        receita = movimentacao(TipoMovimentacao.RECEITA, "300", 0)
+        receita.data_pagamento = fim_do_mes
+        session.add(receita)
+        (await session.get(ContaModel, 1)).saldo = Decimal("950")
+        await session.commit()
+
+        assert saldos(await serie_saldos(session, 1, meses=2)) == [
+            (somar_meses(MES_ATUAL, -1), Decimal("700")), (MES_ATUAL, Decimal("950"))]
+
+
+@pytest.mark.asyncio
+async def test_edicao_e_delecao_ajustam_os_meses_seguintes(engine):
+    async with AsyncSession(engine) as session:
+        await fechar_saldos(session)
+
+        despesa, pendente = (await session.execute(
+            select(MovimentacaoModel).where(MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.DESPESA,
+                                            MovimentacaoModel.data_pagamento == no_mes(2))
+            .order_by(MovimentacaoModel.valor))).scalars().all()
+        despesa.valor = Decimal("300")
+        pendente.consolidado = True
+        transferencia = (await session.execute(select(MovimentacaoModel).where(
+            MovimentacaoModel.tipoMovimentacao == TipoMovimentacao.TRANSFERENCIA))).scalar_one()
+        await session.delete(transferencia)
+        await session.commit()
+
+        fotografias = (await session.execute(
+            select(SaldoMensalModel.id_conta, SaldoMensalModel.mes, SaldoMensalModel.saldo)
+            .order_by(SaldoMensalModel.id_conta, SaldoMensalModel.mes))).all()
+
+    assert fotografias == [
+        (1, somar_meses(MES_ATUAL, -3), Decimal("1000")),
+        (1, somar_meses(MES_ATUAL, -2), Decimal("-299")),
+        (1, somar_meses(MES_ATUAL, -1), Decimal("-299")),
+        (2, somar_meses(MES_ATUAL, -1), Decimal("0")),
+    ]
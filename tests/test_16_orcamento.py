@@ -0,0 +1,112 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from core.instrumentation import coletar_consultas
+from core.orcamento import consumos_do_mes, limiar_cruzado
+from core.saldos import primeiro_dia
+from models.__all_models import (AlertaOrcamentoModel, CategoriaModel, ConsumoCategoriaModel, DivideModel,
+                                 MovimentacaoModel, ParenteModel, UsuarioModel)
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+from tests.sementes import semear, usuarios
+
+MES = primeiro_dia(date.today())
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        (UsuarioModel, usuarios((1, "Ana"))),
+        (ParenteModel, [
+            {"id_parente": 1, "nome": "Ana", "grau_parentesco": "Eu", "id_usuario": 1},
+            {"id_parente": 2, "nome": "Bia", "grau_parentesco": "Irmã", "id_usuario": 1},
+        ]),
+        (CategoriaModel, [
+            {"id_categoria": id_categoria, "nome": nome, "id_usuario": 1, "ativo": True, "valor_categoria": valor,
+             "tipo_categoria": TipoCategoria.VARIAVEL, "modelo_categoria": TipoMovimentacao.DESPESA, "nome_icone": "c.svg"}
+            for id_categoria, nome, valor in ((1, "Mercado", Decimal("500")), (2, "Lazer", Decimal("100")))
+        ]),
+    )
+
+
+def despesa(id_categoria, **divisoes):
+    movimentacao = MovimentacaoModel(
+        valor=sum(divisoes.values()), tipoMovimentacao=TipoMovimentacao.DESPESA, forma_pagamento=FormaPagamento.DEBITO,
+        condicao_pagamento=CondicaoPagamento.A_VISTA, datatime=datetime.now(timezone.utc), consolidado=False,
+        data_pagamento=date.today(), id_categoria=id_categoria, id_conta=None, id_usuario=1)
+    parentes = {"ana": 1, "bia": 2}
+    movimentacao.divisoes = [DivideModel(id_parente=parentes[nome], valor=valor) for nome, valor in divisoes.items()]
+    return movimentacao
+
+
+async def estado(session):
+    consumos = dict((await session.execute(
+        select(ConsumoCategoriaModel.id_categoria, ConsumoCategoriaModel.valor_consumido)
+        .where(ConsumoCategoriaModel.mes == MES))).all())
+    alertas = (await session.execute(
+        select(AlertaOrcamentoModel.id_categoria, AlertaOrcamentoModel.limiar)
+        .order_by(AlertaOrcamentoModel.id_alerta))).all()
+    return consumos, [tuple(alerta) for alerta in alertas]
+
+
+def test_limiar_cruzado():
+    assert limiar_cruzado(Decimal("399.99"), Decimal("500")) == 0
+    assert limiar_cruzado(Decimal("400"), Decimal("500")) == 80
+    assert limiar_cruzado(Decimal("600"), Decimal("500")) == 100
+    assert limiar_cruzado(Decimal("600"), None) == 0
+
+
+@pytest.mark.asyncio
+async def test_consumo_acompanha_as_despesas_e_enfileira_avisos(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:  # como core.database.Session
+        primeira = despesa(1, ana=Decimal("200"), bia=Decimal("100"))
+        session.add(primeira)
+        await session.commit()
+        assert await estado(session) == ({1: Decimal("200")}, [])  # só a parte da própria usuária
+
+        segunda = despesa(1, ana=Decimal("250"))
+        session.add(segunda)
+        with coletar_consultas() as coleta:
+            await session.commit()
+        assert await estado(session) == ({1: Decimal("450")}, [(1, 80)])
+        assert coleta.total <= 9  # versão de sincronização + inserts + parentes + UPDATE do contador + categoria + aviso
+
+        primeira = (await session.execute(select(MovimentacaoModel).options(selectinload(MovimentacaoModel.divisoes))
+                                          .where(MovimentacaoModel.id_movimentacao == primeira.id_movimentacao))).scalar_one()
+        next(d for d in primeira.divisoes if d.id_parente == 1).valor = Decimal("300")
+        await session.commit()
+        assert await estado(session) == ({1: Decimal("550")}, [(1, 80), (1, 100)])
+
+        await session.delete(segunda)
+        await session.commit()
+        consumo = await session.get(ConsumoCategoriaModel, (1, MES))
+        assert consumo.valor_consumido == Decimal("300") and consumo.limiar_notificado == 0  # rearmado
+
+        primeira.id_categoria = 2
+        await session.commit()
+        assert await estado(session) == ({1: Decimal("0"), 2: Decimal("300")}, [(1, 80), (1, 100), (2, 80), (2, 100)])
+
+
+@pytest.mark.asyncio
+async def test_contador_ausente_nasce_da_agregacao(engine):
+    async with engine.begin() as conn:
+        # gasto gravado antes de o contador existir (sem passar pela Session)
+        await conn.execute(insert(MovimentacaoModel).values(
+            id_movimentacao=10, valor=Decimal("70"), tipoMovimentacao=TipoMovimentacao.DESPESA,
+            forma_pagamento=FormaPagamento.DEBITO, condicao_pagamento=CondicaoPagamento.A_VISTA, consolidado=False,
+            data_pagamento=date.today(), id_categoria=2, id_usuario=1))
+        await conn.execute(insert(DivideModel).values(id_parente=1, id_movimentacao=10, valor=Decimal("70")))
+
+    async with AsyncSession(engine) as session:
+        assert await consumos_do_mes(session, 1, [1, 2], MES) == {1: Decimal("0"), 2: Decimal("70")}
+        with coletar_consultas() as coleta:
+            assert await consumos_do_mes(session, 1, [1, 2], MES) == {1: Decimal("0"), 2: Decimal("70")}
+        assert coleta.total == 1
+
+        session.add(despesa(2, ana=Decimal("20")))
+        await session.commit()
+        assert await estado(session) == ({1: Decimal("0"), 2: Decimal("90")}, [(2, 80)])
@@ -0,0 +1,99 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.v1.endpoints import movimentacao
+from core.compressao import CompressaoMiddleware
+from core.deps import get_current_user_leitura, get_read_session
+from core.instrumentation import coletar_consultas
+from models.__all_models import CategoriaModel, DivideModel, MovimentacaoModel, ParenteModel, UsuarioModel
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+from tests.sementes import semear, usuarios
+
+
+DESPESAS = [(10, 1, date(2024, 1, 5)), (11, 1, date(2024, 3, 9)), (12, 2, date(2024, 3, 20)), (13, 2, date(2024, 6, 1))]
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        (UsuarioModel, usuarios((1, "Ana"))),
+        (ParenteModel, [
+            {"id_parente": 1, "nome": "Ana", "grau_parentesco": "Eu", "id_usuario": 1},
+            {"id_parente": 2, "nome": "Bia", "grau_parentesco": "Irmã", "id_usuario": 1},
+        ]),
+        (CategoriaModel, [
+            {"id_categoria": id_categoria, "nome": nome, "id_usuario": 1, "ativo": True,
+             "tipo_categoria": TipoCategoria.VARIAVEL, "modelo_categoria": TipoMovimentacao.DESPESA, "nome_icone": "c.svg"}
+            for id_categoria, nome in ((1, "Mercado"), (2, "Lazer"), (3, "Saúde"))
+        ]),
+        (MovimentacaoModel, [
+            {"id_movimentacao": id_mov, "valor": Decimal("100"), "tipoMovimentacao": TipoMovimentacao.DESPESA,
+             "forma_pagamento": FormaPagamento.DEBITO, "condicao_pagamento": CondicaoPagamento.A_VISTA,
+             "consolidado": True, "data_pagamento": data, "id_categoria": id_categoria, "id_usuario": 1}
+            for id_mov, id_categoria, data in DESPESAS
+        ]),
+        (DivideModel, [
+            {"id_movimentacao": id_mov, "id_parente": id_parente, "valor": valor}
+            for id_mov, _, _ in DESPESAS for id_parente, valor in ((1, Decimal("60")), (2, Decimal("40")))
+        ]),
+    )
+
+
+@pytest_asyncio.fixture
+async def cliente(engine):
+    app = FastAPI()
+    app.include_router(movimentacao.router, prefix="/movimentacao")
+    app.add_middleware(CompressaoMiddleware)
+
+    async def sessao():
+        async with AsyncSession(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_read_session] = sessao
+    app.dependency_overrides[get_current_user_leitura] = lambda: UsuarioModel(id_usuario=1, nome_completo="Ana")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_matriz_em_uma_consulta(cliente):
+    parametros = {"tipo_receita": "false", "data_inicio": "2024-01-15", "data_fim": "2024-04-01"}
+    with coletar_consultas() as coleta:
+        resposta = await cliente.get("/movimentacao/gastos-receitas-por-categoria/matriz",
+                                     params={**parametros, "somente_usuario": "true"})
+    assert resposta.status_code == 200
+    assert coleta.total == 1
+
+    matriz = resposta.json()
+    assert matriz["meses"] == ["2024-01", "2024-02", "2024-03", "2024-04"]
+    assert [(c["nome_categoria"], c["valores"]) for c in matriz["categorias"]] == [
+        ("Mercado", ["60.00", "0", "60.00", "0"]),
+        ("Lazer", ["0", "0", "60.00", "0"]),  # junho fica fora do período
+        ("Saúde", ["0", "0", "0", "0"]),
+    ]
+    assert matriz["totais_mes"] == ["60.00", "0", "120.00", "0"]
+    assert matriz["valor_total"] == "180.00"
+
+    todos = (await cliente.get("/movimentacao/gastos-receitas-por-categoria/matriz",
+                               params={**parametros, "somente_usuario": "false"})).json()
+    assert todos["valor_total"] == "300.00"
+
+
+@pytest.mark.asyncio
+async def test_matriz_valida_o_periodo_e_comprime(cliente):
+    url = "/movimentacao/gastos-receitas-por-categoria/matriz"
+    invertido = await cliente.get(url, params={"tipo_receita": "false", "somente_usuario": "true",
+                                               "data_inicio": "2024-05-01", "data_fim": "2024-01-01"})
+    assert invertido.status_code == 400
+
+    resposta = await cliente.get(url, params={"tipo_receita": "false", "somente_usuario": "true",
+                                              "data_inicio": "2015-01-01", "data_fim": "2024-12-31"},
+                                 headers={"Accept-Encoding": "br"})
+    assert resposta.headers["content-encoding"] == "br"
+    assert len(resposta.json()["meses"]) == 120
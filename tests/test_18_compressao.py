@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import json
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from core.compressao import CompressaoMiddleware, comprimir, escolher_codificacao
+from core.responses import ORJSONDecimalResponse
+
+GRANDE = {"valores": [f"{i}.90" for i in range(2000)]}
+
+app = FastAPI()
+
+
+@app.get("/pequena")
+async def pequena():
+    return ORJSONDecimalResponse(content={"a": 1})
+
+
+@app.get("/grande")
+async def grande():
+    return ORJSONDecimalResponse(content=GRANDE)
+
+
+@app.get("/grande/{id}")
+async def grande_por_id(id: int):
+    return ORJSONDecimalResponse(content=GRANDE)
+
+
+@app.get("/fluxo")
+async def fluxo():
+    async def linhas():
+        for i in range(50):
+            yield json.dumps({"linha": i, "descricao": "Movimentação " * 20}) + "\n"
+    return StreamingResponse(linhas(), media_type="application/json")
+
+
+aplicacao = CompressaoMiddleware(app, niveis_por_rota={"/grande/{id}": {"br": 11}})
+
+
+async def chamar(caminho, accept_encoding=None):
+    """Chama a aplicação ASGI e devolve (headers, pedaços do corpo) sem decodificar nada."""
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    scope = {"type": "http", "method": "GET", "path": caminho, "raw_path": caminho.encode(), "query_string": b"",
+             "headers": headers, "http_version": "1.1", "scheme": "http", "server": ("teste", 80), "root_path": ""}
+    mensagens, pedido_lido, fim = [], False, asyncio.Event()
+
+    async def receive():
+        nonlocal pedido_lido
+        if not pedido_lido:
+            pedido_lido = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await fim.wait()  # o StreamingResponse fica escutando o disconnect
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        mensagens.append(message)
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            fim.set()
+
+    await aplicacao(scope, receive, send)
+    inicio, *corpo = mensagens
+    return ({k.decode(): v.decode() for k, v in inicio["headers"]},
+            [m["body"] for m in corpo if m.get("body")])
+
+
+def test_negociacao_da_codificacao():
+    assert escolher_codificacao("gzip, deflate, br") == "br"
+    assert escolher_codificacao("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert escolher_codificacao("br;q=0, gzip") == "gzip"
+    assert escolher_codificacao("*") == "br"
+    assert escolher_codificacao("identity") is None
+    assert escolher_codificacao(None) is None
+
+
+@pytest.mark.asyncio
+async def test_corpo_pequeno_ou_sem_accept_encoding_sai_intacto():
+    headers, corpo = await chamar("/pequena", "br, gzip")
+    assert "content-encoding" not in headers and headers["vary"] == "Accept-Encoding"
+    assert b"".join(corpo) == b'{"a":1}'
+
+    headers, corpo = await chamar("/grande")
+    assert "content-encoding" not in headers
+    assert json.loads(b"".join(corpo)) == GRANDE
+
+
+@pytest.mark.asyncio
+async def test_corpo_grande_e_comprimido_no_nivel_da_rota():
+    headers, corpo = await chamar("/grande", "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert int(headers["content-length"]) == len(corpo[0])
+    assert json.loads(gzip.decompress(corpo[0])) == GRANDE
+
+    original = ORJSONDecimalResponse(content=GRANDE).body
+    _, padrao = await chamar("/grande", "br")
+    _, rota = await chamar("/grande/7", "br")
+    assert padrao[0] == comprimir(original, "br")
+    assert rota[0] == comprimir(original, "br", 11)  # nível vem do template da rota
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("codificacao, descomprimir", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+async def test_streaming_e_comprimido_pedaco_a_pedaco(codificacao, descomprimir):
+    headers, corpo = await chamar("/fluxo", codificacao)
+    assert headers["content-encoding"] == codificacao
+    assert "content-length" not in headers
+    assert len(corpo) > 1  # não esperou o fim do fluxo para enviar
+    linhas = descomprimir(b"".join(corpo)).decode().splitlines()
+    assert [json.loads(linha)["linha"] for linha in linhas] == list(range(50))
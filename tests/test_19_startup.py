@@ -0,0 +1,31 @@
+import sys
+from unittest.mock import patch
+
+from decouple import config
+
+from benchmarks.bench_startup import carregados_sob_demanda, medir_importacao
+from core.utils import ModuloSobDemanda, importar_sob_demanda
+
+# folgado de propósito: pega regressões grandes (um import pesado no topo), não ruído de CI
+ORCAMENTO_STARTUP_MS = config("STARTUP_ORCAMENTO_MS", default=4000, cast=int)
+
+
+def test_import_main_respeita_o_orcamento_e_nao_carrega_pdf_nem_smtp():
+    medicoes = [medir_importacao("main") for _ in range(2)]
+    melhor = min(medicoes, key=lambda tempos: tempos["main"])
+    assert carregados_sob_demanda(melhor) == []
+    assert melhor["main"] / 1000 < ORCAMENTO_STARTUP_MS
+
+
+def test_modulo_sob_demanda_importa_no_primeiro_acesso_e_aceita_patch():
+    sys.modules.pop("colorsys", None)
+    colorsys = importar_sob_demanda("colorsys")
+    assert isinstance(colorsys, ModuloSobDemanda) and "colorsys" not in sys.modules
+
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "colorsys" in sys.modules
+
+    with patch.object(colorsys, "rgb_to_hsv", return_value="falso"):
+        assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == "falso"
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert importar_sob_demanda("colorsys") is sys.modules["colorsys"]
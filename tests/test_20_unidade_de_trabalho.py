@@ -0,0 +1,80 @@
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.banco import criar_engine, criar_tabelas
+from core.database import SessaoUnidadeDeTrabalho
+from models.__all_models import UsuarioModel
+
+
+def usuario(id_usuario):
+    return UsuarioModel(id_usuario=id_usuario, nome_completo=f"Usuária {id_usuario}", email=f"u{id_usuario}@b.com",
+                        senha="x", data_nascimento=date(1990, 1, 1))
+
+
+@pytest_asyncio.fixture
+async def fabrica():
+    engine = criar_engine()
+    await criar_tabelas(engine)
+    eventos = {"checkout": 0, "commit": 0, "rollback": 0}
+    event.listen(engine.sync_engine.pool, "checkout", lambda *_: eventos.__setitem__("checkout", eventos["checkout"] + 1))
+    event.listen(engine.sync_engine, "commit", lambda *_: eventos.__setitem__("commit", eventos["commit"] + 1))
+    event.listen(engine.sync_engine, "rollback", lambda *_: eventos.__setitem__("rollback", eventos["rollback"] + 1))
+    Session = sessionmaker(bind=engine, class_=SessaoUnidadeDeTrabalho, expire_on_commit=False, autoflush=False)
+    yield Session, eventos
+    await engine.dispose()
+
+
+async def usuarios_gravados(Session):
+    async with Session() as session:
+        return (await session.execute(select(func.count()).select_from(UsuarioModel))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_uma_conexao_e_um_commit_por_requisicao(fabrica):
+    Session, eventos = fabrica
+    async with Session().unidade_de_trabalho() as db:
+        async with db as session:  # get_current_user
+            await session.execute(select(UsuarioModel))
+        async with db as session:  # handler
+            session.add(usuario(1))
+            await session.commit()
+            session.add(usuario(2))
+            await session.commit()
+        await db.close()  # o antigo finally do handler
+        assert eventos == {"checkout": 1, "commit": 0, "rollback": 0}
+        assert (await db.execute(select(func.count()).select_from(UsuarioModel))).scalar_one() == 2
+
+    assert eventos == {"checkout": 1, "commit": 1, "rollback": 0}
+    assert await usuarios_gravados(Session) == 2
+
+
+@pytest.mark.asyncio
+async def test_erro_no_handler_desfaz_tudo(fabrica):
+    Session, eventos = fabrica
+    with pytest.raises(RuntimeError):
+        async with Session().unidade_de_trabalho() as session:
+            session.add(usuario(1))
+            await session.commit()
+            raise RuntimeError("falha depois do commit do handler")
+    assert eventos["commit"] == 0 and eventos["rollback"] == 1
+    assert await usuarios_gravados(Session) == 0
+
+
+@pytest.mark.asyncio
+async def test_helper_aninhado_usa_savepoint_da_transacao_externa(fabrica):
+    Session, eventos = fabrica
+    async with Session().unidade_de_trabalho() as session:
+        session.add(usuario(1))
+        await session.commit()
+        with pytest.raises(IntegrityError):
+            async with session.begin_nested():  # como create_fatura_ano
+                session.add(usuario(1))
+        async with session.begin_nested():
+            session.add(usuario(2))
+    assert eventos["commit"] == 1
+    assert await usuarios_gravados(Session) == 2
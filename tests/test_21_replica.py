@@ -0,0 +1,94 @@
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.banco import criar_engine, criar_tabelas
+from core import database, deps
+from core.database import CHAVE_REPLICA, SessaoUnidadeDeTrabalho
+from core.deps import get_read_session, get_session
+from core.replica import ConsistenciaLeituraMiddleware, JANELA_SEGUNDOS, escrita_recente, sessao_leitura
+from models.__all_models import UsuarioModel
+
+
+def fabrica(engine, **info):
+    return sessionmaker(bind=engine, class_=SessaoUnidadeDeTrabalho, expire_on_commit=False, autoflush=False,
+                        info=info)
+
+
+@pytest_asyncio.fixture
+async def bancos(tmp_path, monkeypatch):
+    """Primário e réplica no mesmo arquivo SQLite; a réplica abre somente leitura."""
+    arquivo = tmp_path / "financas.db"
+    primario = criar_engine(f"sqlite+aiosqlite:///{arquivo}")
+    await criar_tabelas(primario)
+    async with primario.begin() as conn:
+        await conn.execute(insert(UsuarioModel).values(id_usuario=1, nome_completo="Ana", email="a@b.com", senha="x",
+                                                        data_nascimento=date(1990, 1, 1)))
+    replica = criar_engine(f"sqlite+aiosqlite:///file:{arquivo}?mode=ro&uri=true")
+    monkeypatch.setattr(database, "Session", fabrica(primario))
+    monkeypatch.setattr(deps, "Session", database.Session)
+    monkeypatch.setattr(database, "SessionLeitura", fabrica(replica, **{CHAVE_REPLICA: True}))
+    yield primario, replica
+    await primario.dispose()
+    await replica.dispose()
+
+
+def test_janela_de_leitura_das_proprias_escritas():
+    assert escrita_recente("1000.0", agora=1000.0 + JANELA_SEGUNDOS - 1)
+    assert not escrita_recente("1000.0", agora=1000.0 + JANELA_SEGUNDOS)
+    assert not escrita_recente(None) and not escrita_recente("lixo")
+
+
+@pytest.mark.asyncio
+async def test_leitura_vai_para_a_replica_e_nunca_grava(bancos):
+    async with sessao_leitura() as session:
+        assert session.info.get(CHAVE_REPLICA)
+        usuario = await session.get(UsuarioModel, 1)
+        usuario.nome_completo = "alterado sem querer"  # como a rotina diária faz com a descrição
+    async with sessao_leitura(forcar_primario=True) as session:
+        assert not session.info.get(CHAVE_REPLICA)
+        assert (await session.get(UsuarioModel, 1)).nome_completo == "Ana"
+
+
+@pytest.mark.asyncio
+async def test_replica_fora_do_ar_cai_no_primario(bancos, monkeypatch):
+    indisponivel = criar_engine("sqlite+aiosqlite:////diretorio/que/nao/existe/replica.db")
+    monkeypatch.setattr(database, "SessionLeitura", fabrica(indisponivel, **{CHAVE_REPLICA: True}))
+    async with sessao_leitura() as session:
+        assert not session.info.get(CHAVE_REPLICA)
+        assert (await session.execute(select(func.count()).select_from(UsuarioModel))).scalar_one() == 1
+    await indisponivel.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cookie_de_escrita_manda_as_leituras_seguintes_para_o_primario(bancos):
+    app = FastAPI()
+
+    @app.post("/usuarios/{id_usuario}")
+    async def gravar(id_usuario: int, db: AsyncSession = Depends(get_session)):
+        db.add(UsuarioModel(id_usuario=id_usuario, nome_completo="Bia", email=f"{id_usuario}@b.com", senha="x",
+                            data_nascimento=date(1990, 1, 1)))
+        await db.commit()
+
+    @app.get("/usuarios")
+    async def ler(db: AsyncSession = Depends(get_read_session)):
+        total = (await db.execute(select(func.count()).select_from(UsuarioModel))).scalar_one()
+        return {"replica": db.info.get(CHAVE_REPLICA, False), "total": total}
+
+    transporte = ASGITransport(app=ConsistenciaLeituraMiddleware(app))
+    async with AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+        assert (await cliente.get("/usuarios")).json() == {"replica": True, "total": 1}
+        assert "set-cookie" not in (await cliente.get("/usuarios")).headers  # leitura não renova o cookie
+
+        gravacao = await cliente.post("/usuarios/2")
+        assert gravacao.headers["set-cookie"].startswith("ultima_escrita=")
+        assert (await cliente.get("/usuarios")).json() == {"replica": False, "total": 2}
+
+        cliente.cookies.clear()
+        assert (await cliente.get("/usuarios")).json()["replica"] is True
@@ -0,0 +1,186 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from api.v1.endpoints import rotina, usuario
+from api.v1.endpoints.rotina import check_and_send_email
+from core import database, email_saida
+from core.deps import get_session
+from core.email_saida import drenar_emails, enfileirar_email
+from models.__all_models import EmailSaidaModel, MovimentacaoModel, UsuarioModel
+from models.enums import CondicaoPagamento, EstadoEmail, FormaPagamento, TipoMovimentacao
+from tests.sementes import semear, usuarios
+
+
+@pytest.fixture
+def semente():
+    return semear((UsuarioModel, usuarios((1, "Ana", "ana@a.com"))))
+
+
+async def caixa(Session):
+    async with Session() as session:
+        return (await session.execute(select(EmailSaidaModel).order_by(EmailSaidaModel.id_email))).scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_enfileirado_so_existe_se_a_transacao_commitar(Session):
+    async with Session().unidade_de_trabalho() as session:
+        enfileirar_email(session, "ana@a.com", "Assunto", "<p>ok</p>", origem="auth")
+    with pytest.raises(RuntimeError):
+        async with Session().unidade_de_trabalho() as session:
+            enfileirar_email(session, "bia@a.com", "Assunto", "<p>perdido</p>", origem="auth")
+            raise RuntimeError("handler falhou")
+    assert [(e.destinatario, e.estado) for e in await caixa(Session)] == [("ana@a.com", EstadoEmail.PENDENTE)]
+
+
+@pytest.mark.asyncio
+@patch("core.email_saida.config", return_value="remetente@financas.com")
+async def test_limite_por_dominio_conta_os_envios_de_todos_os_workers(mock_config, Session, monkeypatch):
+    antes = datetime.now(timezone.utc)
+    async with Session() as session:
+        # outro worker: um entregue há 30 s e uma reserva em andamento, ambos em a.com
+        for destinatario in ("caio@a.com", "bia@b.com"):
+            enfileirar_email(session, destinatario, "Cobrança", "<p>ok</p>", origem="parente")
+        session.add_all([
+            EmailSaidaModel(destinatario="ja@a.com", assunto="x", corpo_html="x", origem="parente",
+                            estado=EstadoEmail.ENVIADO, enviado_em=antes - timedelta(seconds=30)),
+            EmailSaidaModel(destinatario="outro@a.com", assunto="x", corpo_html="x", origem="parente",
+                            estado=EstadoEmail.ENVIANDO, proxima_tentativa=antes + timedelta(minutes=5)),
+        ])
+        await session.commit()
+    monkeypatch.setattr(email_saida, "LIMITE_POR_DOMINIO_MINUTO", 2)
+    agora = datetime.now(timezone.utc)
+
+    servidor = MagicMock()
+    with patch("core.email_saida.smtplib.SMTP") as mock_smtp:
+        mock_smtp.return_value.__enter__.return_value = servidor
+        async with Session() as session:
+            resumo = await drenar_emails(session, agora)
+    assert resumo == {"enviados": 1, "reagendados": 0, "descartados": 0, "adiados": 1}
+    assert [msg.args[0]["To"] for msg in servidor.send_message.call_args_list] == ["bia@b.com"]
+    [adiado] = [e for e in await caixa(Session) if e.estado == EstadoEmail.PENDENTE]
+    assert adiado.destinatario == "caio@a.com"
+    assert adiado.proxima_tentativa.replace(tzinfo=timezone.utc) == agora + timedelta(minutes=1)
+
+
+@pytest.mark.asyncio
+@patch("core.email_saida.config", return_value="remetente@financas.com")
+async def test_drenagem_entrega_em_lote_reagenda_e_descarta(mock_config, Session, monkeypatch):
+    async with Session() as session:
+        for destinatario in ("ana@a.com", "recusado@a.com", "caio@a.com", "bia@b.com"):
+            enfileirar_email(session, destinatario, "Cobrança", "<p>R$ 10,00</p>", origem="parente")
+        await session.commit()
+
+    def enviar(msg):
+        if msg["To"].startswith("recusado"):
+            raise RuntimeError("550 caixa inexistente")
+
+    servidor = MagicMock()
+    servidor.send_message.side_effect = enviar
+    monkeypatch.setattr(email_saida, "LIMITE_POR_DOMINIO_MINUTO", 2)
+    agora = datetime.now(timezone.utc)
+
+    with patch("core.email_saida.smtplib.SMTP") as mock_smtp:
+        mock_smtp.return_value.__enter__.return_value = servidor
+        async with Session() as session:
+            resumo = await drenar_emails(session, agora)
+    assert resumo == {"enviados": 2, "reagendados": 1, "descartados": 0, "adiados": 1}
+    assert mock_smtp.call_count == 1 and servidor.login.call_count == 1  # uma conexão para o lote
+
+    emails = {e.destinatario: e for e in await caixa(Session)}
+    assert emails["ana@a.com"].estado == emails["bia@b.com"].estado == EstadoEmail.ENVIADO
+    recusado = emails["recusado@a.com"]
+    assert (recusado.estado, recusado.tentativas, recusado.ultimo_erro) == (EstadoEmail.PENDENTE, 1, "550 caixa inexistente")
+    caio = emails["caio@a.com"]  # passou do limite de a.com: vai para a janela seguinte sem contar tentativa
+    assert (caio.estado, caio.tentativas) == (EstadoEmail.PENDENTE, 0)
+    assert caio.proxima_tentativa.replace(tzinfo=timezone.utc) == agora + timedelta(minutes=1)
+
+    monkeypatch.setattr(email_saida, "MAX_TENTATIVAS", 2)
+    monkeypatch.setattr(email_saida, "LIMITE_POR_DOMINIO_MINUTO", 100)
+    with patch("core.email_saida.smtplib.SMTP") as mock_smtp:
+        mock_smtp.return_value.__enter__.return_value = servidor
+        async with Session() as session:
+            resumo = await drenar_emails(session, agora + timedelta(hours=1))
+    assert resumo["descartados"] == 1
+    assert {e.destinatario: e.estado for e in await caixa(Session)}["recusado@a.com"] == EstadoEmail.DESCARTADO
+
+
+@pytest.mark.asyncio
+@patch("core.email_saida.config", return_value="remetente@financas.com")
+async def test_reserva_commitada_antes_da_entrega_e_retomada_quando_vence(mock_config, Session, monkeypatch):
+    async with Session() as session:
+        enfileirar_email(session, "ana@a.com", "Cobrança", "<p>R$ 10,00</p>", origem="parente")
+        await session.commit()
+    agora = datetime.now(timezone.utc)
+
+    def worker_morre(emails):
+        raise SystemExit("worker reiniciado no meio da entrega")
+
+    monkeypatch.setattr(email_saida, "entregar_lote", worker_morre)
+    with pytest.raises(SystemExit):
+        async with Session() as session:
+            await drenar_emails(session, agora)
+    [email] = await caixa(Session)
+    assert email.estado == EstadoEmail.ENVIANDO  # a reserva foi commitada antes do SMTP
+    assert email.proxima_tentativa.replace(tzinfo=timezone.utc) == agora + email_saida.RESERVA
+
+    async with Session() as session:
+        assert (await drenar_emails(session, agora + timedelta(minutes=1)))["enviados"] == 0  # reserva ainda vale
+    monkeypatch.setattr(email_saida, "entregar_lote", lambda emails: {e.id_email: None for e in emails})
+    async with Session() as session:
+        resumo = await drenar_emails(session, agora + email_saida.RESERVA)
+    assert resumo["enviados"] == 1
+    assert [e.estado for e in await caixa(Session)] == [EstadoEmail.ENVIADO]
+
+
+@pytest.mark.asyncio
+async def test_recuperar_senha_so_enfileira(Session):
+    app = FastAPI()
+    app.include_router(usuario.router, prefix="/usuarios")
+
+    async def sessao():
+        async with Session().unidade_de_trabalho() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = sessao
+    with patch("core.email_saida.smtplib.SMTP") as mock_smtp:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as cliente:
+            resposta = await cliente.post("/usuarios/recover-password", json={"email": "ana@a.com"})
+    assert resposta.status_code == 202
+    assert not mock_smtp.called
+    [email] = await caixa(Session)
+    assert (email.destinatario, email.origem, email.estado) == ("ana@a.com", "auth", EstadoEmail.PENDENTE)
+    assert "redefinir-senha" in email.corpo_html
+
+
+@pytest.mark.asyncio
+async def test_rotina_de_atraso_so_enfileira_um_alerta_por_usuario_e_dia(Session, monkeypatch):
+    async with Session() as session:
+        session.add_all([
+            MovimentacaoModel(valor=Decimal(valor), descricao=descricao, tipoMovimentacao=TipoMovimentacao.DESPESA,
+                              forma_pagamento=FormaPagamento.DEBITO, condicao_pagamento=CondicaoPagamento.A_VISTA,
+                              datatime=datetime.now(timezone.utc), consolidado=False,
+                              data_pagamento=date.today() - timedelta(days=3), id_usuario=1)
+            for valor, descricao in (("80", "Luz"), ("45", "Água"))
+        ])
+        await session.commit()
+    # a leitura cai no primário (sem réplica) e a escrita também vai para o banco do teste
+    monkeypatch.setattr(database, "Session", Session)
+    monkeypatch.setattr(rotina, "Session", Session)
+
+    with patch("core.email_saida.smtplib.SMTP") as mock_smtp:
+        enfileirados = [await check_and_send_email(date(2031, 3, 5)) for _ in range(2)]
+        amanha = await check_and_send_email(date(2031, 3, 6))
+
+    assert enfileirados == [1, 0] and amanha == 1
+    assert not mock_smtp.called
+    emails = await caixa(Session)
+    assert [e.chave for e in emails] == ["atraso:1:2031-03-05", "atraso:1:2031-03-06"]
+    assert all((e.destinatario, e.origem, e.anexar_pdf, e.estado) == ("ana@a.com", "rotina", True, EstadoEmail.PENDENTE)
+               for e in emails)
+    assert "Luz" in emails[0].corpo_html and "Água" in emails[0].corpo_html
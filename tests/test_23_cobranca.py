@@ -0,0 +1,121 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from api.v1.endpoints import parente
+from benchmarks.banco import ContadorConsultas
+from core.cobranca import cobrar_mes, extratos_do_mes, mes_anterior
+from core.email_saida import enfileirar_emails_unicos
+from core.deps import get_current_user, get_session
+from models.__all_models import DivideModel, EmailSaidaModel, MovimentacaoModel, ParenteModel, UsuarioModel
+from models.enums import CondicaoPagamento, FormaPagamento, TipoMovimentacao
+from tests.sementes import semear, usuarios
+
+
+MOVIMENTACOES = [  # id, usuário, tipo, consolidado, data
+    (10, 1, TipoMovimentacao.DESPESA, False, date(2024, 3, 5)),
+    (11, 1, TipoMovimentacao.DESPESA, False, date(2024, 3, 31)),
+    (12, 1, TipoMovimentacao.DESPESA, True, date(2024, 3, 10)),
+    (13, 1, TipoMovimentacao.RECEITA, False, date(2024, 3, 10)),
+    (14, 1, TipoMovimentacao.DESPESA, False, date(2024, 4, 1)),
+    (15, 2, TipoMovimentacao.DESPESA, False, date(2024, 3, 15)),
+]
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        (UsuarioModel, usuarios((1, "Ana", "ana@a.com"), (2, "Caio", "caio@a.com"))),
+        (ParenteModel, [
+            {"id_parente": id_parente, "nome": nome, "email": email, "grau_parentesco": "Família",
+             "id_usuario": id_usuario, "ativo": ativo}
+            for id_parente, nome, email, id_usuario, ativo in (
+                (1, "Ana", "ana@a.com", 1, True), (2, "Bia", "bia@b.com", 1, True), (3, "Duda", None, 1, True),
+                (4, "Edu", "edu@b.com", 1, False), (5, "Fabi", "fabi@b.com", 2, True))
+        ]),
+        (MovimentacaoModel, [
+            {"id_movimentacao": id_mov, "valor": Decimal("100"), "descricao": f"Conta {id_mov}",
+             "tipoMovimentacao": tipo, "forma_pagamento": FormaPagamento.DEBITO,
+             "condicao_pagamento": CondicaoPagamento.A_VISTA, "consolidado": consolidado, "data_pagamento": data,
+             "id_usuario": id_usuario}
+            for id_mov, id_usuario, tipo, consolidado, data in MOVIMENTACOES
+        ]),
+        (DivideModel, [
+            {"id_movimentacao": id_mov, "id_parente": id_parente, "valor": Decimal(valor)}
+            for id_mov in (10, 11, 12, 13, 14) for id_parente, valor in ((1, "50.10"), (2, "30.25"), (3, "10"), (4, "9.65"))
+        ] + [{"id_movimentacao": 15, "id_parente": 5, "valor": Decimal("100")}]),
+    )
+
+
+@pytest.mark.asyncio
+async def test_extratos_de_todos_os_parentes_em_uma_consulta(engine, Session):
+    contador = ContadorConsultas(engine)
+    async with Session() as session:
+        with contador.medir():
+            extratos = await extratos_do_mes(session, 2024, 3)
+    assert contador.total == 1
+
+    por_parente = {extrato.id_parente: extrato for extrato in extratos}
+    assert sorted(por_parente) == [1, 2, 3, 4, 5]
+    bia = por_parente[2]
+    assert (bia.nome_usuario, bia.total) == ("Ana", Decimal("60.50"))  # só as despesas 10 e 11 de março em aberto
+    assert [m["data_pagamento"] for m in bia.movimentacoes] == ["2024-03-05", "2024-03-31"]
+    assert bia.dados()["fatura_geral"] == {"total_movimentacoes": 60.5, "total_geral_movimentacoes": 60.5}
+    assert por_parente[5].nome_usuario == "Caio"
+
+
+@pytest.mark.asyncio
+async def test_cobranca_do_mes_enfileira_em_lotes_so_para_quem_recebe(Session):
+    async with Session() as session:
+        resumo = await cobrar_mes(session, 2024, 3, lote=1)
+        # outra rodada do mesmo mês (outro worker, o lote do usuário) não cobra ninguém de novo
+        de_novo = await cobrar_mes(session, 2024, 3)
+        # e o worker que passou pela checagem junto com este esbarra na chave
+        concorrente = await enfileirar_emails_unicos(session, [{
+            "destinatario": "bia@b.com", "assunto": "Cobrança", "corpo_html": "", "origem": "parente",
+            "chave": "cobranca:2:2024-03"}])
+    assert resumo == {"parentes": 3, "usuarios": 2, "ja_cobrados": 0}
+    assert de_novo == {"parentes": 0, "usuarios": 0, "ja_cobrados": 3} and concorrente == 0
+
+    async with Session() as session:
+        emails = (await session.execute(select(EmailSaidaModel).order_by(EmailSaidaModel.id_email))).scalars().all()
+    assert [(e.destinatario, e.origem, e.anexar_pdf, e.chave) for e in emails] == [
+        ("ana@a.com", "parente", True, "cobranca:1:2024-03"), ("bia@b.com", "parente", True, "cobranca:2:2024-03"),
+        ("fabi@b.com", "parente", True, "cobranca:5:2024-03")]
+    assert emails[0].assunto == "Lembrete de Movimentações não Consolidadas"
+    assert "R$ 60,50" in emails[1].corpo_html and "com Ana no mês 3/2024" in emails[1].corpo_html
+    assert "com Caio no mês 3/2024" in emails[2].corpo_html
+
+
+@pytest.mark.asyncio
+async def test_endpoints_de_cobranca(Session):
+    app = FastAPI()
+    app.include_router(parente.router, prefix="/parente")
+
+    async def sessao():
+        async with Session().unidade_de_trabalho() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = sessao
+    app.dependency_overrides[get_current_user] = lambda: UsuarioModel(id_usuario=1, nome_completo="Ana")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as cliente:
+        extrato = (await cliente.post("/parente/cobranca", json={"mes": 3, "ano": 2024, "id_parente": 2})).json()
+        sem_divisoes = (await cliente.post("/parente/cobranca", json={"mes": 5, "ano": 2024, "id_parente": 2})).json()
+        lote = await cliente.post("/parente/enviar-cobranca/lote", json={"mes": 3, "ano": 2024})
+        mes_invalido = await cliente.post("/parente/enviar-cobranca/lote", json={"mes": 13, "ano": 2024})
+
+    assert extrato["data"]["fatura_geral"] == {"total_movimentacoes": 60.5, "total_geral_movimentacoes": 60.5}
+    assert [m["valor"] for m in extrato["data"]["movimentacoes_nao_consolidadas"]] == [30.25, 30.25]
+    assert sem_divisoes["data"] == {"movimentacoes_nao_consolidadas": [],
+                                    "fatura_geral": {"total_movimentacoes": 0.0, "total_geral_movimentacoes": 0.0}}
+    assert (lote.status_code, lote.json()["parentes"]) == (202, 2)  # Caio não é cobrado pela Ana
+    assert mes_invalido.status_code == 422
+
+
+def test_mes_anterior():
+    assert mes_anterior(date(2024, 1, 15)) == (2023, 12)
+    assert mes_anterior(date(2024, 7, 1)) == (2024, 6)
@@ -0,0 +1,50 @@
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from api.v1.endpoints.rotina import processar_usuarios_em_atraso
+from core.cobranca import criar_email_data
+from core.formatacao import formatar_data_brasileira, formatar_valor_brasileiro
+from core.templates import DIRETORIO, precompilar, renderizar
+
+
+def test_formatacao_brasileira():
+    assert formatar_valor_brasileiro(1234567.891) == "R$ 1.234.567,89"
+    assert formatar_valor_brasileiro(Decimal("-0.5")) == "R$ -0,50"
+    assert formatar_valor_brasileiro("abc") == "abc" and formatar_valor_brasileiro(None) is None
+    assert formatar_data_brasileira("2024-03-05") == formatar_data_brasileira(date(2024, 3, 5)) == "05/03/2024"
+    assert formatar_data_brasileira(datetime(2024, 12, 31, 23, 59)) == "31/12/2024"
+
+
+def test_todos_os_templates_compilam():
+    assert precompilar() == sorted(caminho.name for caminho in DIRETORIO.glob("*.mako"))
+    assert "redefinir-senha/abc" in renderizar("redefinir_senha.mako", nome="Ana", url="https://web/redefinir-senha/abc")
+
+
+def test_alerta_de_atraso_escapa_e_nao_altera_os_objetos():
+    contas = [SimpleNamespace(descricao=None, data_pagamento=date(2024, 3, 5), valor=Decimal("10.50")),
+              SimpleNamespace(descricao="<b>Luz & Gás</b>", data_pagamento=date(2024, 3, 6), valor=Decimal("1000"))]
+    faturas = [(SimpleNamespace(data_vencimento=date(2024, 3, 10), fatura_gastos=Decimal("89.50")),
+                SimpleNamespace(nome="Visa"))]
+    [(email_data, destinatario)] = processar_usuarios_em_atraso({"a@b.com": contas}, {"a@b.com": faturas})
+
+    corpo = email_data["email_body"]
+    assert destinatario == "a@b.com" and email_data["email_subject"] == "Alerta: Contas e Faturas em Atraso"
+    assert "Outros" in corpo and contas[0].descricao is None  # a varredura roda em sessão somente leitura
+    assert "&lt;b&gt;Luz &amp; Gás&lt;/b&gt;" in corpo and "<b>Luz" not in corpo
+    assert corpo.index("Contas em atraso") < corpo.index("Fatura - Visa") < corpo.index("R$ 1.100,00")
+
+    [(so_faturas, _)] = processar_usuarios_em_atraso({}, {"c@d.com": faturas})
+    assert "Contas em atraso" not in so_faturas["email_body"] and "R$ 89,50" in so_faturas["email_body"]
+
+
+def test_extrato_do_parente_tem_uma_linha_por_movimentacao():
+    movimentacoes = [{"descricao": f"Conta {i}", "data_pagamento": "2024-03-05", "valor": 10.0} for i in range(500)]
+    dados = {"movimentacoes_nao_consolidadas": movimentacoes,
+             "fatura_geral": {"total_movimentacoes": 5000.0, "total_geral_movimentacoes": 5000.0}}
+    email_data = criar_email_data(SimpleNamespace(nome="Bia"), SimpleNamespace(nome_completo="Ana"),
+                                  SimpleNamespace(mes=3, ano=2024), dados)
+
+    assert email_data["email_subject"] == "Cobrança de Movimentações não Consolidadas"
+    assert email_data["email_body"].count("<tr><td") == 500 + 1  # linhas + resumo
+    assert email_data["email_body"].count("R$ 5.000,00") == 2
@@ -0,0 +1,118 @@
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+import core.cadastro
+from api.v1.endpoints import usuario
+from benchmarks.banco import ContadorConsultas
+from core.cadastro import CATEGORIAS_PADRAO, _COLUNAS_USUARIO, _semeaduras, provisionar_usuarios
+from core.configs import settings
+from core.deps import get_session
+from models.__all_models import CategoriaModel, ContaModel, ParenteModel, UsuarioModel
+from models.enums import TipoCategoria
+from tests.sementes import semear
+
+
+def _usuarios(*nomes):
+    return [{"nome_completo": nome, "data_nascimento": date(1990, 1, 1), "email": f"{nome.lower()}@a.com",
+             "senha": "segredo"} for nome in nomes]
+
+
+@pytest.fixture
+def semente():
+    return semear()  # os usuários nascem no teste
+
+
+@pytest.fixture(autouse=True)
+def hash_rapido(monkeypatch):
+    monkeypatch.setattr(core.cadastro, "generate_hash", lambda senha: f"hash:{senha}")
+
+
+async def _contagens(Session, modelo):
+    async with Session() as session:
+        return dict((await session.execute(
+            select(modelo.id_usuario, func.count()).group_by(modelo.id_usuario))).all())
+
+
+@pytest.mark.asyncio
+async def test_cada_usuario_recebe_os_padroes_com_statements_constantes(Session):
+    contador = ContadorConsultas(Session.kw["bind"])
+    async with Session() as session:
+        with contador.medir():
+            [ana] = await provisionar_usuarios(session, _usuarios("Ana"))
+        statements_um = contador.total
+        with contador.medir():
+            varios = await provisionar_usuarios(session, _usuarios(*(f"U{i}" for i in range(50))))
+        await session.commit()
+
+    assert statements_um == contador.total == 4  # usuários + categorias + contas + parentes
+    assert [linha.email for linha in varios] == [f"u{i}@a.com" for i in range(50)]
+    assert (await _contagens(Session, CategoriaModel)) == {i: len(CATEGORIAS_PADRAO) for i in range(1, 52)}
+    assert set((await _contagens(Session, ContaModel)).values()) == {1}
+
+    async with Session() as session:
+        eu = (await session.execute(select(ParenteModel).where(ParenteModel.id_usuario == ana.id_usuario))).scalar_one()
+        lazer = (await session.execute(select(CategoriaModel).where(
+            CategoriaModel.id_usuario == ana.id_usuario, CategoriaModel.nome == "Lazer"))).scalar_one()
+        carteira = (await session.execute(select(ContaModel).where(ContaModel.id_usuario == ana.id_usuario))).scalar_one()
+        senha = (await session.execute(select(UsuarioModel.senha).where(UsuarioModel.id_usuario == 1))).scalar_one()
+    assert (eu.nome, eu.email, eu.grau_parentesco, eu.ativo) == ("Ana", "ana@a.com", "Eu", True)
+    assert (lazer.tipo_categoria, lazer.valor_categoria, lazer.ativo) == (TipoCategoria.VARIAVEL, None, True)
+    assert (carteira.nome, carteira.tipo_conta, carteira.saldo) == ("Carteira", "Carteira", 0)
+    assert senha == "hash:segredo"
+
+
+@pytest.mark.asyncio
+async def test_email_repetido_desfaz_o_lote_inteiro(Session):
+    async with Session() as session:
+        await provisionar_usuarios(session, _usuarios("Ana"))
+        await session.commit()
+
+    async with Session() as session:
+        with pytest.raises(IntegrityError):
+            await provisionar_usuarios(session, _usuarios("Bia", "Ana"))
+        await session.rollback()
+
+    assert list(await _contagens(Session, CategoriaModel)) == [1]
+    assert list(await _contagens(Session, ParenteModel)) == [1]
+
+
+def test_no_postgresql_e_um_statement_so():
+    novos = insert(UsuarioModel).values(_usuarios("Ana")).returning(*_COLUNAS_USUARIO).cte("novos_usuarios")
+    statement = select(novos).add_cte(*(s.cte(f"semeadura_{i}") for i, s in enumerate(_semeaduras(novos))))
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.count("INSERT INTO") == 4 and "WITH novos_usuarios AS" in sql
+    assert 'INSERT INTO "CATEGORIA"' in sql and "UNION ALL" in sql
+
+
+@pytest.mark.asyncio
+async def test_endpoints_de_cadastro(Session, monkeypatch):
+    app = FastAPI()
+    app.include_router(usuario.router, prefix="/usuarios")
+
+    async def sessao():
+        async with Session().unidade_de_trabalho() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = sessao
+    corpo = [{**dados, "data_nascimento": "1990-01-01"} for dados in _usuarios("Ana", "Bia")]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as cliente:
+        sozinho = await cliente.post("/usuarios/cadastro", json={**corpo[0], "email": "so@a.com"})
+        desligado = await cliente.post("/usuarios/cadastro/lote", json=corpo)
+        monkeypatch.setattr(settings, "PROVISIONAMENTO_TOKEN", "t0k3n")
+        sem_token = await cliente.post("/usuarios/cadastro/lote", json=corpo)
+        cabecalho = {"X-Provisionamento-Token": "t0k3n"}
+        repetido = await cliente.post("/usuarios/cadastro/lote", json=corpo + corpo[:1], headers=cabecalho)
+        lote = await cliente.post("/usuarios/cadastro/lote", json=corpo, headers=cabecalho)
+
+    assert sozinho.status_code == 201 and "senha" not in sozinho.json()
+    assert sozinho.json()["email"] == "so@a.com"
+    assert (desligado.status_code, sem_token.status_code, repetido.status_code) == (403, 401, 400)
+    assert lote.status_code == 201
+    assert [u["email"] for u in lote.json()] == ["ana@a.com", "bia@a.com"]
+    assert len(await _contagens(Session, ParenteModel)) == 3
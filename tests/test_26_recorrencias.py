@@ -0,0 +1,186 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+from core.recorrencias import data_da_ocorrencia, parcelas_no_periodo
+from core.saldos import primeiro_dia, somar_meses
+from models.__all_models import CartaoCreditoModel, ContaModel, FaturaModel, MovimentacaoModel, RepeticaoModel
+from models.enums import TipoRecorrencia
+from tests.sementes import cadastro_da_ana, semear
+
+
+def test_datas_das_ocorrencias_contam_da_data_inicio():
+    inicio = date(2024, 1, 31)
+    assert [data_da_ocorrencia(TipoRecorrencia.MENSAL, inicio, n) for n in (1, 2, 3)] == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31)]
+    assert data_da_ocorrencia("Anual", date(2024, 2, 29), 2) == date(2025, 2, 28)
+    assert data_da_ocorrencia(TipoRecorrencia.QUINZENAL, inicio, 3) == date(2024, 3, 1)
+    assert parcelas_no_periodo(TipoRecorrencia.SEMANAL, inicio, 24, date(2024, 2, 1), date(2024, 3, 1)) == [
+        (2, date(2024, 2, 7)), (3, date(2024, 2, 14)), (4, date(2024, 2, 21)), (5, date(2024, 2, 28))]
+    assert parcelas_no_periodo(TipoRecorrencia.MENSAL, inicio, 2, date(2024, 3, 1), date(2024, 4, 1)) == []
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        *cadastro_da_ana(),
+        (CartaoCreditoModel, [{"id_cartao_credito": 1, "nome": "Cartão", "id_usuario": 1, "limite": Decimal("1000"),
+                               "limite_disponivel": Decimal("1000"), "nome_icone": "c.svg", "ativo": True}]),
+        (FaturaModel, [
+            {"id_fatura": mes, "id_cartao_credito": 1, "id_conta": 1, "data_fechamento": date(2031, mes, 3),
+             "data_vencimento": date(2031, mes, 10), "fatura_gastos": Decimal("0")}
+            for mes in range(1, 13)
+        ]),
+    )
+
+
+def despesa_recorrente(**campos):
+    return {"valor": "39.90", "descricao": "Streaming", "id_categoria": 1, "condicao_pagamento": "Recorrente",
+            "tipo_recorrencia": "Mensal", "datatime": "2031-01-31T10:00:00", "data_pagamento": "2031-01-31",
+            "consolidado": False, "forma_pagamento": "Débito", "id_financeiro": 1, "quantidade_parcelas": 1,
+            "divide_parente": [{"id_parente": 1, "valor_parente": "39.90"}], **campos}
+
+
+async def listar(cliente, ano, mes, **filtros):
+    resposta = await cliente.post("/movimentacao/listar/filtro", json={"mes": mes, "ano": ano, **filtros})
+    assert resposta.status_code == 200
+    return resposta.json()
+
+
+@pytest.mark.asyncio
+async def test_recorrencia_grava_uma_linha_e_materializa_sob_demanda(cliente):
+    criada = await cliente.post("/movimentacao/cadastro/despesa", json=despesa_recorrente())
+    assert criada.status_code == 201
+
+    async with cliente.Session() as session:
+        assert await session.scalar(select(func.count()).select_from(MovimentacaoModel)) == 1
+        assert await session.scalar(select(RepeticaoModel.quantidade_parcelas)) is None
+
+    [abril] = await listar(cliente, 2031, 4)
+    assert (abril["id_movimentacao"], abril["parcela_atual"], abril["data_pagamento"]) == (None, "4", "2031-04-30")
+    assert (abril["valor"], abril["consolidado"], abril["nome_conta"]) == ("39.90", False, "Corrente")
+    assert abril["divide_parente"] == [{"id_parente": 1, "valor_parente": "39.90", "nome_parente": "Ana"}]
+    assert await listar(cliente, 2031, 4, consolidado=True) == []
+    assert await listar(cliente, 2031, 4, id_categoria=2) == []
+    # a série não tem fim
+    [(parcela, data)] = [(m["parcela_atual"], m["data_pagamento"]) for m in await listar(cliente, 2040, 1)]
+    assert (parcela, data) == ("109", "2040-01-31")
+
+    consolidada = await cliente.post("/movimentacao/consolidar",
+                                     json={"consolidado": True, "id_repeticao": abril["id_repeticao"], "parcela": 4})
+    assert consolidada.status_code == 200
+    [gravada] = await listar(cliente, 2031, 4)
+    assert gravada["id_movimentacao"] is not None and gravada["consolidado"] is True
+    async with cliente.Session() as session:
+        assert await session.scalar(select(ContaModel.saldo)) == Decimal("960.10")
+
+    # apagar a partir da 6ª ocorrência encerra a regra na 5ª, sem gravar as que faltam
+    sexta = await cliente.post(f"/movimentacao/recorrencia/{abril['id_repeticao']}/6")
+    assert sexta.status_code == 201
+    apagada = await cliente.delete(f"/movimentacao/deletar/{sexta.json()['id_movimentacao']}")
+    assert apagada.status_code == 204
+    assert [m["parcela_atual"] for m in await listar(cliente, 2031, 5)] == ["5"]
+    assert await listar(cliente, 2031, 6) == [] and await listar(cliente, 2031, 7) == []
+
+    inexistente = await cliente.post(f"/movimentacao/recorrencia/{abril['id_repeticao']}/9")
+    assert inexistente.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_ocorrencia_virtual_no_cartao_cai_na_fatura_do_fechamento(cliente):
+    criada = await cliente.post("/movimentacao/cadastro/despesa", json=despesa_recorrente(
+        forma_pagamento="Crédito", data_pagamento="2031-01-15"))
+    assert criada.status_code == 201
+
+    # gasto de 15/04 entra na fatura que fecha em 03/05
+    [abril] = await listar(cliente, 2031, 5, id_cartao_credito=1)
+    assert (abril["parcela_atual"], abril["id_fatura"], abril["id_cartao_credito"]) == ("4", 5, 1)
+    assert (abril["participa_limite_fatura_gastos"], abril["fatura_info"]["data_fechamento"]) == (False, "2031-05-03")
+    assert abril["fatura_info"]["nome_conta"] == "Corrente"
+    assert [m["parcela_atual"] for m in await listar(cliente, 2031, 4)] == ["4"]
+
+
+def edicao(valor, descricao, data_pagamento):
+    return {"valor": valor, "descricao": descricao, "id_categoria": 1, "datatime": f"{data_pagamento}T10:00:00",
+            "data_pagamento": data_pagamento, "consolidado": False, "forma_pagamento": "Débito", "id_financeiro": 1,
+            "divide_parente": [{"id_parente": 1, "valor_parente": valor}]}
+
+
+async def movimentacoes(cliente):
+    async with cliente.Session() as session:
+        return (await session.execute(
+            select(MovimentacaoModel.id_repeticao, MovimentacaoModel.parcela_atual, MovimentacaoModel.data_pagamento,
+                   MovimentacaoModel.valor)
+            .order_by(MovimentacaoModel.data_pagamento))).all()
+
+
+@pytest.mark.asyncio
+async def test_editar_a_primeira_ocorrencia_nao_muda_as_seguintes(cliente):
+    criada = await cliente.post("/movimentacao/cadastro/despesa", json=despesa_recorrente(
+        tipo_recorrencia="Anual", data_pagamento="2031-01-31"))
+    assert criada.status_code == 201
+    [(id_repeticao, _, _, _)] = await movimentacoes(cliente)
+    async with cliente.Session() as session:
+        id_primeira = await session.scalar(select(MovimentacaoModel.id_movimentacao))
+
+    editada = await cliente.post(f"/movimentacao/editar/{id_primeira}",
+                                 json=edicao("59.90", "Streaming família", "2031-01-31"))
+    assert editada.status_code == 202
+
+    # a regra termina na primeira; a segunda vira o modelo de uma regra nova, com os valores de antes
+    [primeira, segunda] = await movimentacoes(cliente)
+    id_nova = segunda.id_repeticao
+    assert primeira == (id_repeticao, "1", date(2031, 1, 31), Decimal("59.90"))
+    assert segunda == (id_nova, "1", date(2032, 1, 31), Decimal("39.90")) and id_nova != id_repeticao
+    async with cliente.Session() as session:
+        quantidades = dict((await session.execute(
+            select(RepeticaoModel.id_repeticao, RepeticaoModel.quantidade_parcelas))).all())
+    assert quantidades == {id_repeticao: 1, id_nova: None}
+
+    [terceira] = await listar(cliente, 2033, 1)
+    assert (terceira["valor"], terceira["descricao"], terceira["parcela_atual"], terceira["id_movimentacao"]) == (
+        "39.90", "Streaming", "2", None)
+    assert terceira["divide_parente"] == [{"id_parente": 1, "valor_parente": "39.90", "nome_parente": "Ana"}]
+
+
+@pytest.mark.asyncio
+async def test_editar_a_primeira_ocorrencia_grava_poucas_linhas_e_mantem_o_dia(cliente):
+    criada = await cliente.post("/movimentacao/cadastro/despesa", json=despesa_recorrente())
+    assert criada.status_code == 201
+    [(id_repeticao, _, _, _)] = await movimentacoes(cliente)
+    assert (await cliente.post(f"/movimentacao/recorrencia/{id_repeticao}/6")).status_code == 201
+    async with cliente.Session() as session:
+        id_primeira = await session.scalar(
+            select(MovimentacaoModel.id_movimentacao).where(MovimentacaoModel.parcela_atual == "1"))
+
+    editada = await cliente.post(f"/movimentacao/editar/{id_primeira}",
+                                 json=edicao("59.90", "Streaming família", "2031-01-31"))
+    assert editada.status_code == 202
+
+    # 28/02 fica na regra antiga; a nova começa em 31/03 e leva a parcela 6 já gravada, renumerada
+    linhas = await movimentacoes(cliente)
+    id_nova = linhas[-1].id_repeticao
+    assert linhas == [(id_repeticao, "1", date(2031, 1, 31), Decimal("59.90")),
+                      (id_repeticao, "2", date(2031, 2, 28), Decimal("39.90")),
+                      (id_nova, "1", date(2031, 3, 31), Decimal("39.90")),
+                      (id_nova, "4", date(2031, 6, 30), Decimal("39.90"))]
+    [julho] = await listar(cliente, 2031, 7)
+    assert (julho["id_repeticao"], julho["parcela_atual"], julho["data_pagamento"], julho["valor"]) == (
+        id_nova, "5", "2031-07-31", "39.90")
+
+
+@pytest.mark.asyncio
+async def test_cadastro_grava_as_ocorrencias_ate_o_fim_do_mes(cliente):
+    inicio = somar_meses(primeiro_dia(date.today()), -2)
+    criada = await cliente.post("/movimentacao/cadastro/despesa", json=despesa_recorrente(
+        data_pagamento=inicio.isoformat(), datatime=f"{inicio.isoformat()}T10:00:00"))
+    assert criada.status_code == 201
+
+    # orçamento, saldos, extratos e rotina de atraso leem só linhas: não esperam o horizonte_job
+    async with cliente.Session() as session:
+        linhas = (await session.execute(
+            select(MovimentacaoModel.parcela_atual, MovimentacaoModel.data_pagamento)
+            .order_by(MovimentacaoModel.data_pagamento))).all()
+    assert linhas == [("1", inicio), ("2", somar_meses(inicio, 1)), ("3", somar_meses(inicio, 2))]
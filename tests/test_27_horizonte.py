@@ -0,0 +1,217 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from api.v1.endpoints import movimentacao
+from core import horizonte
+from benchmarks.banco import ContadorConsultas
+from core.faturas import CalendarioFaturas, cache_calendarios
+from core.horizonte import estender_faturas, faturas_dos_meses, inserir_faturas, materializar_recorrencias
+from models.__all_models import CartaoCreditoModel, DivideModel, FaturaModel, MovimentacaoModel
+from models.enums import CondicaoPagamento, FormaPagamento, TipoMovimentacao
+from tests.sementes import cadastro_da_ana, semear
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        *cadastro_da_ana(),
+        (CartaoCreditoModel, [
+            {"id_cartao_credito": id_cartao, "nome": f"Cartão {id_cartao}", "id_usuario": 1, "limite": Decimal("1000"),
+             "limite_disponivel": Decimal("1000"), "nome_icone": "c.svg", "ativo": id_cartao != 2,
+             "dia_fechamento": 5 if id_cartao == 3 else None, "dia_vencimento": 15 if id_cartao == 3 else None}
+            for id_cartao in (1, 2, 3)
+        ]),
+        # cartões 1 e 2 até dez/2031 (fecha dia 3, vence dia 30), sem os dias no cartão, como os antigos;
+        # o 3 não tem fatura nenhuma, só os dias
+        (FaturaModel, [
+            {"id_fatura": (id_cartao - 1) * 12 + mes, "id_cartao_credito": id_cartao, "id_conta": 1,
+             "data_fechamento": date(2031, mes, 3), "data_vencimento": date(2031, mes, 28 if mes == 2 else 30),
+             "fatura_gastos": Decimal("0")}
+            for id_cartao in (1, 2) for mes in range(1, 13)
+        ]),
+    )
+
+
+def despesa(**campos):
+    return {"valor": "39.90", "descricao": "Streaming", "id_categoria": 1, "condicao_pagamento": "Recorrente",
+            "tipo_recorrencia": "Mensal", "datatime": "2031-01-31T10:00:00", "data_pagamento": "2031-01-31",
+            "consolidado": False, "forma_pagamento": "Débito", "id_financeiro": 1, "quantidade_parcelas": 1,
+            "divide_parente": [{"id_parente": 1, "valor_parente": "39.90"}], **campos}
+
+
+@pytest.mark.asyncio
+async def test_faturas_dos_cartoes_ativos_ate_o_horizonte(cliente):
+    contador = ContadorConsultas(cliente.Session.kw["bind"])
+    async with cliente.Session() as session:
+        with contador.medir():
+            criadas = await estender_faturas(session, date(2032, 3, 1), lote=10, hoje=date(2032, 1, 10))
+        # cartões, última fatura (e dono) de cada um, versão de sincronização, INSERT, fim do keyset
+        assert criadas == 6 and contador.total == 5
+        assert await estender_faturas(session, date(2032, 3, 1), lote=1, hoje=date(2032, 1, 10)) == 0
+
+        faturas = (await session.execute(
+            select(FaturaModel.id_cartao_credito, FaturaModel.data_fechamento, FaturaModel.data_vencimento,
+                   FaturaModel.id_conta)
+            .where(FaturaModel.data_fechamento >= date(2032, 1, 1))
+            .order_by(FaturaModel.id_cartao_credito, FaturaModel.data_fechamento)
+        )).all()
+    # o 3, sem faturas, começa no mês de hoje com os próprios dias
+    assert faturas == [(1, date(2032, 1, 3), date(2032, 1, 30), 1), (1, date(2032, 2, 3), date(2032, 2, 29), 1),
+                       (1, date(2032, 3, 3), date(2032, 3, 30), 1), (3, date(2032, 1, 5), date(2032, 1, 15), None),
+                       (3, date(2032, 2, 5), date(2032, 2, 15), None), (3, date(2032, 3, 5), date(2032, 3, 15), None)]
+
+
+@pytest.mark.asyncio
+async def test_compra_alem_das_faturas_cria_so_os_meses_que_faltam(cliente):
+    criada = await cliente.post("/movimentacao/cadastro/despesa", json=despesa(
+        condicao_pagamento="À vista", forma_pagamento="Crédito", data_pagamento="2031-12-20"))
+    assert criada.status_code == 201
+
+    async with cliente.Session() as session:
+        faturas = (await session.execute(
+            select(FaturaModel.id_fatura, FaturaModel.data_fechamento).where(FaturaModel.id_cartao_credito == 1)
+            .order_by(FaturaModel.data_fechamento).offset(11))).all()
+        id_fatura = await session.scalar(select(MovimentacaoModel.id_fatura))
+    # o cadastro ainda olha a fatura do mês seguinte ao da última parcela: jan e fev, não 2032 inteiro
+    assert faturas == [(12, date(2031, 12, 3)), (25, date(2032, 1, 3)), (26, date(2032, 2, 3))]
+    assert id_fatura == 25
+
+
+@pytest.mark.asyncio
+async def test_compra_antes_da_primeira_fatura_e_em_cartao_sem_faturas(cliente):
+    # o calendário em cache de outro worker não conhece as faturas de 2031 do cartão 1
+    cache_calendarios.guardar(1, CalendarioFaturas([]))
+    for campos in ({"data_pagamento": "2030-06-10"}, {"data_pagamento": "2031-03-10"},
+                   {"data_pagamento": "2031-05-20", "id_financeiro": 3}):
+        criada = await cliente.post("/movimentacao/cadastro/despesa", json=despesa(
+            condicao_pagamento="À vista", forma_pagamento="Crédito", **campos))
+        assert criada.status_code == 201, criada.text
+
+    async with cliente.Session() as session:
+        faturas = (await session.execute(
+            select(FaturaModel.id_cartao_credito, FaturaModel.data_fechamento, FaturaModel.data_vencimento)
+            .join(MovimentacaoModel, MovimentacaoModel.id_fatura == FaturaModel.id_fatura)
+            .order_by(MovimentacaoModel.id_movimentacao))).all()
+        criadas = (await session.execute(
+            select(FaturaModel.id_cartao_credito, FaturaModel.data_fechamento)
+            .where(FaturaModel.id_fatura > 24).order_by(FaturaModel.id_fatura))).all()
+    cache_calendarios.limpar()
+
+    # junho/2030 já fechou no dia 3: cai em julho; março/2031 já existia; no cartão 3, os dias dele
+    assert faturas == [(1, date(2030, 7, 3), date(2030, 7, 30)), (1, date(2031, 4, 3), date(2031, 4, 30)),
+                       (3, date(2031, 6, 5), date(2031, 6, 15))]
+    # o mês da compra, o seguinte e o depois dele (o cadastro olha a fatura seguinte à da última parcela)
+    assert criadas == [(1, date(2030, 6, 3)), (1, date(2030, 7, 3)), (1, date(2030, 8, 3)),
+                       (3, date(2031, 5, 5)), (3, date(2031, 6, 5)), (3, date(2031, 7, 5))]
+
+
+@pytest.mark.asyncio
+async def test_ocorrencias_gravadas_ate_o_fim_do_mes(cliente):
+    for campos in ({}, {"forma_pagamento": "Crédito", "data_pagamento": "2031-01-15"}):
+        assert (await cliente.post("/movimentacao/cadastro/despesa", json=despesa(**campos))).status_code == 201
+
+    async with cliente.Session() as session:
+        assert await materializar_recorrencias(session, date(2031, 4, 1), lote=1, hoje=date(2031, 3, 10)) == 4
+        assert await materializar_recorrencias(session, date(2031, 4, 1), hoje=date(2031, 3, 10)) == 0
+        gravadas = (await session.execute(
+            select(MovimentacaoModel.parcela_atual, MovimentacaoModel.data_pagamento, MovimentacaoModel.id_fatura,
+                   MovimentacaoModel.participa_limite_fatura_gastos)
+            .where(MovimentacaoModel.parcela_atual != "1")
+            .order_by(MovimentacaoModel.id_repeticao, MovimentacaoModel.data_pagamento)
+        )).all()
+        divisoes = await session.scalar(select(func.count()).select_from(DivideModel))
+        limite = await session.scalar(select(CartaoCreditoModel.limite_disponivel)
+                                      .where(CartaoCreditoModel.id_cartao_credito == 1))
+        gastos = dict((await session.execute(
+            select(FaturaModel.id_fatura, FaturaModel.fatura_gastos).where(FaturaModel.id_fatura.in_([3, 4])))).all())
+
+    assert gravadas == [("2", date(2031, 2, 28), None, None), ("3", date(2031, 3, 31), None, None),
+                        ("2", date(2031, 2, 15), 3, True), ("3", date(2031, 3, 15), 4, True)]
+    assert divisoes == 6
+    assert limite == Decimal("880.30") and gastos == {3: Decimal("39.90"), 4: Decimal("39.90")}
+
+    # a listagem passa a mostrar as linhas, sem repetir a ocorrência virtual
+    resposta = await cliente.post("/movimentacao/listar/filtro", json={"mes": 3, "ano": 2031})
+    assert sorted(m["parcela_atual"] for m in resposta.json()) == ["3", "3"]
+    assert all(m["id_movimentacao"] is not None for m in resposta.json())
+
+
+@pytest.mark.asyncio
+async def test_meses_criados_por_outra_transacao_ficam_de_fora(cliente):
+    linhas = faturas_dos_meses(1, 30, 3, date(2031, 12, 1), date(2032, 2, 1), id_conta=1)
+    async with cliente.Session() as session:
+        assert await inserir_faturas(session, linhas) == 2
+        # o mesmo mês com outro dia de fechamento também é repetido (ux_fatura_cartao_mes)
+        assert await inserir_faturas(session, faturas_dos_meses(1, 30, 10, date(2032, 1, 1), date(2032, 2, 1))) == 0
+        await session.commit()
+        meses = (await session.scalars(
+            select(FaturaModel.data_fechamento).where(FaturaModel.data_fechamento >= date(2031, 12, 1))
+            .where(FaturaModel.id_cartao_credito == 1).order_by(FaturaModel.data_fechamento))).all()
+    assert meses == [date(2031, 12, 3), date(2032, 1, 3), date(2032, 2, 3)]
+
+
+def ocorrencia_concorrente(id_repeticao: int, parcela: int, data_pagamento: date) -> dict:
+    return {"valor": Decimal("39.90"), "tipoMovimentacao": TipoMovimentacao.DESPESA,
+            "forma_pagamento": FormaPagamento.CREDITO, "condicao_pagamento": CondicaoPagamento.RECORRENTE,
+            "consolidado": False, "parcela_atual": str(parcela), "data_pagamento": data_pagamento,
+            "id_repeticao": id_repeticao, "id_usuario": 1}
+
+
+@pytest.mark.asyncio
+async def test_parcela_materializada_no_meio_do_lote(cliente, monkeypatch):
+    for campos in ({}, {"forma_pagamento": "Crédito", "data_pagamento": "2031-01-15"}):
+        assert (await cliente.post("/movimentacao/cadastro/despesa", json=despesa(**campos))).status_code == 201
+    original = horizonte.parcelas_materializadas
+    chamadas = []
+
+    async def com_requisicao_no_meio(session, ids_repeticao):
+        materializadas = await original(session, ids_repeticao)
+        if not chamadas:
+            # a requisição grava a parcela 2 do cartão e faz commit depois da leitura do job
+            await session.execute(insert(MovimentacaoModel).values(ocorrencia_concorrente(2, 2, date(2031, 2, 15))))
+            await session.commit()
+        chamadas.append(ids_repeticao)
+        return materializadas
+
+    monkeypatch.setattr(horizonte, "parcelas_materializadas", com_requisicao_no_meio)
+    async with cliente.Session() as session:
+        assert await materializar_recorrencias(session, date(2031, 4, 1), hoje=date(2031, 3, 10)) == 3
+        parcelas = (await session.execute(
+            select(MovimentacaoModel.id_repeticao, MovimentacaoModel.parcela_atual)
+            .order_by(MovimentacaoModel.id_repeticao, MovimentacaoModel.parcela_atual))).all()
+        limite = await session.scalar(select(CartaoCreditoModel.limite_disponivel)
+                                      .where(CartaoCreditoModel.id_cartao_credito == 1))
+    # o lote foi refeito sem a parcela 2 do cartão, e o limite só desceu pela parcela 3
+    assert len(chamadas) == 2
+    assert parcelas == [(1, "1"), (1, "2"), (1, "3"), (2, "1"), (2, "2"), (2, "3")]
+    assert limite == Decimal("920.20")
+
+
+@pytest.mark.asyncio
+async def test_materializar_parcela_gravada_ao_mesmo_tempo(cliente, monkeypatch):
+    criada = await cliente.post("/movimentacao/cadastro/despesa", json=despesa(
+        forma_pagamento="Crédito", data_pagamento="2031-01-15", datatime="2031-01-15T10:00:00"))
+    assert criada.status_code == 201
+    original = movimentacao.get_or_create_fatura
+    concorrente = {}
+
+    async def com_job_no_meio(session, *args):
+        retorno = await original(session, *args)
+        # o horizonte_job grava a mesma parcela entre a checagem e o INSERT desta requisição
+        concorrente["id"] = (await session.execute(
+            insert(MovimentacaoModel).values(ocorrencia_concorrente(1, 2, date(2031, 2, 15)))
+            .returning(MovimentacaoModel.id_movimentacao))).scalar_one()
+        return retorno
+
+    monkeypatch.setattr(movimentacao, "get_or_create_fatura", com_job_no_meio)
+    resposta = await cliente.post("/movimentacao/recorrencia/1/2")
+
+    async with cliente.Session() as session:
+        linhas = await session.scalar(select(func.count()).select_from(MovimentacaoModel)
+                                      .where(MovimentacaoModel.parcela_atual == "2"))
+    # fica a linha de quem gravou antes, e a requisição responde com ela
+    assert resposta.status_code == 201 and resposta.json() == {"id_movimentacao": concorrente["id"]}
+    assert linhas == 1
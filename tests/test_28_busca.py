@@ -0,0 +1,108 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.dialects import postgresql
+
+from api.v1.endpoints import movimentacao
+from core.busca import buscar_movimentacoes, condicao_termo, normalizar
+from core.deps import get_current_user_leitura, get_read_session
+from models.__all_models import CategoriaModel, MovimentacaoModel, UsuarioModel
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+from tests.sementes import semear, usuarios
+
+DESCRICOES = (
+    # id_categoria, data_pagamento, descricao
+    (1, date(2031, 1, 5), "Açougue Boi Gordo"),
+    (1, date(2031, 1, 20), "ACOUGUE do bairro"),
+    (2, date(2031, 2, 3), "Churrasco: carne do açougue"),
+    (1, date(2031, 2, 10), "Açougue 50%"),
+    (2, date(2031, 3, 1), "Padaria"),
+    (1, date(2031, 3, 7), "açougue"),
+)
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        (UsuarioModel, usuarios((1, "ana"), (2, "bia"))),
+        (CategoriaModel, [
+            {"id_categoria": id_categoria, "nome": nome, "id_usuario": 1, "ativo": True,
+             "tipo_categoria": TipoCategoria.VARIAVEL, "modelo_categoria": TipoMovimentacao.DESPESA,
+             "nome_icone": "c.svg"} for id_categoria, nome in ((1, "Mercado"), (2, "Lazer"))
+        ]),
+        (MovimentacaoModel, [
+            {"valor": Decimal("10"), "descricao": descricao, "tipoMovimentacao": TipoMovimentacao.DESPESA,
+             "forma_pagamento": FormaPagamento.DEBITO, "condicao_pagamento": CondicaoPagamento.A_VISTA,
+             "consolidado": True, "parcela_atual": "1", "data_pagamento": data, "id_categoria": id_categoria,
+             "id_usuario": id_usuario}
+            for id_usuario in (1, 2) for id_categoria, data, descricao in DESCRICOES
+        ]),
+    )
+
+
+def test_termo_sem_acento_e_aproximado_no_postgresql():
+    assert normalizar("Pão de AÇÚCAR") == "pao de acucar"
+    compilado = condicao_termo(" Açúcar_ ", aproximada=True).compile(dialect=postgresql.dialect())
+    assert str(compilado) == (
+        "f_unaccent(lower(\"MOVIMENTACAO\".descricao)) LIKE %(f_unaccent_1)s ESCAPE '\\\\' "
+        "OR (%(param_1)s <%% f_unaccent(lower(\"MOVIMENTACAO\".descricao)))")
+    assert compilado.params == {"f_unaccent_1": "%acucar\\_%", "param_1": "acucar_"}
+
+
+@pytest.mark.asyncio
+async def test_paginas_por_cursor_e_facetas(Session):
+    async with Session() as session:
+        primeira = await buscar_movimentacoes(session, 1, "acougue", limite=2)
+        segunda = await buscar_movimentacoes(session, 1, "acougue", limite=2, cursor=primeira.proximo)
+        terceira = await buscar_movimentacoes(session, 1, "acougue", limite=2, cursor=segunda.proximo)
+        filtrada = await buscar_movimentacoes(session, 1, "acougue", data_inicio=date(2031, 2, 1), categorias=[1])
+        por_cento = await buscar_movimentacoes(session, 1, "50%")
+
+    datas = [item["data_pagamento"] for pagina in (primeira, segunda, terceira) for item in pagina.itens]
+    assert datas == [date(2031, 3, 7), date(2031, 2, 10), date(2031, 2, 3), date(2031, 1, 20), date(2031, 1, 5)]
+    assert terceira.proximo is None and segunda.facetas is None
+    assert primeira.itens[0]["nome_categoria"] == "Mercado"
+    assert primeira.facetas == {
+        "total": 5,
+        "categorias": [{"id_categoria": 1, "nome": "Mercado", "quantidade": 4},
+                       {"id_categoria": 2, "nome": "Lazer", "quantidade": 1}],
+        "meses": [{"ano": 2031, "mes": 3, "quantidade": 1}, {"ano": 2031, "mes": 2, "quantidade": 2},
+                  {"ano": 2031, "mes": 1, "quantidade": 2}],
+    }
+
+    # cada faceta ignora o próprio filtro: categorias contam só o período, meses só a categoria
+    assert [item["descricao"] for item in filtrada.itens] == ["açougue", "Açougue 50%"]
+    assert filtrada.facetas["total"] == 2
+    assert [(f["id_categoria"], f["quantidade"]) for f in filtrada.facetas["categorias"]] == [(1, 2), (2, 1)]
+    assert [(f["mes"], f["quantidade"]) for f in filtrada.facetas["meses"]] == [(3, 1), (2, 1), (1, 2)]
+    assert [item["descricao"] for item in por_cento.itens] == ["Açougue 50%"]
+
+
+@pytest.mark.asyncio
+async def test_endpoint_de_busca(Session):
+    app = FastAPI()
+    app.include_router(movimentacao.router, prefix="/movimentacao")
+
+    async def sessao():
+        async with Session() as session:
+            yield session
+
+    app.dependency_overrides[get_read_session] = sessao
+    app.dependency_overrides[get_current_user_leitura] = lambda: UsuarioModel(id_usuario=2, nome_completo="Bia")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as cliente:
+        resposta = await cliente.post("/movimentacao/busca", json={"termo": "padaria"})
+        curto = await cliente.post("/movimentacao/busca", json={"termo": "pa"})
+        so_espacos = await cliente.post("/movimentacao/busca", json={"termo": "  pa  "})
+        aparado = await cliente.post("/movimentacao/busca", json={"termo": " padaria "})
+        cursor_ruim = await cliente.post("/movimentacao/busca", json={"termo": "padaria", "cursor": "nada"})
+
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert [(item["descricao"], item["valor"], item["data_pagamento"]) for item in corpo["itens"]] == [
+        ("Padaria", "10.00", "2031-03-01")]
+    assert corpo["proximo"] is None and corpo["facetas"]["total"] == 1
+    assert (curto.status_code, so_espacos.status_code, cursor_ruim.status_code) == (422, 422, 400)
+    assert aparado.json()["itens"] == corpo["itens"]
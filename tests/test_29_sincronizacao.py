@@ -0,0 +1,110 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from api.v1.endpoints import sincronizacao
+from core.deps import get_current_user_leitura, get_read_session
+from core.horizonte import faturas_dos_meses, inserir_faturas
+from core.sincronizacao import alteracoes_desde
+from models.__all_models import (CartaoCreditoModel, CategoriaModel, ContaModel, DivideModel, MovimentacaoModel,
+                                 ParenteModel, UsuarioModel)
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+from tests.sementes import semear, usuarios
+
+
+@pytest.fixture
+def semente():
+    return semear((UsuarioModel, usuarios((1, "Ana"), (2, "Bia"))))
+
+
+def ids(resposta, entidade, campo):
+    return [linha[campo] for linha in resposta["entidades"][entidade]]
+
+
+@pytest.mark.asyncio
+async def test_so_o_que_mudou_desde_o_token(Session):
+    async with Session() as session:
+        session.add_all([
+            ContaModel(id_conta=1, nome="Corrente", tipo_conta="Corrente", saldo=Decimal("0"), ativo=True, id_usuario=1),
+            CartaoCreditoModel(id_cartao_credito=1, nome="Cartão", id_usuario=1, limite=Decimal("1000"),
+                               limite_disponivel=Decimal("1000"), nome_icone="c.svg", ativo=True),
+            ParenteModel(id_parente=1, nome="Ana", grau_parentesco="Eu", id_usuario=1),
+            ParenteModel(id_parente=2, nome="Caio", grau_parentesco="Filho", id_usuario=1),
+            CategoriaModel(id_categoria=1, nome="Lazer", id_usuario=2, ativo=True, tipo_categoria=TipoCategoria.VARIAVEL,
+                           modelo_categoria=TipoMovimentacao.DESPESA, nome_icone="c.svg"),
+        ])
+        await session.commit()
+        completo = await alteracoes_desde(session, 1)
+
+        await inserir_faturas(session, faturas_dos_meses(1, 10, 3, date(2031, 1, 1), date(2031, 2, 1)))
+        await session.commit()
+        movimentacao = MovimentacaoModel(
+            id_movimentacao=1, valor=Decimal("50"), descricao="Cinema", tipoMovimentacao=TipoMovimentacao.DESPESA,
+            forma_pagamento=FormaPagamento.DEBITO, condicao_pagamento=CondicaoPagamento.A_VISTA,
+            datatime=datetime.now(timezone.utc), consolidado=True, data_pagamento=date(2031, 1, 5), id_conta=1,
+            id_usuario=1, divisoes=[DivideModel(id_parente=1, valor=Decimal("50"))])
+        session.add(movimentacao)
+        await session.commit()
+        depois_do_cadastro = await alteracoes_desde(session, 1, completo["token"])
+
+    # a divisão muda sem a movimentação carregada, e um parente é apagado
+    async with Session() as session:
+        divisao = (await session.execute(select(DivideModel))).scalar_one()
+        divisao.valor = Decimal("30")
+        await session.commit()
+        await session.delete(await session.get(ParenteModel, 2))
+        await session.commit()
+        depois_da_edicao = await alteracoes_desde(session, 1, depois_do_cadastro["token"])
+        em_dia = await alteracoes_desde(session, 1, depois_da_edicao["token"])
+        outro_usuario = await alteracoes_desde(session, 2, 0)
+        token_desconhecido = await alteracoes_desde(session, 1, 999)
+
+    assert completo["completo"] and completo["token"] == 1
+    assert ids(completo, "parentes", "id_parente") == [1, 2] and ids(completo, "categorias", "id_categoria") == []
+
+    assert not depois_do_cadastro["completo"] and depois_do_cadastro["token"] == 3
+    assert [(f["data_fechamento"], f["versao"]) for f in depois_do_cadastro["entidades"]["faturas"]] == [
+        (date(2031, 1, 3), 2), (date(2031, 2, 3), 2)]
+    assert depois_do_cadastro["entidades"]["movimentacoes"][0]["divide_parente"] == [
+        {"id_parente": 1, "valor_parente": Decimal("50.00")}]
+    assert ids(depois_do_cadastro, "contas", "id_conta") == ids(depois_do_cadastro, "parentes", "id_parente") == []
+
+    assert depois_da_edicao["token"] == 5
+    assert depois_da_edicao["entidades"]["movimentacoes"][0]["divide_parente"] == [
+        {"id_parente": 1, "valor_parente": Decimal("30.00")}]
+    assert ids(depois_da_edicao, "faturas", "id_fatura") == []
+    assert depois_da_edicao["removidos"]["parentes"] == [2]
+
+    assert em_dia["token"] == 5 and not any(em_dia["entidades"].values()) and not any(em_dia["removidos"].values())
+    assert ids(outro_usuario, "categorias", "id_categoria") == [1] and outro_usuario["token"] == 1
+    assert token_desconhecido["completo"] and ids(token_desconhecido, "parentes", "id_parente") == [1]
+
+
+@pytest.mark.asyncio
+async def test_endpoint_de_sincronizacao(Session):
+    async with Session() as session:
+        session.add(ContaModel(nome="Carteira", tipo_conta="Dinheiro", saldo=Decimal("12.5"), ativo=True, id_usuario=1))
+        await session.commit()
+
+    app = FastAPI()
+    app.include_router(sincronizacao.router, prefix="/sync")
+
+    async def sessao():
+        async with Session() as session:
+            yield session
+
+    app.dependency_overrides[get_read_session] = sessao
+    app.dependency_overrides[get_current_user_leitura] = lambda: UsuarioModel(id_usuario=1, nome_completo="Ana")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://teste") as cliente:
+        tudo = await cliente.get("/sync")
+        nada = await cliente.get("/sync", params={"since": tudo.json()["token"]})
+        invalido = await cliente.get("/sync", params={"since": -1})
+
+    assert tudo.status_code == nada.status_code == 200
+    assert [(c["nome"], c["saldo"]) for c in tudo.json()["entidades"]["contas"]] == [("Carteira", "12.50")]
+    assert nada.json()["completo"] is False and nada.json()["entidades"]["contas"] == []
+    assert invalido.status_code == 422
@@ -0,0 +1,39 @@
+import pytest
+
+from benchmarks.banco import criar_engine
+from core import database
+from core.trava import exclusivo, trava
+
+
+@pytest.mark.asyncio
+async def test_trava_so_com_um_por_vez():
+    engine = criar_engine()
+    async with trava("teste-trava", engine) as primeira:
+        async with trava("teste-trava", engine) as segunda, trava("outro-job", engine) as outra:
+            assert primeira and not segunda and outra
+    # solta na saída, e o arquivo continua lá para o próximo
+    async with trava("teste-trava", engine) as depois:
+        assert depois
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_job_exclusivo_nao_roda_enquanto_outro_roda(monkeypatch):
+    engine = criar_engine()
+    monkeypatch.setattr(database, "engine", engine)
+    rodadas = []
+
+    @exclusivo("teste-job")
+    async def outro_worker():
+        rodadas.append("outro")
+        return "rodou"
+
+    @exclusivo("teste-job")
+    async def job():
+        rodadas.append("job")
+        # a trava vale até a corrotina terminar, não só até ela ser agendada
+        return await outro_worker()
+
+    assert await job() is None and rodadas == ["job"]
+    assert await outro_worker() == "rodou"
+    await engine.dispose()
@@ -0,0 +1,93 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from models.__all_models import (CartaoCreditoModel, CategoriaModel, DivideModel, FaturaModel, MovimentacaoModel,
+                                 ParenteModel)
+from models.enums import CondicaoPagamento, FormaPagamento, TipoCategoria, TipoMovimentacao
+from tests.sementes import cadastro_da_ana, semear
+
+# orçamentos dos endpoints mais chamados pelo app; o repeticoes=3 pega o N+1 (uma consulta
+# por movimentação, por categoria ou por divisão), que o total sozinho só pega com volume
+
+
+@pytest.fixture
+def semente():
+    return semear(
+        *cadastro_da_ana(),
+        (ParenteModel, [{"id_parente": id_parente, "nome": f"Parente {id_parente}", "grau_parentesco": "Filho",
+                         "id_usuario": 1} for id_parente in range(2, 5)]),
+        (CategoriaModel, [
+            {"id_categoria": id_categoria, "nome": f"Categoria {id_categoria}", "id_usuario": 1, "ativo": True,
+             "tipo_categoria": TipoCategoria.VARIAVEL, "modelo_categoria": TipoMovimentacao.DESPESA,
+             "valor_categoria": Decimal("300"), "nome_icone": "c.svg"}
+            for id_categoria in range(2, 7)
+        ]),
+        (CartaoCreditoModel, [{"id_cartao_credito": 1, "nome": "Cartão", "id_usuario": 1, "limite": Decimal("5000"),
+                               "limite_disponivel": Decimal("5000"), "nome_icone": "c.svg", "ativo": True,
+                               "dia_fechamento": 3, "dia_vencimento": 10}]),
+        (FaturaModel, [
+            {"id_fatura": mes, "id_cartao_credito": 1, "id_conta": 1, "data_fechamento": date(2031, mes, 3),
+             "data_vencimento": date(2031, mes, 10), "fatura_gastos": Decimal("0")}
+            for mes in range(1, 13)
+        ]),
+    )
+
+
+async def cadastrar_despesas(Session, data_pagamento: date, quantidade: int = 10):
+    """Despesas no débito, espalhadas pelas categorias, gravadas direto (fora do orçamento das requisições)."""
+    async with Session() as session:
+        session.add_all([
+            MovimentacaoModel(
+                valor=Decimal("20"), descricao=f"Despesa {i}", tipoMovimentacao=TipoMovimentacao.DESPESA,
+                forma_pagamento=FormaPagamento.DEBITO, condicao_pagamento=CondicaoPagamento.A_VISTA,
+                datatime=datetime.now(timezone.utc), consolidado=True, data_pagamento=data_pagamento, id_conta=1,
+                id_categoria=i % 6 + 1, id_usuario=1, divisoes=[DivideModel(id_parente=1, valor=Decimal("20"))])
+            for i in range(quantidade)
+        ])
+        await session.commit()
+
+
+def despesa(**campos):
+    return {"valor": "120.00", "descricao": "Mercado", "id_categoria": 1, "condicao_pagamento": "À vista",
+            "tipo_recorrencia": "Mensal", "datatime": "2031-03-05T10:00:00", "data_pagamento": "2031-03-05",
+            "consolidado": False, "forma_pagamento": "Débito", "id_financeiro": 1, "quantidade_parcelas": 1,
+            "divide_parente": [{"id_parente": 1, "valor_parente": "120.00"}], **campos}
+
+
+@pytest.mark.asyncio
+@pytest.mark.orcamento_consultas(4, repeticoes=3)
+async def test_listar_filtro(cliente):
+    await cadastrar_despesas(cliente.Session, date(2031, 3, 5))
+
+    resposta = await cliente.post("/movimentacao/listar/filtro", json={"mes": 3, "ano": 2031})
+    filtrada = await cliente.post("/movimentacao/listar/filtro", json={"mes": 3, "ano": 2031, "id_categoria": 2})
+
+    assert resposta.status_code == filtrada.status_code == 200
+    assert len(resposta.json()) == 10 and len(filtrada.json()) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.orcamento_consultas(5, repeticoes=3)
+async def test_orcamento_mensal(cliente):
+    await cadastrar_despesas(cliente.Session, date.today())
+
+    resposta = await cliente.get("/movimentacao/orcamento-mensal")
+
+    assert resposta.status_code == 200
+    assert len(resposta.json()["detalhes_categorias"]) == 6
+    assert Decimal(resposta.json()["despesas_totais"]) == Decimal("200")
+
+
+@pytest.mark.asyncio
+@pytest.mark.orcamento_consultas(14, repeticoes=3)
+async def test_cadastro_despesa(cliente):
+    await cadastrar_despesas(cliente.Session, date(2031, 3, 5))
+
+    no_debito = await cliente.post("/movimentacao/cadastro/despesa", json=despesa())
+    no_credito = await cliente.post("/movimentacao/cadastro/despesa", json=despesa(forma_pagamento="Crédito"))
+    dividida = await cliente.post("/movimentacao/cadastro/despesa", json=despesa(divide_parente=[
+        {"id_parente": id_parente, "valor_parente": "30.00"} for id_parente in range(1, 5)]))
+
+    assert no_debito.status_code == no_credito.status_code == dividida.status_code == 201, dividida.text